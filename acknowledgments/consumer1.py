@@ -4,7 +4,6 @@ Demonstra AUTO ACK (risco de perda de mensagem)
 """
 import sys
 import os
-import json
 import time
 import random
 
@@ -16,6 +15,7 @@ from utils.common import (
     setup_logging, get_rabbitmq_connection, 
     log_message_received, print_scenario_header, print_config_info
 )
+from utils.serialization import decode_message
 
 def main():
     # Configurações do cenário
@@ -50,7 +50,7 @@ def main():
             logger.info(f"[{CONSUMER_ID}] ⚠️ MENSAGEM JÁ REMOVIDA DA FILA (auto_ack=True)")
             
             # Processa a tarefa
-            task_data = json.loads(body.decode('utf-8'))
+            task_data = decode_message(body, properties)
             
             task_id = task_data.get('task_id')
             task_type = task_data.get('task_type')
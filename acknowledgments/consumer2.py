@@ -4,7 +4,6 @@ Demonstra MANUAL ACK (processamento seguro)
 """
 import sys
 import os
-import json
 import time
 
 # Adiciona o diretório pai ao path para importar utils
@@ -15,6 +14,8 @@ from utils.common import (
     setup_logging, get_rabbitmq_connection, 
     log_message_received, print_scenario_header, print_config_info
 )
+from utils.retry import RetryPolicy
+from utils.serialization import decode_message
 
 def main():
     # Configurações do cenário
@@ -38,6 +39,9 @@ def main():
     failed_count = 0
     requeued_count = 0
     
+    # Falhas voltam à fila após o atraso do tier (compartilhado com consumer3)
+    retry = RetryPolicy(QUEUE_NAME, logger=logger)
+    
     def callback(ch, method, properties, body):
         """Callback para processar tarefas com manual-ack"""
         nonlocal processed_count, failed_count, requeued_count
@@ -50,7 +54,7 @@ def main():
             logger.info(f"[{CONSUMER_ID}] 🔒 MENSAGEM PERMANECE NA FILA (manual_ack)")
             
             # Processa a tarefa
-            task_data = json.loads(body.decode('utf-8'))
+            task_data = decode_message(body, properties)
             
             task_id = task_data.get('task_id')
             task_type = task_data.get('task_type')
@@ -89,11 +93,15 @@ def main():
             logger.error(f"[{CONSUMER_ID}] ❌ FALHA NA TAREFA #{task_data.get('task_id', 'unknown')}: {str(e)}")
             logger.error(f"[{CONSUMER_ID}] 🔄 RECOLOCANDO mensagem na fila para reprocessamento")
             
-            # Falha - rejeita e recoloca na fila
-            ch.basic_nack(delivery_tag=method.delivery_tag, requeue=True)
+            # Falha - republica na fila de atraso (volta à fila após o TTL)
+            outcome = retry.retry(ch, method, properties, body, reason=str(e))
             requeued_count += 1
             
-            logger.error(f"[{CONSUMER_ID}] 🔄 Mensagem recolocada na fila (tentativa: {requeued_count})")
+            if outcome == 'dead':
+                logger.error(f"[{CONSUMER_ID}] 🚫 Tentativas esgotadas - movida para '{retry.dead_letter_queue}'")
+            else:
+                logger.error(f"[{CONSUMER_ID}] 🔄 Mensagem recolocada com atraso "
+                             f"(tentativa: {retry.attempts(properties) + 1}/{retry.max_retries})")
             logger.error(f"[{CONSUMER_ID}] 💪 TAREFA PRESERVADA - Pode ser reprocessada!")
             logger.error(f"[{CONSUMER_ID}] 📉 Total falhado: {failed_count}")
             logger.error("")
@@ -112,6 +120,7 @@ def main():
             queue=QUEUE_NAME,
             durable=True
         )
+        retry.declare(channel)
         
         logger.info(f"Fila '{QUEUE_NAME}' declarada")
         logger.info("Configuração MANUAL ACK:")
@@ -4,7 +4,6 @@ Demonstra diferentes estratégias de ACK (accept, reject, requeue)
 """
 import sys
 import os
-import json
 import time
 import random
 
@@ -16,6 +15,8 @@ from utils.common import (
     setup_logging, get_rabbitmq_connection, 
     log_message_received, print_scenario_header, print_config_info
 )
+from utils.retry import RetryPolicy
+from utils.serialization import DECODE_ERRORS, decode_message
 
 def main():
     # Configurações do cenário
@@ -34,15 +35,16 @@ def main():
     logger = setup_logging(SCENARIO_NAME, COMPONENT_NAME)
     print_config_info(logger)
     
-    # Contadores e controle
+    # Contadores
     stats = {
         'processed': 0,
         'rejected': 0,
-        'requeued': 0,
-        'retries': {}  # tracking de tentativas por task_id
+        'retried': 0
     }
     
-    MAX_RETRIES = 3
+    # Retry atrasado em tiers: a contagem de tentativas viaja nos headers
+    retry = RetryPolicy(QUEUE_NAME, logger=logger)
+    MAX_RETRIES = retry.max_retries
     
     def callback(ch, method, properties, body):
         """Callback inteligente com diferentes estratégias de ACK"""
@@ -51,16 +53,22 @@ def main():
             log_message_received(logger, method, properties, body, CONSUMER_ID)
             
             # Processa a tarefa
-            task_data = json.loads(body.decode('utf-8'))
+            try:
+                task_data = decode_message(body, properties)
+            except DECODE_ERRORS as e:
+                # Corpo que não decodifica falharia em todos os tiers: direto para a fila de mortas
+                logger.error(f"[{CONSUMER_ID}] 🚫 Mensagem inválida ({e}) - REJEITANDO permanentemente")
+                retry.dead_letter(ch, method, properties, body, reason="mensagem inválida")
+                stats['rejected'] += 1
+                return
             
             task_id = task_data.get('task_id')
             task_type = task_data.get('task_type')
             processing_time = task_data.get('processing_time', 2)
             failure_simulation = task_data.get('failure_simulation', False)
             
-            # Rastreia tentativas de reprocessamento
-            retry_count = stats['retries'].get(str(task_id), 0)
-            stats['retries'][str(task_id)] = retry_count + 1
+            # Tentativas anteriores (header x-retry-attempt / x-death)
+            retry_count = retry.attempts(properties)
             
             logger.info(f"[{CONSUMER_ID}] 🧠 PROCESSAMENTO INTELIGENTE #{task_id}")
             logger.info(f"[{CONSUMER_ID}] Tipo: {task_type}")
@@ -76,8 +84,8 @@ def main():
                 logger.error(f"[{CONSUMER_ID}] 🚫 LIMITE DE TENTATIVAS atingido para tarefa #{task_id}")
                 logger.error(f"[{CONSUMER_ID}] 🗑️ REJEITANDO tarefa permanentemente")
                 
-                # REJECT sem requeue - descarta a mensagem problemática
-                ch.basic_nack(delivery_tag=method.delivery_tag, requeue=False)
+                # Move a mensagem problemática para a fila de mortas
+                retry.dead_letter(ch, method, properties, body, reason="limite de tentativas")
                 stats['rejected'] += 1
                 
                 logger.error(f"[{CONSUMER_ID}] ❌ Tarefa #{task_id} REJEITADA (dead letter)")
@@ -103,13 +111,13 @@ def main():
                     
                     # Estratégia baseada no tipo de erro
                     if error_type in ["network_timeout", "service_unavailable"]:
-                        logger.error(f"[{CONSUMER_ID}] 🔄 Erro temporário - REQUEUING para nova tentativa")
-                        ch.basic_nack(delivery_tag=method.delivery_tag, requeue=True)
-                        stats['requeued'] += 1
+                        logger.error(f"[{CONSUMER_ID}] 🔄 Erro temporário - agendando nova tentativa com atraso")
+                        retry.retry(ch, method, properties, body, reason=error_type)
+                        stats['retried'] += 1
                         return
                     elif error_type == "invalid_data":
                         logger.error(f"[{CONSUMER_ID}] 🚫 Dados inválidos - REJEITANDO permanentemente")
-                        ch.basic_nack(delivery_tag=method.delivery_tag, requeue=False)
+                        retry.dead_letter(ch, method, properties, body, reason=error_type)
                         stats['rejected'] += 1
                         return
                     else:
@@ -122,22 +130,23 @@ def main():
             ch.basic_ack(delivery_tag=method.delivery_tag)
             stats['processed'] += 1
             
-            # Remove do controle de retry
-            if str(task_id) in stats['retries']:
-                del stats['retries'][str(task_id)]
-            
             logger.info(f"[{CONSUMER_ID}] ✅ Tarefa #{task_id} processada com SUCESSO!")
             logger.info(f"[{CONSUMER_ID}] 📈 Total processado: {stats['processed']}")
             
+        except pika.exceptions.AMQPError:
+            # Canal ou conexão indisponível (ex: falha no retry/dead_letter acima):
+            # uma nova republicação falharia igual, então o erro sobe para o consumo
+            raise
+            
         except Exception as e:
             logger.error(f"[{CONSUMER_ID}] ❌ Erro no processamento: {str(e)}")
-            logger.error(f"[{CONSUMER_ID}] 🔄 REQUEUING para nova tentativa...")
+            logger.error(f"[{CONSUMER_ID}] 🔄 Agendando nova tentativa com atraso...")
             
-            # NACK com requeue para tentar novamente
-            ch.basic_nack(delivery_tag=method.delivery_tag, requeue=True)
-            stats['requeued'] += 1
+            # Republica na fila de atraso do tier em vez de recolocar na hora
+            retry.retry(ch, method, properties, body, reason=str(e))
+            stats['retried'] += 1
             
-            logger.error(f"[{CONSUMER_ID}] Total recolocado: {stats['requeued']}")
+            logger.error(f"[{CONSUMER_ID}] Total de retentativas: {stats['retried']}")
     
     try:
         # Conecta ao RabbitMQ
@@ -153,12 +162,13 @@ def main():
             queue=QUEUE_NAME,
             durable=True
         )
+        retry.declare(channel)
         
         logger.info(f"Fila '{QUEUE_NAME}' declarada")
         logger.info("Estratégias INTELIGENTES de ACK:")
         logger.info("  ✅ ACK: Processamento bem-sucedido")
-        logger.info("  🔄 NACK + Requeue: Erro temporário, tentar novamente")
-        logger.info("  🚫 NACK + No Requeue: Erro permanente, descartar")
+        logger.info(f"  🔄 Retry atrasado: Erro temporário, nova tentativa após {retry.delays_ms} ms")
+        logger.info(f"  🚫 Dead letter: Erro permanente, vai para '{retry.dead_letter_queue}'")
         logger.info(f"  📊 Limite de tentativas: {MAX_RETRIES}")
         logger.info("")
         
@@ -180,9 +190,8 @@ def main():
         logger.info(f"Parando consumer...")
         logger.info(f"📊 Estatísticas finais:")
         logger.info(f"  ✅ Processado: {stats['processed']}")
-        logger.info(f"  🔄 Recolocado: {stats['requeued']}")
+        logger.info(f"  🔄 Retentativas: {stats['retried']} (por tier: {retry.stats['by_tier']})")
         logger.info(f"  🚫 Rejeitado: {stats['rejected']}")
-        logger.info(f"  🔄 Em retry: {len(stats['retries'])} tarefas")
         if 'channel' in locals():
             channel.stop_consuming()
     except Exception as e:
@@ -0,0 +1,89 @@
+"""
+Benchmark dos codecs de mensagem com os payloads reais de cada cenário
+
+Compara tamanho médio e custo de encode/decode de cada codec registrado em
+utils.serialization, usando como referência o json.dumps(indent=2) que os
+producers usavam.
+
+Uso:
+    python benchmarks/codec_benchmark.py [--messages 2000] [--json resultados.json]
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from typing import Any, Dict, List
+
+# Adiciona o diretório raiz ao path para importar utils e benchmarks
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.payloads import SCENARIO_PAYLOADS
+from utils.serialization import available_codecs, get_codec
+
+LEGACY = 'json (indent=2, legado)'
+
+def _legacy_encode(message: Any) -> bytes:
+    return json.dumps(message, indent=2, ensure_ascii=False).encode('utf-8')
+
+def _legacy_decode(body: bytes) -> Any:
+    return json.loads(body.decode('utf-8'))
+
+def benchmark_scenario(scenario: str, messages: List[Dict[str, Any]]) -> Dict[str, Dict[str, float]]:
+    """
+    Mede cada codec sobre as mensagens de um cenário
+
+    Returns:
+        Mapa codec -> {'avg_bytes', 'encode_us', 'decode_us'}
+    """
+    codecs = [(LEGACY, _legacy_encode, _legacy_decode)]
+    codecs += [(name, get_codec(name).encode, get_codec(name).decode) for name in available_codecs()]
+
+    results = {}
+    for name, encode, decode in codecs:
+        start = time.perf_counter()
+        bodies = [encode(message) for message in messages]
+        encode_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for body in bodies:
+            decode(body)
+        decode_time = time.perf_counter() - start
+
+        results[name] = {
+            'avg_bytes': sum(len(body) for body in bodies) / len(bodies),
+            'encode_us': encode_time / len(messages) * 1e6,
+            'decode_us': decode_time / len(messages) * 1e6
+        }
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de codecs por cenário")
+    parser.add_argument('--messages', type=int, default=2000, help="Mensagens por cenário")
+    parser.add_argument('--json', dest='json_path', help="Arquivo para salvar os resultados")
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    all_results = {}
+
+    print(f"{'CENÁRIO':22s} {'CODEC':32s} {'BYTES':>8s} {'ENC µs':>8s} {'DEC µs':>8s}")
+    print("-" * 82)
+    for scenario, build in SCENARIO_PAYLOADS.items():
+        messages = [build(n)['message'] for n in range(1, args.messages + 1)]
+        results = benchmark_scenario(scenario, messages)
+        all_results[scenario] = results
+
+        for codec, metrics in results.items():
+            print(f"{scenario:22s} {codec:32s} {metrics['avg_bytes']:8.0f} "
+                  f"{metrics['encode_us']:8.2f} {metrics['decode_us']:8.2f}")
+        print()
+
+    if args.json_path:
+        with open(args.json_path, 'w', encoding='utf-8') as f:
+            json.dump(all_results, f, indent=2)
+        print(f"Resultados salvos em {args.json_path}")
+
+if __name__ == "__main__":
+    main()
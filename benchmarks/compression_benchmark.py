@@ -0,0 +1,98 @@
+"""
+Benchmark da compressão zlib com os payloads reais de cada cenário
+
+Para cada cenário compara o corpo sem compressão com deflate puro, deflate
+com o dicionário embutido (scenarios-v1) e deflate com um dicionário
+treinado em mensagens do próprio cenário. Reporta tamanho médio, razão de
+compressão, CPU de compressão/descompressão e a fração de mensagens que
+ficou acima do limite e foi de fato comprimida.
+
+Uso:
+    python benchmarks/compression_benchmark.py [--messages 2000] [--threshold 0] [--json resultados.json]
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from typing import Dict, List, Optional
+
+# Adiciona o diretório raiz ao path para importar utils e benchmarks
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.payloads import SCENARIO_PAYLOADS
+from utils.serialization import (
+    compress_body, decompress_body, encode_message, register_zdict, train_zdict
+)
+
+def measure(bodies: List[bytes], threshold: int, zdict_name: Optional[str]) -> Dict[str, float]:
+    """
+    Comprime e descomprime os corpos medindo tamanho e CPU
+
+    Returns:
+        Métricas {'avg_bytes', 'ratio', 'compressed_pct', 'compress_us', 'decompress_us'}
+    """
+    start = time.process_time()
+    results = [compress_body(body, threshold, zdict_name) for body in bodies]
+    compress_time = time.process_time() - start
+
+    start = time.process_time()
+    for body, content_encoding in results:
+        if content_encoding:
+            decompress_body(body, content_encoding)
+    decompress_time = time.process_time() - start
+
+    raw_bytes = sum(len(body) for body in bodies)
+    wire_bytes = sum(len(body) for body, _ in results)
+    return {
+        'avg_bytes': wire_bytes / len(bodies),
+        'ratio': raw_bytes / wire_bytes,
+        'compressed_pct': 100.0 * sum(1 for _, enc in results if enc) / len(bodies),
+        'compress_us': compress_time / len(bodies) * 1e6,
+        'decompress_us': decompress_time / len(bodies) * 1e6
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de compressão por cenário")
+    parser.add_argument('--messages', type=int, default=2000, help="Mensagens por cenário")
+    parser.add_argument('--threshold', type=int, default=0, help="Tamanho mínimo para comprimir (bytes)")
+    parser.add_argument('--json', dest='json_path', help="Arquivo para salvar os resultados")
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    all_results = {}
+
+    print(f"{'CENÁRIO':22s} {'MODO':18s} {'BYTES':>7s} {'RAZÃO':>6s} {'COMPR%':>7s} "
+          f"{'COMP µs':>8s} {'DESC µs':>8s}")
+    print("-" * 82)
+    for scenario, build in SCENARIO_PAYLOADS.items():
+        # Dicionário treinado com mensagens diferentes das medidas
+        training = [encode_message(build(n)['message'])[0] for n in range(1, 201)]
+        register_zdict(f'bench-{scenario}', train_zdict(training, max_size=4096))
+
+        bodies = [encode_message(build(n)['message'])[0]
+                  for n in range(1000, 1000 + args.messages)]
+        raw_avg = sum(len(body) for body in bodies) / len(bodies)
+
+        results = {'sem compressão': {'avg_bytes': raw_avg, 'ratio': 1.0, 'compressed_pct': 0.0,
+                                      'compress_us': 0.0, 'decompress_us': 0.0}}
+        results['deflate'] = measure(bodies, args.threshold, None)
+        results['deflate+scenarios'] = measure(bodies, args.threshold, 'scenarios-v1')
+        results['deflate+treinado'] = measure(bodies, args.threshold, f'bench-{scenario}')
+        all_results[scenario] = results
+
+        for mode, metrics in results.items():
+            print(f"{scenario:22s} {mode:18s} {metrics['avg_bytes']:7.0f} {metrics['ratio']:6.2f} "
+                  f"{metrics['compressed_pct']:6.1f}% {metrics['compress_us']:8.2f} "
+                  f"{metrics['decompress_us']:8.2f}")
+        print()
+
+    if args.json_path:
+        with open(args.json_path, 'w', encoding='utf-8') as f:
+            json.dump(all_results, f, indent=2)
+        print(f"Resultados salvos em {args.json_path}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,231 @@
+"""
+Benchmark de latência fim a fim por cenário
+
+O producer grava o instante de envio em nanossegundos no header x-sent-ns
+e os consumers medem publish→entrega e publish→ack de cada mensagem. Cada
+cenário usa a topologia do manifesto (utils.topology), os payloads reais
+(benchmarks/payloads.py) e um consumer por fila (três na fila do
+round_robin), cada um com sua própria conexão em uma thread.
+
+Com RABBITMQ_BACKEND=memory roda sem broker, medindo só o custo do cliente.
+Com um RabbitMQ real as filas dos cenários são esvaziadas (queue_purge)
+antes de cada medição.
+
+Uso:
+    python benchmarks/latency_benchmark.py [--messages 1000] [--rate 0] [--json latency_results.json]
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, List
+
+# Adiciona o diretório raiz ao path para importar utils e benchmarks
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pika
+from benchmarks.payloads import SCENARIO_PAYLOADS
+from utils.common import get_rabbitmq_connection
+from utils.serialization import decode_message, encode_message
+from utils.topology import apply_topology, get_scenario_topology
+
+SENT_HEADER = 'x-sent-ns'
+
+SCENARIOS = ['direct_exchange', 'fanout_exchange', 'topic_exchange', 'headers_exchange',
+             'round_robin', 'priority', 'persistence']
+
+# Consumers concorrentes por fila (round_robin divide a mesma fila)
+CONSUMERS_PER_QUEUE = {'round_robin': 3}
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    """
+    Percentil por nearest-rank de uma lista já ordenada
+    """
+    if not sorted_values:
+        return 0.0
+    index = max(0, min(len(sorted_values) - 1, int(round(q / 100.0 * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+def summarize(latencies_ns: List[int]) -> Dict[str, float]:
+    """
+    Resume latências em milissegundos (p50/p95/p99/max/média)
+    """
+    values = sorted(latency / 1e6 for latency in latencies_ns)
+    return {
+        'p50_ms': percentile(values, 50),
+        'p95_ms': percentile(values, 95),
+        'p99_ms': percentile(values, 99),
+        'max_ms': values[-1] if values else 0.0,
+        'mean_ms': sum(values) / len(values) if values else 0.0
+    }
+
+class LatencyConsumer(threading.Thread):
+    """
+    Consumer em thread própria que registra as latências de cada entrega
+    """
+
+    def __init__(self, queue: str, prefetch_count: int, stop_event: threading.Event):
+        super().__init__(daemon=True)
+        self.queue = queue
+        self.prefetch_count = prefetch_count
+        self.stop_event = stop_event
+        self.deliver_ns: List[int] = []
+        self.ack_ns: List[int] = []
+        self.last_ack_ns = 0
+        self.last_activity = time.monotonic()
+        self.ready = threading.Event()
+        self.error = None
+
+    def on_message(self, ch, method, properties, body) -> None:
+        delivered = time.time_ns()
+        decode_message(body, properties)
+        ch.basic_ack(delivery_tag=method.delivery_tag)
+        acked = time.time_ns()
+
+        sent = (properties.headers or {}).get(SENT_HEADER)
+        if sent is not None:
+            self.deliver_ns.append(delivered - sent)
+            self.ack_ns.append(acked - sent)
+        self.last_ack_ns = acked
+        self.last_activity = time.monotonic()
+
+    def run(self) -> None:
+        connection = None
+        try:
+            connection = get_rabbitmq_connection()
+            channel = connection.channel()
+            channel.basic_qos(prefetch_count=self.prefetch_count)
+            channel.basic_consume(queue=self.queue, on_message_callback=self.on_message)
+            self.ready.set()
+            while not self.stop_event.is_set():
+                connection.process_data_events(time_limit=0.05)
+        except Exception as e:
+            self.error = e
+            self.ready.set()
+        finally:
+            if connection is not None and connection.is_open:
+                connection.close()
+
+def run_scenario(scenario: str, messages: int, rate: float, prefetch_count: int,
+                 idle_timeout: float) -> Dict[str, Any]:
+    """
+    Publica as mensagens de um cenário e coleta as latências dos consumers
+
+    Returns:
+        Resultados do cenário (contagens, vazão e percentis)
+    """
+    build = SCENARIO_PAYLOADS[scenario]
+    connection = get_rabbitmq_connection()
+    channel = connection.channel()
+    apply_topology(channel, [scenario])
+
+    queues = [queue['name'] for queue in get_scenario_topology(scenario)['queues']]
+    for queue in queues:
+        channel.queue_purge(queue)
+
+    stop_event = threading.Event()
+    consumers = [LatencyConsumer(queue, prefetch_count, stop_event)
+                 for queue in queues
+                 for _ in range(CONSUMERS_PER_QUEUE.get(scenario, 1))]
+    for consumer in consumers:
+        consumer.start()
+        consumer.ready.wait()
+        if consumer.error:
+            raise consumer.error
+
+    interval = 1.0 / rate if rate > 0 else 0.0
+    first_send_ns = time.time_ns()
+    next_send = time.perf_counter()
+    for n in range(1, messages + 1):
+        payload = build(n)
+        body, content_type = encode_message(payload['message'])
+        headers = dict(payload.get('headers') or {})
+        headers[SENT_HEADER] = time.time_ns()
+        channel.basic_publish(
+            exchange=payload['exchange'],
+            routing_key=payload['routing_key'],
+            body=body,
+            properties=pika.BasicProperties(
+                content_type=content_type,
+                delivery_mode=payload.get('delivery_mode', 2),
+                priority=payload.get('priority'),
+                message_id=str(n),
+                headers=headers
+            )
+        )
+        if interval:
+            next_send += interval
+            delay = next_send - time.perf_counter()
+            if delay > 0:
+                connection.sleep(delay)
+        else:
+            connection.process_data_events(time_limit=0)
+    publish_seconds = (time.time_ns() - first_send_ns) / 1e9
+
+    # Aguarda os consumers ficarem ociosos (nem toda mensagem é roteada)
+    while any(time.monotonic() - consumer.last_activity < idle_timeout for consumer in consumers):
+        connection.process_data_events(time_limit=0.05)
+    stop_event.set()
+    for consumer in consumers:
+        consumer.join()
+    connection.close()
+
+    deliver_ns = [value for consumer in consumers for value in consumer.deliver_ns]
+    ack_ns = [value for consumer in consumers for value in consumer.ack_ns]
+    last_ack_ns = max((consumer.last_ack_ns for consumer in consumers), default=first_send_ns)
+    elapsed = max((last_ack_ns - first_send_ns) / 1e9, 1e-9)
+
+    return {
+        'published': messages,
+        'delivered': len(deliver_ns),
+        'consumers': len(consumers),
+        'publish_rate': messages / publish_seconds if publish_seconds > 0 else 0.0,
+        'throughput': len(deliver_ns) / elapsed,
+        'deliver_latency': summarize(deliver_ns),
+        'ack_latency': summarize(ack_ns)
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de latência fim a fim por cenário")
+    parser.add_argument('--messages', type=int, default=1000, help="Mensagens por cenário")
+    parser.add_argument('--rate', type=float, default=0, help="Mensagens/s do producer (0 = sem limite)")
+    parser.add_argument('--prefetch', type=int, default=10, help="prefetch_count dos consumers")
+    parser.add_argument('--idle-timeout', type=float, default=1.0,
+                        help="Segundos sem entregas para encerrar um cenário")
+    parser.add_argument('--scenarios', nargs='+', default=SCENARIOS, choices=SCENARIOS)
+    parser.add_argument('--json', dest='json_path', default='latency_results.json',
+                        help="Arquivo para salvar os resultados")
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    results = {
+        'started_at': datetime.now().isoformat(),
+        'backend': os.getenv('RABBITMQ_BACKEND', 'amqp'),
+        'messages': args.messages,
+        'rate': args.rate,
+        'prefetch_count': args.prefetch,
+        'scenarios': {}
+    }
+
+    print(f"{'CENÁRIO':18s} {'ENTREGUES':>9s} {'MSG/s':>9s} {'p50 ms':>8s} {'p95 ms':>8s} "
+          f"{'p99 ms':>8s} {'max ms':>8s}")
+    print("-" * 76)
+    for scenario in args.scenarios:
+        result = run_scenario(scenario, args.messages, args.rate, args.prefetch, args.idle_timeout)
+        results['scenarios'][scenario] = result
+        latency = result['ack_latency']
+        print(f"{scenario:18s} {result['delivered']:9d} {result['throughput']:9.0f} "
+              f"{latency['p50_ms']:8.2f} {latency['p95_ms']:8.2f} {latency['p99_ms']:8.2f} "
+              f"{latency['max_ms']:8.2f}")
+
+    with open(args.json_path, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2)
+    print(f"\nResultados salvos em {args.json_path} (latências publish→ack)")
+
+if __name__ == "__main__":
+    main()
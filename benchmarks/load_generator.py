@@ -0,0 +1,107 @@
+"""
+Gerador de carga em malha aberta para qualquer cenário
+
+Publica os payloads reais do cenário (benchmarks/payloads.py) na taxa alvo,
+com o perfil de chegadas escolhido, usando utils.loadgen.LoadGenerator. Cada
+mensagem leva o instante pretendido de envio no header x-intended-ns, para
+que os consumers meçam a latência sem coordinated omission.
+
+Com RABBITMQ_BACKEND=memory roda sem broker (mede só o custo do producer).
+
+Uso:
+    python benchmarks/load_generator.py --scenario priority --rate 500 --profile poisson --duration 30
+    python benchmarks/load_generator.py --scenario topic_exchange --rate 2000 --profile burst --burst-size 50 --messages 20000
+    python benchmarks/load_generator.py --scenario direct_exchange --rate 1000 --profile ramp --ramp-from 100 --duration 60
+"""
+import argparse
+import json
+import os
+import random
+import sys
+from datetime import datetime
+
+# Adiciona o diretório raiz ao path para importar utils e benchmarks
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pika
+from benchmarks.payloads import SCENARIO_PAYLOADS
+from utils.common import get_rabbitmq_connection
+from utils.loadgen import INTENDED_HEADER, PROFILES, LoadGenerator, format_load_stats
+from utils.serialization import encode_message
+from utils.topology import apply_topology
+
+# Atraso no fim da carga a partir do qual o producer não acompanhou a taxa alvo
+LAG_WARNING_MS = 100.0
+
+def main():
+    parser = argparse.ArgumentParser(description="Gerador de carga em malha aberta por cenário")
+    parser.add_argument('--scenario', required=True, choices=sorted(SCENARIO_PAYLOADS))
+    parser.add_argument('--rate', type=float, required=True, help="Taxa alvo (mensagens/s)")
+    parser.add_argument('--profile', default='constant', choices=PROFILES, help="Perfil de chegadas")
+    parser.add_argument('--duration', type=float, help="Segundos de carga")
+    parser.add_argument('--messages', type=int, help="Número de mensagens")
+    parser.add_argument('--burst-size', type=int, default=10, help="Mensagens por rajada (perfil burst)")
+    parser.add_argument('--ramp-from', type=float, default=0.0, help="Taxa inicial (perfil ramp)")
+    parser.add_argument('--json', dest='json_path', help="Arquivo para salvar os resultados")
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    if args.duration is None and args.messages is None:
+        parser.error("informe --duration e/ou --messages")
+
+    random.seed(args.seed)
+    build = SCENARIO_PAYLOADS[args.scenario]
+    connection = get_rabbitmq_connection()
+    channel = connection.channel()
+    apply_topology(channel, [args.scenario])
+
+    def send(n: int, intended_ns: int) -> None:
+        payload = build(n)
+        body, content_type = encode_message(payload['message'])
+        headers = dict(payload.get('headers') or {})
+        headers[INTENDED_HEADER] = intended_ns
+        channel.basic_publish(
+            exchange=payload['exchange'],
+            routing_key=payload['routing_key'],
+            body=body,
+            properties=pika.BasicProperties(
+                content_type=content_type,
+                delivery_mode=payload.get('delivery_mode', 2),
+                priority=payload.get('priority'),
+                message_id=str(n),
+                timestamp=intended_ns // 1_000_000_000,
+                headers=headers
+            )
+        )
+
+    load = LoadGenerator(send, rate=args.rate, profile=args.profile, duration=args.duration,
+                         messages=args.messages, burst_size=args.burst_size,
+                         ramp_from_rate=args.ramp_from, sleep=connection.sleep, seed=args.seed)
+    print(f"🚀 {args.scenario}: {args.rate:.0f} msg/s, perfil {args.profile}")
+    try:
+        stats = load.run()
+    except KeyboardInterrupt:
+        stats = load.get_stats()
+    finally:
+        if connection.is_open:
+            connection.close()
+
+    print(format_load_stats(stats))
+    if load.last_error is not None:
+        print(f"❌ Último erro de envio: {load.last_error}")
+    if stats['final_lag_ms'] > LAG_WARNING_MS:
+        print(f"⚠️  O producer terminou {stats['final_lag_ms']:.0f}ms atrás do cronograma: "
+              f"a taxa alvo excede a capacidade de envio")
+
+    if args.json_path:
+        with open(args.json_path, 'w', encoding='utf-8') as f:
+            json.dump({
+                'started_at': datetime.now().isoformat(),
+                'backend': os.getenv('RABBITMQ_BACKEND', 'amqp'),
+                'scenario': args.scenario,
+                **stats
+            }, f, indent=2)
+        print(f"Resultados salvos em {args.json_path}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,274 @@
+"""
+Geradores dos payloads reais de cada cenário para os benchmarks
+
+Cada gerador recebe o número sequencial da mensagem e devolve um dicionário
+com exchange, routing_key, message (o dicionário publicado pelo producer do
+cenário) e, quando o cenário usa, priority e headers.
+"""
+import os
+import random
+import sys
+import uuid
+from datetime import datetime
+from typing import Any, Callable, Dict
+
+# Adiciona o diretório raiz ao path para importar os cenários
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from interoperability.producer import create_message_from_template
+
+def _direct(n: int) -> Dict[str, Any]:
+    routing_key = ["info", "warning", "error"][n % 3]
+    return {
+        'exchange': 'direct_exchange_demo',
+        'routing_key': routing_key,
+        'message': {
+            "id": n,
+            "type": routing_key,
+            "content": f"Mensagem {routing_key} #{n}",
+            "timestamp": datetime.now().isoformat(),
+            "scenario": "direct_exchange"
+        }
+    }
+
+def _fanout(n: int) -> Dict[str, Any]:
+    return {
+        'exchange': 'fanout_exchange_demo',
+        'routing_key': '',
+        'message': {
+            "id": n,
+            "type": "broadcast",
+            "content": f"Mensagem de broadcast #{n}",
+            "announcement": "Esta é uma notificação global para todos os consumers",
+            "timestamp": datetime.now().isoformat(),
+            "scenario": "fanout_exchange"
+        },
+        'headers': {'message_type': 'broadcast', 'priority': 'normal'}
+    }
+
+TOPIC_ROUTING_KEYS = [
+    "system.info.auth", "system.warning.auth", "system.error.auth",
+    "system.info.database", "system.warning.database", "system.error.database",
+    "system.info.api", "system.warning.api", "system.error.api",
+    "app.user.login", "app.user.logout", "app.order.created",
+    "app.order.updated", "app.payment.success", "app.payment.failed"
+]
+
+def _topic(n: int) -> Dict[str, Any]:
+    routing_key = random.choice(TOPIC_ROUTING_KEYS)
+    category, subcategory, detail = routing_key.split('.')
+    return {
+        'exchange': 'topic_exchange_demo',
+        'routing_key': routing_key,
+        'message': {
+            "id": n,
+            "routing_key": routing_key,
+            "category": category,
+            "subcategory": subcategory,
+            "detail": detail,
+            "content": f"Mensagem {routing_key} #{n}",
+            "timestamp": datetime.now().isoformat(),
+            "scenario": "topic_exchange"
+        },
+        'headers': {'category': category, 'subcategory': subcategory, 'detail': detail}
+    }
+
+HEADERS_COMBINATIONS = [
+    ({"format": "json", "priority": "high", "region": "us"}, "Dados JSON de alta prioridade dos EUA"),
+    ({"format": "xml", "priority": "low", "region": "eu"}, "Dados XML de baixa prioridade da Europa"),
+    ({"format": "json", "priority": "medium", "region": "br"}, "Dados JSON de prioridade média do Brasil"),
+    ({"format": "csv", "priority": "high", "source": "api"}, "Dados CSV de alta prioridade da API"),
+    ({"format": "json", "encrypted": "true", "region": "us"}, "Dados JSON criptografados dos EUA"),
+    ({"format": "xml", "priority": "medium", "source": "batch"}, "Dados XML de prioridade média do processamento batch")
+]
+
+def _headers(n: int) -> Dict[str, Any]:
+    headers, content = random.choice(HEADERS_COMBINATIONS)
+    return {
+        'exchange': 'headers_exchange_demo',
+        'routing_key': '',
+        'message': {
+            "id": n,
+            "content": f"{content} #{n}",
+            "timestamp": datetime.now().isoformat(),
+            "scenario": "headers_exchange",
+            "headers_info": headers
+        },
+        'headers': dict(headers)
+    }
+
+def _round_robin(n: int) -> Dict[str, Any]:
+    task_types = {
+        "image_processing": (3, "Processamento de imagem"),
+        "data_analysis": (5, "Análise de dados"),
+        "report_generation": (2, "Geração de relatório"),
+        "email_sending": (1, "Envio de email"),
+        "backup_task": (4, "Tarefa de backup")
+    }
+    task_type = list(task_types)[(n - 1) % len(task_types)]
+    estimated_time, description = task_types[task_type]
+    return {
+        'exchange': '',
+        'routing_key': 'round_robin_work_queue',
+        'message': {
+            "task_id": n,
+            "task_type": task_type,
+            "description": description,
+            "estimated_time": estimated_time,
+            "created_at": datetime.now().isoformat(),
+            "scenario": "round_robin",
+            "payload": f"Dados da tarefa #{n} - {task_type}"
+        }
+    }
+
+def _round_robin_weighted(n: int) -> Dict[str, Any]:
+    task_types = [
+        ("quick_task", 1, "Tarefa rápida"),
+        ("medium_task", 2, "Tarefa média"),
+        ("complex_task", 3, "Tarefa complexa"),
+        ("batch_job", 4, "Job de lote"),
+        ("heavy_processing", 5, "Processamento pesado")
+    ]
+    task_type, processing_time, description = task_types[(n - 1) % len(task_types)]
+    return {
+        'exchange': '',
+        'routing_key': 'weighted_round_robin_queue',
+        'message': {
+            "task_id": n,
+            "task_type": task_type,
+            "description": description,
+            "processing_time": processing_time,
+            "complexity": "high" if processing_time > 3 else "medium" if processing_time > 1 else "low",
+            "created_at": datetime.now().isoformat(),
+            "scenario": "round_robin_weighted",
+            "payload": f"Dados da tarefa #{n} - {task_type}"
+        }
+    }
+
+def _persistence(n: int) -> Dict[str, Any]:
+    persistent = n % 2 == 1
+    durability = "PERSISTENTE" if persistent else "TRANSIENTE"
+    return {
+        'exchange': '',
+        'routing_key': 'persistent_messages_queue' if persistent else 'transient_messages_queue',
+        'delivery_mode': 2 if persistent else 1,
+        'message': {
+            "message_id": n,
+            "type": durability.lower(),
+            "durability": durability,
+            "description": "Sobrevive a reinicializações do broker" if persistent else "Perdida se broker reiniciar",
+            "content": f"Mensagem {durability} #{n}",
+            "important_data": f"Dados críticos do sistema - ID {n}",
+            "timestamp": datetime.now().isoformat(),
+            "scenario": "persistence",
+            "delivery_mode": 2 if persistent else 1
+        },
+        'headers': {'durability': durability, 'message_type': 'demo'}
+    }
+
+def _acknowledgments(n: int) -> Dict[str, Any]:
+    manual = n % 2 == 1
+    task_type = random.choice(["payment_processing", "order_fulfillment", "user_registration",
+                               "inventory_update", "email_notification"])
+    return {
+        'exchange': '',
+        'routing_key': 'manual_ack_queue' if manual else 'auto_ack_queue',
+        'message': {
+            "task_id": n,
+            "task_type": task_type,
+            "ack_type": "MANUAL" if manual else "AUTO",
+            "description": ("Processamento seguro com confirmação manual" if manual
+                            else "Processamento rápido mas com risco de perda"),
+            "risk_level": "BAIXO" if manual else "ALTO",
+            "content": f"Tarefa crítica {task_type} #{n}",
+            "processing_time": random.randint(2, 5),
+            "failure_simulation": random.choice([False, False, False, True]),
+            "timestamp": datetime.now().isoformat(),
+            "scenario": "acknowledgments"
+        }
+    }
+
+PRIORITY_TYPES = [
+    ("CRITICAL_ALERT", 10, "Sistema em falha crítica"),
+    ("SECURITY_BREACH", 9, "Tentativa de invasão detectada"),
+    ("ERROR_LOG", 7, "Erro no processamento"),
+    ("WARNING", 5, "Aviso de capacidade"),
+    ("INFO_LOG", 3, "Log informativo"),
+    ("DEBUG_LOG", 1, "Debug de desenvolvimento"),
+    ("BATCH_PROCESS", 0, "Processamento em lote")
+]
+
+def _priority(n: int) -> Dict[str, Any]:
+    msg_type, priority, description = random.choice(PRIORITY_TYPES)
+    severity = ("CRITICAL" if priority >= 9 else "ERROR" if priority >= 7 else
+                "WARNING" if priority >= 5 else "INFO" if priority >= 3 else "DEBUG")
+    message = {
+        "id": n,
+        "type": msg_type,
+        "priority": priority,
+        "description": description,
+        "timestamp": datetime.now().isoformat(),
+        "server": f"server-{random.randint(1, 5)}",
+        "severity": severity
+    }
+    if msg_type == "CRITICAL_ALERT":
+        message["alert_code"] = f"CRIT-{random.randint(1000, 9999)}"
+        message["affected_systems"] = ["database", "api", "frontend"]
+    elif msg_type == "SECURITY_BREACH":
+        message["source_ip"] = f"192.168.{random.randint(1, 255)}.{random.randint(1, 255)}"
+        message["attack_type"] = random.choice(["SQL_INJECTION", "BRUTE_FORCE", "XSS"])
+    elif msg_type == "BATCH_PROCESS":
+        message["records_count"] = random.randint(1000, 50000)
+        message["estimated_time"] = f"{random.randint(5, 120)} minutes"
+    headers = {'message_type': msg_type, 'severity': severity, 'component': 'priority_producer'}
+    if "estimated_time" in message:
+        headers['estimated_time'] = message["estimated_time"]
+    return {
+        'exchange': '',
+        'routing_key': 'priority_queue',
+        'priority': priority,
+        'message': message,
+        'headers': headers
+    }
+
+def _interoperability(n: int) -> Dict[str, Any]:
+    msg_type = random.choice(["USER_REGISTRATION", "ORDER_CREATED", "PAYMENT_PROCESSED",
+                              "INVENTORY_UPDATE", "NOTIFICATION_SEND"])
+    target_lang = random.choice(["python", "nodejs", "javascript"])
+    message = create_message_from_template({"type": msg_type}, n)
+    message["_meta"] = {
+        "producer": "python",
+        "target": target_lang,
+        "version": "1.0",
+        "encoding": "utf-8",
+        "timestamp": datetime.now().isoformat(),
+        "message_id": str(uuid.uuid4()),
+        "correlation_id": f"msg-{n:06d}",
+        "format": "json"
+    }
+    return {
+        'exchange': 'interop_exchange',
+        'routing_key': target_lang,
+        'message': message,
+        'headers': {
+            'content-type': 'application/json',
+            'producer-language': 'python',
+            'target-language': target_lang,
+            'message-type': msg_type,
+            'schema-version': '1.0',
+            'correlation-id': message["_meta"]["correlation_id"]
+        }
+    }
+
+SCENARIO_PAYLOADS: Dict[str, Callable[[int], Dict[str, Any]]] = {
+    'direct_exchange': _direct,
+    'fanout_exchange': _fanout,
+    'topic_exchange': _topic,
+    'headers_exchange': _headers,
+    'round_robin': _round_robin,
+    'round_robin_weighted': _round_robin_weighted,
+    'persistence': _persistence,
+    'acknowledgments': _acknowledgments,
+    'priority': _priority,
+    'interoperability': _interoperability
+}
@@ -0,0 +1,324 @@
+"""
+Frota de producers em vários processos para saturar o broker
+
+Um producer Python fica limitado a um núcleo (encode JSON e framing do
+pika). Este launcher cria N processos (fork), cada um com sua faixa
+disjunta de números de mensagem (o "id" dos payloads e o message_id), e
+publica os payloads reais do cenário (benchmarks/payloads.py). Cada worker
+pega --channels canais do seu RabbitMQConnectionPool, espalhados em sockets
+distintos, com um BatchingPublisher por canal e as mensagens alternadas
+entre eles. Cada worker reporta progresso e o resultado final
+ao processo pai por um pipe; o pai mostra as taxas por worker e agregadas.
+
+Com --rate a carga é em malha aberta (utils.loadgen, taxa dividida entre os
+workers); sem --rate cada worker publica o mais rápido que consegue.
+
+Com RABBITMQ_BACKEND=memory cada processo tem seu próprio broker em memória:
+mede só o custo dos producers (encode e framing).
+
+Uso:
+    python benchmarks/producer_fleet.py --scenario priority --workers 4 --messages 200000
+    python benchmarks/producer_fleet.py --scenario direct_exchange --workers 2 --channels 4 --duration 30
+    python benchmarks/producer_fleet.py --scenario topic_exchange --workers 8 --duration 60 --rate 40000 --profile poisson
+"""
+import argparse
+import json
+import math
+import multiprocessing
+import os
+import random
+import sys
+import time
+from datetime import datetime
+from multiprocessing.connection import wait
+from typing import Any, Dict, List, Optional
+
+# Adiciona o diretório raiz ao path para importar utils e benchmarks
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pika
+from benchmarks.payloads import SCENARIO_PAYLOADS
+from utils.batching import BatchingPublisher
+from utils.common import RabbitMQConnectionPool
+from utils.histogram import LatencyHistogram
+from utils.loadgen import INTENDED_HEADER, PROFILES, LoadGenerator
+from utils.serialization import encode_message
+from utils.topology import apply_topology
+
+# Tamanho da faixa de números de cada worker quando a carga é só por duração
+ID_BLOCK = 1_000_000_000
+
+def id_ranges(workers: int, messages: Optional[int]) -> List[Dict[str, Optional[int]]]:
+    """
+    Divide os números de mensagem em faixas contíguas e disjuntas
+
+    Returns:
+        Uma faixa {'first_id', 'count'} por worker (count None = sem limite,
+        dentro de um bloco de ID_BLOCK números)
+    """
+    if messages is None:
+        return [{'first_id': 1 + worker * ID_BLOCK, 'count': None} for worker in range(workers)]
+    per_worker = math.ceil(messages / workers)
+    return [{'first_id': 1 + worker * per_worker,
+             'count': max(0, min(per_worker, messages - worker * per_worker))}
+            for worker in range(workers)]
+
+def merge_batch_stats(stats: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Soma as estatísticas de vários BatchingPublisher.get_stats()
+    """
+    totals = {key: sum(item[key] for item in stats)
+              for key in ('published', 'sent', 'batches', 'writes', 'bytes', 'confirmed',
+                          'nacked', 'retried', 'failed', 'pending')}
+    return dict(
+        totals,
+        avg_batch=totals['sent'] / totals['batches'] if totals['batches'] else 0.0,
+        max_batch=max((item['max_batch'] for item in stats), default=0),
+        messages_per_write=totals['sent'] / totals['writes'] if totals['writes'] else 0.0,
+        confirm_p99_ms=max((item['confirm_p99_ms'] for item in stats), default=0.0)
+    )
+
+def run_worker(worker_id: int, options: Dict[str, Any], id_range: Dict[str, Optional[int]], pipe) -> None:
+    """
+    Processo worker: publica a sua faixa de mensagens e reporta pelo pipe
+
+    Mensagens enviadas ao pai: {'type': 'progress'|'done'|'error', 'worker', ...}
+    """
+    random.seed(options['seed'] + worker_id)
+    build = SCENARIO_PAYLOADS[options['scenario']]
+    first_id = id_range['first_id']
+    count = id_range['count']
+    sent = [0]
+    started = time.perf_counter()
+    last_report = [started]
+    # Um socket por canal, até --channels conexões
+    pool = RabbitMQConnectionPool(max_connections=options['channels'])
+    publishers: List[BatchingPublisher] = []
+
+    def finish() -> Dict[str, Any]:
+        # Envia o que está no linger e passa a contar só o que foi escrito
+        for publisher in publishers:
+            publisher.close()
+        batches = merge_batch_stats([publisher.get_stats() for publisher in publishers])
+        sent[0] = batches['sent']
+        return batches
+
+    def report(kind: str, **extra) -> None:
+        elapsed = time.perf_counter() - started
+        pipe.send({'type': kind, 'worker': worker_id, 'pid': os.getpid(), 'sent': sent[0],
+                   'elapsed': elapsed, 'rate': sent[0] / elapsed if elapsed else 0.0, **extra})
+
+    try:
+        channels = [pool.acquire_channel() for _ in range(options['channels'])]
+        apply_topology(channels[0], [options['scenario']])
+        publishers.extend(BatchingPublisher(channel, max_messages=options['batch_size'],
+                                            linger_ms=options['linger_ms'], confirm=options['confirm'])
+                          for channel in channels)
+        tick = max(options['linger_ms'] / 1000.0, 0.001)
+
+        def sleep(seconds: float) -> None:
+            # Os timers de linger e os heartbeats de cada conexão só rodam
+            # dentro de process_data_events: health_check passa por todas
+            deadline = time.perf_counter() + seconds
+            while True:
+                pool.health_check()
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    return
+                time.sleep(min(remaining, tick))
+
+        def send(n: int, intended_ns: int) -> None:
+            message_number = first_id + n - 1
+            payload = build(message_number)
+            body, content_type = encode_message(payload['message'])
+            headers = dict(payload.get('headers') or {})
+            headers[INTENDED_HEADER] = intended_ns
+            publisher = publishers[n % len(publishers)]
+            publisher.publish(
+                payload['exchange'],
+                payload['routing_key'],
+                body,
+                pika.BasicProperties(
+                    content_type=content_type,
+                    delivery_mode=payload.get('delivery_mode', 2),
+                    priority=payload.get('priority'),
+                    message_id=str(message_number),
+                    headers=headers
+                )
+            )
+            sent[0] += 1
+            now = time.perf_counter()
+            if now - last_report[0] >= options['report_interval']:
+                last_report[0] = now
+                report('progress')
+
+        latency = None
+        if options['rate']:
+            load = LoadGenerator(send, rate=options['rate'] / options['workers'], profile=options['profile'],
+                                 duration=options['duration'], messages=count if count is not None else ID_BLOCK,
+                                 burst_size=options['burst_size'], sleep=sleep,
+                                 seed=options['seed'] + worker_id)
+            load.run()
+            latency = load.latency.to_dict()
+        else:
+            deadline = started + options['duration'] if options['duration'] else None
+            limit = count if count is not None else ID_BLOCK
+            n = 0
+            while n < limit and (deadline is None or time.perf_counter() < deadline):
+                n += 1
+                send(n, time.time_ns())
+
+        batches = finish()
+        report('done', batches=batches, latency=latency, first_id=first_id, last_id=first_id + sent[0] - 1)
+    except KeyboardInterrupt:
+        extra: Dict[str, Any] = {}
+        try:
+            extra['batches'] = finish()
+        except Exception as e:
+            # Conexão perdida durante o flush: conta só os lotes já escritos
+            extra['batches'] = merge_batch_stats([publisher.get_stats() for publisher in publishers])
+            extra['error'] = f"Flush interrompido: {type(e).__name__}: {e}"
+            sent[0] = extra['batches']['sent']
+        report('done', interrupted=True, first_id=first_id, last_id=first_id + sent[0] - 1, **extra)
+    except Exception as e:
+        report('error', error=f"{type(e).__name__}: {e}")
+    finally:
+        pool.close()
+        pipe.close()
+
+def summarize(workers: Dict[int, Dict[str, Any]], wall_seconds: float) -> Dict[str, Any]:
+    """
+    Taxas agregadas a partir do último relatório de cada worker
+    """
+    total = sum(worker['sent'] for worker in workers.values())
+    summary = {
+        'sent': total,
+        'wall_seconds': wall_seconds,
+        'aggregate_rate': total / wall_seconds if wall_seconds else 0.0,
+        'sum_worker_rates': sum(worker['rate'] for worker in workers.values()),
+        'errors': [worker['error'] for worker in workers.values() if worker.get('error')]
+    }
+    histograms = [LatencyHistogram.from_dict(worker['latency']) for worker in workers.values()
+                  if worker.get('latency')]
+    if histograms:
+        summary['latency'] = LatencyHistogram.merged(histograms).summary()
+    return summary
+
+def main():
+    parser = argparse.ArgumentParser(description="Frota de producers em vários processos")
+    parser.add_argument('--scenario', required=True, choices=sorted(SCENARIO_PAYLOADS))
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help="Processos producer")
+    parser.add_argument('--messages', type=int, help="Total de mensagens (divididas entre os workers)")
+    parser.add_argument('--duration', type=float, help="Segundos de carga")
+    parser.add_argument('--rate', type=float, default=0, help="Taxa total alvo em msg/s (0 = máximo)")
+    parser.add_argument('--profile', default='constant', choices=PROFILES, help="Perfil de chegadas (com --rate)")
+    parser.add_argument('--burst-size', type=int, default=10, help="Mensagens por rajada (perfil burst)")
+    parser.add_argument('--channels', type=int, default=1,
+                        help="Canais por worker, cada um em uma conexão do pool")
+    parser.add_argument('--batch-size', type=int, default=100, help="Mensagens por lote do BatchingPublisher")
+    parser.add_argument('--linger-ms', type=float, default=5.0, help="Linger dos lotes")
+    parser.add_argument('--confirm', action='store_true', help="Publisher confirms por lote")
+    parser.add_argument('--report-interval', type=float, default=1.0, help="Segundos entre relatórios")
+    parser.add_argument('--json', dest='json_path', help="Arquivo para salvar os resultados")
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    if args.duration is None and args.messages is None:
+        parser.error("informe --duration e/ou --messages")
+    if args.workers < 1 or args.channels < 1:
+        parser.error("--workers e --channels devem ser >= 1")
+
+    options = {
+        'scenario': args.scenario, 'workers': args.workers, 'channels': args.channels,
+        'duration': args.duration,
+        'rate': args.rate, 'profile': args.profile, 'burst_size': args.burst_size,
+        'batch_size': args.batch_size, 'linger_ms': args.linger_ms, 'confirm': args.confirm,
+        'report_interval': args.report_interval, 'seed': args.seed
+    }
+
+    # fork evita reimportar os módulos em cada worker; onde não existe, usa o padrão
+    methods = multiprocessing.get_all_start_methods()
+    context = multiprocessing.get_context('fork' if 'fork' in methods else None)
+
+    readers = {}
+    processes = []
+    for worker_id, id_range in enumerate(id_ranges(args.workers, args.messages)):
+        reader, writer = context.Pipe(duplex=False)
+        process = context.Process(target=run_worker, args=(worker_id, options, id_range, writer),
+                                  name=f"producer-{worker_id}")
+        process.start()
+        writer.close()
+        readers[reader] = worker_id
+        processes.append(process)
+
+    print(f"🚀 {args.workers} producers para '{args.scenario}' "
+          f"({'máximo' if not args.rate else f'{args.rate:.0f} msg/s'})")
+    started = time.perf_counter()
+    workers: Dict[int, Dict[str, Any]] = {}
+    last_print = started
+    try:
+        while readers:
+            for reader in wait(list(readers), timeout=args.report_interval):
+                try:
+                    report = reader.recv()
+                except EOFError:
+                    # Worker terminou (ou morreu) sem mais relatórios
+                    del readers[reader]
+                    continue
+                workers[report['worker']] = report
+                if report['type'] == 'error':
+                    print(f"❌ Worker {report['worker']}: {report['error']}")
+            now = time.perf_counter()
+            if now - last_print >= args.report_interval and workers:
+                last_print = now
+                total = sum(worker['sent'] for worker in workers.values())
+                print(f"⏱️  {now - started:6.1f}s | {total:>10d} enviadas | "
+                      f"{total / (now - started):>10.0f} msg/s agregadas")
+    except KeyboardInterrupt:
+        # Os workers recebem o SIGINT também e mandam o relatório final
+        for reader in list(readers):
+            while reader.poll(1):
+                try:
+                    report = reader.recv()
+                except EOFError:
+                    break
+                workers[report['worker']] = report
+    for process in processes:
+        process.join()
+    wall_seconds = time.perf_counter() - started
+
+    print(f"\n{'WORKER':>6s} {'PID':>8s} {'ENVIADAS':>10s} {'SEGUNDOS':>9s} {'MSG/s':>10s} {'FAIXA DE IDS':>24s}")
+    print("-" * 72)
+    for worker_id in sorted(workers):
+        worker = workers[worker_id]
+        id_span = f"{worker.get('first_id', '?')}-{worker.get('last_id', '?')}"
+        print(f"{worker_id:6d} {worker['pid']:8d} {worker['sent']:10d} {worker['elapsed']:9.2f} "
+              f"{worker['rate']:10.0f} {id_span:>24s}")
+
+    summary = summarize(workers, wall_seconds)
+    print("-" * 72)
+    print(f"Total: {summary['sent']} mensagens em {wall_seconds:.2f}s = "
+          f"{summary['aggregate_rate']:.0f} msg/s agregadas "
+          f"(soma das taxas dos workers: {summary['sum_worker_rates']:.0f} msg/s)")
+    if 'latency' in summary:
+        latency = summary['latency']
+        print(f"Latência desde o instante pretendido: p50 {latency['p50_ms']:.2f}ms "
+              f"p99 {latency['p99_ms']:.2f}ms max {latency['max_ms']:.2f}ms")
+
+    if args.json_path:
+        with open(args.json_path, 'w', encoding='utf-8') as f:
+            json.dump({
+                'started_at': datetime.now().isoformat(),
+                'backend': os.getenv('RABBITMQ_BACKEND', 'amqp'),
+                'options': options,
+                'workers': {str(worker_id): {key: value for key, value in worker.items() if key != 'latency'}
+                            for worker_id, worker in workers.items()},
+                'summary': summary
+            }, f, indent=2)
+        print(f"Resultados salvos em {args.json_path}")
+
+    if summary['errors']:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
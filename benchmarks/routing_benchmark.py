@@ -0,0 +1,218 @@
+"""
+Benchmark do roteamento topic e headers do lado do cliente
+
+Topic (TopicTrie):
+1. Fan-out por routing key do producer de topic_exchange com os bindings do
+   manifesto, listando as keys que não chegam a nenhuma fila.
+2. Custo de match em função do número de bindings: TopicTrie sem cache,
+   TopicTrie memoizada e a varredura linear com topic_matches (o que o broker
+   em memória faz), sobre bindings sintéticos com '*' e '#'.
+
+Headers (HeadersIndex):
+1. Destino de cada combinação de headers do producer de headers_exchange e
+   relatório das combinações sem destino, com a frequência em uma amostra
+   dos payloads do cenário.
+2. Custo de match em função do número de bindings (índice sem cache,
+   memoizado e varredura linear com headers_match), sobre bindings
+   sintéticos com x-match any/all.
+
+Uso:
+    python benchmarks/routing_benchmark.py [--type topic|headers|all] [--bindings 10,100,1000,10000] [--keys 2000] [--json routing.json]
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from typing import Any, Dict, List
+
+# Adiciona o diretório raiz ao path para importar utils e benchmarks
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.payloads import HEADERS_COMBINATIONS, SCENARIO_PAYLOADS, TOPIC_ROUTING_KEYS
+from utils.memory_broker import headers_match, topic_matches
+from utils.routing import HeadersIndex, TopicTrie
+
+VOCABULARY = ['system', 'app', 'user', 'order', 'payment', 'auth', 'database', 'api',
+              'info', 'warning', 'error', 'login', 'logout', 'created', 'updated', 'failed']
+
+HEADER_VALUES = {
+    'format': ['json', 'xml', 'csv', 'avro'],
+    'priority': ['low', 'medium', 'high'],
+    'region': ['us', 'eu', 'br', 'ap'],
+    'source': ['api', 'batch', 'stream'],
+    'encrypted': ['true', 'false'],
+    'tenant': [f"t{i}" for i in range(20)],
+    'version': ['1', '2', '3']
+}
+
+def synthetic_pattern(rng: random.Random) -> str:
+    words = []
+    for _ in range(rng.randint(2, 4)):
+        roll = rng.random()
+        words.append('*' if roll < 0.15 else '#' if roll < 0.2 else rng.choice(VOCABULARY))
+    return '.'.join(words)
+
+def synthetic_key(rng: random.Random) -> str:
+    return '.'.join(rng.choice(VOCABULARY) for _ in range(rng.randint(2, 4)))
+
+def synthetic_headers_binding(rng: random.Random) -> Dict[str, Any]:
+    arguments = {'x-match': rng.choice(['all', 'any'])}
+    for key in rng.sample(sorted(HEADER_VALUES), rng.randint(1, 3)):
+        arguments[key] = rng.choice(HEADER_VALUES[key])
+    return arguments
+
+def synthetic_headers(rng: random.Random) -> Dict[str, Any]:
+    return {key: rng.choice(HEADER_VALUES[key]) for key in rng.sample(sorted(HEADER_VALUES), rng.randint(2, 4))}
+
+def benchmark_bindings(count: int, keys: List[str], rng: random.Random) -> Dict[str, Any]:
+    """
+    Mede o custo de match com count bindings sintéticos
+
+    Returns:
+        {'bindings', 'trie_us', 'trie_cached_us', 'linear_us', 'avg_fanout', 'unroutable_pct'}
+    """
+    bindings = [(synthetic_pattern(rng), f"queue_{i}") for i in range(count)]
+
+    uncached = TopicTrie(bindings, cache_size=0)
+    start = time.perf_counter()
+    results = [uncached.match(key) for key in keys]
+    trie_time = time.perf_counter() - start
+
+    cached = TopicTrie(bindings)
+    for key in keys:
+        cached.match(key)
+    start = time.perf_counter()
+    for key in keys:
+        cached.match(key)
+    cached_time = time.perf_counter() - start
+
+    # A varredura linear é lenta com muitos bindings: mede uma amostra
+    sample = keys[:max(1, min(len(keys), 200_000 // count))]
+    start = time.perf_counter()
+    for key in sample:
+        [queue for pattern, queue in bindings if topic_matches(pattern, key)]
+    linear_time = time.perf_counter() - start
+
+    return {
+        'bindings': count,
+        'trie_us': trie_time / len(keys) * 1e6,
+        'trie_cached_us': cached_time / len(keys) * 1e6,
+        'linear_us': linear_time / len(sample) * 1e6,
+        'avg_fanout': sum(len(queues) for queues in results) / len(results),
+        'unroutable_pct': 100.0 * sum(1 for queues in results if not queues) / len(results)
+    }
+
+def benchmark_headers_bindings(count: int, messages: List[Dict[str, Any]], rng: random.Random) -> Dict[str, Any]:
+    """
+    Mede o custo de match de headers com count bindings sintéticos
+
+    Returns:
+        {'bindings', 'index_us', 'index_cached_us', 'linear_us', 'avg_fanout', 'unroutable_pct'}
+    """
+    bindings = [(f"queue_{i}", synthetic_headers_binding(rng)) for i in range(count)]
+
+    uncached = HeadersIndex(bindings, cache_size=0)
+    start = time.perf_counter()
+    results = [uncached.match(headers) for headers in messages]
+    index_time = time.perf_counter() - start
+
+    cached = HeadersIndex(bindings)
+    for headers in messages:
+        cached.match(headers)
+    start = time.perf_counter()
+    for headers in messages:
+        cached.match(headers)
+    cached_time = time.perf_counter() - start
+
+    sample = messages[:max(1, min(len(messages), 200_000 // count))]
+    start = time.perf_counter()
+    for headers in sample:
+        [queue for queue, arguments in bindings if headers_match(arguments, headers)]
+    linear_time = time.perf_counter() - start
+
+    return {
+        'bindings': count,
+        'index_us': index_time / len(messages) * 1e6,
+        'index_cached_us': cached_time / len(messages) * 1e6,
+        'linear_us': linear_time / len(sample) * 1e6,
+        'avg_fanout': sum(len(queues) for queues in results) / len(results),
+        'unroutable_pct': 100.0 * sum(1 for queues in results if not queues) / len(results)
+    }
+
+def run_topic(counts: List[int], keys: int, rng: random.Random) -> Dict[str, Any]:
+    router = TopicTrie.from_topology('topic_exchange', exchange='topic_exchange_demo')
+    print("Fan-out das routing keys de topic_exchange/producer.py:")
+    for key in TOPIC_ROUTING_KEYS:
+        queues = router.match(key)
+        print(f"  {key:24s} {len(queues)} → {', '.join(queues) if queues else '(sem destino)'}")
+    unroutable = router.unroutable(TOPIC_ROUTING_KEYS)
+    print(f"{len(unroutable)} de {len(TOPIC_ROUTING_KEYS)} keys sem fila de destino\n")
+
+    routing_keys = [synthetic_key(rng) for _ in range(keys)]
+    results = []
+    print(f"{'BINDINGS':>9s} {'TRIE (µs)':>10s} {'MEMO (µs)':>10s} {'LINEAR (µs)':>12s} {'FAN-OUT':>8s} {'SEM DESTINO':>12s}")
+    for count in counts:
+        result = benchmark_bindings(count, routing_keys, rng)
+        results.append(result)
+        print(f"{count:9d} {result['trie_us']:10.2f} {result['trie_cached_us']:10.2f} "
+              f"{result['linear_us']:12.2f} {result['avg_fanout']:8.2f} {result['unroutable_pct']:11.1f}%")
+    return {'scenario_fanout': router.fanout(TOPIC_ROUTING_KEYS), 'unroutable': unroutable, 'results': results}
+
+def run_headers(counts: List[int], keys: int, rng: random.Random) -> Dict[str, Any]:
+    index = HeadersIndex.from_topology('headers_exchange', exchange='headers_exchange_demo')
+    print("Destino das combinações de headers_exchange/producer.py:")
+    for headers, _ in HEADERS_COMBINATIONS:
+        queues = index.match(headers)
+        headers_str = ", ".join(f"{k}={v}" for k, v in headers.items())
+        print(f"  {headers_str:42s} {len(queues)} → {', '.join(queues) if queues else '(sem destino)'}")
+
+    # Frequência das combinações sem destino em uma amostra dos payloads do cenário
+    published = [SCENARIO_PAYLOADS['headers_exchange'](n)['headers'] for n in range(1, keys + 1)]
+    report = index.unmatched_report(published)
+    unmatched_total = sum(entry['count'] for entry in report)
+    print(f"Sem destino: {unmatched_total} de {len(published)} mensagens "
+          f"({100.0 * unmatched_total / len(published):.1f}%)")
+    for entry in report:
+        print(f"  {entry['count']:6d}x {entry['headers']}")
+    print()
+
+    messages = [synthetic_headers(rng) for _ in range(keys)]
+    results = []
+    print(f"{'BINDINGS':>9s} {'ÍNDICE (µs)':>12s} {'MEMO (µs)':>10s} {'LINEAR (µs)':>12s} {'FAN-OUT':>8s} {'SEM DESTINO':>12s}")
+    for count in counts:
+        result = benchmark_headers_bindings(count, messages, rng)
+        results.append(result)
+        print(f"{count:9d} {result['index_us']:12.2f} {result['index_cached_us']:10.2f} "
+              f"{result['linear_us']:12.2f} {result['avg_fanout']:8.2f} {result['unroutable_pct']:11.1f}%")
+    return {'unmatched_report': report, 'results': results}
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark do roteamento topic e headers do lado do cliente")
+    parser.add_argument('--type', dest='exchange_type', default='all', choices=['topic', 'headers', 'all'])
+    parser.add_argument('--bindings', default='10,100,1000,10000', help="Números de bindings, separados por vírgula")
+    parser.add_argument('--keys', type=int, default=2000, help="Routing keys/combinações de headers por medição")
+    parser.add_argument('--json', dest='json_path', help="Arquivo para salvar os resultados")
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    # random global: escolha das combinações pelos builders de payloads.py
+    random.seed(args.seed)
+    rng = random.Random(args.seed)
+    counts = [int(value) for value in args.bindings.split(',')]
+    output = {}
+    if args.exchange_type in ('topic', 'all'):
+        output['topic'] = run_topic(counts, args.keys, rng)
+    if args.exchange_type in ('headers', 'all'):
+        if output:
+            print()
+        output['headers'] = run_headers(counts, args.keys, rng)
+
+    if args.json_path:
+        with open(args.json_path, 'w', encoding='utf-8') as f:
+            json.dump(output, f, indent=2)
+        print(f"Resultados salvos em {args.json_path}")
+
+if __name__ == "__main__":
+    main()
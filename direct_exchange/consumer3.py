@@ -4,7 +4,6 @@ Consome mensagens com routing key 'error'
 """
 import sys
 import os
-import json
 import time
 
 # Adiciona o diretório pai ao path para importar utils
@@ -15,6 +14,7 @@ from utils.common import (
     setup_logging, get_rabbitmq_connection, create_exchange_and_queue,
     log_message_received, print_scenario_header, print_config_info
 )
+from utils.serialization import decode_message
 
 def main():
     # Configurações do cenário
@@ -43,7 +43,7 @@ def main():
             log_message_received(logger, method, properties, body, CONSUMER_ID)
             
             # Processa a mensagem
-            message_data = json.loads(body.decode('utf-8'))
+            message_data = decode_message(body, properties)
             
             logger.info(f"[{CONSUMER_ID}] ERRO CRÍTICO - Processando mensagem ID: {message_data.get('id')}")
             logger.info(f"[{CONSUMER_ID}] Conteúdo: {message_data.get('content')}")
@@ -16,6 +16,7 @@ from utils.common import (
     setup_logging, get_rabbitmq_connection, create_exchange_and_queue,
     log_message_sent, print_scenario_header, print_config_info
 )
+from utils.serialization import compress_for_publish
 
 def main():
     # Configurações do cenário
@@ -76,11 +77,13 @@ def main():
                     timestamp=int(time.time())
                 )
                 
+                body, properties = compress_for_publish(message_body, properties)
+                
                 # Publica a mensagem
                 channel.basic_publish(
                     exchange=EXCHANGE_NAME,
                     routing_key=routing_key,
-                    body=message_body,
+                    body=body,
                     properties=properties
                 )
                 
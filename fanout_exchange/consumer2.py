@@ -1,20 +1,28 @@
 """
 Consumer 2 para Fanout Exchange
 Processa logs de auditoria
+
+Gravar a auditoria é espera de I/O: o consumer usa a camada asyncio
+(utils.aio.consume_async) e grava até AUDIT_PREFETCH registros ao mesmo
+tempo em um único thread, em vez de um por vez.
 """
+import asyncio
+import signal
 import sys
 import os
-import json
 import time
 
 # Adiciona o diretório pai ao path para importar utils
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-import pika
+from utils.aio import (
+    close_async_connection, consume_async, create_exchange_and_queue_async,
+    get_async_rabbitmq_connection, open_async_channel
+)
 from utils.common import (
-    setup_logging, get_rabbitmq_connection, create_exchange_and_queue,
-    log_message_received, print_scenario_header, print_config_info
+    setup_logging, log_message_received, print_scenario_header, print_config_info
 )
+from utils.serialization import decode_message
 
 def main():
     # Configurações do cenário
@@ -24,6 +32,8 @@ def main():
     EXCHANGE_NAME = "fanout_exchange_demo"
     EXCHANGE_TYPE = "fanout"
     QUEUE_NAME = "fanout_queue_audit"
+    # Gravações de auditoria simultâneas (janela do basic_qos)
+    PREFETCH_COUNT = int(os.getenv('AUDIT_PREFETCH', '10'))
     
     # Setup
     print_scenario_header(
@@ -35,14 +45,14 @@ def main():
     logger = setup_logging(SCENARIO_NAME, COMPONENT_NAME)
     print_config_info(logger)
     
-    def callback(ch, method, properties, body):
-        """Callback para processar mensagens recebidas"""
+    async def handle_audit(method, properties, body):
+        """Registra uma mensagem na auditoria (ACK/NACK feitos pelo runtime)"""
         try:
             # Log da mensagem recebida
             log_message_received(logger, method, properties, body, CONSUMER_ID)
             
             # Processa a mensagem
-            message_data = json.loads(body.decode('utf-8'))
+            message_data = decode_message(body, properties)
             
             logger.info(f"[{CONSUMER_ID}] 📝 REGISTRANDO AUDITORIA - ID: {message_data.get('id')}")
             logger.info(f"[{CONSUMER_ID}] Timestamp: {message_data.get('timestamp')}")
@@ -57,61 +67,67 @@ def main():
             }
             
             logger.info(f"[{CONSUMER_ID}] Gravando registro de auditoria...")
-            time.sleep(0.8)  # Simula I/O de gravação
+            await asyncio.sleep(0.8)  # Simula I/O de gravação (sem bloquear as outras)
             
-            # Confirma o processamento
-            ch.basic_ack(delivery_tag=method.delivery_tag)
             logger.info(f"[{CONSUMER_ID}] ✅ Auditoria registrada com sucesso")
             
         except Exception as e:
             logger.error(f"[{CONSUMER_ID}] ❌ Erro ao registrar auditoria: {str(e)}")
-            # Rejeita a mensagem e não recoloca na fila
-            ch.basic_nack(delivery_tag=method.delivery_tag, requeue=False)
+            # Propaga para o runtime rejeitar a mensagem sem recolocá-la na fila
+            raise
     
-    try:
+    async def consume():
+        stop_event = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        try:
+            # Ctrl+C encerra o consumo e drena as gravações em andamento
+            loop.add_signal_handler(signal.SIGINT, stop_event.set)
+        except NotImplementedError:
+            pass
+        
         # Conecta ao RabbitMQ
         logger.info("Conectando ao RabbitMQ...")
-        connection = get_rabbitmq_connection()
-        channel = connection.channel()
-        
-        # Configura QoS
-        channel.basic_qos(prefetch_count=1)
-        
-        # Cria exchange e fila (idempotente)
-        create_exchange_and_queue(
-            channel=channel,
-            exchange_name=EXCHANGE_NAME,
-            exchange_type=EXCHANGE_TYPE,
-            queue_name=QUEUE_NAME,
-            routing_key='',  # Ignorada em fanout
-            durable=True
-        )
-        
-        logger.info(f"Exchange '{EXCHANGE_NAME}' declarado")
-        logger.info(f"Fila '{QUEUE_NAME}' declarada e vinculada ao exchange")
-        
-        # Configura o consumer
-        channel.basic_consume(
-            queue=QUEUE_NAME,
-            on_message_callback=callback,
-            auto_ack=False  # Confirmação manual
-        )
-        
-        logger.info(f"[{CONSUMER_ID}] 📋 Aguardando broadcasts para auditoria. Para sair pressione Ctrl+C")
-        
-        # Inicia o consumo
-        channel.start_consuming()
-        
+        connection = await get_async_rabbitmq_connection()
+        try:
+            channel = await open_async_channel(connection)
+            
+            # Cria exchange e fila (idempotente)
+            await create_exchange_and_queue_async(
+                channel,
+                exchange_name=EXCHANGE_NAME,
+                exchange_type=EXCHANGE_TYPE,
+                queue_name=QUEUE_NAME,
+                routing_key='',  # Ignorada em fanout
+                durable=True
+            )
+            
+            logger.info(f"Exchange '{EXCHANGE_NAME}' declarado")
+            logger.info(f"Fila '{QUEUE_NAME}' declarada e vinculada ao exchange")
+            logger.info(f"QoS configurado: prefetch_count={PREFETCH_COUNT} (gravações simultâneas)")
+            logger.info(f"[{CONSUMER_ID}] 📋 Aguardando broadcasts para auditoria. Para sair pressione Ctrl+C")
+            
+            # Inicia o consumo
+            counters = await consume_async(
+                channel,
+                QUEUE_NAME,
+                handle_audit,
+                prefetch_count=PREFETCH_COUNT,
+                stop_event=stop_event,
+                requeue_on_error=False,
+                logger=logger
+            )
+            logger.info("Parando consumer...")
+            logger.info(f"Auditorias registradas: {counters['processed']}, rejeitadas: {counters['failed']}")
+        finally:
+            await close_async_connection(connection)
+            logger.info("Conexão fechada")
+    
+    try:
+        asyncio.run(consume())
     except KeyboardInterrupt:
         logger.info("Parando consumer...")
-        if 'channel' in locals():
-            channel.stop_consuming()
     except Exception as e:
         logger.error(f"Erro no consumer: {str(e)}")
-    finally:
-        if 'connection' in locals() and not connection.is_closed:
-            connection.close()
-            logger.info("Conexão fechada")
 
 if __name__ == "__main__":
     main()
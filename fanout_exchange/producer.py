@@ -16,6 +16,8 @@ from utils.common import (
     setup_logging, get_rabbitmq_connection, create_exchange_and_queue,
     log_message_sent, print_scenario_header, print_config_info
 )
+from utils.serialization import compress_for_publish
+from utils.topology import apply_topology, get_scenario_topology
 
 def main():
     # Configurações do cenário
@@ -40,30 +42,12 @@ def main():
         connection = get_rabbitmq_connection()
         channel = connection.channel()
         
-        # Declara o exchange (idempotente)
-        logger.info(f"Declarando exchange '{EXCHANGE_NAME}' do tipo '{EXCHANGE_TYPE}'")
-        channel.exchange_declare(
-            exchange=EXCHANGE_NAME,
-            exchange_type=EXCHANGE_TYPE,
-            durable=True
-        )
+        # Declara exchange, filas e bindings do manifesto em um único round trip
+        logger.info(f"Declarando exchange '{EXCHANGE_NAME}' do tipo '{EXCHANGE_TYPE}' e filas dos consumers...")
+        apply_topology(channel, [SCENARIO_NAME])
         
-        # Declara as filas que os consumers irão usar
-        queue_names = [
-            "fanout_queue_notifications",
-            "fanout_queue_audit", 
-            "fanout_queue_metrics"
-        ]
-        
-        logger.info("Declarando filas para os consumers...")
-        for queue_name in queue_names:
-            channel.queue_declare(queue=queue_name, durable=True)
-            channel.queue_bind(
-                exchange=EXCHANGE_NAME,
-                queue=queue_name,
-                routing_key=''  # Ignorada em fanout
-            )
-            logger.info(f"Fila '{queue_name}' declarada e vinculada")
+        for queue in get_scenario_topology(SCENARIO_NAME)['queues']:
+            logger.info(f"Fila '{queue['name']}' declarada e vinculada")
         
         logger.info("Producer iniciado. Fazendo broadcast a cada 4 segundos...")
         logger.info("Pressione Ctrl+C para parar")
@@ -94,11 +78,13 @@ def main():
                 }
             )
             
+            body, properties = compress_for_publish(message_body, properties)
+            
             # Publica a mensagem (routing_key é ignorada em fanout)
             channel.basic_publish(
                 exchange=EXCHANGE_NAME,
                 routing_key='',  # Ignorada em fanout exchange
-                body=message_body,
+                body=body,
                 properties=properties
             )
             
@@ -5,7 +5,6 @@ Binding: region=us OR format=xml (x-match=any)
 """
 import sys
 import os
-import json
 import time
 
 # Adiciona o diretório pai ao path para importar utils
@@ -16,6 +15,7 @@ from utils.common import (
     setup_logging, get_rabbitmq_connection, 
     log_message_received, print_scenario_header, print_config_info
 )
+from utils.serialization import decode_message
 
 def main():
     # Configurações do cenário
@@ -50,7 +50,7 @@ def main():
             log_message_received(logger, method, properties, body, CONSUMER_ID)
             
             # Processa a mensagem
-            message_data = json.loads(body.decode('utf-8'))
+            message_data = decode_message(body, properties)
             headers = properties.headers or {}
             
             # Identifica qual critério foi atendido
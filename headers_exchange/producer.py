@@ -8,6 +8,7 @@ import time
 import json
 from datetime import datetime
 import random
+from collections import Counter
 
 # Adiciona o diretório pai ao path para importar utils
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -17,6 +18,8 @@ from utils.common import (
     setup_logging, get_rabbitmq_connection, create_exchange_and_queue,
     log_message_sent, print_scenario_header, print_config_info
 )
+from utils.routing import HeadersIndex
+from utils.serialization import compress_for_publish
 
 def main():
     # Configurações do cenário
@@ -77,11 +80,18 @@ def main():
             durable=True
         )
         
+        # Bindings conhecidos (manifesto de topologia) para prever o destino de cada combinação
+        router = HeadersIndex.from_topology(SCENARIO_NAME, exchange=EXCHANGE_NAME)
+        # Com SKIP_UNROUTABLE=1 combinações sem fila de destino não são publicadas
+        skip_unroutable = os.getenv('SKIP_UNROUTABLE', '0').lower() in ('1', 'true', 'yes')
+        unmatched = Counter()
+        
         logger.info("Producer iniciado. Enviando mensagens com headers variados...")
         logger.info("Tipos de headers que serão enviados:")
         for i, msg_type in enumerate(MESSAGE_TYPES, 1):
             headers_str = ", ".join([f"{k}={v}" for k, v in msg_type["headers"].items()])
-            logger.info(f"  {i}. {headers_str}")
+            queues = router.match(msg_type["headers"])
+            logger.info(f"  {i}. {headers_str} → {', '.join(queues) if queues else 'nenhuma fila (descartada pelo broker)'}")
         logger.info("Pressione Ctrl+C para parar")
         
         message_count = 1
@@ -91,6 +101,10 @@ def main():
             message_type = random.choice(MESSAGE_TYPES)
             headers = message_type["headers"]
             base_content = message_type["content"]
+            routable = router.is_routable(headers)
+            if not routable:
+                unmatched[tuple(sorted(headers.items()))] += 1
+                logger.warning(f"Headers {headers} não casam com nenhum binding conhecido")
             
             # Prepara a mensagem
             message_data = {
@@ -111,23 +125,31 @@ def main():
                 headers=headers  # Headers usados para roteamento
             )
             
-            # Publica a mensagem (routing_key é ignorada em headers exchange)
-            channel.basic_publish(
-                exchange=EXCHANGE_NAME,
-                routing_key='',  # Ignorada em headers exchange
-                body=message_body,
-                properties=properties
-            )
+            body, properties = compress_for_publish(message_body, properties)
             
-            # Log customizado para headers
-            headers_str = ", ".join([f"{k}={v}" for k, v in headers.items()])
-            log_message_sent(logger, EXCHANGE_NAME, f"headers({headers_str})", message_body, properties)
+            # Publica a mensagem (routing_key é ignorada em headers exchange);
+            # com SKIP_UNROUTABLE=1 as combinações sem fila não são enviadas
+            if routable or not skip_unroutable:
+                channel.basic_publish(
+                    exchange=EXCHANGE_NAME,
+                    routing_key='',  # Ignorada em headers exchange
+                    body=body,
+                    properties=properties
+                )
+                
+                # Log customizado para headers
+                headers_str = ", ".join([f"{k}={v}" for k, v in headers.items()])
+                log_message_sent(logger, EXCHANGE_NAME, f"headers({headers_str})", message_body, properties)
             
             message_count += 1
             time.sleep(3)  # Pausa entre mensagens
             
     except KeyboardInterrupt:
         logger.info("Parando producer...")
+        if 'unmatched' in locals():
+            # Relatório das combinações que não chegaram a nenhuma fila
+            for items, count in unmatched.most_common():
+                logger.info(f"Sem destino: {dict(items)} ({count} mensagens)")
     except Exception as e:
         logger.error(f"Erro no producer: {str(e)}")
     finally:
@@ -5,7 +5,7 @@ Demonstra consumo de mensagens enviadas pelo producer Python
 import sys
 import os
 import time
-import json
+import logging
 from datetime import datetime
 import random
 
@@ -17,12 +17,25 @@ from utils.common import (
     setup_logging, get_rabbitmq_connection,
     print_scenario_header, print_config_info
 )
+from utils.serialization import DECODE_ERRORS, decode_message
+from utils.dedup import create_dedup_filter
+from utils.handlers import HandlerRegistry
+from utils.histogram import LatencyHistogram
+from utils.workers import consume_in_processes
+
+# Nome do logger criado por setup_logging (usado também nos processos do pool)
+LOGGER_NAME = "interoperability_consumer1-python"
+
+# Handlers por tipo de mensagem (registrados com @HANDLERS.register)
+HANDLERS = HandlerRegistry("interoperability_consumer1")
 
 def main():
     # Configurações do cenário
     SCENARIO_NAME = "interoperability"
     COMPONENT_NAME = "consumer1-python"
     QUEUE_NAME = "python_queue"
+    # inline (padrão) ou process: handlers CPU-bound em um ProcessPoolExecutor
+    EXECUTION_MODE = os.getenv('CONSUMER_EXECUTION_MODE', 'inline')
     
     # Setup
     print_scenario_header(
@@ -44,15 +57,19 @@ def main():
         logger.info(f"Declarando fila '{QUEUE_NAME}'...")
         channel.queue_declare(queue=QUEUE_NAME, durable=True)
         
-        # Configurações do consumer
-        channel.basic_qos(prefetch_count=1)
+        # Configurações do consumer (no modo process o prefetch acompanha o pool)
+        if EXECUTION_MODE != 'process':
+            channel.basic_qos(prefetch_count=1)
+        
+        # Descarta reentregas de mensagens já processadas (por message_id)
+        dedup = create_dedup_filter()
         
         # Estatísticas
         stats = {
             'processed': 0,
-            'by_type': {},
+            'duplicates': 0,
             'errors': 0,
-            'processing_times': [],
+            'processing_times': LatencyHistogram(),
             'start_time': datetime.now()
         }
         
@@ -63,75 +80,60 @@ def main():
         print(f"📦 Biblioteca: pika")
         print(f"🔄 Pressione Ctrl+C para parar\n")
         
+        def on_received(message):
+            """Atualiza estatísticas de recebimento"""
+            stats['processed'] += 1
+            msg_type = message.get('type', 'UNKNOWN')
+            
+            # Log de recebimento
+            print(f"📥 MSG #{stats['processed']:03d} | "
+                  f"🐍→🐍 | "
+                  f"{msg_type:20s} | "
+                  f"Processing...")
+        
+        def on_completed(message, actual_time):
+            """Registra a conclusão do processamento"""
+            correlation_id = message.get('_meta', {}).get('correlation_id', 'unknown')
+            stats['processing_times'].record(actual_time)
+            
+            # Log de conclusão
+            elapsed = datetime.now() - stats['start_time']
+            uptime = str(elapsed).split('.')[0]
+            
+            print(f"✅ MSG #{stats['processed']:03d} | "
+                  f"🐍 Python | "
+                  f"{actual_time:.2f}s | "
+                  f"ID: {correlation_id} | "
+                  f"Uptime: {uptime}")
+            
+            # Log estatísticas a cada 10 mensagens
+            if stats['processed'] % 10 == 0:
+                print_stats(stats, logger)
+        
         def callback(ch, method, properties, body):
             try:
-                start_time = time.time()
+                # Reentrega de mensagem já processada: só confirma
+                if dedup.is_duplicate(method, properties):
+                    stats['duplicates'] += 1
+                    logger.warning(f"Mensagem duplicada ignorada: {properties.message_id}")
+                    ch.basic_ack(delivery_tag=method.delivery_tag)
+                    return
                 
                 # Decodifica mensagem JSON
-                message = json.loads(body.decode('utf-8'))
-                stats['processed'] += 1
-                
-                # Extrai metadados
-                msg_type = message.get('type', 'UNKNOWN')
-                meta = message.get('_meta', {})
-                
-                producer_lang = meta.get('producer', 'unknown')
-                message_id = meta.get('message_id', 'unknown')
-                correlation_id = meta.get('correlation_id', 'unknown')
-                
-                # Atualiza estatísticas por tipo
-                if msg_type not in stats['by_type']:
-                    stats['by_type'][msg_type] = 0
-                stats['by_type'][msg_type] += 1
-                
-                # Log de recebimento
-                print(f"📥 MSG #{stats['processed']:03d} | "
-                      f"🐍→🐍 | "
-                      f"{msg_type:20s} | "
-                      f"Processing...")
-                
-                # Processamento específico por tipo em Python
-                if msg_type == "USER_REGISTRATION":
-                    process_user_registration_python(message, logger)
-                elif msg_type == "ORDER_CREATED":
-                    process_order_created_python(message, logger)
-                elif msg_type == "PAYMENT_PROCESSED":
-                    process_payment_processed_python(message, logger)
-                elif msg_type == "INVENTORY_UPDATE":
-                    process_inventory_update_python(message, logger)
-                elif msg_type == "NOTIFICATION_SEND":
-                    process_notification_send_python(message, logger)
-                else:
-                    process_generic_message_python(message, logger)
-                
-                # Simula tempo de processamento
-                processing_time = random.uniform(0.3, 0.8)
-                time.sleep(processing_time)
+                message = decode_message(body, properties)
+                on_received(message)
                 
-                end_time = time.time()
-                actual_time = end_time - start_time
-                stats['processing_times'].append(actual_time)
+                actual_time, _ = process_message_python(message)
+                on_completed(message, actual_time)
                 
-                # Log de conclusão
-                elapsed = datetime.now() - stats['start_time']
-                uptime = str(elapsed).split('.')[0]
-                
-                print(f"✅ MSG #{stats['processed']:03d} | "
-                      f"🐍 Python | "
-                      f"{actual_time:.2f}s | "
-                      f"ID: {correlation_id} | "
-                      f"Uptime: {uptime}")
-                
-                # Confirma processamento
+                # Confirma processamento (marcando o id antes do ACK)
+                dedup.mark_processed(properties)
                 ch.basic_ack(delivery_tag=method.delivery_tag)
                 
-                # Log estatísticas a cada 10 mensagens
-                if stats['processed'] % 10 == 0:
-                    print_stats(stats, logger)
-                
-            except json.JSONDecodeError as e:
+            except DECODE_ERRORS as e:
                 stats['errors'] += 1
-                logger.error(f"Erro ao decodificar JSON: {e}")
+                # Corpo que não decodifica nunca seria processado em uma nova tentativa
+                logger.error(f"Erro ao decodificar mensagem: {e}")
                 ch.basic_nack(delivery_tag=method.delivery_tag, requeue=False)
                 
             except Exception as e:
@@ -139,6 +141,32 @@ def main():
                 logger.error(f"Erro no processamento: {e}")
                 ch.basic_nack(delivery_tag=method.delivery_tag, requeue=True)
         
+        def on_process_result(message, result, method, properties, inline):
+            # As métricas do registro ficam no processo do pool; replica aqui
+            # (corpos grandes rodam neste processo e o dispatch já registrou)
+            actual_time, handler_time = result
+            if not inline:
+                HANDLERS.record(message.get('type', 'UNKNOWN'), handler_time)
+            on_received(message)
+            on_completed(message, actual_time)
+        
+        if EXECUTION_MODE == 'process':
+            # Pool de processos: o processamento por tipo roda fora do GIL do
+            # consumer e as mensagens são confirmadas na ordem de entrega
+            logger.info("Modo de execução: pool de processos. Para sair, pressione CTRL+C")
+            counters = consume_in_processes(
+                channel,
+                QUEUE_NAME,
+                process_message_python,
+                on_result=on_process_result,
+                logger=logger,
+                dedup=dedup
+            )
+            stats['errors'] += counters['failed']
+            stats['duplicates'] += counters['duplicates']
+            print_final_stats(stats)
+            return
+        
         # Configura consumer
         channel.basic_consume(
             queue=QUEUE_NAME,
@@ -159,12 +187,37 @@ def main():
         print(f"❌ Erro: {e}")
         
     finally:
+        if 'dedup' in locals():
+            dedup.close()
         if 'channel' in locals() and channel.is_open:
             channel.stop_consuming()
         if 'connection' in locals() and connection.is_open:
             connection.close()
             logger.info("Conexão fechada")
 
+def process_message_python(message):
+    """
+    Executa o processamento específico do tipo da mensagem
+    
+    Função de nível de módulo para poder rodar em um processo do pool.
+    
+    Returns:
+        Tupla (tempo total em segundos, tempo do handler em segundos)
+    """
+    logger = logging.getLogger(LOGGER_NAME)
+    start_time = time.time()
+    
+    # Processamento específico por tipo em Python (despacho O(1) pelo registro)
+    HANDLERS.dispatch(message.get('type', 'UNKNOWN'), message, logger)
+    handler_time = time.time() - start_time
+    
+    # Simula tempo de processamento
+    processing_time = random.uniform(0.3, 0.8)
+    time.sleep(processing_time)
+    
+    return time.time() - start_time, handler_time
+
+@HANDLERS.register("USER_REGISTRATION")
 def process_user_registration_python(message, logger):
     """Processa registro de usuário usando recursos Python"""
     user_id = message.get('user_id')
@@ -200,6 +253,7 @@ def process_user_registration_python(message, logger):
     logger.info("Salvando no banco de dados...")
     logger.info("Enviando email de boas-vindas...")
 
+@HANDLERS.register("ORDER_CREATED")
 def process_order_created_python(message, logger):
     """Processa criação de pedido usando recursos Python"""
     order_id = message.get('order_id')
@@ -226,6 +280,7 @@ def process_order_created_python(message, logger):
     logger.info("Calculando frete...")
     logger.info("Gerando nota fiscal...")
 
+@HANDLERS.register("PAYMENT_PROCESSED")
 def process_payment_processed_python(message, logger):
     """Processa pagamento usando recursos Python"""
     payment_id = message.get('payment_id')
@@ -258,6 +313,7 @@ def process_payment_processed_python(message, logger):
     logger.info("Atualizando status do pedido...")
     logger.info("Registrando transação...")
 
+@HANDLERS.register("INVENTORY_UPDATE")
 def process_inventory_update_python(message, logger):
     """Processa atualização de estoque usando recursos Python"""
     product_id = message.get('product_id')
@@ -288,6 +344,7 @@ def process_inventory_update_python(message, logger):
     logger.info("Atualizando banco de dados...")
     logger.info("Notificando sistema de compras...")
 
+@HANDLERS.register("NOTIFICATION_SEND")
 def process_notification_send_python(message, logger):
     """Processa envio de notificação usando recursos Python"""
     notif_id = message.get('notification_id')
@@ -324,6 +381,7 @@ def process_notification_send_python(message, logger):
     except ValueError as e:
         logger.error(f"Erro de configuração: {e}")
 
+@HANDLERS.default
 def process_generic_message_python(message, logger):
     """Processa mensagem genérica mostrando recursos Python"""
     msg_type = message.get('type', 'UNKNOWN')
@@ -346,7 +404,7 @@ def print_stats(stats, logger):
     elapsed = datetime.now() - stats['start_time']
     rate = stats['processed'] / elapsed.total_seconds() if elapsed.total_seconds() > 0 else 0
     
-    avg_time = sum(stats['processing_times']) / len(stats['processing_times']) if stats['processing_times'] else 0
+    avg_time = stats['processing_times'].mean()
     
     print(f"\n📊 ESTATÍSTICAS PYTHON CONSUMER:")
     print(f"   🐍 Total processadas: {stats['processed']}")
@@ -355,9 +413,12 @@ def print_stats(stats, logger):
     print(f"   ⏱️ Tempo médio: {avg_time:.2f}s")
     print(f"   📋 Distribuição por tipo:")
     
-    for msg_type, count in sorted(stats['by_type'].items()):
+    for msg_type, handler_stats in sorted(HANDLERS.get_stats().items()):
+        count = handler_stats['calls']
         percentage = (count / stats['processed']) * 100
-        print(f"      {msg_type}: {count} ({percentage:.1f}%)")
+        print(f"      {msg_type}: {count} ({percentage:.1f}%) | "
+              f"handler {handler_stats['avg_ms']:.1f}ms médio, p95 {handler_stats['p95_ms']:.0f}ms | "
+              f"erros: {handler_stats['errors']}")
     
     print(f"   ⏱️ Uptime: {str(elapsed).split('.')[0]}\n")
 
@@ -366,21 +427,24 @@ def print_final_stats(stats):
     elapsed = datetime.now() - stats['start_time']
     rate = stats['processed'] / elapsed.total_seconds() if elapsed.total_seconds() > 0 else 0
     
-    avg_time = sum(stats['processing_times']) / len(stats['processing_times']) if stats['processing_times'] else 0
-    min_time = min(stats['processing_times']) if stats['processing_times'] else 0
-    max_time = max(stats['processing_times']) if stats['processing_times'] else 0
+    times = stats['processing_times'].summary()
+    avg_time = times['mean_ms'] / 1000
+    min_time = times['min_ms'] / 1000
+    max_time = times['max_ms'] / 1000
     
     print(f"\n📈 ESTATÍSTICAS FINAIS - PYTHON CONSUMER:")
     print(f"   🐍 Linguagem: Python 3.x")
     print(f"   📦 Biblioteca: pika")
     print(f"   📊 Total processadas: {stats['processed']}")
     print(f"   ❌ Erros: {stats['errors']}")
+    print(f"   ♻️ Duplicadas ignoradas: {stats['duplicates']}")
     print(f"   ⏱️ Tempo total: {str(elapsed).split('.')[0]}")
     print(f"   📈 Taxa média: {rate:.2f} msg/s")
     print(f"   ⏱️ Tempos de processamento:")
     print(f"      Médio: {avg_time:.2f}s")
     print(f"      Mínimo: {min_time:.2f}s")
     print(f"      Máximo: {max_time:.2f}s")
+    print(f"      p95/p99: {times['p95_ms'] / 1000:.2f}s / {times['p99_ms'] / 1000:.2f}s")
     
     if stats['processed'] > 0:
         success_rate = ((stats['processed'] - stats['errors']) / stats['processed']) * 100
@@ -5,7 +5,6 @@ Demonstra envio de mensagens que serão consumidas por diferentes linguagens
 import sys
 import os
 import time
-import json
 from datetime import datetime
 import random
 import uuid
@@ -18,6 +17,9 @@ from utils.common import (
     setup_logging, get_rabbitmq_connection, create_exchange_and_queue,
     log_message_sent, print_scenario_header, print_config_info
 )
+from utils.loadgen import INTENDED_HEADER, create_load_generator, format_load_stats
+from utils.serialization import encode_message
+from utils.topology import apply_topology, get_scenario_topology
 
 def main():
     # Configurações do cenário
@@ -45,25 +47,12 @@ def main():
         connection = get_rabbitmq_connection()
         channel = connection.channel()
         
-        # Declara exchange e filas
-        logger.info(f"Declarando exchange '{EXCHANGE_NAME}' tipo direct...")
-        channel.exchange_declare(
-            exchange=EXCHANGE_NAME,
-            exchange_type='direct',
-            durable=True
-        )
-          # Declara filas para cada linguagem
-        queues = [PYTHON_QUEUE, NODEJS_QUEUE, JAVASCRIPT_QUEUE]
-        routing_keys = ["python", "nodejs", "javascript"]
+        # Declara exchange, filas e bindings do manifesto em um único round trip
+        logger.info(f"Declarando exchange '{EXCHANGE_NAME}' tipo direct e filas por linguagem...")
+        apply_topology(channel, [SCENARIO_NAME])
         
-        for queue, routing_key in zip(queues, routing_keys):
-            logger.info(f"Declarando fila '{queue}' com routing key '{routing_key}'...")
-            channel.queue_declare(queue=queue, durable=True)
-            channel.queue_bind(
-                exchange=EXCHANGE_NAME,
-                queue=queue,
-                routing_key=routing_key
-            )
+        for binding in get_scenario_topology(SCENARIO_NAME)['bindings']:
+            logger.info(f"Fila '{binding['queue']}' declarada com routing key '{binding['routing_key']}'")
         
         # Tipos de mensagens para demonstrar interoperabilidade
         message_templates = [
@@ -129,17 +118,19 @@ def main():
         print(f"📋 Formato: JSON padronizado")
         print(f"🔄 Pressione Ctrl+C para parar\n")
         
-        message_count = 0
+        sent = [0]
         
-        # Loop principal de envio
-        while True:
+        def publish_message(message_count, intended_ns=None):
+            """
+            Monta e publica a mensagem message_count
+            
+            Com intended_ns (gerador de carga) grava o instante pretendido no
+            header e não registra a mensagem no log
+            """
             # Escolhe template de mensagem
             template = random.choice(message_templates)
               # Escolhe linguagem de destino
             target_lang = random.choice(["python", "nodejs", "javascript"])
-            target_queue = f"{target_lang}_queue"
-            
-            message_count += 1
             
             # Cria mensagem baseada no template
             message = create_message_from_template(template, message_count)
@@ -156,8 +147,8 @@ def main():
                 "format": "json"
             }
             
-            # Serializa para JSON (formato universal)
-            message_body = json.dumps(message, indent=2, ensure_ascii=False)
+            # Serializa para JSON compacto (formato universal)
+            message_body, content_type = encode_message(message)
             
             # Headers para interoperabilidade
             headers = {
@@ -169,6 +160,8 @@ def main():
                 'schema-version': '1.0',
                 'correlation-id': message["_meta"]["correlation_id"]
             }
+            if intended_ns is not None:
+                headers[INTENDED_HEADER] = intended_ns
             
             # Publica mensagem
             channel.basic_publish(
@@ -177,7 +170,7 @@ def main():
                 body=message_body,
                 properties=pika.BasicProperties(
                     delivery_mode=2,  # Persistente
-                    content_type='application/json',
+                    content_type=content_type,
                     content_encoding='utf-8',
                     message_id=message["_meta"]["message_id"],
                     correlation_id=message["_meta"]["correlation_id"],
@@ -185,7 +178,11 @@ def main():
                     headers=headers
                 )
             )
-              # Log detalhado
+            sent[0] = message_count
+            if intended_ns is not None:
+                return
+            
+            # Log detalhado
             lang_icons = {"python": "🐍", "nodejs": "🟢", "javascript": "🟡"}
             lang_icon = lang_icons.get(target_lang, "📝")
             
@@ -206,13 +203,25 @@ def main():
                   f"{lang_icon} {target_lang:6s} | "
                   f"{template['type']:20s} | "
                   f"{template['description']}")
+        
+        load = create_load_generator(publish_message, sleep=connection.sleep)
+        if load is not None:
+            # Carga em malha aberta: taxa e perfil de LOAD_RATE/LOAD_PROFILE, sem logs por mensagem
+            logger.info(f"Gerador de carga: {load.rate:.0f} msg/s, perfil {load.profile}")
+            stats = load.run()
+            logger.info(f"Carga concluída: {format_load_stats(stats)}")
+            return
+        
+        # Loop principal de envio
+        while True:
+            publish_message(sent[0] + 1)
             
             # Aguarda antes da próxima mensagem
             time.sleep(1.0)
             
     except KeyboardInterrupt:
-        logger.info(f"Interrompido pelo usuário. Total de mensagens enviadas: {message_count}")
-        print(f"\n✅ Finalizando producer. Total: {message_count} mensagens enviadas")
+        logger.info(f"Interrompido pelo usuário. Total de mensagens enviadas: {sent[0]}")
+        print(f"\n✅ Finalizando producer. Total: {sent[0]} mensagens enviadas")
         
     except Exception as e:
         logger.error(f"Erro no producer: {e}")
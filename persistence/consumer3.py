@@ -4,7 +4,6 @@ Demonstra monitoramento de ambos os tipos de mensagem (persistente e transiente)
 """
 import sys
 import os
-import json
 import time
 
 # Adiciona o diretório pai ao path para importar utils
@@ -12,9 +11,12 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 import pika
 from utils.common import (
-    setup_logging, get_rabbitmq_connection, 
+    setup_logging, get_rabbitmq_connection,
     log_message_received, print_scenario_header, print_config_info
 )
+from utils.histogram import LatencyHistogram
+from utils.multiplexer import QueueMultiplexer
+from utils.serialization import decode_message
 
 def main():
     # Configurações do cenário
@@ -24,6 +26,13 @@ def main():
     PERSISTENT_QUEUE = "persistent_messages_queue"
     TRANSIENT_QUEUE = "transient_messages_queue"
     
+    # Prefetch e peso por fila (peso = fração relativa do tempo de processamento)
+    PERSISTENT_PREFETCH = int(os.getenv('PERSISTENT_PREFETCH', '2'))
+    PERSISTENT_WEIGHT = float(os.getenv('PERSISTENT_WEIGHT', '1'))
+    TRANSIENT_PREFETCH = int(os.getenv('TRANSIENT_PREFETCH', '4'))
+    TRANSIENT_WEIGHT = float(os.getenv('TRANSIENT_WEIGHT', '1'))
+    LAG_INTERVAL = float(os.getenv('LAG_INTERVAL', '10'))
+    
     # Setup
     print_scenario_header(
         SCENARIO_NAME, 
@@ -36,120 +45,104 @@ def main():
     
     # Contadores
     stats = {
-        'persistent': {'count': 0, 'total_time': 0},
-        'transient': {'count': 0, 'total_time': 0}
+        'persistent': {'count': 0, 'times': LatencyHistogram()},
+        'transient': {'count': 0, 'times': LatencyHistogram()}
     }
     
-    def callback_persistent(ch, method, properties, body):
-        """Callback para mensagens persistentes"""
+    def handle_persistent(method, properties, body):
+        """Handler para mensagens persistentes (ACK/NACK pelo multiplexador)"""
         start_time = time.time()
-        try:
-            log_message_received(logger, method, properties, body, f"{CONSUMER_ID}_PERSISTENT")
-            
-            message_data = json.loads(body.decode('utf-8'))
-            message_id = message_data.get('message_id')
-            
-            stats['persistent']['count'] += 1
-            
-            logger.info(f"[{CONSUMER_ID}] 💾 PERSISTENTE #{message_id} - Monitorando...")
-            time.sleep(0.3)  # Simula monitoramento
-            
-            processing_time = time.time() - start_time
-            stats['persistent']['total_time'] += processing_time
-            avg_time = stats['persistent']['total_time'] / stats['persistent']['count']
-            
-            logger.info(f"[{CONSUMER_ID}] 📊 Stats PERSISTENTE: Count={stats['persistent']['count']}, "
-                       f"Avg Time={avg_time:.2f}s")
-            
-            ch.basic_ack(delivery_tag=method.delivery_tag)
-            
-        except Exception as e:
-            logger.error(f"[{CONSUMER_ID}] ❌ Erro monitoramento persistente: {str(e)}")
-            ch.basic_nack(delivery_tag=method.delivery_tag, requeue=True)
+        log_message_received(logger, method, properties, body, f"{CONSUMER_ID}_PERSISTENT")
+        
+        message_data = decode_message(body, properties)
+        message_id = message_data.get('message_id')
+        
+        stats['persistent']['count'] += 1
+        
+        logger.info(f"[{CONSUMER_ID}] 💾 PERSISTENTE #{message_id} - Monitorando...")
+        time.sleep(0.3)  # Simula monitoramento
+        
+        processing_time = time.time() - start_time
+        stats['persistent']['times'].record(processing_time)
+        avg_time = stats['persistent']['times'].mean()
+        
+        logger.info(f"[{CONSUMER_ID}] 📊 Stats PERSISTENTE: Count={stats['persistent']['count']}, "
+                   f"Avg Time={avg_time:.2f}s")
     
-    def callback_transient(ch, method, properties, body):
-        """Callback para mensagens transientes"""
+    def handle_transient(method, properties, body):
+        """Handler para mensagens transientes (ACK/NACK pelo multiplexador)"""
         start_time = time.time()
-        try:
-            log_message_received(logger, method, properties, body, f"{CONSUMER_ID}_TRANSIENT")
-            
-            message_data = json.loads(body.decode('utf-8'))
-            message_id = message_data.get('message_id')
-            
-            stats['transient']['count'] += 1
-            
-            logger.info(f"[{CONSUMER_ID}] ⚡ TRANSIENTE #{message_id} - Monitorando...")
-            time.sleep(0.1)  # Monitoramento mais rápido
-            
-            processing_time = time.time() - start_time
-            stats['transient']['total_time'] += processing_time
-            avg_time = stats['transient']['total_time'] / stats['transient']['count']
-            
-            logger.info(f"[{CONSUMER_ID}] 📊 Stats TRANSIENTE: Count={stats['transient']['count']}, "
-                       f"Avg Time={avg_time:.2f}s")
-            
-            ch.basic_ack(delivery_tag=method.delivery_tag)
-            
-        except Exception as e:
-            logger.error(f"[{CONSUMER_ID}] ❌ Erro monitoramento transiente: {str(e)}")
-            ch.basic_nack(delivery_tag=method.delivery_tag, requeue=False)
+        log_message_received(logger, method, properties, body, f"{CONSUMER_ID}_TRANSIENT")
+        
+        message_data = decode_message(body, properties)
+        message_id = message_data.get('message_id')
+        
+        stats['transient']['count'] += 1
+        
+        logger.info(f"[{CONSUMER_ID}] ⚡ TRANSIENTE #{message_id} - Monitorando...")
+        time.sleep(0.1)  # Monitoramento mais rápido
+        
+        processing_time = time.time() - start_time
+        stats['transient']['times'].record(processing_time)
+        avg_time = stats['transient']['times'].mean()
+        
+        logger.info(f"[{CONSUMER_ID}] 📊 Stats TRANSIENTE: Count={stats['transient']['count']}, "
+                   f"Avg Time={avg_time:.2f}s")
     
+    mux = None
     try:
-        # Conecta ao RabbitMQ
+        # Um canal para as duas filas: o multiplexador dá a cada fila seu
+        # próprio prefetch e reparte o tempo de processamento pelos pesos,
+        # para que uma rajada em uma fila não esgote a outra
         logger.info("Conectando ao RabbitMQ...")
         connection = get_rabbitmq_connection()
         channel = connection.channel()
         
-        # Configura QoS
-        channel.basic_qos(prefetch_count=2)
-        
         # Declara ambas as filas
         channel.queue_declare(queue=PERSISTENT_QUEUE, durable=True)
         channel.queue_declare(queue=TRANSIENT_QUEUE, durable=False)
         
         logger.info("Monitor configurado para ambas as filas:")
-        logger.info(f"  - {PERSISTENT_QUEUE} (persistente)")
-        logger.info(f"  - {TRANSIENT_QUEUE} (transiente)")
+        logger.info(f"  - {PERSISTENT_QUEUE} (persistente, prefetch {PERSISTENT_PREFETCH}, peso {PERSISTENT_WEIGHT})")
+        logger.info(f"  - {TRANSIENT_QUEUE} (transiente, prefetch {TRANSIENT_PREFETCH}, peso {TRANSIENT_WEIGHT})")
         logger.info("")
         
-        # Configura consumers para ambas as filas
-        channel.basic_consume(
-            queue=PERSISTENT_QUEUE,
-            on_message_callback=callback_persistent,
-            auto_ack=False
-        )
-        
-        channel.basic_consume(
-            queue=TRANSIENT_QUEUE,
-            on_message_callback=callback_transient,
-            auto_ack=False
-        )
+        mux = QueueMultiplexer(channel, logger=logger, lag_interval=LAG_INTERVAL)
+        mux.add_queue(PERSISTENT_QUEUE, handle_persistent,
+                      prefetch_count=PERSISTENT_PREFETCH, weight=PERSISTENT_WEIGHT)
+        mux.add_queue(TRANSIENT_QUEUE, handle_transient,
+                      prefetch_count=TRANSIENT_PREFETCH, weight=TRANSIENT_WEIGHT,
+                      requeue_on_error=False)
         
         logger.info(f"[{CONSUMER_ID}] 📊 Monitor ativo para ambos os tipos de mensagem...")
         logger.info("Para sair pressione Ctrl+C")
         
         # Inicia o consumo
-        channel.start_consuming()
+        mux.run()
         
     except KeyboardInterrupt:
         logger.info("Parando monitor...")
         logger.info("\n=== ESTATÍSTICAS FINAIS ===")
         logger.info(f"PERSISTENTES: {stats['persistent']['count']} mensagens")
         if stats['persistent']['count'] > 0:
-            avg_persistent = stats['persistent']['total_time'] / stats['persistent']['count']
-            logger.info(f"  Tempo médio: {avg_persistent:.2f}s")
+            times = stats['persistent']['times']
+            logger.info(f"  Tempo médio: {times.mean():.2f}s (p99 {times.percentile(99):.2f}s)")
         
         logger.info(f"TRANSIENTES: {stats['transient']['count']} mensagens")
         if stats['transient']['count'] > 0:
-            avg_transient = stats['transient']['total_time'] / stats['transient']['count']
-            logger.info(f"  Tempo médio: {avg_transient:.2f}s")
+            times = stats['transient']['times']
+            logger.info(f"  Tempo médio: {times.mean():.2f}s (p99 {times.percentile(99):.2f}s)")
         
-        if 'channel' in locals():
-            channel.stop_consuming()
+        if mux is not None:
+            logger.info("\n=== MULTIPLEXADOR ===")
+            for queue, queue_stats in mux.get_stats().items():
+                logger.info(f"{queue}: {queue_stats['processed']} ok, {queue_stats['failed']} erros, "
+                           f"{queue_stats['share']:.0%} do tempo (peso {queue_stats['weight']}), "
+                           f"espera p99 {queue_stats['wait_p99_ms']:.0f}ms")
     except Exception as e:
         logger.error(f"Erro no monitor: {str(e)}")
     finally:
-        if 'connection' in locals() and not connection.is_closed:
+        if 'connection' in locals() and connection.is_open:
             connection.close()
             logger.info("Conexão fechada")
 
@@ -15,8 +15,9 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 import pika
 from utils.common import (
     setup_logging, get_rabbitmq_connection, create_exchange_and_queue,
-    log_message_sent, print_scenario_header, print_config_info
+    ConfirmingPublisher, log_message_sent, print_scenario_header, print_config_info
 )
+from utils.serialization import compress_for_publish
 
 def main():
     # Configurações do cenário
@@ -65,6 +66,9 @@ def main():
         logger.info("TRANSIENTE: Perdida se RabbitMQ reiniciar")
         logger.info("Pressione Ctrl+C para parar")
         
+        # Publisher confirms em pipeline: até 50 mensagens aguardando ACK do broker
+        publisher = ConfirmingPublisher(channel, window_size=50, logger=logger)
+        
         message_id = 1
         
         while True:
@@ -108,11 +112,13 @@ def main():
                 }
             )
             
-            # Publica a mensagem
-            channel.basic_publish(
+            body, properties = compress_for_publish(message_body, properties)
+            
+            # Publica a mensagem (confirmação do broker chega de forma assíncrona)
+            publisher.publish(
                 exchange=EXCHANGE_NAME,
                 routing_key=queue_name,
-                body=message_body,
+                body=body,
                 properties=properties
             )
             
@@ -126,7 +132,8 @@ def main():
             
             logger.info("")
             message_id += 1
-            time.sleep(3)  # Pausa para observar diferenças
+            # Pausa para observar diferenças processando confirmações e heartbeats
+            connection.sleep(3)
             
     except KeyboardInterrupt:
         logger.info("Parando producer...")
@@ -138,6 +145,12 @@ def main():
     except Exception as e:
         logger.error(f"Erro no producer: {str(e)}")
     finally:
+        if 'publisher' in locals() and not connection.is_closed:
+            if not publisher.flush(timeout=5):
+                logger.warning(f"{publisher.outstanding} mensagens sem confirmação do broker")
+            latency = publisher.confirm_latency()
+            logger.info(f"Confirmações: {publisher.counters['confirmed']}/{publisher.counters['published']} | "
+                        f"Latência p50={latency['p50_ms']:.1f}ms p99={latency['p99_ms']:.1f}ms")
         if 'connection' in locals() and not connection.is_closed:
             connection.close()
             logger.info("Conexão fechada")
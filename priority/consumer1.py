@@ -5,7 +5,6 @@ Processa mensagens de alta prioridade primeiro
 import sys
 import os
 import time
-import json
 from datetime import datetime
 import random
 
@@ -17,6 +16,11 @@ from utils.common import (
     setup_logging, get_rabbitmq_connection,
     print_scenario_header, print_config_info
 )
+from utils.handlers import HandlerRegistry
+from utils.serialization import DECODE_ERRORS, decode_message
+
+# Handlers por tipo de mensagem (registrados com @HANDLERS.register)
+HANDLERS = HandlerRegistry("priority_consumer1")
 
 def main():
     # Configurações do cenário
@@ -71,7 +75,7 @@ def main():
         def callback(ch, method, properties, body):
             try:
                 # Deserializa mensagem
-                message = json.loads(body.decode('utf-8'))
+                message = decode_message(body, properties)
                 stats['processed'] += 1
                 
                 # Extrai informações
@@ -107,14 +111,7 @@ def main():
                 processing_time = get_processing_time(priority, severity)
                 
                 # Simula processamento específico por tipo
-                if msg_type == "CRITICAL_ALERT":
-                    process_critical_alert(message, logger)
-                elif msg_type == "SECURITY_BREACH":
-                    process_security_breach(message, logger)
-                elif msg_type == "ERROR_LOG":
-                    process_error_log(message, logger)
-                else:
-                    process_regular_message(message, logger)
+                HANDLERS.dispatch(msg_type, message, logger)
                 
                 # Simula tempo de processamento
                 time.sleep(processing_time)
@@ -135,8 +132,9 @@ def main():
                 if stats['processed'] % 10 == 0:
                     print_stats(stats, logger)
                 
-            except json.JSONDecodeError as e:
-                logger.error(f"Erro ao decodificar JSON: {e}")
+            except DECODE_ERRORS as e:
+                # Corpo que não decodifica nunca seria processado em uma nova tentativa
+                logger.error(f"Erro ao decodificar mensagem: {e}")
                 ch.basic_nack(delivery_tag=method.delivery_tag, requeue=False)
                 
             except Exception as e:
@@ -193,6 +191,7 @@ def get_processing_time(priority, severity):
     else:
         return round(random.uniform(1.0, 2.0), 1)  # Mais lento para info/debug
 
+@HANDLERS.register("CRITICAL_ALERT")
 def process_critical_alert(message, logger):
     """Processa alertas críticos"""
     alert_code = message.get('alert_code', 'UNKNOWN')
@@ -212,6 +211,7 @@ def process_critical_alert(message, logger):
     for action in actions:
         logger.info(f"Executando: {action}")
 
+@HANDLERS.register("SECURITY_BREACH")
 def process_security_breach(message, logger):
     """Processa violações de segurança"""
     source_ip = message.get('source_ip', 'unknown')
@@ -224,12 +224,14 @@ def process_security_breach(message, logger):
     logger.info(f"Registrando tentativa de {attack_type}")
     logger.info("Notificando equipe de segurança")
 
+@HANDLERS.register("ERROR_LOG")
 def process_error_log(message, logger):
     """Processa logs de erro"""
     server = message.get('server', 'unknown')
     logger.error(f"⚠️ ERRO em {server}: {message.get('description', '')}")
     logger.info("Registrando erro para análise posterior")
 
+@HANDLERS.default
 def process_regular_message(message, logger):
     """Processa mensagens regulares"""
     msg_type = message.get('type', 'unknown')
@@ -266,5 +268,13 @@ def print_final_stats(stats):
     print(f"     ℹ️ Info: {stats['info']} ({stats['info']/max(stats['processed'], 1)*100:.1f}%)")
     print(f"     🔍 Debug: {stats['debug']} ({stats['debug']/max(stats['processed'], 1)*100:.1f}%)")
 
+    handler_stats = HANDLERS.get_stats()
+    if handler_stats:
+        print("\n   🧩 Handlers por tipo:")
+        for msg_type, metrics in sorted(handler_stats.items()):
+            print(f"     {msg_type}: {metrics['calls']} chamadas | "
+                  f"{metrics['avg_ms']:.1f}ms médio | p95 {metrics['p95_ms']:.0f}ms | "
+                  f"erros: {metrics['errors']}")
+
 if __name__ == "__main__":
     main()
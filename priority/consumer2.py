@@ -5,7 +5,6 @@ Processa todas as mensagens mas foca em operações de médio prazo
 import sys
 import os
 import time
-import json
 from datetime import datetime
 import random
 
@@ -17,6 +16,12 @@ from utils.common import (
     setup_logging, get_rabbitmq_connection,
     print_scenario_header, print_config_info
 )
+from utils.handlers import HandlerRegistry
+from utils.histogram import LatencyHistogram
+from utils.serialization import DECODE_ERRORS, decode_message
+
+# Handlers por tipo de mensagem (registrados com @HANDLERS.register)
+HANDLERS = HandlerRegistry("priority_consumer2")
 
 def main():
     # Configurações do cenário
@@ -55,7 +60,7 @@ def main():
         stats = {
             'processed': 0,
             'by_priority': {i: 0 for i in range(11)},  # 0-10
-            'processing_times': [],
+            'processing_times': LatencyHistogram(),
             'start_time': datetime.now()
         }
         
@@ -68,7 +73,7 @@ def main():
         def callback(ch, method, properties, body):
             try:
                 # Deserializa mensagem
-                message = json.loads(body.decode('utf-8'))
+                message = decode_message(body, properties)
                 stats['processed'] += 1
                 
                 # Extrai informações
@@ -94,18 +99,7 @@ def main():
                 start_time = time.time()
                 
                 # Processamento baseado no tipo de mensagem
-                if msg_type == "CRITICAL_ALERT":
-                    process_critical_operations(message, logger)
-                elif msg_type == "SECURITY_BREACH":
-                    process_security_operations(message, logger)
-                elif msg_type == "ERROR_LOG":
-                    process_error_analysis(message, logger)
-                elif msg_type == "WARNING":
-                    process_warning_analysis(message, logger)
-                elif msg_type == "BATCH_PROCESS":
-                    process_batch_coordination(message, logger)
-                else:
-                    process_general_operations(message, logger)
+                HANDLERS.dispatch(msg_type, message, logger)
                 
                 # Tempo de processamento consistente mas eficiente
                 processing_time = get_balanced_processing_time(priority, msg_type)
@@ -113,7 +107,7 @@ def main():
                 
                 end_time = time.time()
                 actual_time = end_time - start_time
-                stats['processing_times'].append(actual_time)
+                stats['processing_times'].record(actual_time)
                 
                 # Log de conclusão
                 elapsed = datetime.now() - stats['start_time']
@@ -131,8 +125,9 @@ def main():
                 if stats['processed'] % 15 == 0:
                     print_stats(stats, logger)
                 
-            except json.JSONDecodeError as e:
-                logger.error(f"Erro ao decodificar JSON: {e}")
+            except DECODE_ERRORS as e:
+                # Corpo que não decodifica nunca seria processado em uma nova tentativa
+                logger.error(f"Erro ao decodificar mensagem: {e}")
                 ch.basic_nack(delivery_tag=method.delivery_tag, requeue=False)
                 
             except Exception as e:
@@ -204,6 +199,7 @@ def get_balanced_processing_time(priority, msg_type):
     
     return round(final_time * variation, 1)
 
+@HANDLERS.register("CRITICAL_ALERT")
 def process_critical_operations(message, logger):
     """Processa operações críticas"""
     alert_code = message.get('alert_code', 'UNKNOWN')
@@ -214,6 +210,7 @@ def process_critical_operations(message, logger):
     logger.info("Preparando relatório de incidente")
     logger.info("Atualizando dashboard de status")
 
+@HANDLERS.register("SECURITY_BREACH")
 def process_security_operations(message, logger):
     """Processa operações de segurança"""
     source_ip = message.get('source_ip', 'unknown')
@@ -226,6 +223,7 @@ def process_security_operations(message, logger):
     logger.info("Atualizando regras de firewall")
     logger.info("Gerando relatório de segurança")
 
+@HANDLERS.register("ERROR_LOG")
 def process_error_analysis(message, logger):
     """Processa análise de erros"""
     server = message.get('server', 'unknown')
@@ -236,6 +234,7 @@ def process_error_analysis(message, logger):
     logger.info("Verificando recursos do sistema")
     logger.info("Atualizando métricas de erro")
 
+@HANDLERS.register("WARNING")
 def process_warning_analysis(message, logger):
     """Processa análise de warnings"""
     logger.info(f"🟡 Análise de warning: {message.get('description', '')}")
@@ -244,6 +243,7 @@ def process_warning_analysis(message, logger):
     logger.info("Verificando tendências")
     logger.info("Atualizando alertas preventivos")
 
+@HANDLERS.register("BATCH_PROCESS")
 def process_batch_coordination(message, logger):
     """Processa coordenação de lotes"""
     records_count = message.get('records_count', 0)
@@ -256,6 +256,7 @@ def process_batch_coordination(message, logger):
     logger.info("Reservando recursos computacionais")
     logger.info("Configurando pipeline de processamento")
 
+@HANDLERS.default
 def process_general_operations(message, logger):
     """Processa operações gerais"""
     msg_type = message.get('type', 'unknown')
@@ -267,7 +268,7 @@ def print_stats(stats, logger):
     elapsed = datetime.now() - stats['start_time']
     rate = stats['processed'] / elapsed.total_seconds() if elapsed.total_seconds() > 0 else 0
     
-    avg_time = sum(stats['processing_times']) / len(stats['processing_times']) if stats['processing_times'] else 0
+    avg_time = stats['processing_times'].mean()
     
     print(f"\n📊 ESTATÍSTICAS CONSUMER2:")
     print(f"   Total processadas: {stats['processed']}")
@@ -289,9 +290,10 @@ def print_final_stats(stats):
     elapsed = datetime.now() - stats['start_time']
     rate = stats['processed'] / elapsed.total_seconds() if elapsed.total_seconds() > 0 else 0
     
-    avg_time = sum(stats['processing_times']) / len(stats['processing_times']) if stats['processing_times'] else 0
-    min_time = min(stats['processing_times']) if stats['processing_times'] else 0
-    max_time = max(stats['processing_times']) if stats['processing_times'] else 0
+    times = stats['processing_times'].summary()
+    avg_time = times['mean_ms'] / 1000
+    min_time = times['min_ms'] / 1000
+    max_time = times['max_ms'] / 1000
     
     print(f"\n📈 ESTATÍSTICAS FINAIS - CONSUMER2:")
     print(f"   Total processadas: {stats['processed']}")
@@ -301,6 +303,7 @@ def print_final_stats(stats):
     print(f"     Médio: {avg_time:.2f}s")
     print(f"     Mínimo: {min_time:.2f}s")
     print(f"     Máximo: {max_time:.2f}s")
+    print(f"     p95/p99: {times['p95_ms'] / 1000:.2f}s / {times['p99_ms'] / 1000:.2f}s")
     print(f"\n   🎯 Eficiência por prioridade:")
     
     # Mostra distribuição detalhada
@@ -313,5 +316,13 @@ def print_final_stats(stats):
         print(f"     🟡 Média (3-6): {total_medium_priority} ({total_medium_priority/stats['processed']*100:.1f}%)")
         print(f"     🔍 Baixa (0-2): {total_low_priority} ({total_low_priority/stats['processed']*100:.1f}%)")
 
+    handler_stats = HANDLERS.get_stats()
+    if handler_stats:
+        print("\n   🧩 Handlers por tipo:")
+        for msg_type, metrics in sorted(handler_stats.items()):
+            print(f"     {msg_type}: {metrics['calls']} chamadas | "
+                  f"{metrics['avg_ms']:.1f}ms médio | p95 {metrics['p95_ms']:.0f}ms | "
+                  f"erros: {metrics['errors']}")
+
 if __name__ == "__main__":
     main()
@@ -5,7 +5,7 @@ Foca em processamento de baixa prioridade e tarefas de longo prazo
 import sys
 import os
 import time
-import json
+import logging
 from datetime import datetime
 import random
 
@@ -17,12 +17,29 @@ from utils.common import (
     setup_logging, get_rabbitmq_connection,
     print_scenario_header, print_config_info
 )
+from utils.handlers import HandlerRegistry
+from utils.histogram import LatencyHistogram
+from utils.scheduler import create_scheduler
+from utils.serialization import DECODE_ERRORS, decode_message
+from utils.workers import consume_batches, consume_in_processes
+
+# Nome do logger criado por setup_logging (usado também nos processos do pool)
+LOGGER_NAME = "priority_consumer3"
+
+# Handlers especializados por tipo de mensagem
+HANDLERS = HandlerRegistry("priority_consumer3")
 
 def main():
     # Configurações do cenário
     SCENARIO_NAME = "priority"
     COMPONENT_NAME = "consumer3"
     QUEUE_NAME = "priority_queue"
+    # inline (padrão, em lotes) ou process: handlers em um ProcessPoolExecutor
+    EXECUTION_MODE = os.getenv('CONSUMER_EXECUTION_MODE', 'inline')
+    BATCH_SIZE = 5  # Mensagens por lote (também é o prefetch)
+    BATCH_WAIT_MS = 500  # Espera máxima para completar um lote
+    # Ordem de processamento do buffer (SCHEDULER_POLICY: priority, sjf, edf, fifo)
+    scheduler = create_scheduler('priority')
     
     # Setup
     print_scenario_header(
@@ -48,9 +65,6 @@ def main():
             arguments={'x-max-priority': 10}
         )
         
-        # Configurações do consumer
-        channel.basic_qos(prefetch_count=3)  # Processa até 3 mensagens simultaneamente
-        
         # Estatísticas avançadas
         stats = {
             'processed': 0,
@@ -59,7 +73,7 @@ def main():
             'quick_jobs': 0,
             'total_processing_time': 0,
             'start_time': datetime.now(),
-            'priority_wait_times': {}  # Rastrea tempo de espera por prioridade
+            'priority_wait_times': {}  # Histograma do tempo de espera por prioridade
         }
         
         logger.info("Iniciando consumer de tarefas em lote...")
@@ -68,106 +82,133 @@ def main():
         print(f"📦 Especialidade: Processamento em lote e tarefas longas")
         print(f"🔄 Pressione Ctrl+C para parar\n")
         
-        def callback(ch, method, properties, body):
-            try:
-                # Deserializa mensagem
-                message = json.loads(body.decode('utf-8'))
-                stats['processed'] += 1
-                
-                # Extrai informações
-                msg_id = message.get('id', 'unknown')
-                msg_type = message.get('type', 'unknown')
-                priority = message.get('priority', 0)
-                description = message.get('description', '')
-                severity = message.get('severity', 'UNKNOWN')
-                timestamp = message.get('timestamp', '')
-                
-                # Calcula tempo de espera na fila
-                if timestamp:
-                    try:
-                        msg_time = datetime.fromisoformat(timestamp.replace('Z', '+00:00').replace('+00:00', ''))
-                        wait_time = (datetime.now() - msg_time).total_seconds()
-                        if priority not in stats['priority_wait_times']:
-                            stats['priority_wait_times'][priority] = []
-                        stats['priority_wait_times'][priority].append(wait_time)
-                    except:
-                        wait_time = 0
-                else:
+        def on_received(message):
+            """Atualiza estatísticas de recebimento e tempo de espera na fila"""
+            stats['processed'] += 1
+            
+            # Extrai informações
+            msg_id = message.get('id', 'unknown')
+            priority = message.get('priority', 0)
+            severity = message.get('severity', 'UNKNOWN')
+            timestamp = message.get('timestamp', '')
+            
+            # Calcula tempo de espera na fila
+            if timestamp:
+                try:
+                    msg_time = datetime.fromisoformat(timestamp.replace('Z', '+00:00').replace('+00:00', ''))
+                    wait_time = (datetime.now() - msg_time).total_seconds()
+                    if priority not in stats['priority_wait_times']:
+                        stats['priority_wait_times'][priority] = LatencyHistogram()
+                    stats['priority_wait_times'][priority].record(wait_time)
+                except:
                     wait_time = 0
-                
-                # Atualiza estatísticas por severidade
-                if severity in stats['by_severity']:
-                    stats['by_severity'][severity] += 1
-                
-                # Ícone baseado na prioridade
-                priority_icon = get_priority_icon(priority)
-                
-                # Log de recebimento com tempo de espera
-                print(f"📥 MSG #{msg_id:03d} | "
-                      f"{priority_icon} P{priority} | "
-                      f"{severity:8s} | "
-                      f"Wait: {wait_time:.1f}s | "
-                      f"Processing...")
-                
-                start_time = time.time()
-                
-                # Processamento especializado
-                if msg_type == "BATCH_PROCESS":
-                    process_batch_job(message, logger)
-                    stats['batch_jobs'] += 1
-                elif msg_type == "DEBUG_LOG":
-                    process_debug_analysis(message, logger)
-                elif msg_type == "INFO_LOG":
-                    process_info_aggregation(message, logger)
-                elif priority <= 3:  # Baixa prioridade
-                    process_low_priority_task(message, logger)
-                else:
-                    process_opportunistic_task(message, logger)
-                    stats['quick_jobs'] += 1
-                
-                # Tempo de processamento otimizado para eficiência
-                processing_time = get_efficient_processing_time(priority, msg_type)
-                time.sleep(processing_time)
-                
-                end_time = time.time()
-                actual_time = end_time - start_time
-                stats['total_processing_time'] += actual_time
-                
-                # Log de conclusão
-                elapsed = datetime.now() - stats['start_time']
-                uptime = str(elapsed).split('.')[0]
-                
-                efficiency = "🔋" if actual_time <= 1.0 else "⚡" if actual_time <= 2.0 else "🕐"
-                
-                print(f"✅ MSG #{msg_id:03d} | "
-                      f"{efficiency} {actual_time:.1f}s | "
-                      f"Total: {stats['processed']} | "
-                      f"Uptime: {uptime}")
-                
-                # Confirma processamento
-                ch.basic_ack(delivery_tag=method.delivery_tag)
-                
-                # Log estatísticas a cada 20 mensagens
-                if stats['processed'] % 20 == 0:
-                    print_stats(stats, logger)
-                
-            except json.JSONDecodeError as e:
-                logger.error(f"Erro ao decodificar JSON: {e}")
-                ch.basic_nack(delivery_tag=method.delivery_tag, requeue=False)
-                
-            except Exception as e:
-                logger.error(f"Erro no processamento: {e}")
-                ch.basic_nack(delivery_tag=method.delivery_tag, requeue=True)
+            else:
+                wait_time = 0
+            
+            # Atualiza estatísticas por severidade
+            if severity in stats['by_severity']:
+                stats['by_severity'][severity] += 1
+            
+            # Ícone baseado na prioridade
+            priority_icon = get_priority_icon(priority)
+            
+            # Log de recebimento com tempo de espera
+            print(f"📥 MSG #{msg_id:03d} | "
+                  f"{priority_icon} P{priority} | "
+                  f"{severity:8s} | "
+                  f"Wait: {wait_time:.1f}s | "
+                  f"Processing...")
         
-        # Configura consumer
-        channel.basic_consume(
-            queue=QUEUE_NAME,
-            on_message_callback=callback,
-            auto_ack=False
-        )
+        def on_completed(message, result):
+            """Registra a conclusão do processamento"""
+            actual_time, job_kind, _ = result
+            if job_kind == 'batch':
+                stats['batch_jobs'] += 1
+            elif job_kind == 'quick':
+                stats['quick_jobs'] += 1
+            stats['total_processing_time'] += actual_time
+            
+            # Log de conclusão
+            elapsed = datetime.now() - stats['start_time']
+            uptime = str(elapsed).split('.')[0]
+            
+            efficiency = "🔋" if actual_time <= 1.0 else "⚡" if actual_time <= 2.0 else "🕐"
+            
+            print(f"✅ MSG #{message.get('id', 'unknown'):03d} | "
+                  f"{efficiency} {actual_time:.1f}s | "
+                  f"Total: {stats['processed']} | "
+                  f"Uptime: {uptime}")
+            
+            # Log estatísticas a cada 20 mensagens
+            if stats['processed'] % 20 == 0:
+                print_stats(stats, logger)
         
-        logger.info("Aguardando mensagens. Para sair, pressione CTRL+C")
-        channel.start_consuming()
+        def handle_batch(batch):
+            """
+            Processa um lote de mensagens (confirmado com um único ACK)
+            
+            Returns:
+                Delivery tags das mensagens que não decodificam, rejeitadas
+                sem requeue (vão para o dead-letter)
+            """
+            messages = []
+            undecodable = []
+            # Urgentes primeiro dentro do lote (o ACK múltiplo não depende da ordem)
+            if scheduler is not None:
+                batch = scheduler.order(batch)
+            for method, properties, body in batch:
+                try:
+                    messages.append(decode_message(body, properties))
+                except DECODE_ERRORS as e:
+                    # Nunca seria decodificada em uma nova tentativa
+                    logger.error(f"Erro ao decodificar mensagem (tag {method.delivery_tag}): {e}")
+                    undecodable.append(method.delivery_tag)
+            
+            print(f"📦 LOTE: {len(messages)} mensagens")
+            
+            # Estatísticas só são atualizadas se o lote inteiro for processado,
+            # pois um lote com erro é dividido e reprocessado
+            results = [(message, process_priority_task(message)) for message in messages]
+            for message, result in results:
+                on_received(message)
+                on_completed(message, result)
+            return undecodable
+        
+        def on_process_result(message, result, method, properties, inline):
+            # O despacho rodou em outro processo: replica a métrica do handler
+            # (corpos grandes rodam aqui e o dispatch já registrou)
+            if not inline:
+                HANDLERS.record(message.get('type', 'unknown'), result[2])
+            on_received(message)
+            on_completed(message, result)
+        
+        if EXECUTION_MODE == 'process':
+            # Pool de processos: os handlers de lote rodam em paralelo em todos
+            # os núcleos e as mensagens são confirmadas na ordem de entrega
+            logger.info("Modo de execução: pool de processos. Para sair, pressione CTRL+C")
+            consume_in_processes(
+                channel,
+                QUEUE_NAME,
+                process_priority_task,
+                on_result=on_process_result,
+                logger=logger,
+                scheduler=scheduler
+            )
+            print_final_stats(stats)
+            return
+        
+        # Consumo em lotes: até BATCH_SIZE mensagens (ou o que chegar em
+        # BATCH_WAIT_MS) confirmadas com um único ACK múltiplo
+        logger.info(f"Aguardando lotes de até {BATCH_SIZE} mensagens. Para sair, pressione CTRL+C")
+        consume_batches(
+            channel,
+            QUEUE_NAME,
+            handle_batch,
+            batch_size=BATCH_SIZE,
+            max_wait_ms=BATCH_WAIT_MS,
+            requeue_on_error=True,
+            logger=logger
+        )
         
     except KeyboardInterrupt:
         logger.info("Interrompido pelo usuário")
@@ -185,6 +226,45 @@ def main():
             connection.close()
             logger.info("Conexão fechada")
 
+def process_priority_task(message):
+    """
+    Executa o processamento especializado de uma mensagem
+    
+    Função de nível de módulo para poder rodar em um processo do pool.
+    
+    Returns:
+        Tupla (tempo de processamento em segundos, 'batch' | 'quick' | None,
+        tempo do handler em segundos)
+    """
+    logger = logging.getLogger(LOGGER_NAME)
+    msg_type = message.get('type', 'unknown')
+    priority = message.get('priority', 0)
+    job_kind = None
+    
+    start_time = time.time()
+    
+    # Processamento especializado
+    if msg_type == "BATCH_PROCESS":
+        job_kind = 'batch'
+    elif msg_type not in HANDLERS and priority > 3:
+        job_kind = 'quick'
+    HANDLERS.dispatch(msg_type, message, logger)
+    handler_time = time.time() - start_time
+    
+    # Tempo de processamento otimizado para eficiência
+    processing_time = get_efficient_processing_time(priority, msg_type)
+    time.sleep(processing_time)
+    
+    return time.time() - start_time, job_kind, handler_time
+
+@HANDLERS.default
+def process_general_task(message, logger):
+    """Tipos sem handler específico: baixa prioridade ou oportunístico"""
+    if message.get('priority', 0) <= 3:  # Baixa prioridade
+        process_low_priority_task(message, logger)
+    else:
+        process_opportunistic_task(message, logger)
+
 def get_priority_icon(priority):
     """Retorna ícone baseado na prioridade"""
     if priority >= 9:
@@ -218,6 +298,7 @@ def get_efficient_processing_time(priority, msg_type):
     
     return round(base_time * variation, 1)
 
+@HANDLERS.register("BATCH_PROCESS")
 def process_batch_job(message, logger):
     """Processa trabalhos em lote"""
     records_count = message.get('records_count', 0)
@@ -241,6 +322,7 @@ def process_batch_job(message, logger):
     for i, step in enumerate(steps, 1):
         logger.info(f"[{i}/{len(steps)}] {step}")
 
+@HANDLERS.register("DEBUG_LOG")
 def process_debug_analysis(message, logger):
     """Processa análise de debug"""
     logger.debug(f"🔍 ANÁLISE DE DEBUG: {message.get('description', '')}")
@@ -251,6 +333,7 @@ def process_debug_analysis(message, logger):
     logger.debug("Verificando estado das variáveis")
     logger.debug("Gerando relatório de debug")
 
+@HANDLERS.register("INFO_LOG")
 def process_info_aggregation(message, logger):
     """Processa agregação de informações"""
     logger.info(f"ℹ️ AGREGAÇÃO DE INFO: {message.get('description', '')}")
@@ -288,7 +371,7 @@ def print_stats(stats, logger):
     avg_wait_times = {}
     for priority, times in stats['priority_wait_times'].items():
         if times:
-            avg_wait_times[priority] = sum(times) / len(times)
+            avg_wait_times[priority] = times.mean()
     
     print(f"\n📊 ESTATÍSTICAS CONSUMER3:")
     print(f"   Total processadas: {stats['processed']}")
@@ -332,17 +415,24 @@ def print_final_stats(stats):
     # Análise de eficiência da priorização
     if stats['priority_wait_times']:
         print(f"\n   ⏳ Eficiência da priorização:")
-        all_wait_times = []
-        for priority, times in stats['priority_wait_times'].items():
+        for priority, times in sorted(stats['priority_wait_times'].items(), reverse=True):
             if times:
-                avg_wait = sum(times) / len(times)
-                all_wait_times.extend(times)
                 icon = get_priority_icon(priority)
-                print(f"     {icon} P{priority}: {avg_wait:.1f}s médio ({len(times)} msgs)")
+                print(f"     {icon} P{priority}: {times.mean():.1f}s médio, "
+                      f"p95 {times.percentile(95):.1f}s ({len(times)} msgs)")
         
+        all_wait_times = LatencyHistogram.merged(stats['priority_wait_times'].values())
         if all_wait_times:
-            overall_avg = sum(all_wait_times) / len(all_wait_times)
-            print(f"     📊 Tempo médio geral: {overall_avg:.1f}s")
+            print(f"     📊 Tempo médio geral: {all_wait_times.mean():.1f}s "
+                  f"(p99 {all_wait_times.percentile(99):.1f}s)")
+
+    handler_stats = HANDLERS.get_stats()
+    if handler_stats:
+        print("\n   🧩 Handlers por tipo:")
+        for msg_type, metrics in sorted(handler_stats.items()):
+            print(f"     {msg_type}: {metrics['calls']} chamadas | "
+                  f"{metrics['avg_ms']:.1f}ms médio | p95 {metrics['p95_ms']:.0f}ms | "
+                  f"erros: {metrics['errors']}")
 
 if __name__ == "__main__":
     main()
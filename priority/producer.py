@@ -5,7 +5,6 @@ Demonstra filas com prioridade onde mensagens importantes são processadas prime
 import sys
 import os
 import time
-import json
 from datetime import datetime
 import random
 
@@ -17,6 +16,9 @@ from utils.common import (
     setup_logging, get_rabbitmq_connection, create_exchange_and_queue,
     log_message_sent, print_scenario_header, print_config_info
 )
+from utils.batching import create_batching_publisher
+from utils.loadgen import INTENDED_HEADER, create_load_generator, format_load_stats
+from utils.serialization import encode_message
 
 def main():
     # Configurações do cenário
@@ -66,14 +68,20 @@ def main():
         print(f"⏰ Intervalo: 0.5s entre mensagens")
         print(f"🔄 Pressione Ctrl+C para parar\n")
         
-        message_count = 0
+        # Lotes por routing key com linger (PUBLISH_BATCH_SIZE, PUBLISH_LINGER_MS, PUBLISH_CONFIRM)
+        publisher = create_batching_publisher(channel, logger=logger)
+        sent = [0]
         
-        # Loop principal de envio
-        while True:
+        def publish_message(message_count, intended_ns=None):
+            """
+            Monta e publica a mensagem message_count
+            
+            Com intended_ns (gerador de carga) grava o instante pretendido no
+            header e não registra a mensagem no log
+            """
             # Escolhe tipo de mensagem aleatoriamente
             msg_type = random.choice(message_types)
             
-            message_count += 1
             timestamp = datetime.now().isoformat()
             
             # Cria payload da mensagem
@@ -98,27 +106,39 @@ def main():
                 message["records_count"] = random.randint(1000, 50000)
                 message["estimated_time"] = f"{random.randint(5, 120)} minutes"
             
-            # Serializa mensagem
-            message_body = json.dumps(message, indent=2)
+            # Serializa mensagem (JSON compacto)
+            message_body, content_type = encode_message(message)
+            
+            headers = {
+                'message_type': msg_type["type"],
+                'severity': get_severity_level(msg_type["priority"]),
+                'component': 'priority_producer'
+            }
+            if "estimated_time" in message:
+                # Estimativa para o escalonador sjf sem decodificar o corpo
+                headers['estimated_time'] = message["estimated_time"]
+            if intended_ns is not None:
+                headers[INTENDED_HEADER] = intended_ns
             
             # Publica mensagem com prioridade
-            channel.basic_publish(
+            publisher.publish(
                 exchange=EXCHANGE_NAME,
                 routing_key=QUEUE_NAME,
                 body=message_body,
                 properties=pika.BasicProperties(
                     priority=msg_type["priority"],  # Define prioridade da mensagem
                     delivery_mode=2,  # Mensagem persistente
+                    content_type=content_type,
                     message_id=str(message_count),
                     timestamp=int(time.time()),
-                    headers={
-                        'message_type': msg_type["type"],
-                        'severity': get_severity_level(msg_type["priority"]),
-                        'component': 'priority_producer'
-                    }
+                    headers=headers
                 )
             )
-              # Log detalhado
+            sent[0] = message_count
+            if intended_ns is not None:
+                return
+            
+            # Log detalhado
             priority_icon = get_priority_icon(msg_type["priority"])
             severity = get_severity_level(msg_type["priority"])
 
@@ -139,19 +159,35 @@ def main():
                   f"{severity:8s} | "
                   f"{msg_type['type']:15s} | "
                   f"{msg_type['description']}")
+        
+        load = create_load_generator(publish_message, sleep=connection.sleep)
+        if load is not None:
+            # Carga em malha aberta (LOAD_RATE/LOAD_PROFILE), sem logs por mensagem
+            logger.info(f"Gerador de carga: {load.rate:.0f} msg/s, perfil {load.profile}")
+            stats = load.run()
+            publisher.close()
+            logger.info(f"Carga concluída: {format_load_stats(stats)}")
+            logger.info(f"Lotes: {publisher.get_stats()}")
+            return
+        
+        # Loop principal de envio
+        while True:
+            publish_message(sent[0] + 1)
             
-            # Aguarda antes da próxima mensagem
-            time.sleep(0.5)
+            # Aguarda antes da próxima mensagem (connection.sleep dispara o linger dos lotes)
+            connection.sleep(0.5)
             
     except KeyboardInterrupt:
-        logger.info(f"Interrompido pelo usuário. Total de mensagens enviadas: {message_count}")
-        print(f"\n✅ Finalizando producer. Total: {message_count} mensagens enviadas")
+        logger.info(f"Interrompido pelo usuário. Total de mensagens enviadas: {sent[0]}")
+        print(f"\n✅ Finalizando producer. Total: {sent[0]} mensagens enviadas")
         
     except Exception as e:
         logger.error(f"Erro no producer: {e}")
         print(f"❌ Erro: {e}")
         
     finally:
+        if 'publisher' in locals() and connection.is_open:
+            publisher.close()
         if 'connection' in locals() and connection.is_open:
             connection.close()
             logger.info("Conexão fechada")
@@ -4,7 +4,6 @@ Worker que processa tarefas da fila compartilhada
 """
 import sys
 import os
-import json
 import time
 
 # Adiciona o diretório pai ao path para importar utils
@@ -12,9 +11,10 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 import pika
 from utils.common import (
-    setup_logging, get_rabbitmq_connection, 
+    setup_logging, RecoveringConnection,
     log_message_received, print_scenario_header, print_config_info
 )
+from utils.serialization import decode_message
 
 def main():
     # Configurações do cenário
@@ -44,7 +44,7 @@ def main():
             log_message_received(logger, method, properties, body, CONSUMER_ID)
             
             # Processa a tarefa
-            task_data = json.loads(body.decode('utf-8'))
+            task_data = decode_message(body, properties)
             tasks_processed += 1
             
             task_id = task_data.get('task_id')
@@ -76,44 +76,40 @@ def main():
             ch.basic_nack(delivery_tag=method.delivery_tag, requeue=True)
     
     try:
-        # Conecta ao RabbitMQ
+        # Conecta ao RabbitMQ com recuperação automática: fila e consumer
+        # são restaurados (com backoff) se o broker ou a rede caírem
         logger.info("Conectando ao RabbitMQ...")
-        connection = get_rabbitmq_connection()
-        channel = connection.channel()
-        
-        # Configura QoS - processa uma tarefa por vez (fair dispatch)
-        channel.basic_qos(prefetch_count=1)
-        logger.info("QoS configurado: prefetch_count=1 (uma tarefa por vez)")
-        
-        # Declara a fila (idempotente)
-        channel.queue_declare(
-            queue=QUEUE_NAME,
-            durable=True
-        )
+        connection = RecoveringConnection(scenarios=[SCENARIO_NAME], logger=logger)
+        connection.connect()
         
         logger.info(f"Fila '{QUEUE_NAME}' declarada")
         logger.info("Configuração Round Robin: Cada worker pega uma tarefa por vez")
         
-        # Configura o consumer
-        channel.basic_consume(
+        # Configura o consumer - QoS: processa uma tarefa por vez (fair dispatch)
+        connection.consume(
             queue=QUEUE_NAME,
             on_message_callback=callback,
+            prefetch_count=1,
             auto_ack=False  # Confirmação manual para garantir processamento
         )
+        logger.info("QoS configurado: prefetch_count=1 (uma tarefa por vez)")
         
         logger.info(f"[{CONSUMER_ID}] 👷 Worker ativo e aguardando tarefas...")
         logger.info("Para sair pressione Ctrl+C")
         
         # Inicia o consumo
-        channel.start_consuming()
+        connection.start_consuming()
         
     except KeyboardInterrupt:
         logger.info(f"Parando worker... Total processado: {tasks_processed} tarefas")
-        if 'channel' in locals():
-            channel.stop_consuming()
+        if 'connection' in locals():
+            connection.stop_consuming()
     except Exception as e:
         logger.error(f"Erro no worker: {str(e)}")
     finally:
+        if 'connection' in locals() and connection.metrics['recoveries']:
+            logger.info(f"Recuperações: {connection.metrics['recoveries']} | "
+                        f"Pior tempo: {connection.metrics['max_recovery_s']:.2f}s")
         if 'connection' in locals() and not connection.is_closed:
             connection.close()
             logger.info("Conexão fechada")
@@ -16,6 +16,7 @@ from utils.common import (
     setup_logging, get_rabbitmq_connection, create_exchange_and_queue,
     log_message_sent, print_scenario_header, print_config_info
 )
+from utils.serialization import compress_for_publish
 
 def main():
     # Configurações do cenário
@@ -93,11 +94,13 @@ def main():
                 }
             )
             
+            body, properties = compress_for_publish(message_body, properties)
+            
             # Publica na fila (usando exchange padrão)
             channel.basic_publish(
                 exchange=EXCHANGE_NAME,  # Exchange padrão
                 routing_key=QUEUE_NAME,  # Nome da fila como routing key
-                body=message_body,
+                body=body,
                 properties=properties
             )
             
@@ -4,7 +4,6 @@ Worker médio com capacidade moderada (prefetch=3)
 """
 import sys
 import os
-import json
 import time
 import threading
 
@@ -16,6 +15,8 @@ from utils.common import (
     setup_logging, get_rabbitmq_connection, 
     log_message_received, print_scenario_header, print_config_info
 )
+from utils.serialization import decode_message
+from utils.workers import PrefetchController, consume_threaded
 
 def main():
     # Configurações do cenário
@@ -24,6 +25,8 @@ def main():
     CONSUMER_ID = "MEDIUM_WORKER"
     QUEUE_NAME = "weighted_round_robin_queue"
     PREFETCH_COUNT = 3  # Capacidade moderada - 3 tarefas simultâneas
+    # Ajusta o prefetch em tempo de execução pela velocidade medida do worker
+    ADAPTIVE_PREFETCH = os.getenv('ADAPTIVE_PREFETCH', '1') == '1'
     
     # Setup
     print_scenario_header(
@@ -40,8 +43,8 @@ def main():
     tasks_in_progress = 0
     lock = threading.Lock()
     
-    def callback(ch, method, properties, body):
-        """Callback para processar tarefas recebidas"""
+    def handle_task(method, properties, body):
+        """Processa uma tarefa em uma thread do pool (ACK/NACK feitos pelo runtime)"""
         nonlocal tasks_processed, tasks_in_progress
         
         with lock:
@@ -53,7 +56,7 @@ def main():
             log_message_received(logger, method, properties, body, CONSUMER_ID)
             
             # Processa a tarefa
-            task_data = json.loads(body.decode('utf-8'))
+            task_data = decode_message(body, properties)
             
             task_id = task_data.get('task_id')
             task_type = task_data.get('task_type')
@@ -85,16 +88,14 @@ def main():
             logger.info(f"[{CONSUMER_ID}] ✅ Tarefa #{task_id} concluída com otimização!")
             logger.info(f"[{CONSUMER_ID}] Total processado: {total_processed} tarefas")
             
-            # Confirma o processamento
-            ch.basic_ack(delivery_tag=method.delivery_tag)
-            logger.info(f"[{CONSUMER_ID}] 📝 Tarefa confirmada e removida da fila")
+            logger.info(f"[{CONSUMER_ID}] 📝 Tarefa pronta para confirmação")
             
         except Exception as e:
             logger.error(f"[{CONSUMER_ID}] ❌ Erro ao processar tarefa: {str(e)}")
             with lock:
                 tasks_in_progress -= 1
-            # Rejeita a tarefa e recoloca na fila para outro worker
-            ch.basic_nack(delivery_tag=method.delivery_tag, requeue=True)
+            # Propaga para o runtime rejeitar a tarefa e recolocá-la na fila
+            raise
     
     try:
         # Conecta ao RabbitMQ
@@ -102,8 +103,7 @@ def main():
         connection = get_rabbitmq_connection()
         channel = connection.channel()
         
-        # Configura QoS - worker médio com capacidade moderada
-        channel.basic_qos(prefetch_count=PREFETCH_COUNT)
+        # QoS - worker médio com capacidade moderada (aplicado por consume_threaded)
         logger.info(f"QoS configurado: prefetch_count={PREFETCH_COUNT} (worker MÉDIO)")
         
         # Declara a fila (idempotente)
@@ -116,21 +116,32 @@ def main():
         logger.info(f"Worker Médio: Processa até {PREFETCH_COUNT} tarefas simultaneamente")
         logger.info("Características: Otimizado, velocidade +15%, capacidade moderada")
         
-        # Configura o consumer
-        channel.basic_consume(
-            queue=QUEUE_NAME,
-            on_message_callback=callback,
-            auto_ack=False  # Confirmação manual
-        )
-        
         logger.info(f"[{CONSUMER_ID}] 👷 Worker MÉDIO ativo e aguardando tarefas...")
         logger.info("Para sair pressione Ctrl+C")
         
-        # Inicia o consumo
-        channel.start_consuming()
+        # Prefetch adaptativo: PREFETCH_COUNT passa a ser a concorrência do
+        # worker e a janela do basic_qos segue o tempo de serviço medido
+        controller = None
+        if ADAPTIVE_PREFETCH:
+            controller = PrefetchController(channel, concurrency=PREFETCH_COUNT, logger=logger)
+            logger.info("Prefetch adaptativo ativo (ADAPTIVE_PREFETCH=0 para desativar)")
+        
+        # Pool de threads do tamanho do prefetch: a thread principal fica no
+        # loop de I/O (heartbeats e ACKs) enquanto as tarefas rodam em paralelo
+        consume_threaded(
+            channel,
+            QUEUE_NAME,
+            handle_task,
+            prefetch_count=PREFETCH_COUNT,
+            requeue_on_error=True,  # Tarefas com erro voltam para outro worker
+            logger=logger,
+            prefetch_controller=controller
+        )
         
     except KeyboardInterrupt:
         logger.info(f"Parando worker médio... Total processado: {tasks_processed} tarefas")
+        if locals().get('controller'):
+            logger.info(f"Prefetch adaptativo: {controller.get_metrics()}")
         if 'channel' in locals():
             channel.stop_consuming()
     except Exception as e:
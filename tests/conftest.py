@@ -0,0 +1,52 @@
+"""
+Fixtures compartilhadas: broker em memória isolado por teste
+"""
+import os
+import sys
+
+# Adiciona o diretório raiz ao path para importar utils
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pika
+import pytest
+
+from utils.memory_broker import MemoryBroker, connect
+from utils.serialization import encode_message
+from utils.topology import reset_declaration_cache
+
+@pytest.fixture(autouse=True)
+def declaration_cache():
+    # O cache de declarações é global ao módulo: cada teste começa vazio
+    reset_declaration_cache()
+    yield
+    reset_declaration_cache()
+
+@pytest.fixture
+def broker():
+    return MemoryBroker()
+
+@pytest.fixture
+def connection(broker):
+    connection = connect(broker)
+    yield connection
+    if not connection.is_closed:
+        connection.close()
+
+@pytest.fixture
+def channel(connection):
+    return connection.channel()
+
+@pytest.fixture
+def publish(channel):
+    """
+    Publica mensagens (objetos codificados com encode_message ou bytes crus) em uma fila
+    """
+    def publish(queue: str, messages, **properties) -> None:
+        for message in messages:
+            if isinstance(message, bytes):
+                body, content_type = message, 'application/json'
+            else:
+                body, content_type = encode_message(message)
+            channel.basic_publish(exchange='', routing_key=queue, body=body,
+                                  properties=pika.BasicProperties(content_type=content_type, **properties))
+    return publish
@@ -0,0 +1,128 @@
+"""
+Testes da publicação em lotes (utils.batching) no broker em memória
+"""
+from types import SimpleNamespace
+
+import pika
+import pika.frame
+import pika.spec
+import pytest
+
+from utils.batching import BatchingPublisher, _FrameWriter
+
+QUEUE = 'batch_queue'
+
+@pytest.fixture
+def queue(channel):
+    channel.queue_declare(QUEUE)
+    return QUEUE
+
+def test_count_trigger_sends_the_batch(channel, broker, queue):
+    publisher = BatchingPublisher(channel, max_messages=3, linger_ms=10000)
+    publisher.publish('', queue, b'1')
+    publisher.publish('', queue, b'2')
+    assert broker.message_count(queue) == 0 and publisher.pending == 2
+    publisher.publish('', queue, b'3')
+    assert broker.message_count(queue) == 3 and publisher.pending == 0
+    assert publisher.get_stats()['writes'] == 1 and publisher.max_batch == 3
+
+def test_byte_trigger_sends_the_batch(channel, broker, queue):
+    publisher = BatchingPublisher(channel, max_messages=100, max_bytes=10, linger_ms=10000)
+    publisher.publish('', queue, b'abcdef')
+    assert broker.message_count(queue) == 0
+    publisher.publish('', queue, b'ghijkl')
+    assert broker.message_count(queue) == 2
+    assert publisher.counters['bytes'] == 12
+
+def test_linger_timer_sends_every_pending_key(channel, broker, queue):
+    """O timer da conexão dispara o envio sem novos publish e leva os lotes das outras chaves"""
+    channel.queue_declare('other_queue')
+    publisher = BatchingPublisher(channel, max_messages=100, linger_ms=20)
+    publisher.publish('', queue, b'1')
+    publisher.publish('', 'other_queue', b'2')
+    assert broker.message_count(queue) == 0
+    channel.connection.sleep(0.1)
+    assert broker.message_count(queue) == 1 and broker.message_count('other_queue') == 1
+    assert publisher.counters['writes'] == 1 and publisher.counters['batches'] == 2
+
+def nack_tags(channel, publisher, tags):
+    """Troca os ACKs do broker em memória por NACKs nos delivery tags informados"""
+    def on_confirm(frame):
+        if frame.method.delivery_tag in tags:
+            tags.remove(frame.method.delivery_tag)
+            frame = pika.frame.Method(frame.channel_number, pika.spec.Basic.Nack(delivery_tag=frame.method.delivery_tag))
+        publisher._on_confirm(frame)
+    channel._confirm_callback = on_confirm
+
+def test_nacked_messages_go_back_to_the_buffer(channel, queue):
+    publisher = BatchingPublisher(channel, max_messages=3, linger_ms=10000, confirm=True)
+    nack_tags(channel, publisher, [2])
+    for body in (b'a', b'b', b'c'):
+        publisher.publish('', queue, body)
+    # A mensagem com NACK volta para o buffer e sai no próximo envio
+    assert publisher.pending == 1
+    assert [message[0] for message in publisher._batches[('', queue)].messages] == [b'b']
+    publisher.flush()
+    assert publisher.counters['confirmed'] == 3 and publisher.counters['retried'] == 1
+    assert publisher.failed() == []
+
+def test_nacks_beyond_max_retries_are_failed(channel, queue):
+    publisher = BatchingPublisher(channel, max_messages=1, confirm=True, max_retries=1)
+    nack_tags(channel, publisher, [1, 2])
+    publisher.publish('', queue, b'x')
+    publisher.flush()
+    assert publisher.counters['nacked'] == 2 and publisher.counters['failed'] == 1
+    assert publisher.failed() == [('', queue, b'x', pika.BasicProperties())]
+
+def test_blocked_connection_holds_the_buffer(channel, broker, queue):
+    """Com Connection.Blocked o linger não envia; o Unblocked libera o buffer"""
+    publisher = BatchingPublisher(channel, max_messages=100, linger_ms=10)
+    broker.set_resource_alarm(True)
+    channel.connection.process_data_events()
+    publisher.publish('', queue, b'1')
+    channel.connection.sleep(0.05)
+    assert broker.message_count(queue) == 0 and publisher.pending == 1
+    broker.set_resource_alarm(False)
+    channel.connection.sleep(0.05)
+    assert broker.message_count(queue) == 1 and publisher.pending == 0
+
+def test_closed_channel_raises_with_messages_in_the_buffer(channel, queue):
+    publisher = BatchingPublisher(channel, max_messages=2, linger_ms=10000)
+    publisher.publish('', queue, b'1')
+    channel.close()
+    with pytest.raises(pika.exceptions.ChannelWrongStateError):
+        publisher.publish('', queue, b'2')
+
+class FakeImplConnection:
+    def __init__(self):
+        self._body_max_length = 4
+        self.bytes_sent = 0
+        self.frames_sent = 0
+        self.is_closed = False
+        self.writes = []
+
+    def _adapter_emit_data(self, data):
+        self.writes.append(data)
+
+def fake_channel():
+    connection = SimpleNamespace(_flush_output=lambda *waiters: None)
+    return SimpleNamespace(channel_number=1, connection=connection,
+                           _impl=SimpleNamespace(connection=FakeImplConnection()))
+
+def test_frame_writer_needs_pika_1_and_its_internals(channel, monkeypatch):
+    assert _FrameWriter.create(channel) is None
+    assert _FrameWriter.create(fake_channel()) is not None
+    monkeypatch.setattr(pika, '__version__', '2.0.0')
+    assert _FrameWriter.create(fake_channel()) is None
+
+def test_frame_writer_emits_one_write_per_send():
+    channel = fake_channel()
+    writer = _FrameWriter.create(channel)
+    frames = writer.marshal('', 'q', b'0123456789', pika.BasicProperties(), False)
+    frames += writer.marshal('', 'q', b'ab', pika.BasicProperties(), False)
+    # 10 bytes em frames de 4: método, header e três corpos; depois método, header e um corpo
+    assert len(frames) == 8
+    impl_connection = channel._impl.connection
+    written = writer.write(frames)
+    assert impl_connection.writes == [b''.join(frames)]
+    assert impl_connection.bytes_sent == written and impl_connection.frames_sent == 8
@@ -0,0 +1,313 @@
+"""
+Testes dos utilitários de conexão, pool e publicação (utils.common)
+"""
+import time
+from types import SimpleNamespace
+
+import pika
+import pika.frame
+import pika.spec
+import pytest
+
+from utils.common import (ConfirmingPublisher, RabbitMQConnectionPool, RecoveringConnection,
+                          get_connection_pool)
+from utils.memory_broker import connect
+
+class ScriptedConnection:
+    """
+    Conexão falsa: cada process_data_events entrega as confirmações agendadas
+    pelo teste e registra a chamada, para verificar a ordem publish -> flush
+    """
+
+    def __init__(self):
+        self.calls = []
+        self.confirms = []
+        self.callback = None
+
+    def process_data_events(self, time_limit=0):
+        self.calls.append('process')
+        while self.confirms:
+            self.callback(self.confirms.pop(0))
+
+class ScriptedImpl:
+    def __init__(self, connection):
+        self.connection = connection
+        self.published = []
+
+    def confirm_delivery(self, ack_nack_callback, callback=None):
+        self.connection.callback = ack_nack_callback
+        callback(pika.frame.Method(1, pika.spec.Confirm.SelectOk()))
+
+    def basic_publish(self, exchange, routing_key, body, properties=None, mandatory=False):
+        self.connection.calls.append('publish')
+        self.published.append(body)
+
+class ScriptedChannel:
+    def __init__(self):
+        self.connection = ScriptedConnection()
+        self._impl = ScriptedImpl(self.connection)
+
+def ack(tag, multiple=False):
+    return pika.frame.Method(1, pika.spec.Basic.Ack(delivery_tag=tag, multiple=multiple))
+
+def nack(tag, multiple=False):
+    return pika.frame.Method(1, pika.spec.Basic.Nack(delivery_tag=tag, multiple=multiple))
+
+def test_publish_writes_before_returning():
+    """O frame publicado é escrito (process_data_events) antes de publish retornar"""
+    channel = ScriptedChannel()
+    publisher = ConfirmingPublisher(channel, window_size=10)
+    channel.connection.calls.clear()
+    publisher.publish('', 'q', b'1')
+    assert channel.connection.calls == ['publish', 'process']
+
+def test_window_blocks_until_a_confirm_arrives():
+    """Com a janela cheia, publish espera até o broker confirmar alguma mensagem"""
+    channel = ScriptedChannel()
+    publisher = ConfirmingPublisher(channel, window_size=2)
+    publisher.publish('', 'q', b'1')
+    publisher.publish('', 'q', b'2')
+    assert publisher.outstanding == 2
+    channel.connection.confirms.append(ack(1))
+    publisher.publish('', 'q', b'3')
+    assert publisher.outstanding == 2
+    assert [entry[2] for entry in publisher.unconfirmed()] == [b'2', b'3']
+
+def test_multiple_ack_confirms_every_tag_up_to_it():
+    channel = ScriptedChannel()
+    publisher = ConfirmingPublisher(channel, window_size=10)
+    for n in range(5):
+        publisher.publish('', 'q', str(n).encode())
+    channel.connection.confirms.append(ack(3, multiple=True))
+    channel.connection.process_data_events()
+    assert publisher.counters['confirmed'] == 3
+    assert publisher.unconfirmed() == [('', 'q', b'3', None), ('', 'q', b'4', None)]
+    assert publisher.confirm_latency()['count'] == 3
+
+def test_nack_republishes_until_max_retries():
+    """NACK republica com nova tag; esgotadas as tentativas, a mensagem vai para failed()"""
+    channel = ScriptedChannel()
+    publisher = ConfirmingPublisher(channel, window_size=10, max_retries=2)
+    publisher.publish('', 'q', b'x')
+    for tag in (1, 2, 3):
+        channel.connection.confirms.append(nack(tag))
+        channel.connection.process_data_events()
+    assert channel._impl.published == [b'x', b'x', b'x']
+    assert publisher.counters == {'published': 1, 'confirmed': 0, 'nacked': 3, 'retried': 2, 'failed': 1}
+    assert publisher.failed() == [('', 'q', b'x', None)] and publisher.outstanding == 0
+
+def test_confirms_on_the_memory_broker(channel, broker):
+    channel.queue_declare('confirmed_queue')
+    publisher = ConfirmingPublisher(channel, window_size=5)
+    for n in range(20):
+        publisher.publish('', 'confirmed_queue', str(n).encode(), pika.BasicProperties(delivery_mode=2))
+    assert publisher.flush(timeout=1)
+    assert publisher.counters['confirmed'] == 20
+    assert broker.message_count('confirmed_queue') == 20
+
+@pytest.mark.parametrize('window_size', [0, -1])
+def test_window_must_be_positive(window_size):
+    with pytest.raises(ValueError):
+        ConfirmingPublisher(ScriptedChannel(), window_size=window_size)
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    """Registra os atrasos de backoff em vez de dormir"""
+    delays = []
+    monkeypatch.setattr('utils.common.time', SimpleNamespace(
+        sleep=delays.append, monotonic=time.monotonic, time=time.time, perf_counter=time.perf_counter))
+    return delays
+
+def flaky_factory(broker, failures, error=pika.exceptions.AMQPConnectionError):
+    """Fábrica que falha nas primeiras tentativas e guarda as conexões abertas"""
+    opened = []
+
+    def factory():
+        if len(opened) < failures:
+            opened.append(None)
+            raise error("broker indisponível")
+        connection = connect(broker)
+        opened.append(connection)
+        return connection
+
+    return factory, opened
+
+def test_recovering_connection_backs_off_until_the_broker_answers(broker, sleeps):
+    factory, opened = flaky_factory(broker, failures=3)
+    recovering = RecoveringConnection(connection_factory=factory, base_delay=0.5, max_delay=1.5).connect()
+    assert len(opened) == 4 and not recovering.is_closed
+    assert len(sleeps) == 3
+    assert all(0 <= delay <= min(1.5, 0.5 * 2 ** attempt) for attempt, delay in enumerate(sleeps, start=1))
+    recovering.close()
+
+def test_recovering_connection_gives_up_after_max_attempts(broker, sleeps):
+    factory, opened = flaky_factory(broker, failures=10)
+    with pytest.raises(ConnectionError):
+        RecoveringConnection(connection_factory=factory, max_attempts=3).connect()
+    assert len(opened) == 3 and len(sleeps) == 2
+
+@pytest.mark.parametrize('error', [pika.exceptions.ProbableAuthenticationError,
+                                   pika.exceptions.ProbableAccessDeniedError])
+def test_authentication_errors_are_fatal(broker, sleeps, error):
+    factory, opened = flaky_factory(broker, failures=1, error=error)
+    with pytest.raises(error):
+        RecoveringConnection(connection_factory=factory).connect()
+    assert len(opened) == 1 and sleeps == []
+
+def test_missing_queue_is_fatal_and_closes_the_new_connection(broker, sleeps):
+    """Um 404 na preparação do canal é propagado e a conexão nova não fica aberta"""
+    factory, opened = flaky_factory(broker, failures=0)
+    recovering = RecoveringConnection(connection_factory=factory,
+                                      on_channel_open=lambda ch: ch.queue_declare('missing', passive=True))
+    with pytest.raises(pika.exceptions.ChannelClosedByBroker) as error:
+        recovering.connect()
+    assert error.value.reply_code == 404
+    assert len(opened) == 1 and opened[0].is_closed and sleeps == []
+
+def test_consumers_are_registered_again_after_a_broker_restart(broker, sleeps):
+    factory, opened = flaky_factory(broker, failures=0)
+    recovering = RecoveringConnection(connection_factory=factory,
+                                      on_channel_open=lambda ch: ch.queue_declare('jobs', durable=True)).connect()
+    received = []
+
+    def callback(ch, method, properties, body):
+        received.append(body)
+        ch.basic_ack(delivery_tag=method.delivery_tag)
+        if len(received) == 3:
+            recovering.stop_consuming()
+
+    recovering.consume('jobs', callback, prefetch_count=2)
+    broker.restart()
+    publisher = connect(broker).channel()
+    for n in range(3):
+        publisher.basic_publish('', 'jobs', str(n).encode(), pika.BasicProperties(delivery_mode=2))
+
+    recovering.start_consuming()
+
+    assert received == [b'0', b'1', b'2']
+    assert len(opened) == 2 and recovering.metrics['recoveries'] == 1
+    assert recovering.channel._prefetch_count == 2
+    recovering.close()
+
+def test_unconfirmed_publishes_are_replayed_after_recovery(broker, sleeps):
+    """Mensagens sem confirmação quando a conexão cai são republicadas na nova conexão"""
+    factory, _ = flaky_factory(broker, failures=0)
+    recovering = RecoveringConnection(connection_factory=factory,
+                                      on_channel_open=lambda ch: ch.queue_declare('events', durable=True)).connect()
+    recovering.enable_confirms(window_size=10)
+    # Confirmações perdidas junto com a conexão
+    recovering.channel._confirm_callback = lambda frame: None
+    for n in range(3):
+        recovering.publish('', 'events', str(n).encode())
+    assert recovering.publisher.outstanding == 3
+    broker.restart()
+
+    recovering.publish('', 'events', b'3')
+
+    # A publicação que encontrou a conexão fechada já estava na janela e é republicada uma única vez
+    assert recovering.metrics['replayed_publishes'] == 4
+    assert recovering.publisher.flush(timeout=1)
+    assert broker.message_count('events') == 4
+    recovering.close()
+
+def pool_factory(broker):
+    """Fábrica de conexões do pool que guarda as conexões abertas"""
+    opened = []
+
+    def factory():
+        connection = connect(broker)
+        opened.append(connection)
+        return connection
+
+    return factory, opened
+
+@pytest.mark.parametrize('limits', [(0, 1), (1, 0)])
+def test_pool_limits_must_be_positive(limits):
+    with pytest.raises(ValueError):
+        RabbitMQConnectionPool(max_connections=limits[0], max_channels_per_connection=limits[1])
+
+def test_pool_spreads_channels_and_respects_the_limit_per_connection(broker):
+    factory, opened = pool_factory(broker)
+    pool = RabbitMQConnectionPool(max_connections=2, max_channels_per_connection=2,
+                                  connection_factory=factory)
+    channels = [pool.acquire_channel() for _ in range(4)]
+    # Os dois primeiros canais vão para sockets distintos antes de multiplexar
+    assert channels[0].connection is not channels[1].connection
+    assert len(opened) == 2
+    assert sorted(sum(ch.connection is c for ch in channels) for c in opened) == [2, 2]
+    with pytest.raises(RuntimeError):
+        pool.acquire_channel()
+    pool.close()
+
+def test_pool_reuses_released_channels(broker):
+    factory, opened = pool_factory(broker)
+    pool = RabbitMQConnectionPool(max_connections=1, connection_factory=factory)
+    with pool.channel() as first:
+        pass
+    assert pool.stats() == {'connections': 1, 'channels_leased': 0,
+                            'channels_idle': 1, 'consuming_connections': 0}
+    with pool.channel() as second:
+        assert second is first
+    assert len(opened) == 1
+    pool.close()
+
+def test_pool_discards_closed_connections_and_channels(broker):
+    factory, opened = pool_factory(broker)
+    pool = RabbitMQConnectionPool(max_connections=2, connection_factory=factory)
+    first = pool.acquire_channel()
+    second = pool.acquire_channel()
+    pool.release_channel(second)
+    first.connection.close()
+    second.close()
+
+    assert pool.health_check() == 1
+    assert pool.stats()['connections'] == 1 and pool.stats()['channels_idle'] == 0
+    # Um canal de conexão já descartada é ignorado na devolução
+    pool.release_channel(first)
+    channel = pool.acquire_channel()
+    assert channel.is_open and channel is not second
+    pool.close()
+
+def test_closed_pool_refuses_channels(broker):
+    factory, _ = pool_factory(broker)
+    with RabbitMQConnectionPool(connection_factory=factory) as pool:
+        pool.acquire_channel()
+    assert pool.stats()['connections'] == 0
+    with pytest.raises(RuntimeError):
+        pool.acquire_channel()
+
+def test_pool_consumes_from_every_connection(broker):
+    factory, _ = pool_factory(broker)
+    pool = RabbitMQConnectionPool(max_connections=2, connection_factory=factory)
+    received = []
+
+    def callback(ch, method, properties, body):
+        received.append(body)
+        ch.basic_ack(delivery_tag=method.delivery_tag)
+        if len(received) == 2:
+            pool.stop_consuming()
+
+    with pool.channel() as ch:
+        ch.queue_declare('a')
+        ch.queue_declare('b')
+        ch.basic_publish('', 'a', b'a')
+        ch.basic_publish('', 'b', b'b')
+    channel_a = pool.consume('a', callback)
+    channel_b = pool.consume('b', callback)
+    assert channel_a.connection is not channel_b.connection
+    assert pool.stats()['consuming_connections'] == 2
+
+    pool.start_consuming(poll_interval=0.01)
+    assert sorted(received) == [b'a', b'b']
+    pool.close()
+
+def test_shared_pool_reads_limits_from_the_environment(monkeypatch):
+    monkeypatch.setattr('utils.common._shared_pool', None)
+    monkeypatch.setenv('RABBITMQ_POOL_MAX_CONNECTIONS', '3')
+    monkeypatch.setenv('RABBITMQ_POOL_MAX_CHANNELS', '5')
+    pool = get_connection_pool()
+    assert (pool.max_connections, pool.max_channels_per_connection) == (3, 5)
+    assert get_connection_pool() is pool
+    # Um pool fechado é substituído na próxima chamada
+    pool.close()
+    assert get_connection_pool() is not pool
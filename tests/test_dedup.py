@@ -0,0 +1,56 @@
+"""
+Testes da deduplicação por message_id (utils.dedup)
+"""
+from types import SimpleNamespace
+
+import pika
+
+from utils.dedup import DedupFilter
+
+def delivery(message_id, redelivered=False):
+    return SimpleNamespace(redelivered=redelivered), pika.BasicProperties(message_id=message_id)
+
+def test_recent_ids_detect_duplicates_after_processing():
+    """Só ids marcados como processados contam como duplicados"""
+    dedup = DedupFilter()
+    assert not dedup.is_duplicate(*delivery('a'))
+    # Sem mark_processed (ex: republicada para retry) continua sendo processada
+    assert not dedup.is_duplicate(*delivery('a', redelivered=True))
+    dedup.mark_processed(delivery('a')[1])
+    assert dedup.is_duplicate(*delivery('a', redelivered=True))
+    assert not dedup.is_duplicate(*delivery(None))
+    assert dedup.get_stats()['duplicates'] == 1
+
+def test_recent_ids_respect_limit_and_ttl(monkeypatch):
+    """Os ids mais antigos saem ao exceder o limite e ao vencer o TTL"""
+    now = [1000.0]
+    monkeypatch.setattr('utils.dedup.time.monotonic', lambda: now[0])
+    dedup = DedupFilter(max_entries=2, ttl=10)
+    for message_id in ('a', 'b', 'c'):
+        dedup.mark_processed(delivery(message_id)[1])
+    assert not dedup.is_duplicate(*delivery('a'))
+    assert dedup.is_duplicate(*delivery('c'))
+    now[0] += 11
+    assert not dedup.is_duplicate(*delivery('c'))
+
+def test_store_survives_restarts_and_is_only_checked_for_redeliveries(tmp_path):
+    """O SQLite (com Bloom na frente) só é consultado em reentregas e sobrevive a reinícios"""
+    path = str(tmp_path / 'dedup.sqlite')
+    first = DedupFilter(bloom_capacity=1000, sqlite_path=path)
+    first.mark_processed(delivery('m-1')[1])
+    first.close()
+
+    dedup = DedupFilter(bloom_capacity=1000, sqlite_path=path)
+    # Entrega nova: nem Bloom nem SQLite
+    assert not dedup.is_duplicate(*delivery('m-1'))
+    assert dedup.get_stats()['store_lookups'] == 0
+    # Reentrega de id nunca processado: o Bloom responde sem ir ao disco
+    assert not dedup.is_duplicate(*delivery('m-2', redelivered=True))
+    assert dedup.get_stats()['bloom_skips'] == 1
+    assert dedup.is_duplicate(*delivery('m-1', redelivered=True))
+    stats = dedup.get_stats()
+    assert stats['store_lookups'] == 1 and stats['duplicates'] == 1
+    # Promovido ao conjunto recente: a próxima consulta não vai ao disco
+    assert dedup.is_duplicate(*delivery('m-1', redelivered=True))
+    assert dedup.get_stats()['store_lookups'] == 1
+    dedup.close()
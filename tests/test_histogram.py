@@ -0,0 +1,87 @@
+"""
+Testes do histograma de latência (utils.histogram)
+"""
+import json
+import random
+
+import pytest
+
+from utils.histogram import SUB_BUCKETS, LatencyHistogram, _bucket_bounds, _bucket_index
+
+def exact_percentile(values, q):
+    # Mesmo critério de posto do histograma (nearest rank)
+    ordered = sorted(values)
+    rank = max(1, int(q / 100.0 * len(ordered) + 0.5))
+    return ordered[rank - 1]
+
+@pytest.fixture
+def samples():
+    rng = random.Random(7)
+    # De 1ms a alguns segundos: várias potências de 2
+    return [rng.lognormvariate(-4, 1.5) + 0.001 for _ in range(20000)]
+
+def test_every_value_falls_inside_its_bucket():
+    for value in [0, 1, 255, 256, 257, 1000, 123456, 10 ** 9]:
+        low, high = _bucket_bounds(_bucket_index(value))
+        assert low <= value <= high
+        assert high - low <= max(1, value // SUB_BUCKETS)
+
+@pytest.mark.parametrize('q', [1, 50, 90, 99, 99.9])
+def test_percentiles_within_one_percent(samples, q):
+    hist = LatencyHistogram()
+    for value in samples:
+        hist.record(value)
+    expected = exact_percentile(samples, q)
+    assert hist.percentile(q) == pytest.approx(expected, rel=0.01)
+
+def test_percentiles_are_clamped_to_the_observed_range():
+    hist = LatencyHistogram()
+    hist.record(0.5)
+    assert hist.percentile(0) == hist.percentile(100) == 0.5
+    assert LatencyHistogram().percentile(99) == 0.0
+
+def test_negative_durations_count_as_zero():
+    hist = LatencyHistogram()
+    hist.record(-0.2)
+    assert hist.min == hist.max == 0.0 and hist.percentile(50) == 0.0
+
+def test_merge_equals_recording_everything_in_one(samples):
+    parts = [LatencyHistogram() for _ in range(4)]
+    whole = LatencyHistogram()
+    for n, value in enumerate(samples):
+        parts[n % 4].record(value)
+        whole.record(value)
+
+    merged = LatencyHistogram.merged(parts)
+    assert merged.to_dict()['counts'] == whole.to_dict()['counts']
+    assert (merged.count, merged.min, merged.max) == (whole.count, whole.min, whole.max)
+    assert merged.total == pytest.approx(whole.total)
+    assert merged.summary() == pytest.approx(whole.summary())
+    # merged não altera as partes
+    assert sum(len(part) for part in parts) == len(samples)
+
+def test_merge_with_an_empty_histogram():
+    hist = LatencyHistogram()
+    hist.record(0.01, count=3)
+    assert hist.copy().merge(LatencyHistogram()).summary() == hist.summary()
+    assert LatencyHistogram().merge(hist).summary() == hist.summary()
+
+def test_dict_round_trip_through_json(samples):
+    hist = LatencyHistogram()
+    for value in samples[:1000]:
+        hist.record(value)
+    restored = LatencyHistogram.from_dict(json.loads(json.dumps(hist.to_dict())))
+    assert restored.summary() == hist.summary()
+    assert restored.percentile(99.9) == hist.percentile(99.9)
+
+def test_summary_in_milliseconds():
+    hist = LatencyHistogram()
+    for ms in (10, 20, 30, 40):
+        hist.record(ms / 1000)
+    summary = hist.summary()
+    assert summary['count'] == 4
+    assert summary['mean_ms'] == pytest.approx(25)
+    assert (summary['min_ms'], summary['max_ms']) == pytest.approx((10, 40))
+    assert summary['p50_ms'] == pytest.approx(20, rel=0.01)
+    hist.reset()
+    assert not hist and hist.summary()['max_ms'] == 0.0
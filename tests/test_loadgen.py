@@ -0,0 +1,101 @@
+"""
+Testes do gerador de carga em malha aberta (utils.loadgen)
+"""
+import itertools
+import random
+from types import SimpleNamespace
+
+import pytest
+
+from utils.loadgen import LoadGenerator, arrival_offsets, create_load_generator
+
+class FakeClock:
+    """Relógio controlado pelo teste: sleep e send avançam o tempo"""
+
+    def __init__(self):
+        self.now = 100.0
+        self.sleeps = []
+
+    def perf_counter(self):
+        return self.now
+
+    def time_ns(self):
+        return 1_000_000_000_000
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr('utils.loadgen.time', SimpleNamespace(
+        perf_counter=clock.perf_counter, time_ns=clock.time_ns, sleep=clock.sleep))
+    return clock
+
+def test_constant_and_burst_offsets():
+    assert list(arrival_offsets('constant', rate=4, messages=5)) == [0, 0.25, 0.5, 0.75, 1.0]
+    assert list(arrival_offsets('burst', rate=4, messages=6, burst_size=2)) == [0, 0, 0.5, 0.5, 1.0, 1.0]
+    # duration corta o cronograma; sem messages nem duration é infinito
+    assert len(list(arrival_offsets('constant', rate=10, duration=1))) == 10
+    assert len(list(itertools.islice(arrival_offsets('constant', rate=10), 1000))) == 1000
+
+def test_poisson_offsets_keep_the_mean_rate():
+    offsets = list(arrival_offsets('poisson', rate=50, messages=5000, rng=random.Random(1)))
+    assert offsets == sorted(offsets) and offsets[0] == 0
+    assert offsets[-1] / (len(offsets) - 1) == pytest.approx(1 / 50, rel=0.05)
+
+def test_ramp_offsets_accelerate_until_the_target_rate():
+    offsets = list(arrival_offsets('ramp', rate=100, duration=10, ramp_from_rate=10))
+    # Área sob a rampa: (10 + 100) / 2 * 10 s
+    assert len(offsets) == pytest.approx(550, abs=1)
+    gaps = [b - a for a, b in zip(offsets, offsets[1:])]
+    assert gaps[0] > gaps[-1] and gaps[-1] == pytest.approx(1 / 100, rel=0.05)
+
+@pytest.mark.parametrize('profile, kwargs', [
+    ('uniform', {}),
+    ('constant', {'rate': 0}),
+    ('burst', {'burst_size': 0}),
+    ('ramp', {}),
+])
+def test_invalid_parameters(profile, kwargs):
+    with pytest.raises(ValueError):
+        next(arrival_offsets(profile, **{'rate': 10, **kwargs}))
+
+def test_slow_send_does_not_shift_the_schedule(clock):
+    """Um envio lento atrasa os seguintes, que saem sem espera até alcançar o cronograma"""
+    calls = []
+
+    def send(n, intended_ns):
+        calls.append((n, intended_ns, clock.now))
+        if n == 2:
+            clock.now += 0.35
+
+    generator = LoadGenerator(send, rate=10, messages=6)
+    stats = generator.run()
+
+    # Instantes pretendidos fixos: 0, 100, 200, ... ms desde o início
+    assert [intended for _, intended, _ in calls] == [clock.time_ns() + n * 100_000_000 for n in range(6)]
+    assert [round(sent - 100.0, 3) for _, _, sent in calls] == [0.0, 0.1, 0.45, 0.45, 0.45, 0.5]
+    assert stats['sent'] == 6 and stats['final_lag_ms'] == pytest.approx(0)
+    # A latência da mensagem 3 conta desde o instante pretendido (0.2 s), não do envio real
+    assert stats['max_lag_ms'] == pytest.approx(250)
+    assert generator.latency.max == pytest.approx(0.35, rel=0.01)
+
+def test_send_errors_are_counted_and_the_schedule_goes_on(clock):
+    def send(n, intended_ns):
+        if n % 2:
+            raise ConnectionError(f"falha {n}")
+
+    stats = LoadGenerator(send, rate=100, messages=5).run()
+    assert stats['sent'] == 2 and stats['errors'] == 3
+
+def test_create_load_generator_reads_the_environment(monkeypatch):
+    monkeypatch.delenv('LOAD_RATE', raising=False)
+    assert create_load_generator(lambda n, intended_ns: None) is None
+    monkeypatch.setenv('LOAD_RATE', '250')
+    monkeypatch.setenv('LOAD_PROFILE', 'burst')
+    monkeypatch.setenv('LOAD_MESSAGES', '40')
+    monkeypatch.setenv('LOAD_BURST_SIZE', '20')
+    generator = create_load_generator(lambda n, intended_ns: None)
+    assert (generator.rate, generator.profile, generator.messages, generator.burst_size) == (250, 'burst', 40, 20)
@@ -0,0 +1,51 @@
+"""
+Testes do broker em memória (utils.memory_broker)
+"""
+import threading
+
+import pika
+import pytest
+
+from utils.memory_broker import connect
+
+QUEUE = 'settle_queue'
+
+def test_multiple_acks_while_another_thread_delivers(channel, broker):
+    """ACKs múltiplos na thread do consumer e entregas vindas de outra conexão não se atropelam"""
+    channel.queue_declare(QUEUE)
+    total = 2000
+    acked = []
+
+    def callback(ch, method, properties, body):
+        acked.append(method.delivery_tag)
+        if len(acked) % 7 == 0 or len(acked) == total:
+            ch.basic_ack(delivery_tag=method.delivery_tag, multiple=True)
+        if len(acked) == total:
+            ch.stop_consuming()
+
+    channel.basic_qos(prefetch_count=50)
+    channel.basic_consume(QUEUE, callback)
+
+    def produce():
+        producer = connect(broker)
+        producer_channel = producer.channel()
+        for n in range(total):
+            producer_channel.basic_publish('', QUEUE, str(n).encode())
+        producer.close()
+
+    thread = threading.Thread(target=produce)
+    thread.start()
+    channel.start_consuming()
+    thread.join()
+
+    assert len(acked) == total and not channel._unacked
+    assert broker.message_count(QUEUE) == 0
+
+def test_unknown_delivery_tag_closes_the_channel(channel, publish):
+    channel.queue_declare(QUEUE)
+    publish(QUEUE, [{'n': 1}])
+    method, _, _ = channel.basic_get(QUEUE)
+    channel.basic_ack(method.delivery_tag)
+    with pytest.raises(pika.exceptions.ChannelClosedByBroker) as error:
+        channel.basic_ack(method.delivery_tag)
+    assert error.value.reply_code == 406 and channel.is_closed
@@ -0,0 +1,93 @@
+"""
+Testes do multiplexador de filas com weighted fair queuing (utils.multiplexer)
+"""
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from utils.multiplexer import QueueMultiplexer
+
+@pytest.fixture
+def service_clock(monkeypatch):
+    """
+    Relógio do tempo de serviço controlado pelo teste: o handler avança
+    clock[0] com o custo simulado, sem depender da precisão do sleep
+    """
+    clock = [0.0]
+    monkeypatch.setattr('utils.multiplexer.time', SimpleNamespace(
+        perf_counter=lambda: clock[0], time=time.time, monotonic=time.monotonic))
+    return clock
+
+def test_weights_split_service_time_while_both_queues_are_busy(channel, broker, publish, service_clock):
+    """Com pesos 2 e 1 e as duas filas cheias, a primeira recebe 2/3 do tempo de serviço"""
+    for queue in ('heavy', 'light'):
+        channel.queue_declare(queue)
+        publish(queue, [{'n': n} for n in range(200)])
+    stop = threading.Event()
+    served = []
+
+    def handler(method, properties, body):
+        service_clock[0] += 0.01
+        served.append(method.routing_key)
+        if len(served) == 90:
+            stop.set()
+
+    mux = QueueMultiplexer(channel, lag_interval=0)
+    mux.add_queue('heavy', handler, prefetch_count=4, weight=2)
+    mux.add_queue('light', handler, prefetch_count=4, weight=1)
+    stats = mux.run(stop, poll_interval=0.05)
+
+    assert stats['heavy']['processed'] == 60 and stats['light']['processed'] == 30
+    assert stats['heavy']['share'] == pytest.approx(2 / 3)
+    # As entregas que ficaram no buffer voltam para as filas
+    assert broker.message_count('heavy') + broker.message_count('light') == 400 - 90
+
+def test_share_follows_service_time_not_message_count(channel, publish, service_clock):
+    """Mensagens 3x mais caras em uma fila de mesmo peso: ela processa 1/3 das mensagens"""
+    for queue in ('slow', 'fast'):
+        channel.queue_declare(queue)
+        publish(queue, [{'n': n} for n in range(100)])
+    stop = threading.Event()
+    served = []
+
+    def handler(method, properties, body):
+        service_clock[0] += 0.03 if method.routing_key == 'slow' else 0.01
+        served.append(method.routing_key)
+        if len(served) == 80:
+            stop.set()
+
+    mux = QueueMultiplexer(channel, lag_interval=0)
+    mux.add_queue('slow', handler, prefetch_count=2)
+    mux.add_queue('fast', handler, prefetch_count=2)
+    stats = mux.run(stop, poll_interval=0.05)
+
+    assert stats['slow']['processed'] == 20 and stats['fast']['processed'] == 60
+    assert stats['slow']['share'] == pytest.approx(0.5)
+
+def test_idle_queue_does_not_bank_credit(channel, publish, service_clock):
+    """Uma fila que estava vazia não passa na frente das outras quando recebe mensagens"""
+    for queue in ('busy', 'late'):
+        channel.queue_declare(queue)
+    publish('busy', [{'n': n} for n in range(100)])
+    stop = threading.Event()
+    served = []
+
+    def handler(method, properties, body):
+        service_clock[0] += 0.01
+        served.append(method.routing_key)
+        if len(served) == 30:
+            publish('late', [{'n': n} for n in range(30)])
+        if len(served) == 60:
+            stop.set()
+
+    mux = QueueMultiplexer(channel, lag_interval=0)
+    mux.add_queue('busy', handler, prefetch_count=2)
+    mux.add_queue('late', handler, prefetch_count=2)
+    mux.run(stop, poll_interval=0.05)
+
+    after = served[30:]
+    # Depois que 'late' tem mensagens, as duas alternam em vez de 'late' monopolizar
+    assert abs(after.count('late') - after.count('busy')) <= 2
+    assert 'busy' in after[:3]
@@ -0,0 +1,122 @@
+"""
+Testes da frota de producers (benchmarks/producer_fleet.py) no broker em memória
+"""
+import pika
+import pytest
+
+import benchmarks.producer_fleet as fleet
+from utils.batching import BatchingPublisher
+from utils.memory_broker import reset_memory_broker
+
+class FakePipe:
+    """Registra os relatórios que o worker mandaria ao processo pai"""
+
+    def __init__(self):
+        self.reports = []
+        self.closed = False
+
+    def send(self, report):
+        self.reports.append(report)
+
+    def close(self):
+        self.closed = True
+
+@pytest.fixture
+def memory_backend(monkeypatch):
+    monkeypatch.setenv('RABBITMQ_BACKEND', 'memory')
+    return reset_memory_broker()
+
+def options(**overrides):
+    return dict({'scenario': 'priority', 'workers': 1, 'channels': 2, 'duration': None,
+                 'rate': 0, 'profile': 'constant', 'burst_size': 10, 'batch_size': 8,
+                 'linger_ms': 50.0, 'confirm': False, 'report_interval': 60.0, 'seed': 1}, **overrides)
+
+def queued(broker):
+    return sum(broker.message_count(queue) for queue in broker.queues)
+
+def test_id_ranges_are_contiguous_and_disjoint():
+    assert fleet.id_ranges(3, 10) == [{'first_id': 1, 'count': 4}, {'first_id': 5, 'count': 4},
+                                      {'first_id': 9, 'count': 2}]
+    # Mais workers que mensagens: os últimos ficam sem faixa
+    assert [r['count'] for r in fleet.id_ranges(4, 2)] == [1, 1, 0, 0]
+    unbounded = fleet.id_ranges(2, None)
+    assert unbounded[1]['first_id'] - unbounded[0]['first_id'] == fleet.ID_BLOCK
+    assert all(r['count'] is None for r in unbounded)
+
+def test_merge_batch_stats_sums_counters_and_keeps_the_worst_tail():
+    first = {'published': 10, 'sent': 10, 'batches': 2, 'writes': 2, 'bytes': 100, 'confirmed': 10,
+             'nacked': 0, 'retried': 0, 'failed': 0, 'pending': 0, 'max_batch': 6, 'confirm_p99_ms': 1.5}
+    second = dict(first, sent=20, batches=2, writes=1, max_batch=12, confirm_p99_ms=0.5)
+    merged = fleet.merge_batch_stats([first, second])
+    assert merged['sent'] == 30 and merged['bytes'] == 200
+    assert merged['avg_batch'] == 7.5 and merged['messages_per_write'] == 10.0
+    assert (merged['max_batch'], merged['confirm_p99_ms']) == (12, 1.5)
+
+def test_merge_batch_stats_without_publishers():
+    merged = fleet.merge_batch_stats([])
+    assert merged['sent'] == 0 and merged['max_batch'] == 0 and merged['avg_batch'] == 0.0
+
+def test_worker_publishes_its_range_over_every_channel(memory_backend):
+    pipe = FakePipe()
+    fleet.run_worker(1, options(), {'first_id': 101, 'count': 20}, pipe)
+
+    done = pipe.reports[-1]
+    assert done['type'] == 'done' and pipe.closed
+    assert (done['sent'], done['first_id'], done['last_id']) == (20, 101, 120)
+    assert done['batches']['published'] == done['batches']['sent'] == 20
+    assert queued(memory_backend) == 20
+
+def test_interrupted_worker_flushes_the_linger_before_reporting(memory_backend, monkeypatch):
+    """Ctrl+C no meio da carga: as mensagens já no buffer são enviadas e contadas"""
+    encode = fleet.encode_message
+    calls = []
+
+    def interrupt_after_seven(message):
+        calls.append(message)
+        if len(calls) == 8:
+            raise KeyboardInterrupt
+        return encode(message)
+
+    monkeypatch.setattr(fleet, 'encode_message', interrupt_after_seven)
+    pipe = FakePipe()
+    fleet.run_worker(0, options(), {'first_id': 1, 'count': 50}, pipe)
+
+    done = pipe.reports[-1]
+    assert done['type'] == 'done' and done['interrupted']
+    assert done['sent'] == done['batches']['sent'] == 7 and done['last_id'] == 7
+    assert 'error' not in done
+    assert queued(memory_backend) == 7
+
+def test_interrupted_worker_reports_only_written_batches_when_the_flush_fails(memory_backend, monkeypatch):
+    encode = fleet.encode_message
+    calls = []
+
+    def interrupt_after_ten(message):
+        calls.append(message)
+        if len(calls) == 11:
+            raise KeyboardInterrupt
+        return encode(message)
+
+    def lost_connection(self):
+        raise pika.exceptions.AMQPConnectionError("conexão perdida")
+
+    monkeypatch.setattr(fleet, 'encode_message', interrupt_after_ten)
+    monkeypatch.setattr(BatchingPublisher, 'close', lost_connection)
+    pipe = FakePipe()
+    # batch_size 4 em 2 canais: cada canal enviou um lote cheio, o resto ficou no buffer
+    fleet.run_worker(0, options(batch_size=4), {'first_id': 1, 'count': 50}, pipe)
+
+    done = pipe.reports[-1]
+    assert done['interrupted'] and done['error'].startswith("Flush interrompido: AMQPConnectionError")
+    assert done['sent'] == done['batches']['sent'] == 8 and done['batches']['pending'] == 2
+    assert queued(memory_backend) == 8
+
+def test_worker_errors_are_reported(monkeypatch):
+    def unreachable():
+        raise pika.exceptions.AMQPConnectionError("broker indisponível")
+
+    monkeypatch.setattr('utils.common.get_rabbitmq_connection', unreachable)
+    pipe = FakePipe()
+    fleet.run_worker(0, options(), {'first_id': 1, 'count': 5}, pipe)
+    assert pipe.reports[-1]['type'] == 'error' and pipe.closed
+    assert pipe.reports[-1]['error'].startswith('AMQPConnectionError')
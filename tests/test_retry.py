@@ -0,0 +1,60 @@
+"""
+Testes do retry atrasado em tiers (utils.retry) no broker em memória
+"""
+import time
+
+import pika
+
+from utils.retry import ATTEMPT_HEADER, DEAD_REASON_HEADER, RetryPolicy
+from utils.topology import retry_queue_name
+
+QUEUE = 'retry_work_queue'
+
+def wait_for_message(channel, queue: str, timeout: float = 2.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        method, properties, body = channel.basic_get(queue)
+        if method is not None:
+            return method, properties, body
+        time.sleep(0.005)
+    raise AssertionError(f"nenhuma mensagem em '{queue}' após {timeout}s")
+
+def test_failures_walk_the_tiers_then_dead_letter(channel, broker):
+    """Cada falha usa o tier da tentativa; esgotadas as tentativas, vai para {fila}.dead"""
+    policy = RetryPolicy(QUEUE, delays_ms=[20, 40], max_retries=3)
+    channel.queue_declare(QUEUE)
+    policy.declare(channel)
+    channel.basic_publish(exchange='', routing_key=QUEUE, body=b'payload',
+                          properties=pika.BasicProperties(message_id='m-1', expiration='60000'))
+
+    outcomes = []
+    attempts = []
+    for _ in range(4):
+        method, properties, body = wait_for_message(channel, QUEUE)
+        attempts.append(policy.attempts(properties))
+        outcomes.append(policy.retry(channel, method, properties, body, reason='falha temporária'))
+
+    assert outcomes == ['retry', 'retry', 'retry', 'dead']
+    assert attempts == [0, 1, 2, 3]
+    # Tentativas além dos tiers usam o último
+    assert policy.stats['by_tier'] == {20: 1, 40: 2}
+    assert policy.stats['retried'] == 3 and policy.stats['dead_lettered'] == 1
+
+    method, properties, body = wait_for_message(channel, policy.dead_letter_queue)
+    assert body == b'payload' and properties.message_id == 'm-1'
+    assert properties.headers[ATTEMPT_HEADER] == 3
+    assert properties.headers[DEAD_REASON_HEADER].startswith('tentativas esgotadas (3)')
+    assert broker.message_count(QUEUE) == 0
+
+def test_attempts_fall_back_to_x_death(channel):
+    """Sem x-retry-attempt, as expirações nas filas de atraso da fila contam como tentativas"""
+    policy = RetryPolicy(QUEUE, delays_ms=[20, 40])
+    x_death = [
+        {'queue': retry_queue_name(QUEUE, 20), 'reason': 'expired', 'count': 1},
+        {'queue': retry_queue_name(QUEUE, 40), 'reason': 'expired', 'count': 2},
+        {'queue': retry_queue_name('outra_fila', 20), 'reason': 'expired', 'count': 5},
+        {'queue': QUEUE, 'reason': 'rejected', 'count': 1}
+    ]
+    assert policy.attempts(pika.BasicProperties(headers={'x-death': x_death})) == 3
+    assert policy.attempts(pika.BasicProperties(headers={ATTEMPT_HEADER: 1, 'x-death': x_death})) == 1
+    assert policy.attempts(None) == 0
@@ -0,0 +1,73 @@
+"""
+Testes do roteamento no cliente (utils.routing) contra a semântica do broker em memória
+"""
+import random
+
+import pytest
+
+from utils.memory_broker import headers_match, topic_matches
+from utils.routing import HeadersIndex, TopicTrie
+
+WORDS = ['app', 'system', 'error', 'auth', 'log', 'x']
+HEADER_KEYS = ['format', 'region', 'priority', 'x-tenant']
+X_MATCH = ['all', 'any', 'all-with-x', 'any-with-x']
+
+def random_key(rnd: random.Random, words) -> str:
+    return '.'.join(rnd.choice(words) for _ in range(rnd.randint(1, 4)))
+
+@pytest.mark.parametrize('seed', range(20))
+def test_topic_trie_matches_linear_scan(seed):
+    """A trie devolve as mesmas filas que topic_matches aplicado a cada binding"""
+    rnd = random.Random(seed)
+    bindings = [(random_key(rnd, WORDS + ['*', '#']), f'q{n}') for n in range(rnd.randint(1, 12))]
+    trie = TopicTrie(bindings)
+    for _ in range(200):
+        key = random_key(rnd, WORDS)
+        expected = tuple(sorted({queue for pattern, queue in bindings if topic_matches(pattern, key)}))
+        assert trie.match(key) == expected, (bindings, key)
+
+def test_topic_trie_edge_cases():
+    """'#' casa zero palavras, '*' exatamente uma; remove atualiza o cache"""
+    trie = TopicTrie([('system.#', 'all'), ('*.error', 'errors'), ('#.#', 'twice')])
+    assert trie.match('system') == ('all', 'twice')
+    assert trie.match('app.error') == ('errors', 'twice')
+    assert trie.match('app.auth.error') == ('twice',)
+    assert trie.remove('#.#', 'twice')
+    assert not trie.is_routable('app.auth.error')
+    assert trie.unroutable(['system.log', 'app.log']) == ['app.log']
+
+@pytest.mark.parametrize('seed', range(20))
+def test_headers_index_matches_linear_scan(seed):
+    """O índice devolve as mesmas filas que headers_match, inclusive nos modos -with-x"""
+    rnd = random.Random(seed)
+    values = ['json', 'xml', 'us', 'eu', None]
+    bindings = []
+    for n in range(rnd.randint(1, 10)):
+        arguments = {'x-match': rnd.choice(X_MATCH)}
+        for key in rnd.sample(HEADER_KEYS, rnd.randint(0, 3)):
+            arguments[key] = rnd.choice(values)
+        bindings.append((f'q{n}', arguments))
+    index = HeadersIndex(bindings)
+    for _ in range(200):
+        headers = {key: rnd.choice(values[:-1]) for key in rnd.sample(HEADER_KEYS, rnd.randint(0, 4))}
+        expected = tuple(sorted({queue for queue, arguments in bindings if headers_match(arguments, headers)}))
+        assert index.match(headers) == expected, (bindings, headers)
+
+def test_headers_with_x_modes_keep_x_criteria():
+    """Nos modos -with-x as chaves x- são critérios; nos demais são ignoradas"""
+    index = HeadersIndex([
+        ('plain', {'x-match': 'all', 'x-tenant': 'a', 'format': 'json'}),
+        ('with_x', {'x-match': 'all-with-x', 'x-tenant': 'a', 'format': 'json'}),
+        ('any_with_x', {'x-match': 'any-with-x', 'x-tenant': 'a'})
+    ])
+    assert index.match({'format': 'json'}) == ('plain',)
+    assert index.match({'format': 'json', 'x-tenant': 'a'}) == ('any_with_x', 'plain', 'with_x')
+    assert index.match({'x-tenant': 'b', 'format': 'json'}) == ('plain',)
+
+def test_headers_index_unhashable_values_and_report():
+    """Valores não hashable são avaliados sem cache; o relatório agrupa as combinações sem destino"""
+    index = HeadersIndex([('tables', {'x-match': 'all', 'tags': ['a', 'b']}),
+                          ('json', {'format': 'json'})])
+    assert index.match({'tags': ['a', 'b']}) == ('tables',)
+    report = index.unmatched_report([{'format': 'xml'}, {'format': 'json'}, {'format': 'xml'}])
+    assert report == [{'headers': {'format': 'xml'}, 'count': 2}]
@@ -0,0 +1,134 @@
+"""
+Testes do escalonador de entregas (utils.scheduler)
+"""
+import threading
+
+import pika
+import pytest
+
+from utils.scheduler import DeliveryScheduler, create_scheduler, parse_duration
+from utils.serialization import encode_message
+from utils.workers import consume_threaded
+
+def props(**kwargs):
+    return pika.BasicProperties(**kwargs)
+
+def drain(scheduler):
+    return [scheduler.pop() for _ in range(len(scheduler))]
+
+def test_priority_policy_serves_the_highest_first():
+    scheduler = DeliveryScheduler('priority')
+    for name, priority in [('a', 1), ('b', 10), ('c', None), ('d', 5)]:
+        scheduler.push(name, props(priority=priority), b'')
+    assert drain(scheduler) == ['b', 'd', 'a', 'c']
+
+def test_ties_keep_the_arrival_order():
+    scheduler = DeliveryScheduler('priority')
+    for name in 'abcd':
+        scheduler.push(name, props(priority=3), b'')
+    assert drain(scheduler) == list('abcd')
+    assert scheduler.stats == {'scheduled': 4, 'reordered': 0}
+
+def test_shortest_job_reads_headers_then_the_body():
+    scheduler = DeliveryScheduler('sjf')
+    body, content_type = encode_message({'estimated_time': '2 hours'})
+    scheduler.push('long', props(content_type=content_type), body)
+    scheduler.push('header', props(headers={'processing_time': '45 minutes'}), b'not json')
+    scheduler.push('unknown', props(), b'not json')
+    scheduler.push('decoded', props(), b'', message={'estimated_time': 30})
+    assert drain(scheduler) == ['decoded', 'header', 'long', 'unknown']
+
+def test_earliest_deadline_first():
+    scheduler = DeliveryScheduler('edf')
+    scheduler.push('no-deadline', props(), b'')
+    scheduler.push('late', props(timestamp=1000, expiration='60000'), b'')
+    scheduler.push('early', props(timestamp=1000, expiration='5000'), b'')
+    # Sem timestamp, o prazo conta da chegada (muito depois de 1000)
+    scheduler.push('arrival', props(expiration='1000'), b'')
+    assert drain(scheduler) == ['early', 'late', 'arrival', 'no-deadline']
+
+def test_fifo_policy_and_factory(monkeypatch):
+    scheduler = DeliveryScheduler('fifo')
+    for priority in (1, 9, 5):
+        scheduler.push(priority, props(priority=priority), b'')
+    assert drain(scheduler) == [1, 9, 5]
+
+    monkeypatch.setenv('SCHEDULER_POLICY', 'fifo')
+    assert create_scheduler() is None
+    monkeypatch.setenv('SCHEDULER_POLICY', 'edf')
+    assert create_scheduler().policy_name == 'edf'
+    monkeypatch.delenv('SCHEDULER_POLICY')
+    assert create_scheduler('sjf').policy_name == 'sjf'
+    with pytest.raises(ValueError):
+        DeliveryScheduler('random')
+
+def test_reorder_tracking_counts_each_overtake():
+    scheduler = DeliveryScheduler('priority')
+    for name, priority in [('a', 1), ('b', 5), ('c', 3)]:
+        scheduler.push(name, props(priority=priority), b'')
+    assert scheduler.pop() == 'b'
+    assert scheduler.pop() == 'c'
+    assert scheduler.stats['reordered'] == 2
+    assert scheduler.pop() == 'a'
+    # A mais antiga saiu por último: as marcas de remoção foram limpas
+    assert scheduler._arrivals == [] and scheduler._removed == set()
+
+    scheduler.push('d', props(priority=1), b'')
+    assert scheduler.pop() == 'd' and scheduler.stats == {'scheduled': 4, 'reordered': 2}
+    with pytest.raises(IndexError):
+        scheduler.pop()
+
+def test_order_sorts_a_batch_stably():
+    scheduler = DeliveryScheduler('priority')
+    batch = [(n, props(priority=p), b'') for n, p in enumerate([1, 3, 1, 3])]
+    assert [d[0] for d in scheduler.order(batch)] == [1, 3, 0, 2]
+    assert scheduler.stats == {'scheduled': 4, 'reordered': 1}
+    scheduler.order(batch[1::2])
+    assert scheduler.stats['reordered'] == 1
+
+def test_custom_policy_receives_the_decoded_message():
+    seen = []
+
+    def by_size(properties, body, arrived_at, message=None):
+        seen.append(message)
+        return len(message)
+
+    scheduler = DeliveryScheduler(by_size)
+    scheduler.push('big', props(), b'', message='xxxx')
+    scheduler.push('small', props(), b'', message='x')
+    assert drain(scheduler) == ['small', 'big'] and seen == ['xxxx', 'x']
+    assert scheduler.policy_name == 'by_size'
+
+@pytest.mark.parametrize('value, seconds', [(30, 30.0), ('2 hours', 7200.0), ('45 minutes', 2700.0),
+                                            ('1.5s', 1.5), ('soon', None), (True, None)])
+def test_parse_duration(value, seconds):
+    assert parse_duration(value) == seconds
+
+def test_threaded_consumer_processes_waiting_deliveries_by_priority(channel, publish):
+    """Com o único worker ocupado, as entregas do prefetch são atendidas por prioridade"""
+    channel.queue_declare('jobs')
+    publish('jobs', [{'n': n} for n in range(5)], priority=None)
+    for n, priority in enumerate([1, 9, 4, 7], start=5):
+        body, content_type = encode_message({'n': n})
+        channel.basic_publish('', 'jobs', body, props(content_type=content_type, priority=priority))
+    processed = []
+    release = threading.Event()
+    stop = threading.Event()
+
+    def handler(method, properties, body):
+        # O primeiro segura o worker até todas as entregas estarem no escalonador
+        release.wait(timeout=2)
+        processed.append(properties.priority)
+        if len(processed) == 9:
+            stop.set()
+
+    scheduler = DeliveryScheduler('priority')
+    channel.connection.call_later(0.2, release.set)
+    counters = consume_threaded(channel, 'jobs', handler, prefetch_count=9, max_workers=1,
+                                stop_event=stop, poll_interval=0.05, scheduler=scheduler)
+    assert counters == {'processed': 9, 'failed': 0}
+    # Em ordem de chegada as prioritárias seriam as quatro últimas; a primeira
+    # entrega pode ter sido retirada antes de as outras chegarem
+    assert [p for p in processed if p] == [9, 7, 4, 1]
+    assert processed.index(1) <= 4
+    assert scheduler.stats['reordered'] > 0
@@ -0,0 +1,104 @@
+"""
+Testes dos codecs e da compressão de mensagens (utils.serialization)
+"""
+import pika
+import pytest
+
+from utils import serialization
+from utils.serialization import (
+    DECODE_ERRORS, DEFLATE, ZDICT_PREFIX, available_codecs, compress_body, compress_for_publish,
+    decode_message, decompress_body, encode_message, register_zdict, train_zdict
+)
+
+MESSAGES = [
+    {'id': 1, 'type': 'CRITICAL', 'priority': 10, 'content': 'Mensagem ção ✅', 'ok': True, 'none': None},
+    {'nested': {'list': [1, -2, 3.5, 'x', [], {}], 'big': 2 ** 62, 'negative': -(2 ** 40)}},
+    [],
+    'texto',
+    -17
+]
+
+@pytest.mark.parametrize('content_type', available_codecs())
+@pytest.mark.parametrize('message', MESSAGES)
+def test_codecs_round_trip(content_type, message):
+    body, announced = encode_message(message, content_type)
+    assert isinstance(body, bytes) and announced == content_type
+    assert decode_message(body, pika.BasicProperties(content_type=announced)) == message
+
+def test_binary_codec_keeps_bytes_and_is_smaller_than_json():
+    message = {'id': 123456, 'payload': b'\x00\x01', 'values': list(range(50))}
+    body, content_type = encode_message(message, 'application/x-compact-binary')
+    assert decode_message(body, pika.BasicProperties(content_type=content_type)) == message
+    json_body, _ = encode_message({**message, 'payload': 'AAE='})
+    assert len(body) < len(json_body)
+
+def test_missing_content_type_is_json():
+    body, _ = encode_message({'a': 1})
+    assert decode_message(body, None) == {'a': 1}
+    assert body == b'{"a":1}'
+
+@pytest.mark.parametrize('body, content_type', [
+    (b'{quebrado', 'application/json'),
+    (b'\xff\xfe', 'application/json'),
+    (encode_message({'a': [1, 2, 3]}, 'application/x-compact-binary')[0][:-2], 'application/x-compact-binary'),
+    (encode_message({'a': 1}, 'application/x-compact-binary')[0] + b'\x00', 'application/x-compact-binary'),
+    (b'{}', 'application/x-desconhecido'),
+])
+def test_invalid_bodies_raise_decode_errors(body, content_type):
+    with pytest.raises(DECODE_ERRORS):
+        decode_message(body, pika.BasicProperties(content_type=content_type))
+
+def large_message():
+    return {'records': [{'id': n, 'type': 'CRITICAL', 'content': f'Mensagem {n}', 'scenario': 'priority'}
+                        for n in range(200)]}
+
+def test_compress_for_publish_round_trip_without_touching_the_caller_properties():
+    body, content_type = encode_message(large_message())
+    properties = pika.BasicProperties(content_type=content_type, delivery_mode=2)
+    compressed, sent = compress_for_publish(body, properties, threshold=100)
+    assert sent.content_encoding == DEFLATE and len(compressed) < len(body)
+    assert properties.content_encoding is None and sent is not properties
+    assert sent.delivery_mode == 2
+    assert decode_message(compressed, sent) == large_message()
+
+def test_small_bodies_and_disabled_compression_are_unchanged(monkeypatch):
+    monkeypatch.delenv('MESSAGE_COMPRESS_THRESHOLD', raising=False)
+    body, _ = encode_message({'a': 1})
+    properties = pika.BasicProperties()
+    assert compress_for_publish(body, properties) == (body, properties)
+    assert compress_for_publish(body, properties, threshold=1000) == (body, properties)
+
+def test_zdict_beats_plain_deflate_on_small_payloads():
+    body, content_type = encode_message({'id': 7, 'type': 'CRITICAL', 'priority': 10,
+                                        'content': 'Mensagem crítica', 'timestamp': '2025-01-01T00:00:00.000000',
+                                        'scenario': 'priority'})
+    plain, _ = compress_body(body)
+    with_zdict, encoding = compress_body(body, zdict_name='scenarios-v1')
+    assert encoding == ZDICT_PREFIX + 'scenarios-v1' and len(with_zdict) < len(plain)
+    properties = pika.BasicProperties(content_type=content_type, content_encoding=encoding)
+    assert decode_message(with_zdict, properties) == decode_message(body, None)
+
+def test_trained_zdict_must_be_registered_on_both_sides(monkeypatch):
+    monkeypatch.setattr('utils.serialization._ZDICTS', dict(serialization._ZDICTS))
+    samples = [encode_message({'order': n, 'region': 'eu', 'status': 'shipped'})[0] for n in range(20)]
+    register_zdict('orders-test', train_zdict(samples))
+    compressed, encoding = compress_body(samples[0], zdict_name='orders-test')
+    assert decompress_body(compressed, encoding) == samples[0]
+    with pytest.raises(ValueError):
+        decompress_body(compressed, ZDICT_PREFIX + 'nao-registrado')
+    with pytest.raises(ValueError):
+        register_zdict('com:dois-pontos', b'x')
+
+def test_decompression_is_bounded(monkeypatch):
+    """Um corpo que infla além de MAX_DECOMPRESSED_SIZE é recusado (zip bomb)"""
+    monkeypatch.setattr('utils.serialization.MAX_DECOMPRESSED_SIZE', 1024)
+    compressed, encoding = compress_body(b'0' * 4096)
+    with pytest.raises(DECODE_ERRORS):
+        decode_message(compressed, pika.BasicProperties(content_encoding=encoding))
+    small, encoding = compress_body(b'0' * 1024)
+    assert decompress_body(small, encoding) == b'0' * 1024
+
+def test_corrupted_compressed_body_raises_decode_errors():
+    compressed, encoding = compress_body(encode_message(large_message())[0])
+    with pytest.raises(DECODE_ERRORS):
+        decode_message(compressed[:-20] + b'\x00' * 20, pika.BasicProperties(content_encoding=encoding))
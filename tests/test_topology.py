@@ -0,0 +1,69 @@
+"""
+Testes da declaração de topologia em pipeline (utils.topology) no broker em memória
+"""
+import pika
+import pytest
+
+from utils.memory_broker import MemoryBroker, connect
+from utils.retry import RetryPolicy
+from utils.topology import declare
+
+QUEUES = [{'name': 'orders'}, {'name': 'audit'}]
+EXCHANGES = [{'name': 'orders_exchange', 'type': 'direct'}]
+BINDINGS = [{'exchange': 'orders_exchange', 'queue': 'orders', 'routing_key': 'new'},
+            {'exchange': 'orders_exchange', 'queue': 'audit', 'routing_key': 'new'}]
+
+def record_sends(channel):
+    sent = []
+    send_method = channel._impl._send_method
+
+    def wrapper(method):
+        sent.append(method)
+        send_method(method)
+
+    channel._impl._send_method = wrapper
+    return sent
+
+def test_pipelined_declare_sends_nowait_methods_and_one_barrier(channel, broker):
+    """Todas as declarações menos a última vão por _send_method com nowait"""
+    sent = record_sends(channel)
+    assert declare(channel, EXCHANGES, QUEUES, BINDINGS) == 5
+    assert len(sent) == 4 and all(method.nowait for method in sent)
+    assert set(broker.queues) >= {'orders', 'audit'}
+    assert len(broker.exchanges['orders_exchange'].bindings) == 2
+    channel.basic_publish('orders_exchange', 'new', b'{}')
+    assert broker.message_count('orders') == 1 and broker.message_count('audit') == 1
+
+def test_cache_is_per_connection(channel, broker):
+    """A mesma conexão pula o que já declarou; outra conexão (ou outro broker) declara de novo"""
+    assert declare(channel, EXCHANGES, QUEUES, BINDINGS) == 5
+    assert declare(channel.connection.channel(), EXCHANGES, QUEUES, BINDINGS) == 0
+    other = connect(broker)
+    assert declare(other.channel(), EXCHANGES, QUEUES, BINDINGS) == 5
+    other.close()
+
+def test_retry_policy_declares_on_each_fresh_broker():
+    for _ in range(2):
+        connection = connect(MemoryBroker())
+        assert RetryPolicy('jobs', delays_ms=[1000, 5000]).declare(connection.channel()) > 0
+        connection.close()
+
+def test_failing_declare_surfaces_at_the_barrier(channel, broker):
+    """O erro de uma declaração nowait só aparece na barreira síncrona e nada entra no cache"""
+    channel.queue_declare('orders', durable=False)
+    sent = record_sends(channel)
+    with pytest.raises(pika.exceptions.ChannelClosedByBroker) as error:
+        declare(channel, EXCHANGES, QUEUES, BINDINGS)
+    assert error.value.reply_code == 406
+    # A falha não interrompeu o envio em pipeline; o canal fechou
+    assert len(sent) == 4 and channel.is_closed
+    assert 'audit' not in broker.queues
+    retry_channel = channel.connection.channel()
+    with pytest.raises(pika.exceptions.ChannelClosedByBroker):
+        declare(retry_channel, queues=[{'name': 'orders'}])
+    assert declare(channel.connection.channel(), queues=[{'name': 'orders', 'durable': False}]) == 1
+
+def test_sequential_declare_without_pipeline(channel):
+    sent = record_sends(channel)
+    assert declare(channel, EXCHANGES, QUEUES, BINDINGS, pipelined=False) == 5
+    assert sent == []
@@ -0,0 +1,210 @@
+"""
+Testes dos runtimes de consumo (utils.workers) no broker em memória
+"""
+import atexit
+import logging
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from utils.common import setup_logging
+from utils.workers import PrefetchController, consume_batches, consume_in_processes
+
+QUEUE = 'work_queue'
+
+def slow_echo(message):
+    # Nível de módulo para ser serializável; as primeiras terminam por último
+    if message.get('fail'):
+        raise RuntimeError(f"falha na mensagem {message['n']}")
+    time.sleep(message['delay'])
+    return message['n']
+
+def record_acks(channel):
+    acks = []
+    basic_ack = channel.basic_ack
+
+    def wrapper(delivery_tag=0, multiple=False):
+        acks.append((delivery_tag, multiple))
+        basic_ack(delivery_tag=delivery_tag, multiple=multiple)
+
+    channel.basic_ack = wrapper
+    return acks
+
+def test_process_pool_acks_in_delivery_order(channel, broker, publish):
+    """Resultados fora de ordem viram ACKs múltiplos só do prefixo concluído"""
+    channel.queue_declare(QUEUE)
+    total = 8
+    publish(QUEUE, [{'n': n, 'delay': (total - n) * 0.03, 'fail': n == 5} for n in range(1, total + 1)])
+    acks = record_acks(channel)
+    results = []
+    stop = threading.Event()
+
+    def on_result(message, result, method, properties, inline):
+        results.append((method.delivery_tag, result, inline))
+        if len(results) == total - 1:
+            stop.set()
+
+    counters = consume_in_processes(channel, QUEUE, slow_echo, prefetch_count=total, max_workers=4,
+                                    on_result=on_result, stop_event=stop, requeue_on_error=False,
+                                    poll_interval=0.05)
+
+    assert counters['processed'] == total - 1 and counters['failed'] == 1
+    assert [tag for tag, _, _ in results] == [1, 2, 3, 4, 6, 7, 8]
+    assert [result for _, result, _ in results] == [1, 2, 3, 4, 6, 7, 8]
+    # O ACK múltiplo antes do NACK não pode cobrir a entrega que falhou
+    assert (4, True) in acks and acks[-1] == (8, True)
+    assert all(tag != 5 for tag, _ in acks)
+    assert channel.is_open and broker.message_count(QUEUE) == 0
+
+def test_process_pool_runs_large_bodies_inline(channel, broker, publish):
+    """Corpos acima de max_pickle_bytes rodam na thread local e chegam com inline=True"""
+    channel.queue_declare(QUEUE)
+    publish(QUEUE, [{'n': 1, 'delay': 0.05},
+                    {'n': 2, 'delay': 0, 'padding': 'x' * 500},
+                    {'n': 3, 'delay': 0}])
+    results = []
+    stop = threading.Event()
+
+    def on_result(message, result, method, properties, inline):
+        results.append((result, inline))
+        if len(results) == 3:
+            stop.set()
+
+    counters = consume_in_processes(channel, QUEUE, slow_echo, max_workers=2, max_pickle_bytes=200,
+                                    on_result=on_result, stop_event=stop, poll_interval=0.05)
+
+    assert results == [(1, False), (2, True), (3, False)]
+    assert counters['inline'] == 1 and counters['processed'] == 3
+    assert broker.message_count(QUEUE) == 0
+
+def test_batches_split_until_the_failing_message(channel, broker, publish):
+    """Um lote com erro é dividido até isolar a mensagem problemática"""
+    channel.queue_declare(QUEUE)
+    publish(QUEUE, [{'n': n} for n in range(1, 9)])
+    calls = []
+    stop = threading.Event()
+
+    def handler(batch):
+        calls.append([method.delivery_tag for method, _, _ in batch])
+        if any(method.delivery_tag == 6 for method, _, _ in batch):
+            raise ValueError("mensagem 6 inválida")
+        if sum(len(call) for call in calls if 6 not in call) == 7:
+            stop.set()
+
+    counters = consume_batches(channel, QUEUE, handler, batch_size=8, max_wait_ms=50,
+                               stop_event=stop, requeue_on_error=False)
+
+    assert calls == [[1, 2, 3, 4, 5, 6, 7, 8], [1, 2, 3, 4], [5, 6, 7, 8], [5, 6], [5], [6], [7, 8]]
+    assert counters == {'processed': 7, 'failed': 1, 'rejected': 0, 'batches': 1, 'acks': 3}
+    assert channel.is_open and broker.message_count(QUEUE) == 0
+
+def test_batches_nack_rejected_tags_before_the_multiple_ack(channel, broker, publish):
+    """Tags devolvidos pelo handler recebem NACK sem requeue e vão para a fila de mortas"""
+    channel.queue_declare(f'{QUEUE}.dead')
+    channel.queue_declare(QUEUE, arguments={'x-dead-letter-exchange': '',
+                                            'x-dead-letter-routing-key': f'{QUEUE}.dead'})
+    publish(QUEUE, [{'n': 1}, b'{quebrado', {'n': 3}, b'\xff'])
+    stop = threading.Event()
+
+    def handler(batch):
+        stop.set()
+        return [method.delivery_tag for method, _, body in batch if not body.startswith(b'{"')]
+
+    counters = consume_batches(channel, QUEUE, handler, batch_size=4, max_wait_ms=50, stop_event=stop)
+
+    assert counters == {'processed': 2, 'failed': 0, 'rejected': 2, 'batches': 1, 'acks': 1}
+    assert channel.is_open
+    assert broker.message_count(QUEUE) == 0 and broker.message_count(f'{QUEUE}.dead') == 2
+
+def log_from_child(message):
+    logger = logging.getLogger('tests_pool')
+    logger.info(f"processando {message['n']}")
+    return [type(handler).__name__ for handler in logger.handlers]
+
+def test_process_pool_logs_without_the_parent_listener(channel, broker, publish, capfd):
+    """Com LOG_ASYNC, o filho escreve direto no handler do console em vez da fila sem listener"""
+    logger = setup_logging('tests', 'pool', async_logging=True)
+    channel.queue_declare(QUEUE)
+    publish(QUEUE, [{'n': 1}])
+    results = []
+    stop = threading.Event()
+
+    def on_result(message, result, method, properties, inline):
+        results.append(result)
+        stop.set()
+
+    try:
+        consume_in_processes(channel, QUEUE, log_from_child, max_workers=1,
+                             on_result=on_result, stop_event=stop, poll_interval=0.05)
+    finally:
+        listener = logger._queue_listener
+        atexit.unregister(listener.stop)
+        listener.stop()
+        logger.handlers.clear()
+
+    assert results == [['StreamHandler']]
+    assert 'processando 1' in capfd.readouterr().out
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Relógio controlado pelo teste; cada basic_qos leva 50ms de round trip"""
+    state = SimpleNamespace(now=0.0, perf=0.0)
+
+    def perf_counter():
+        state.perf += 0.025
+        return state.perf
+
+    monkeypatch.setattr('utils.workers.time', SimpleNamespace(
+        monotonic=lambda: state.now, perf_counter=perf_counter, sleep=time.sleep))
+    return state
+
+def test_prefetch_waits_for_the_interval(channel, clock):
+    controller = PrefetchController(channel, concurrency=2, interval=5.0)
+    controller.start()
+    assert channel._global_prefetch == 2
+    controller.record_service_time(0.1)
+    clock.now = 4.9
+    assert not controller.maybe_adjust()
+    assert controller.prefetch_count == 2
+
+def test_prefetch_follows_littles_law(channel, clock):
+    """Sem ACKs no intervalo, a janela cobre concurrency/S * (S + R) com headroom"""
+    controller = PrefetchController(channel, concurrency=2, interval=5.0)
+    controller.start()
+    assert controller.rtt == pytest.approx(0.025)
+    controller.record_service_time(0.1)
+    clock.now = 5.0
+    assert controller.maybe_adjust()
+    # 20 msg/s * 125ms = 2.5 em trânsito, * 1.25 = 3.125
+    assert controller.prefetch_count == channel._global_prefetch == 4
+    assert controller.get_metrics()['adjustments'] == 1
+
+def test_prefetch_shrinks_to_the_acked_throughput(channel, clock):
+    """Um worker que confirma menos do que consegue não retém mensagens além de concurrency"""
+    controller = PrefetchController(channel, concurrency=2, initial_prefetch=10, interval=5.0)
+    controller.start()
+    controller.record_service_time(0.1)
+    for _ in range(10):
+        controller.record_ack()
+    clock.now = 5.0
+    assert controller.maybe_adjust()
+    assert controller.ack_rate == pytest.approx(2.0)
+    assert controller.prefetch_count == 3
+
+def test_prefetch_is_clamped_and_smoothed(channel, clock):
+    controller = PrefetchController(channel, concurrency=50, max_prefetch=60, interval=1.0)
+    controller.start()
+    controller.record_service_time(0.01)
+    controller.record_service_time(0.02)
+    assert controller.service_time == pytest.approx(0.012)
+    clock.now = 1.0
+    controller.maybe_adjust()
+    assert controller.prefetch_count == 60
+
+@pytest.mark.parametrize('params', [{'concurrency': 0}, {'min_prefetch': 0},
+                                    {'min_prefetch': 10, 'max_prefetch': 5}])
+def test_prefetch_rejects_invalid_parameters(channel, params):
+    with pytest.raises(ValueError):
+        PrefetchController(channel, **params)
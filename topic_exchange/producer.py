@@ -17,6 +17,10 @@ from utils.common import (
     setup_logging, get_rabbitmq_connection, create_exchange_and_queue,
     log_message_sent, print_scenario_header, print_config_info
 )
+from utils.batching import create_batching_publisher
+from utils.loadgen import INTENDED_HEADER, create_load_generator, format_load_stats
+from utils.routing import TopicTrie
+from utils.serialization import compress_for_publish
 
 def main():
     # Configurações do cenário
@@ -70,17 +74,37 @@ def main():
             durable=True
         )
         
+        # Bindings conhecidos (manifesto de topologia) para prever o destino de cada key
+        router = TopicTrie.from_topology(SCENARIO_NAME, exchange=EXCHANGE_NAME)
+        # Com SKIP_UNROUTABLE=1 keys sem fila de destino não são publicadas
+        skip_unroutable = os.getenv('SKIP_UNROUTABLE', '0').lower() in ('1', 'true', 'yes')
+        unroutable = [0]
+        
         logger.info("Producer iniciado. Enviando mensagens com padrões variados...")
         logger.info("Padrões de routing key:")
         for pattern in ROUTING_PATTERNS:
-            logger.info(f"  - {pattern}")
+            queues = router.match(pattern)
+            logger.info(f"  - {pattern} → {', '.join(queues) if queues else 'nenhuma fila (descartada pelo broker)'}")
         logger.info("Pressione Ctrl+C para parar")
         
-        message_count = 1
+        # Lotes por routing key com linger (PUBLISH_BATCH_SIZE, PUBLISH_LINGER_MS, PUBLISH_CONFIRM)
+        publisher = create_batching_publisher(channel, logger=logger)
         
-        while True:
+        def publish_message(message_count, intended_ns=None):
+            """
+            Monta e publica a mensagem message_count
+            
+            Com intended_ns (gerador de carga) grava o instante pretendido no
+            header e não registra a mensagem no log
+            """
             # Escolhe uma routing key aleatória
             routing_key = random.choice(ROUTING_PATTERNS)
+            if not router.is_routable(routing_key):
+                unroutable[0] += 1
+                if intended_ns is None:
+                    logger.warning(f"Routing key '{routing_key}' não casa com nenhum binding conhecido")
+                if skip_unroutable:
+                    return
             
             # Extrai informações da routing key
             parts = routing_key.split('.')
@@ -102,37 +126,64 @@ def main():
             
             message_body = json.dumps(message_data, ensure_ascii=False)
             
+            headers = {
+                'category': category,
+                'subcategory': subcategory,
+                'detail': detail
+            }
+            if intended_ns is not None:
+                headers[INTENDED_HEADER] = intended_ns
+            
             # Propriedades da mensagem
             properties = pika.BasicProperties(
                 delivery_mode=2,  # Mensagem persistente
                 content_type='application/json',
                 timestamp=int(time.time()),
-                headers={
-                    'category': category,
-                    'subcategory': subcategory,
-                    'detail': detail
-                }
+                headers=headers
             )
             
+            body, properties = compress_for_publish(message_body, properties)
+            
             # Publica a mensagem
-            channel.basic_publish(
+            publisher.publish(
                 exchange=EXCHANGE_NAME,
                 routing_key=routing_key,
-                body=message_body,
+                body=body,
                 properties=properties
             )
+            if intended_ns is not None:
+                return
             
             log_message_sent(logger, EXCHANGE_NAME, routing_key, message_body, properties)
             logger.info(f"Enviado: {category}.{subcategory}.{detail}")
+        
+        load = create_load_generator(publish_message, sleep=connection.sleep)
+        if load is not None:
+            # Carga em malha aberta (LOAD_RATE/LOAD_PROFILE), sem logs por mensagem
+            logger.info(f"Gerador de carga: {load.rate:.0f} msg/s, perfil {load.profile}")
+            stats = load.run()
+            publisher.close()
+            logger.info(f"Carga concluída: {format_load_stats(stats)}")
+            logger.info(f"Lotes: {publisher.get_stats()}")
+            logger.info(f"Sem fila de destino: {unroutable[0]} mensagens"
+                        f"{' (não publicadas)' if skip_unroutable else ''}")
+            return
+        
+        message_count = 1
+        
+        while True:
+            publish_message(message_count)
             
             message_count += 1
-            time.sleep(2)  # Pausa entre mensagens
+            connection.sleep(2)  # Pausa entre mensagens (dispara o linger dos lotes)
             
     except KeyboardInterrupt:
         logger.info("Parando producer...")
     except Exception as e:
         logger.error(f"Erro no producer: {str(e)}")
     finally:
+        if 'publisher' in locals() and connection.is_open:
+            publisher.close()
         if 'connection' in locals() and not connection.is_closed:
             connection.close()
             logger.info("Conexão fechada")
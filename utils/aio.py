@@ -0,0 +1,267 @@
+"""
+Camada asyncio para o projeto RabbitMQ
+
+Contrapartida assíncrona de get_rabbitmq_connection/create_exchange_and_queue,
+construída sobre o AsyncioConnection do pika, e um loop de consumo que executa
+handlers `async def` concorrentemente até o limite do prefetch (basic_qos).
+"""
+import asyncio
+import logging
+import os
+from typing import Any, Awaitable, Callable, Dict, Optional, Set
+
+import pika
+from pika.adapters.asyncio_connection import AsyncioConnection
+
+from utils.common import get_connection_parameters
+
+# Handler assíncrono: recebe (method, properties, body)
+AsyncHandler = Callable[[Any, pika.BasicProperties, bytes], Awaitable[None]]
+
+class AsyncChannel:
+    """
+    Envelope de um canal pika que expõe as operações RPC como corrotinas
+
+    Operações pendentes falham com ConnectionError se o canal for fechado
+    (por exemplo, PRECONDITION_FAILED em um declare), em vez de ficarem
+    aguardando para sempre.
+    """
+
+    def __init__(self, channel: pika.channel.Channel):
+        self.channel = channel
+        self._pending: Set[asyncio.Future] = set()
+        self._close_reason: Optional[Exception] = None
+        channel.add_on_close_callback(self._on_close)
+
+    @property
+    def is_open(self) -> bool:
+        return self.channel.is_open
+
+    def _on_close(self, channel, reason) -> None:
+        self._close_reason = reason
+        for future in list(self._pending):
+            if not future.done():
+                future.set_exception(ConnectionError(f"Canal fechado: {reason}"))
+        self._pending.clear()
+
+    async def _call(self, method: Callable, **kwargs) -> Any:
+        if self._close_reason is not None:
+            raise ConnectionError(f"Canal fechado: {self._close_reason}")
+
+        future = asyncio.get_running_loop().create_future()
+        self._pending.add(future)
+
+        def on_done(frame):
+            self._pending.discard(future)
+            if not future.done():
+                future.set_result(frame)
+
+        method(callback=on_done, **kwargs)
+        return await future
+
+    async def exchange_declare(self, exchange: str, exchange_type: str, durable: bool = True,
+                               arguments: Optional[Dict[str, Any]] = None) -> Any:
+        return await self._call(self.channel.exchange_declare, exchange=exchange,
+                                exchange_type=exchange_type, durable=durable,
+                                arguments=arguments)
+
+    async def queue_declare(self, queue: str, durable: bool = True,
+                            arguments: Optional[Dict[str, Any]] = None) -> Any:
+        return await self._call(self.channel.queue_declare, queue=queue,
+                                durable=durable, arguments=arguments)
+
+    async def queue_bind(self, queue: str, exchange: str, routing_key: str = '',
+                         arguments: Optional[Dict[str, Any]] = None) -> Any:
+        return await self._call(self.channel.queue_bind, queue=queue, exchange=exchange,
+                                routing_key=routing_key, arguments=arguments)
+
+    async def basic_qos(self, prefetch_count: int) -> Any:
+        return await self._call(self.channel.basic_qos, prefetch_count=prefetch_count)
+
+    async def basic_cancel(self, consumer_tag: str) -> Any:
+        return await self._call(self.channel.basic_cancel, consumer_tag=consumer_tag)
+
+    def basic_publish(self, exchange: str, routing_key: str, body: bytes,
+                      properties: Optional[pika.BasicProperties] = None) -> None:
+        # Publish é assíncrono no protocolo (sem resposta do broker)
+        self.channel.basic_publish(exchange=exchange, routing_key=routing_key,
+                                   body=body, properties=properties)
+
+async def get_async_rabbitmq_connection() -> AsyncioConnection:
+    """
+    Cria conexão assíncrona com RabbitMQ usando variáveis de ambiente
+
+    O broker em memória (RABBITMQ_BACKEND=memory) só tem a interface do
+    BlockingConnection e não é aceito aqui.
+
+    Returns:
+        Conexão AsyncioConnection aberta no event loop atual
+
+    Raises:
+        ConnectionError: Se não conseguir conectar
+        ValueError: Com RABBITMQ_BACKEND=memory
+    """
+    if os.getenv('RABBITMQ_BACKEND', 'amqp').lower() == 'memory':
+        raise ValueError("RABBITMQ_BACKEND=memory não suporta a camada asyncio "
+                         "(use get_rabbitmq_connection)")
+
+    loop = asyncio.get_running_loop()
+    parameters = get_connection_parameters()
+    opened = loop.create_future()
+
+    def on_open(connection):
+        if not opened.done():
+            opened.set_result(connection)
+
+    def on_open_error(connection, error):
+        if not opened.done():
+            opened.set_exception(ConnectionError(
+                f"Falha ao conectar com RabbitMQ em {parameters.host}:{parameters.port} - {str(error)}"
+            ))
+
+    AsyncioConnection(
+        parameters,
+        on_open_callback=on_open,
+        on_open_error_callback=on_open_error,
+        custom_ioloop=loop
+    )
+    return await opened
+
+async def open_async_channel(connection: AsyncioConnection) -> AsyncChannel:
+    """
+    Abre um canal na conexão assíncrona
+
+    Args:
+        connection: Conexão retornada por get_async_rabbitmq_connection
+
+    Returns:
+        Canal envolvido em AsyncChannel
+
+    Raises:
+        ConnectionError: Se o canal (ou a conexão) fechar antes de abrir
+    """
+    opened = asyncio.get_running_loop().create_future()
+
+    def on_open(channel):
+        if not opened.done():
+            opened.set_result(channel)
+
+    def on_close(channel, reason):
+        if not opened.done():
+            opened.set_exception(ConnectionError(f"Canal fechado antes de abrir: {reason}"))
+
+    channel = connection.channel(on_open_callback=on_open)
+    channel.add_on_close_callback(on_close)
+    return AsyncChannel(await opened)
+
+async def close_async_connection(connection: AsyncioConnection) -> None:
+    """
+    Fecha a conexão assíncrona e aguarda a confirmação do broker
+    """
+    if connection.is_closed or connection.is_closing:
+        return
+
+    closed = asyncio.get_running_loop().create_future()
+    connection.add_on_close_callback(
+        lambda conn, reason: closed.done() or closed.set_result(reason)
+    )
+    connection.close()
+    await closed
+
+async def create_exchange_and_queue_async(channel: AsyncChannel,
+                                          exchange_name: str,
+                                          exchange_type: str,
+                                          queue_name: str,
+                                          routing_key: str = '',
+                                          queue_arguments: Optional[Dict[str, Any]] = None,
+                                          durable: bool = True) -> None:
+    """
+    Cria exchange e fila de forma idempotente (versão assíncrona)
+
+    Mesma semântica de utils.common.create_exchange_and_queue.
+
+    Args:
+        channel: Canal assíncrono
+        exchange_name: Nome do exchange
+        exchange_type: Tipo do exchange (direct, fanout, topic, headers)
+        queue_name: Nome da fila
+        routing_key: Chave de roteamento para binding
+        queue_arguments: Argumentos adicionais da fila
+        durable: Se exchange e fila devem ser duráveis
+    """
+    await channel.exchange_declare(exchange_name, exchange_type, durable=durable)
+    await channel.queue_declare(queue_name, durable=durable, arguments=queue_arguments or {})
+
+    # Cria binding se routing_key fornecida (não se aplica a fanout)
+    if routing_key or exchange_type != 'fanout':
+        await channel.queue_bind(queue_name, exchange_name, routing_key=routing_key)
+
+async def consume_async(channel: AsyncChannel,
+                        queue: str,
+                        handler: AsyncHandler,
+                        prefetch_count: int = 1,
+                        stop_event: Optional[asyncio.Event] = None,
+                        requeue_on_error: bool = True,
+                        logger: Optional[logging.Logger] = None) -> Dict[str, int]:
+    """
+    Consome uma fila executando handlers assíncronos concorrentemente
+
+    Cada entrega vira uma task; como o broker respeita o basic_qos, até
+    prefetch_count handlers ficam em execução ao mesmo tempo. O ACK é feito
+    após o handler terminar com sucesso; exceções geram NACK.
+
+    Args:
+        channel: Canal assíncrono
+        queue: Nome da fila
+        handler: Corrotina (method, properties, body) - não deve fazer ack
+        prefetch_count: Janela de mensagens não confirmadas (>= 1)
+        stop_event: Evento que encerra o consumo quando sinalizado
+        requeue_on_error: Se mensagens com erro voltam para a fila
+        logger: Logger para erros dos handlers
+
+    Returns:
+        Contadores {'processed', 'failed'} ao final do consumo
+    """
+    if prefetch_count < 1:
+        raise ValueError("prefetch_count deve ser >= 1 para limitar a concorrência")
+
+    logger = logger or logging.getLogger(__name__)
+    loop = asyncio.get_running_loop()
+    stop_event = stop_event or asyncio.Event()
+    in_flight: Set[asyncio.Task] = set()
+    counters = {'processed': 0, 'failed': 0}
+
+    async def run_handler(method, properties, body):
+        try:
+            await handler(method, properties, body)
+        except Exception as e:
+            counters['failed'] += 1
+            logger.error(f"Erro no handler assíncrono (tag {method.delivery_tag}): {str(e)}")
+            if channel.is_open:
+                channel.channel.basic_nack(delivery_tag=method.delivery_tag, requeue=requeue_on_error)
+        else:
+            counters['processed'] += 1
+            if channel.is_open:
+                channel.channel.basic_ack(delivery_tag=method.delivery_tag)
+
+    def on_message(ch, method, properties, body):
+        task = loop.create_task(run_handler(method, properties, body))
+        in_flight.add(task)
+        task.add_done_callback(in_flight.discard)
+
+    # Encerra também se o canal cair
+    channel.channel.add_on_close_callback(lambda ch, reason: stop_event.set())
+
+    await channel.basic_qos(prefetch_count)
+    consumer_tag = channel.channel.basic_consume(queue=queue, on_message_callback=on_message)
+
+    try:
+        await stop_event.wait()
+    finally:
+        if channel.is_open:
+            await channel.basic_cancel(consumer_tag)
+        # Drena os handlers em andamento para que os ACKs sejam enviados
+        if in_flight:
+            await asyncio.gather(*in_flight, return_exceptions=True)
+
+    return counters
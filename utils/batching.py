@@ -0,0 +1,425 @@
+"""
+Publicação em lotes com linger (uma escrita no socket por lote)
+
+No BlockingChannel cada basic_publish grava três frames (método, header e
+corpo) no buffer de saída e espera o buffer esvaziar antes de retornar:
+três send() por mensagem, mais uma volta do ioloop. BatchingPublisher
+acumula as mensagens por (exchange, routing_key) e, quando um lote atinge
+max_messages ou max_bytes, ou a mensagem mais antiga completa linger_ms,
+serializa os frames de todos os lotes pendentes em um único bloco de bytes
+e o entrega ao transporte de uma vez (um send() por envio): o lote que
+disparou o envio leva junto os das outras chaves. O frame Basic.Publish de
+cada (exchange, routing_key) é serializado uma vez e reaproveitado.
+
+Com confirm=True o canal entra em modo confirm e cada lote espera suas
+confirmações (um round trip por lote, não por mensagem); mensagens com NACK
+voltam para o buffer até max_retries vezes.
+
+A ordem é preservada dentro de cada (exchange, routing_key); mensagens de
+chaves diferentes no mesmo envio saem agrupadas por chave.
+
+A escrita direta no transporte usa atributos internos do pika e fica
+isolada em _FrameWriter, que só é ativado no pika 1.x com esses atributos
+presentes; fora disso (outra versão, broker em memória) cada mensagem do
+lote é publicada pelo canal, sem coalescer as escritas. Enquanto o broker
+mantiver a conexão bloqueada (Connection.Blocked) nada é enviado.
+
+Uso típico:
+    publisher = BatchingPublisher(channel, max_messages=100, linger_ms=5)
+    publisher.publish(exchange, routing_key, body, properties)
+    ...
+    publisher.close()   # envia o que restou no buffer
+"""
+import logging
+import math
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import pika
+import pika.exceptions
+import pika.frame
+import pika.spec
+
+from utils.histogram import LatencyHistogram
+
+# (exchange, routing_key)
+BatchKey = Tuple[str, str]
+
+class _Batch:
+    __slots__ = ('messages', 'size', 'started_at')
+
+    def __init__(self):
+        # (body, properties, mandatory, tentativas)
+        self.messages: List[Tuple[bytes, pika.BasicProperties, bool, int]] = []
+        self.size = 0
+        self.started_at = 0.0
+
+class _FrameWriter:
+    """
+    Serializa os frames de Basic.Publish e os grava no transporte do pika
+    em uma única escrita
+
+    Único ponto do módulo que depende de atributos internos do pika
+    (_adapter_emit_data, _body_max_length, contadores de envio e
+    _flush_output); create() devolve None quando eles não estão disponíveis.
+    """
+
+    # Versões major do pika em que os atributos internos foram verificados
+    SUPPORTED_PIKA_MAJOR = (1,)
+    _REQUIRED = ('_adapter_emit_data', '_body_max_length', 'bytes_sent', 'frames_sent')
+
+    def __init__(self, channel, impl_connection):
+        self._channel_number = channel.channel_number
+        self._connection = channel.connection
+        self._impl_connection = impl_connection
+        self._publish_frames: Dict[Tuple[str, str, bool], bytes] = {}
+
+    @classmethod
+    def create(cls, channel) -> Optional['_FrameWriter']:
+        """
+        Returns:
+            O writer do canal, ou None se o pika instalado (ou o canal) não
+            oferece os atributos internos necessários
+        """
+        try:
+            major = int(pika.__version__.split('.')[0])
+        except (AttributeError, ValueError):
+            return None
+        if major not in cls.SUPPORTED_PIKA_MAJOR:
+            return None
+        impl_connection = getattr(getattr(channel, '_impl', None), 'connection', None)
+        if impl_connection is None or not all(hasattr(impl_connection, name) for name in cls._REQUIRED):
+            return None
+        if not callable(getattr(channel.connection, '_flush_output', None)):
+            return None
+        return cls(channel, impl_connection)
+
+    def _publish_frame(self, exchange: str, routing_key: str, mandatory: bool) -> bytes:
+        key = (exchange, routing_key, mandatory)
+        marshaled = self._publish_frames.get(key)
+        if marshaled is None:
+            method = pika.spec.Basic.Publish(exchange=exchange, routing_key=routing_key, mandatory=mandatory)
+            marshaled = self._publish_frames[key] = pika.frame.Method(self._channel_number, method).marshal()
+        return marshaled
+
+    def marshal(self, exchange: str, routing_key: str, body: bytes, properties: pika.BasicProperties,
+                mandatory: bool) -> List[bytes]:
+        """
+        Frames de método, header e corpo de uma mensagem
+        """
+        body_max_length = self._impl_connection._body_max_length
+        frames = [self._publish_frame(exchange, routing_key, mandatory),
+                  pika.frame.Header(self._channel_number, len(body), properties).marshal()]
+        # Corpos maiores que o frame_max são divididos, como em Connection._send_message
+        for chunk in range(int(math.ceil(len(body) / body_max_length))):
+            start = chunk * body_max_length
+            frames.append(pika.frame.Body(self._channel_number, body[start:start + body_max_length]).marshal())
+        return frames
+
+    def write(self, frames: List[bytes]) -> int:
+        """
+        Grava os frames no transporte de uma vez
+
+        Returns:
+            Bytes gravados
+        """
+        if self._impl_connection.is_closed:
+            raise pika.exceptions.ConnectionWrongStateError("Conexão fechada com mensagens no buffer")
+        data = b''.join(frames)
+        self._impl_connection.bytes_sent += len(data)
+        self._impl_connection.frames_sent += len(frames)
+        self._impl_connection._adapter_emit_data(data)
+        return len(data)
+
+    def flush(self, done: Optional[Callable[[], bool]] = None) -> None:
+        """
+        Escreve o buffer de saída (e espera done, se houver); mesmo caminho do
+        BlockingChannel.basic_publish, seguro dentro de callbacks da conexão
+        """
+        if done is None:
+            self._connection._flush_output()
+        else:
+            self._connection._flush_output(done)
+
+class BatchingPublisher:
+    """
+    Publisher que agrupa mensagens em lotes com limites de quantidade,
+    tamanho e tempo de espera (linger)
+
+    Não é thread-safe: deve ser usado na thread da conexão.
+
+    Args:
+        channel: BlockingChannel (não deve estar em modo confirm)
+        max_messages: Mensagens por lote de uma (exchange, routing_key)
+        max_bytes: Bytes de corpo por lote
+        linger_ms: Espera máxima da mensagem mais antiga no buffer
+        confirm: Se cada lote aguarda as confirmações do broker
+        max_retries: Republicações após NACK (com confirm)
+        logger: Logger para mensagens descartadas
+    """
+
+    def __init__(self,
+                 channel,
+                 max_messages: int = 100,
+                 max_bytes: int = 256 * 1024,
+                 linger_ms: float = 5.0,
+                 confirm: bool = False,
+                 max_retries: int = 3,
+                 logger: Optional[logging.Logger] = None):
+        if max_messages < 1 or max_bytes < 1 or linger_ms < 0:
+            raise ValueError("max_messages e max_bytes devem ser >= 1 e linger_ms >= 0")
+
+        self.channel = channel
+        self.connection = channel.connection
+        self.max_messages = max_messages
+        self.max_bytes = max_bytes
+        self.linger = linger_ms / 1000.0
+        self.confirm = confirm
+        self.max_retries = max_retries
+        self.logger = logger or logging.getLogger(__name__)
+
+        self._batches: 'OrderedDict[BatchKey, _Batch]' = OrderedDict()
+        self._linger_scheduled = False
+        self._failed: List[Tuple[str, str, bytes, pika.BasicProperties]] = []
+        self.max_batch = 0
+        self.confirm_times = LatencyHistogram()
+        self.counters = {'published': 0, 'sent': 0, 'batches': 0, 'writes': 0, 'bytes': 0,
+                         'confirmed': 0, 'nacked': 0, 'retried': 0, 'failed': 0}
+
+        # Escrita direta no transporte quando o pika permite; senão cada
+        # mensagem do lote é publicada pelo canal interno, sem coalescer
+        self._impl = channel._impl
+        self._writer = _FrameWriter.create(channel)
+
+        # Connection.Blocked: o broker parou de ler a conexão (alarme de memória/disco)
+        self._blocked = False
+        self.connection.add_on_connection_blocked_callback(self._on_blocked)
+        self.connection.add_on_connection_unblocked_callback(self._on_unblocked)
+
+        # Com confirm: delivery_tag -> (exchange, routing_key, body, properties, mandatory, tentativas)
+        self._next_tag = 1
+        self._unconfirmed: 'OrderedDict[int, tuple]' = OrderedDict()
+        self._retries: List[tuple] = []
+        if confirm:
+            selected = []
+            self._impl.confirm_delivery(self._on_confirm, callback=lambda frame: selected.append(frame))
+            self._flush_io(lambda: bool(selected))
+
+    def __enter__(self) -> 'BatchingPublisher':
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.close()
+
+    @property
+    def pending(self) -> int:
+        """Mensagens no buffer, ainda não enviadas"""
+        return sum(len(batch.messages) for batch in self._batches.values())
+
+    def publish(self,
+                exchange: str,
+                routing_key: str,
+                body,
+                properties: Optional[pika.BasicProperties] = None,
+                mandatory: bool = False) -> None:
+        """
+        Adiciona uma mensagem ao lote de (exchange, routing_key)
+
+        O lote é enviado na hora se atingir max_messages ou max_bytes; os
+        demais saem quando a mensagem mais antiga completar linger_ms.
+        """
+        if isinstance(body, str):
+            body = body.encode('utf-8')
+        self.counters['published'] += 1
+        self._add(exchange, routing_key, body, properties or pika.BasicProperties(), mandatory, 0)
+        self.poll()
+
+    def _add(self, exchange: str, routing_key: str, body: bytes, properties: pika.BasicProperties,
+             mandatory: bool, attempts: int) -> None:
+        key = (exchange, routing_key)
+        batch = self._batches.get(key)
+        if batch is None:
+            batch = self._batches[key] = _Batch()
+            batch.started_at = time.monotonic()
+        batch.messages.append((body, properties, mandatory, attempts))
+        batch.size += len(body)
+        if len(batch.messages) >= self.max_messages or batch.size >= self.max_bytes:
+            self._send()
+        elif not self._linger_scheduled:
+            # Timer da conexão: dispara durante process_data_events/sleep mesmo sem novos publish
+            self._linger_scheduled = True
+            self.connection.call_later(self.linger, self._on_linger)
+
+    def _on_blocked(self, connection, frame) -> None:
+        self._blocked = True
+        self.logger.warning(f"Conexão bloqueada pelo broker ({frame.method.reason}); "
+                            f"{self.pending} mensagens aguardam no buffer")
+
+    def _on_unblocked(self, connection, frame) -> None:
+        self._blocked = False
+
+    def _on_linger(self) -> None:
+        self._linger_scheduled = False
+        self.poll()
+        if self._batches and not self._linger_scheduled:
+            self._linger_scheduled = True
+            oldest = min(batch.started_at for batch in self._batches.values())
+            self.connection.call_later(max(0.0, oldest + self.linger - time.monotonic()), self._on_linger)
+
+    def poll(self) -> bool:
+        """
+        Envia os lotes pendentes se algum já completou linger_ms
+
+        Returns:
+            True se houve envio
+        """
+        if self._blocked:
+            # O timer de linger tenta de novo; o envio não espera dentro do callback
+            return False
+        now = time.monotonic()
+        if any(now - batch.started_at >= self.linger for batch in self._batches.values()):
+            self._send()
+            return True
+        return False
+
+    def flush(self) -> None:
+        """
+        Envia todos os lotes pendentes e, com confirm, aguarda as confirmações
+        """
+        # Com confirm, mensagens com NACK voltam ao buffer durante o envio
+        while self._batches:
+            self._send()
+
+    def _check_writable(self) -> None:
+        if not self.channel.is_open:
+            raise pika.exceptions.ChannelWrongStateError("Canal fechado com mensagens no buffer")
+        # Bloqueada, a conexão não é lida pelo broker: espera o Unblocked (com
+        # blocked_connection_timeout o pika fecha a conexão e o erro sobe aqui)
+        while self._blocked and self.connection.is_open:
+            self.connection.process_data_events(time_limit=0.1)
+        if not self.channel.is_open:
+            raise pika.exceptions.ChannelWrongStateError("Canal fechado com mensagens no buffer")
+
+    def _send(self) -> None:
+        self._check_writable()
+
+        batches = list(self._batches.items())
+        self._batches.clear()
+        first_tag = self._next_tag
+        if self._writer is not None:
+            frames: List[bytes] = []
+            for (exchange, routing_key), batch in batches:
+                for body, properties, mandatory, attempts in batch.messages:
+                    frames.extend(self._writer.marshal(exchange, routing_key, body, properties, mandatory))
+                    self._track(exchange, routing_key, body, properties, mandatory, attempts)
+            self.counters['bytes'] += self._writer.write(frames)
+        else:
+            for (exchange, routing_key), batch in batches:
+                for body, properties, mandatory, attempts in batch.messages:
+                    self._impl.basic_publish(exchange=exchange, routing_key=routing_key, body=body,
+                                             properties=properties, mandatory=mandatory)
+                    self._track(exchange, routing_key, body, properties, mandatory, attempts)
+                    self.counters['bytes'] += len(body)
+
+        sent = self._next_tag - first_tag
+        self.counters['sent'] += sent
+        self.counters['batches'] += len(batches)
+        self.counters['writes'] += 1
+        self.max_batch = max([self.max_batch] + [len(batch.messages) for _, batch in batches])
+
+        if self.confirm:
+            self._wait_confirms()
+        else:
+            self._flush_io()
+
+    def _track(self, exchange: str, routing_key: str, body: bytes, properties: pika.BasicProperties,
+               mandatory: bool, attempts: int) -> None:
+        if self.confirm:
+            self._unconfirmed[self._next_tag] = (exchange, routing_key, body, properties, mandatory, attempts)
+        self._next_tag += 1
+
+    def _flush_io(self, done: Optional[Callable[[], bool]] = None) -> None:
+        # Escreve o buffer de saída e, se houver, espera done
+        if self._writer is not None:
+            self._writer.flush(done)
+            return
+        if done is None:
+            self.connection.process_data_events(time_limit=0)
+        while done is not None and not done() and self.connection.is_open:
+            self.connection.process_data_events(time_limit=1)
+
+    def _wait_confirms(self) -> None:
+        started = time.perf_counter()
+        self._flush_io(lambda: not self._unconfirmed)
+        self.confirm_times.record(time.perf_counter() - started)
+        # NACKs voltam para o buffer fora do callback de confirmação
+        retries, self._retries = self._retries, []
+        for exchange, routing_key, body, properties, mandatory, attempts in retries:
+            self._add(exchange, routing_key, body, properties, mandatory, attempts)
+
+    def _on_confirm(self, frame) -> None:
+        method = frame.method
+        if method.multiple:
+            tags = [tag for tag in self._unconfirmed if tag <= method.delivery_tag]
+        else:
+            tags = [method.delivery_tag] if method.delivery_tag in self._unconfirmed else []
+
+        for tag in tags:
+            exchange, routing_key, body, properties, mandatory, attempts = self._unconfirmed.pop(tag)
+            if isinstance(method, pika.spec.Basic.Ack):
+                self.counters['confirmed'] += 1
+                continue
+            self.counters['nacked'] += 1
+            if attempts < self.max_retries:
+                # Volta para o buffer depois da espera (sai no próximo lote)
+                self.counters['retried'] += 1
+                self._retries.append((exchange, routing_key, body, properties, mandatory, attempts + 1))
+            else:
+                self.counters['failed'] += 1
+                self._failed.append((exchange, routing_key, body, properties))
+                self.logger.error(f"Mensagem descartada após {attempts} republicações "
+                                  f"(exchange={exchange}, routing_key={routing_key})")
+
+    def failed(self) -> List[Tuple[str, str, bytes, pika.BasicProperties]]:
+        """
+        Mensagens descartadas após esgotar as republicações
+
+        Returns:
+            Lista de (exchange, routing_key, body, properties)
+        """
+        return list(self._failed)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return dict(
+            self.counters,
+            pending=self.pending,
+            avg_batch=self.counters['sent'] / self.counters['batches'] if self.counters['batches'] else 0.0,
+            max_batch=self.max_batch,
+            messages_per_write=self.counters['sent'] / self.counters['writes'] if self.counters['writes'] else 0.0,
+            confirm_p99_ms=self.confirm_times.percentile(99) * 1000
+        )
+
+    def close(self) -> None:
+        """
+        Envia o que restou no buffer (o canal continua aberto)
+        """
+        if self.channel.is_open:
+            self.flush()
+
+def create_batching_publisher(channel, logger: Optional[logging.Logger] = None) -> BatchingPublisher:
+    """
+    Cria um BatchingPublisher a partir das variáveis de ambiente
+
+    PUBLISH_BATCH_SIZE (100), PUBLISH_BATCH_BYTES (262144), PUBLISH_LINGER_MS (5)
+    e PUBLISH_CONFIRM (0). PUBLISH_BATCH_SIZE=1 envia cada mensagem na hora.
+    """
+    return BatchingPublisher(
+        channel,
+        max_messages=int(os.getenv('PUBLISH_BATCH_SIZE', '100')),
+        max_bytes=int(os.getenv('PUBLISH_BATCH_BYTES', str(256 * 1024))),
+        linger_ms=float(os.getenv('PUBLISH_LINGER_MS', '5')),
+        confirm=os.getenv('PUBLISH_CONFIRM', '0').lower() in ('1', 'true', 'yes'),
+        logger=logger
+    )
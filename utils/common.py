@@ -3,52 +3,160 @@ Utilitários compartilhados para o projeto RabbitMQ
 """
 import os
 import pika
+import pika.exceptions
+import json
 import logging
+import logging.handlers
+import queue
+import random
 import sys
+import atexit
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
 from datetime import datetime
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Callable, Iterator, List
 
-def setup_logging(scenario_name: str, component_name: str) -> logging.Logger:
+from utils import memory_broker, topology
+
+class SamplingFilter(logging.Filter):
+    """
+    Filtro que deixa passar apenas uma fração dos registros de cada nível
+    
+    A amostragem é determinística (1 a cada N registros do nível), o que
+    evita sortear números aleatórios no caminho quente. Níveis sem taxa
+    configurada passam sempre.
+    """
+    
+    def __init__(self, rates: Dict[int, float]):
+        """
+        Args:
+            rates: Mapa nível -> fração a manter (0.0 a 1.0)
+        """
+        super().__init__()
+        self._every = {}
+        for level, rate in rates.items():
+            self._every[level] = 0 if rate <= 0 else max(1, round(1 / min(rate, 1.0)))
+        self._counters = dict.fromkeys(self._every, 0)
+    
+    def filter(self, record: logging.LogRecord) -> bool:
+        every = self._every.get(record.levelno)
+        if every is None:
+            return True
+        if every == 0:
+            return False
+        count = self._counters[record.levelno]
+        self._counters[record.levelno] = count + 1
+        return count % every == 0
+
+class JsonLinesFormatter(logging.Formatter):
+    """
+    Formata cada registro como uma linha JSON
+    """
+    
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'ts': datetime.fromtimestamp(record.created).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage()
+        }
+        if record.exc_info:
+            entry['exc_info'] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False)
+
+def _sample_rates_from_env() -> Dict[int, float]:
+    """Lê taxas de amostragem de LOG_SAMPLE_<NIVEL> (ex: LOG_SAMPLE_INFO=0.1)"""
+    rates = {}
+    for name in ('DEBUG', 'INFO', 'WARNING'):
+        value = os.getenv(f'LOG_SAMPLE_{name}')
+        if value:
+            rates[logging.getLevelName(name)] = float(value)
+    return rates
+
+def setup_logging(scenario_name: str,
+                  component_name: str,
+                  level: Optional[str] = None,
+                  json_format: Optional[bool] = None,
+                  async_logging: Optional[bool] = None,
+                  sample_rates: Optional[Dict[int, float]] = None) -> logging.Logger:
     """
     Configura logging padronizado para todos os componentes
     
+    Os parâmetros opcionais também podem vir do ambiente: LOG_LEVEL,
+    LOG_FORMAT=json, LOG_ASYNC=1 e LOG_SAMPLE_<NIVEL>=<fração>.
+    
     Args:
         scenario_name: Nome do cenário (ex: 'direct_exchange')
         component_name: Nome do componente (ex: 'producer', 'consumer1')
+        level: Nível mínimo de log (padrão: INFO)
+        json_format: Se deve emitir linhas JSON em vez de texto
+        async_logging: Se a escrita deve ocorrer em thread separada
+            (QueueHandler/QueueListener)
+        sample_rates: Fração de registros mantida por nível
+            (ex: {logging.INFO: 0.1})
     
     Returns:
         Logger configurado
     """
+    level = level or os.getenv('LOG_LEVEL', 'INFO')
+    if json_format is None:
+        json_format = os.getenv('LOG_FORMAT', 'text').lower() == 'json'
+    if async_logging is None:
+        async_logging = os.getenv('LOG_ASYNC', '0') == '1'
+    if sample_rates is None:
+        sample_rates = _sample_rates_from_env()
+    
     logger = logging.getLogger(f"{scenario_name}_{component_name}")
-    logger.setLevel(logging.INFO)
+    logger.setLevel(level.upper())
     
-    # Remove handlers existentes para evitar duplicação
+    # Remove handlers, filtros e listener anteriores para evitar duplicação
     for handler in logger.handlers[:]:
         logger.removeHandler(handler)
+    for log_filter in logger.filters[:]:
+        logger.removeFilter(log_filter)
+    previous_listener = getattr(logger, '_queue_listener', None)
+    if previous_listener is not None:
+        atexit.unregister(previous_listener.stop)
+        previous_listener.stop()
+        logger._queue_listener = None
     
     # Handler para console
     console_handler = logging.StreamHandler(sys.stdout)
-    console_handler.setLevel(logging.INFO)
     
     # Formato das mensagens
-    formatter = logging.Formatter(
-        '%(asctime)s - [%(name)s] - %(levelname)s - %(message)s',
-        datefmt='%Y-%m-%d %H:%M:%S'
-    )
+    if json_format:
+        formatter = JsonLinesFormatter()
+    else:
+        formatter = logging.Formatter(
+            '%(asctime)s - [%(name)s] - %(levelname)s - %(message)s',
+            datefmt='%Y-%m-%d %H:%M:%S'
+        )
     console_handler.setFormatter(formatter)
-    logger.addHandler(console_handler)
+    
+    if sample_rates:
+        logger.addFilter(SamplingFilter(sample_rates))
+    
+    if async_logging:
+        # A escrita no stdout acontece na thread do QueueListener
+        log_queue = queue.SimpleQueue()
+        listener = logging.handlers.QueueListener(log_queue, console_handler)
+        listener.start()
+        atexit.register(listener.stop)
+        logger._queue_listener = listener
+        logger.addHandler(logging.handlers.QueueHandler(log_queue))
+    else:
+        logger.addHandler(console_handler)
     
     return logger
 
-def get_rabbitmq_connection() -> pika.BlockingConnection:
+def get_connection_parameters() -> pika.ConnectionParameters:
     """
-    Cria conexão com RabbitMQ usando variáveis de ambiente
+    Monta os parâmetros de conexão a partir das variáveis de ambiente
     
     Returns:
-        Conexão ativa com RabbitMQ
-        
-    Raises:
-        ConnectionError: Se não conseguir conectar
+        Parâmetros de conexão do pika
     """
     # Carrega configurações do ambiente
     host = os.getenv('RABBITMQ_HOST', 'localhost')
@@ -56,23 +164,785 @@ def get_rabbitmq_connection() -> pika.BlockingConnection:
     username = os.getenv('RABBITMQ_USER', 'guest')
     password = os.getenv('RABBITMQ_PASSWORD', 'guest')
     vhost = os.getenv('RABBITMQ_VHOST', '/')
+    # 600s acomoda callbacks que bloqueiam a thread de I/O; consumers em
+    # utils.workers mantêm o loop ativo e podem usar valores menores
+    heartbeat = int(os.getenv('RABBITMQ_HEARTBEAT', '600'))
     
     # Parâmetros de conexão
     credentials = pika.PlainCredentials(username, password)
-    parameters = pika.ConnectionParameters(
+    return pika.ConnectionParameters(
         host=host,
         port=port,
         virtual_host=vhost,
         credentials=credentials,
-        heartbeat=600,
+        heartbeat=heartbeat,
         blocked_connection_timeout=300
     )
+
+def get_rabbitmq_connection() -> pika.BlockingConnection:
+    """
+    Cria conexão com RabbitMQ usando variáveis de ambiente
+    
+    Com RABBITMQ_BACKEND=memory retorna uma conexão com o broker em memória
+    do processo (utils.memory_broker), com a mesma interface.
+    
+    Returns:
+        Conexão ativa com RabbitMQ
+        
+    Raises:
+        ConnectionError: Se não conseguir conectar
+    """
+    if os.getenv('RABBITMQ_BACKEND', 'amqp').lower() == 'memory':
+        return memory_broker.connect()
+    
+    parameters = get_connection_parameters()
     
     try:
         connection = pika.BlockingConnection(parameters)
         return connection
     except Exception as e:
-        raise ConnectionError(f"Falha ao conectar com RabbitMQ em {host}:{port} - {str(e)}")
+        raise ConnectionError(f"Falha ao conectar com RabbitMQ em {parameters.host}:{parameters.port} - {str(e)}")
+
+class RabbitMQConnectionPool:
+    """
+    Pool de conexões e canais RabbitMQ
+    
+    Distribui canais entre várias conexões (sockets) respeitando um limite
+    de canais por conexão. Canais devolvidos ao pool são reutilizados e
+    conexões/canais fechados são descartados nas verificações de saúde.
+    
+    As conexões são BlockingConnection e, como no restante do projeto,
+    devem ser usadas pela mesma thread que as criou; o lock protege apenas
+    a contabilidade interna do pool.
+    """
+    
+    def __init__(self,
+                 max_connections: int = 4,
+                 max_channels_per_connection: int = 32,
+                 connection_factory: Optional[Callable[[], pika.BlockingConnection]] = None):
+        """
+        Args:
+            max_connections: Número máximo de conexões abertas pelo pool
+            max_channels_per_connection: Limite de canais em uso por conexão
+            connection_factory: Função que cria uma nova conexão
+                (padrão: get_rabbitmq_connection)
+        """
+        if max_connections < 1 or max_channels_per_connection < 1:
+            raise ValueError("max_connections e max_channels_per_connection devem ser >= 1")
+        
+        self.max_connections = max_connections
+        self.max_channels_per_connection = max_channels_per_connection
+        self._connection_factory = connection_factory or get_rabbitmq_connection
+        self._lock = threading.Lock()
+        
+        # Estado por conexão: canais emprestados e canais ociosos
+        self._connections: List[pika.BlockingConnection] = []
+        self._leased: Dict[int, List[Any]] = {}
+        self._idle: Dict[int, List[Any]] = {}
+        self._consuming: List[pika.BlockingConnection] = []
+        self._closed = False
+        self._stop_requested = False
+    
+    def _open_connection(self) -> pika.BlockingConnection:
+        connection = self._connection_factory()
+        self._connections.append(connection)
+        self._leased[id(connection)] = []
+        self._idle[id(connection)] = []
+        return connection
+    
+    def _discard_connection(self, connection: pika.BlockingConnection) -> None:
+        if connection in self._connections:
+            self._connections.remove(connection)
+        if connection in self._consuming:
+            self._consuming.remove(connection)
+        self._leased.pop(id(connection), None)
+        self._idle.pop(id(connection), None)
+    
+    def _pick_connection(self) -> pika.BlockingConnection:
+        """Escolhe a conexão menos carregada, abrindo uma nova se necessário"""
+        open_connections = [c for c in self._connections if c.is_open]
+        
+        least_loaded = min(
+            open_connections,
+            key=lambda c: len(self._leased[id(c)]),
+            default=None
+        )
+        
+        # Espalha os canais por novos sockets antes de multiplexar
+        if least_loaded is None or (
+            len(self._leased[id(least_loaded)]) > 0
+            and len(self._connections) < self.max_connections
+        ):
+            return self._open_connection()
+        
+        if len(self._leased[id(least_loaded)]) >= self.max_channels_per_connection:
+            raise RuntimeError(
+                f"Pool esgotado: {len(self._connections)} conexões com "
+                f"{self.max_channels_per_connection} canais cada"
+            )
+        
+        return least_loaded
+    
+    def acquire_channel(self):
+        """
+        Obtém um canal do pool, reutilizando canais ociosos quando possível
+        
+        Returns:
+            Canal aberto (BlockingChannel)
+            
+        Raises:
+            RuntimeError: Se o pool estiver fechado ou esgotado
+        """
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("Pool de conexões fechado")
+            
+            self._health_check_locked()
+            
+            # Reutiliza canal ocioso na conexão menos carregada
+            for connection in sorted(self._connections, key=lambda c: len(self._leased[id(c)])):
+                idle = self._idle[id(connection)]
+                if idle and len(self._leased[id(connection)]) < self.max_channels_per_connection:
+                    channel = idle.pop()
+                    self._leased[id(connection)].append(channel)
+                    return channel
+            
+            connection = self._pick_connection()
+            channel = connection.channel()
+            self._leased[id(connection)].append(channel)
+            return channel
+    
+    def release_channel(self, channel) -> None:
+        """
+        Devolve um canal ao pool para reutilização
+        
+        Args:
+            channel: Canal obtido com acquire_channel
+        """
+        with self._lock:
+            connection = channel.connection
+            leased = self._leased.get(id(connection))
+            if leased is None or channel not in leased:
+                return
+            
+            leased.remove(channel)
+            if channel.is_open and connection.is_open and not self._closed:
+                self._idle[id(connection)].append(channel)
+    
+    @contextmanager
+    def channel(self) -> Iterator[Any]:
+        """
+        Context manager que empresta um canal e o devolve ao final
+        
+        Yields:
+            Canal aberto (BlockingChannel)
+        """
+        channel = self.acquire_channel()
+        try:
+            yield channel
+        finally:
+            self.release_channel(channel)
+    
+    def consume(self,
+                queue: str,
+                on_message_callback: Callable,
+                prefetch_count: int = 1,
+                auto_ack: bool = False):
+        """
+        Registra um consumer em um canal dedicado do pool
+        
+        Cada fila recebe seu próprio canal (e QoS), distribuído entre as
+        conexões do pool. Use start_consuming() para processar as entregas.
+        
+        Args:
+            queue: Nome da fila
+            on_message_callback: Callback (ch, method, properties, body)
+            prefetch_count: Prefetch do canal dedicado
+            auto_ack: Se deve usar confirmação automática
+        
+        Returns:
+            Canal em que o consumer foi registrado
+        """
+        channel = self.acquire_channel()
+        channel.basic_qos(prefetch_count=prefetch_count)
+        channel.basic_consume(
+            queue=queue,
+            on_message_callback=on_message_callback,
+            auto_ack=auto_ack
+        )
+        
+        with self._lock:
+            if channel.connection not in self._consuming:
+                self._consuming.append(channel.connection)
+        
+        return channel
+    
+    def start_consuming(self, poll_interval: float = 0.05) -> None:
+        """
+        Processa entregas de todas as conexões com consumers registrados
+        
+        Args:
+            poll_interval: Tempo máximo de espera por conexão a cada volta
+        """
+        self._stop_requested = False
+        while self._consuming and not self._stop_requested:
+            # Alterna entre as conexões para que nenhum socket fique sem leitura
+            for connection in list(self._consuming):
+                if not connection.is_open:
+                    with self._lock:
+                        self._discard_connection(connection)
+                    continue
+                connection.process_data_events(time_limit=poll_interval)
+    
+    def stop_consuming(self) -> None:
+        """
+        Interrompe o loop de start_consuming
+        """
+        self._stop_requested = True
+    
+    def _health_check_locked(self) -> int:
+        removed = 0
+        for connection in list(self._connections):
+            if not connection.is_open:
+                self._discard_connection(connection)
+                removed += 1
+                continue
+            
+            self._idle[id(connection)] = [c for c in self._idle[id(connection)] if c.is_open]
+            self._leased[id(connection)] = [c for c in self._leased[id(connection)] if c.is_open]
+        
+        return removed
+    
+    def health_check(self) -> int:
+        """
+        Mantém conexões ociosas vivas (heartbeats) e descarta as fechadas
+        
+        Returns:
+            Número de conexões descartadas
+        """
+        with self._lock:
+            for connection in self._connections:
+                if connection.is_open and connection not in self._consuming:
+                    try:
+                        connection.process_data_events(time_limit=0)
+                    except Exception:
+                        pass
+            return self._health_check_locked()
+    
+    def stats(self) -> Dict[str, int]:
+        """
+        Retorna contadores do pool
+        """
+        with self._lock:
+            return {
+                'connections': len(self._connections),
+                'channels_leased': sum(len(c) for c in self._leased.values()),
+                'channels_idle': sum(len(c) for c in self._idle.values()),
+                'consuming_connections': len(self._consuming)
+            }
+    
+    def close(self) -> None:
+        """
+        Fecha todas as conexões do pool
+        """
+        with self._lock:
+            self._closed = True
+            for connection in list(self._connections):
+                if connection.is_open:
+                    try:
+                        connection.close()
+                    except Exception:
+                        pass
+                self._discard_connection(connection)
+    
+    def __enter__(self) -> 'RabbitMQConnectionPool':
+        return self
+    
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.close()
+
+_shared_pool: Optional[RabbitMQConnectionPool] = None
+_shared_pool_lock = threading.Lock()
+
+def get_connection_pool() -> RabbitMQConnectionPool:
+    """
+    Retorna o pool compartilhado do processo, criando-o na primeira chamada
+    
+    Os limites vêm de RABBITMQ_POOL_MAX_CONNECTIONS (padrão 4) e
+    RABBITMQ_POOL_MAX_CHANNELS (padrão 32 por conexão).
+    
+    Returns:
+        Pool de conexões compartilhado
+    """
+    global _shared_pool
+    
+    with _shared_pool_lock:
+        if _shared_pool is None or _shared_pool._closed:
+            _shared_pool = RabbitMQConnectionPool(
+                max_connections=int(os.getenv('RABBITMQ_POOL_MAX_CONNECTIONS', '4')),
+                max_channels_per_connection=int(os.getenv('RABBITMQ_POOL_MAX_CHANNELS', '32'))
+            )
+        return _shared_pool
+
+class ConfirmingPublisher:
+    """
+    Publisher com publisher confirms em pipeline
+    
+    Em vez do modo síncrono do BlockingChannel (um round trip por mensagem),
+    mantém até window_size mensagens publicadas e ainda não confirmadas.
+    Os ACK/NACK do broker são processados conforme chegam; mensagens com
+    NACK são republicadas até max_retries vezes.
+    
+    Uso típico:
+        publisher = ConfirmingPublisher(channel, window_size=100)
+        publisher.publish(exchange, routing_key, body, properties)
+        ...
+        publisher.flush()
+    """
+    
+    def __init__(self,
+                 channel,
+                 window_size: int = 100,
+                 max_retries: int = 3,
+                 logger: Optional[logging.Logger] = None):
+        """
+        Args:
+            channel: BlockingChannel (não deve estar em modo confirm)
+            window_size: Máximo de mensagens aguardando confirmação
+            max_retries: Republicações permitidas após NACK
+            logger: Logger para mensagens descartadas
+        """
+        if window_size < 1:
+            raise ValueError("window_size deve ser >= 1")
+        
+        self.channel = channel
+        self.connection = channel.connection
+        self.window_size = window_size
+        self.max_retries = max_retries
+        self.logger = logger
+        
+        # delivery_tag -> (exchange, routing_key, body, properties, mandatory, tentativas, enviado_em)
+        self._outstanding: 'OrderedDict[int, tuple]' = OrderedDict()
+        self._next_tag = 1
+        self._latencies = deque(maxlen=1000)
+        self._failed: List[tuple] = []
+        self.counters = {'published': 0, 'confirmed': 0, 'nacked': 0, 'retried': 0, 'failed': 0}
+        
+        # O canal interno do BlockingChannel entrega os ACK/NACK de forma
+        # assíncrona; o BlockingChannel.confirm_delivery tornaria cada
+        # publish síncrono
+        self._impl = channel._impl
+        selected = []
+        self._impl.confirm_delivery(self._on_confirm, callback=lambda frame: selected.append(frame))
+        # Os callbacks do canal interno não contam como evento para o
+        # BlockingConnection: time_limit=None bloquearia para sempre
+        while not selected:
+            self.connection.process_data_events(time_limit=0.1)
+    
+    def _on_confirm(self, frame) -> None:
+        method = frame.method
+        is_ack = isinstance(method, pika.spec.Basic.Ack)
+        now = time.perf_counter()
+        
+        if method.multiple:
+            tags = [tag for tag in self._outstanding if tag <= method.delivery_tag]
+        else:
+            tags = [method.delivery_tag] if method.delivery_tag in self._outstanding else []
+        
+        for tag in tags:
+            exchange, routing_key, body, properties, mandatory, attempts, sent_at = self._outstanding.pop(tag)
+            self._latencies.append(now - sent_at)
+            
+            if is_ack:
+                self.counters['confirmed'] += 1
+                continue
+            
+            self.counters['nacked'] += 1
+            if attempts < self.max_retries:
+                self.counters['retried'] += 1
+                self._send(exchange, routing_key, body, properties, mandatory, attempts + 1)
+            else:
+                self.counters['failed'] += 1
+                self._failed.append((exchange, routing_key, body, properties))
+                if self.logger:
+                    self.logger.error(f"Mensagem descartada após {attempts} republicações "
+                                      f"(exchange={exchange}, routing_key={routing_key})")
+    
+    def _send(self, exchange: str, routing_key: str, body, properties, mandatory: bool, attempts: int) -> int:
+        tag = self._next_tag
+        self._next_tag += 1
+        self._outstanding[tag] = (exchange, routing_key, body, properties, mandatory, attempts, time.perf_counter())
+        self._impl.basic_publish(
+            exchange=exchange,
+            routing_key=routing_key,
+            body=body,
+            properties=properties,
+            mandatory=mandatory
+        )
+        return tag
+    
+    def publish(self,
+                exchange: str,
+                routing_key: str,
+                body,
+                properties: Optional[pika.BasicProperties] = None,
+                mandatory: bool = False) -> int:
+        """
+        Publica uma mensagem, bloqueando apenas se a janela estiver cheia
+        
+        Args:
+            exchange: Nome do exchange
+            routing_key: Chave de roteamento
+            body: Corpo da mensagem (str ou bytes)
+            properties: Propriedades da mensagem
+            mandatory: Flag mandatory do basic_publish
+        
+        Returns:
+            Delivery tag atribuída à mensagem
+        """
+        while len(self._outstanding) >= self.window_size:
+            self.connection.process_data_events(time_limit=0.1)
+        
+        self.counters['published'] += 1
+        tag = self._send(exchange, routing_key, body, properties, mandatory, 0)
+        # O publish do canal interno só enfileira os frames: escreve no socket
+        # agora e processa as confirmações já recebidas, sem bloquear
+        self.connection.process_data_events(time_limit=0)
+        return tag
+    
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """
+        Aguarda a confirmação de todas as mensagens pendentes
+        
+        Args:
+            timeout: Tempo máximo de espera em segundos (None = sem limite)
+        
+        Returns:
+            True se não restaram mensagens pendentes
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self._outstanding:
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                break
+            self.connection.process_data_events(time_limit=remaining if remaining is not None else 1)
+        return not self._outstanding
+    
+    @property
+    def outstanding(self) -> int:
+        """Número de mensagens aguardando confirmação"""
+        return len(self._outstanding)
+    
+    def unconfirmed(self) -> List[tuple]:
+        """
+        Retorna as mensagens ainda não confirmadas, na ordem de publicação
+        
+        Returns:
+            Lista de (exchange, routing_key, body, properties)
+        """
+        return [entry[:4] for entry in self._outstanding.values()]
+    
+    def failed(self) -> List[tuple]:
+        """
+        Retorna as mensagens descartadas após esgotar as republicações
+        
+        Returns:
+            Lista de (exchange, routing_key, body, properties)
+        """
+        return list(self._failed)
+    
+    def confirm_latency(self) -> Dict[str, float]:
+        """
+        Estatísticas da latência de confirmação (últimas 1000 mensagens)
+        
+        Returns:
+            Dicionário com count, avg_ms, p50_ms, p99_ms e max_ms
+        """
+        samples = sorted(self._latencies)
+        if not samples:
+            return {'count': 0, 'avg_ms': 0.0, 'p50_ms': 0.0, 'p99_ms': 0.0, 'max_ms': 0.0}
+        
+        def percentile(p: float) -> float:
+            return samples[min(len(samples) - 1, int(p * len(samples)))] * 1000
+        
+        return {
+            'count': len(samples),
+            'avg_ms': sum(samples) / len(samples) * 1000,
+            'p50_ms': percentile(0.50),
+            'p99_ms': percentile(0.99),
+            'max_ms': samples[-1] * 1000
+        }
+
+class RecoveringConnection:
+    """
+    Conexão RabbitMQ com recuperação automática
+    
+    Quando a conexão ou o canal caem, reconecta com backoff exponencial e
+    jitter, redeclara a topologia dos cenários informados, registra de novo
+    os consumers com seu QoS e republica as mensagens ainda não confirmadas
+    (quando confirms estão habilitados). O tempo de cada recuperação fica em
+    self.metrics para acompanhar a latência de failover. Falhas permanentes
+    (autenticação, 403/404/406) são propagadas sem novas tentativas.
+    """
+    
+    RECOVERABLE_ERRORS = (
+        pika.exceptions.AMQPConnectionError,
+        pika.exceptions.AMQPChannelError,
+        ConnectionError
+    )
+    
+    # Falhas permanentes: reconectar não resolve (credenciais, permissões,
+    # fila/exchange inexistente ou declarada com argumentos diferentes)
+    FATAL_ERRORS = (
+        pika.exceptions.AuthenticationError,
+        pika.exceptions.ProbableAuthenticationError,
+        pika.exceptions.ProbableAccessDeniedError
+    )
+    FATAL_REPLY_CODES = (403, 404, 406)
+    
+    def __init__(self,
+                 scenarios: Optional[List[str]] = None,
+                 on_channel_open: Optional[Callable[[Any], None]] = None,
+                 max_attempts: Optional[int] = None,
+                 base_delay: float = 0.5,
+                 max_delay: float = 30.0,
+                 connection_factory: Optional[Callable[[], pika.BlockingConnection]] = None,
+                 logger: Optional[logging.Logger] = None):
+        """
+        Args:
+            scenarios: Cenários do manifesto (utils.topology) a declarar a cada conexão
+            on_channel_open: Função chamada com o canal novo para declarações extras
+            max_attempts: Tentativas por recuperação (None = sem limite)
+            base_delay: Atraso base do backoff em segundos
+            max_delay: Teto do backoff em segundos
+            connection_factory: Função que cria a conexão (padrão: get_rabbitmq_connection)
+            logger: Logger para eventos de recuperação
+        """
+        self.scenarios = scenarios or []
+        self.on_channel_open = on_channel_open
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._connection_factory = connection_factory or get_rabbitmq_connection
+        self.logger = logger or logging.getLogger(__name__)
+        
+        self.connection: Optional[pika.BlockingConnection] = None
+        self.channel = None
+        self.publisher: Optional[ConfirmingPublisher] = None
+        self._confirm_window: Optional[int] = None
+        self._consumers: List[tuple] = []
+        self._stop_requested = False
+        
+        self.metrics = {
+            'recoveries': 0,
+            'last_recovery_s': 0.0,
+            'max_recovery_s': 0.0,
+            'total_recovery_s': 0.0,
+            'replayed_publishes': 0
+        }
+    
+    @property
+    def is_closed(self) -> bool:
+        return self.connection is None or self.connection.is_closed
+    
+    def _backoff_delay(self, attempt: int) -> float:
+        # Backoff exponencial com "full jitter" para evitar reconexões em massa sincronizadas
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+    
+    def is_fatal(self, error: Exception) -> bool:
+        """
+        Indica se o erro é permanente e deve ser propagado em vez de reconectar
+        
+        Args:
+            error: Exceção capturada
+        
+        Returns:
+            True para falhas de autenticação e respostas 403/404/406 do broker
+        """
+        if isinstance(error, self.FATAL_ERRORS):
+            return True
+        return getattr(error, 'reply_code', None) in self.FATAL_REPLY_CODES
+    
+    def _open(self) -> None:
+        self.connection = self._connection_factory()
+        try:
+            self.channel = self.connection.channel()
+            
+            if self.scenarios:
+                topology.apply_topology(self.channel, self.scenarios)
+            if self.on_channel_open:
+                self.on_channel_open(self.channel)
+            
+            for queue_name, callback, prefetch_count, auto_ack in self._consumers:
+                self._register_consumer(queue_name, callback, prefetch_count, auto_ack)
+        except Exception:
+            # Não deixa a conexão nova aberta se a preparação do canal falhar
+            if self.connection.is_open:
+                try:
+                    self.connection.close()
+                except Exception:
+                    pass
+            raise
+        
+        if self._confirm_window is not None:
+            pending = self.publisher.unconfirmed() if self.publisher else []
+            self.publisher = ConfirmingPublisher(self.channel, window_size=self._confirm_window, logger=self.logger)
+            for exchange, routing_key, body, properties in pending:
+                self.publisher.publish(exchange, routing_key, body, properties)
+            self.metrics['replayed_publishes'] += len(pending)
+    
+    def _connect_with_backoff(self) -> None:
+        attempt = 0
+        while True:
+            try:
+                self._open()
+                return
+            except self.RECOVERABLE_ERRORS as e:
+                if self.is_fatal(e):
+                    raise
+                attempt += 1
+                if self.max_attempts is not None and attempt >= self.max_attempts:
+                    raise ConnectionError(f"Recuperação falhou após {attempt} tentativas - {str(e)}")
+                delay = self._backoff_delay(attempt)
+                self.logger.warning(f"Tentativa {attempt} de conexão falhou ({str(e)}). "
+                                    f"Nova tentativa em {delay:.2f}s")
+                time.sleep(delay)
+    
+    def connect(self) -> 'RecoveringConnection':
+        """
+        Abre a conexão inicial (com as mesmas regras de backoff)
+        
+        Returns:
+            A própria instância
+        """
+        self._connect_with_backoff()
+        return self
+    
+    def _recover(self, error: Exception) -> None:
+        started = time.monotonic()
+        self.logger.warning(f"Conexão perdida ({type(error).__name__}: {str(error)}). Recuperando...")
+        
+        if self.connection is not None:
+            # A nova conexão começa sem cache de declarações: o broker pode
+            # ter reiniciado e perdido filas transientes
+            topology.reset_declaration_cache(self.connection)
+            if self.connection.is_open:
+                try:
+                    self.connection.close()
+                except Exception:
+                    pass
+        
+        self._connect_with_backoff()
+        
+        elapsed = time.monotonic() - started
+        self.metrics['recoveries'] += 1
+        self.metrics['last_recovery_s'] = elapsed
+        self.metrics['max_recovery_s'] = max(self.metrics['max_recovery_s'], elapsed)
+        self.metrics['total_recovery_s'] += elapsed
+        self.logger.info(f"Conexão recuperada em {elapsed * 1000:.0f}ms "
+                         f"(recuperação #{self.metrics['recoveries']})")
+    
+    def _register_consumer(self, queue: str, callback: Callable, prefetch_count: int, auto_ack: bool) -> None:
+        # O QoS por consumer vale para os basic_consume seguintes do canal
+        self.channel.basic_qos(prefetch_count=prefetch_count)
+        self.channel.basic_consume(queue=queue, on_message_callback=callback, auto_ack=auto_ack)
+    
+    def consume(self,
+                queue: str,
+                on_message_callback: Callable,
+                prefetch_count: int = 1,
+                auto_ack: bool = False) -> None:
+        """
+        Registra um consumer que será restaurado a cada reconexão
+        
+        Args:
+            queue: Nome da fila
+            on_message_callback: Callback (ch, method, properties, body)
+            prefetch_count: Prefetch aplicado antes do basic_consume
+            auto_ack: Se deve usar confirmação automática
+        """
+        self._consumers.append((queue, on_message_callback, prefetch_count, auto_ack))
+        if self.channel is not None and self.channel.is_open:
+            self._register_consumer(queue, on_message_callback, prefetch_count, auto_ack)
+    
+    def enable_confirms(self, window_size: int = 100) -> ConfirmingPublisher:
+        """
+        Publica via ConfirmingPublisher; mensagens sem confirmação são
+        republicadas após uma reconexão
+        
+        Args:
+            window_size: Janela de mensagens não confirmadas
+        
+        Returns:
+            Publisher do canal atual
+        """
+        self._confirm_window = window_size
+        self.publisher = ConfirmingPublisher(self.channel, window_size=window_size, logger=self.logger)
+        return self.publisher
+    
+    def publish(self,
+                exchange: str,
+                routing_key: str,
+                body,
+                properties: Optional[pika.BasicProperties] = None) -> None:
+        """
+        Publica uma mensagem, recuperando a conexão se necessário
+        """
+        while True:
+            published_before = self.publisher.counters['published'] if self.publisher else 0
+            try:
+                if self.publisher is not None:
+                    self.publisher.publish(exchange, routing_key, body, properties)
+                else:
+                    self.channel.basic_publish(exchange=exchange, routing_key=routing_key,
+                                               body=body, properties=properties)
+                return
+            except self.RECOVERABLE_ERRORS as e:
+                if self.is_fatal(e):
+                    raise
+                # Se já entrou na janela de confirmação, será republicada pela recuperação
+                already_tracked = (self.publisher is not None and
+                                   self.publisher.counters['published'] > published_before)
+                self._recover(e)
+                if already_tracked:
+                    return
+    
+    def start_consuming(self) -> None:
+        """
+        Consome até stop_consuming(), recuperando a conexão em caso de falha
+        """
+        self._stop_requested = False
+        while not self._stop_requested:
+            try:
+                self.channel.start_consuming()
+                if self._stop_requested or self.channel.is_open:
+                    return
+                # O canal fechado descarta os consumers e start_consuming retorna sem erro
+                raise pika.exceptions.ChannelWrongStateError("Canal fechado durante o consumo")
+            except self.RECOVERABLE_ERRORS as e:
+                if self._stop_requested:
+                    return
+                if self.is_fatal(e):
+                    raise
+                self._recover(e)
+    
+    def stop_consuming(self) -> None:
+        """
+        Interrompe o consumo
+        """
+        self._stop_requested = True
+        if self.channel is not None and self.channel.is_open:
+            self.channel.stop_consuming()
+    
+    def close(self) -> None:
+        """
+        Aguarda confirmações pendentes (se houver) e fecha a conexão
+        """
+        if self.connection is None or self.connection.is_closed:
+            return
+        if self.publisher is not None:
+            self.publisher.flush(timeout=5)
+        self.connection.close()
 
 def create_exchange_and_queue(channel: pika.channel.Channel, 
                             exchange_name: str, 
@@ -84,6 +954,8 @@ def create_exchange_and_queue(channel: pika.channel.Channel,
     """
     Cria exchange e fila de forma idempotente
     
+    Declarações já feitas nesta conexão são puladas (ver utils.topology).
+    
     Args:
         channel: Canal do RabbitMQ
         exchange_name: Nome do exchange
@@ -93,27 +965,26 @@ def create_exchange_and_queue(channel: pika.channel.Channel,
         queue_arguments: Argumentos adicionais da fila
         durable: Se exchange e fila devem ser duráveis
     """
-    # Cria exchange se não existir
-    channel.exchange_declare(
-        exchange=exchange_name,
-        exchange_type=exchange_type,
-        durable=durable
-    )
-    
-    # Cria fila se não existir
-    channel.queue_declare(
-        queue=queue_name,
-        durable=durable,
-        arguments=queue_arguments or {}
+    # Declarações em pipeline (um round trip) e com cache por conexão
+    topology.declare(
+        channel,
+        exchanges=[{'name': exchange_name, 'type': exchange_type, 'durable': durable}],
+        queues=[{'name': queue_name, 'durable': durable, 'arguments': queue_arguments}],
+        # Cria binding se routing_key fornecida (não se aplica a fanout)
+        bindings=[{'exchange': exchange_name, 'queue': queue_name, 'routing_key': routing_key}]
+                 if routing_key or exchange_type != 'fanout' else []
     )
-    
-    # Cria binding se routing_key fornecida (não se aplica a fanout)
-    if routing_key or exchange_type != 'fanout':
-        channel.queue_bind(
-            exchange=exchange_name,
-            queue=queue_name,
-            routing_key=routing_key
-        )
+
+def _format_properties(properties: Optional[pika.BasicProperties]) -> str:
+    """Resumo das propriedades usado nos logs de mensagem"""
+    if not properties:
+        return ""
+    props_info = f"delivery_mode={properties.delivery_mode}"
+    if properties.priority:
+        props_info += f" | priority={properties.priority}"
+    if properties.headers:
+        props_info += f" | headers={properties.headers}"
+    return props_info
 
 def log_message_sent(logger: logging.Logger, 
                     exchange: str, 
@@ -122,16 +993,16 @@ def log_message_sent(logger: logging.Logger,
                     properties: Optional[pika.BasicProperties] = None) -> None:
     """
     Log padronizado para mensagens enviadas
+    
+    Não formata nada quando INFO está desabilitado no logger.
     """
-    props_info = ""
-    if properties:
-        props_info = f" | delivery_mode={properties.delivery_mode}"
-        if properties.priority:
-            props_info += f" | priority={properties.priority}"
-        if properties.headers:
-            props_info += f" | headers={properties.headers}"
+    if not logger.isEnabledFor(logging.INFO):
+        return
     
-    logger.info(f"ENVIADO → Exchange: {exchange} | Routing Key: {routing_key} | Mensagem: {message[:50]}...{props_info}")
+    props_info = _format_properties(properties)
+    logger.info("ENVIADO → Exchange: %s | Routing Key: %s | Mensagem: %s...%s",
+                exchange, routing_key, message[:50],
+                f" | {props_info}" if props_info else "")
 
 def log_message_received(logger: logging.Logger,
                         method: pika.spec.Basic.Deliver,
@@ -140,16 +1011,17 @@ def log_message_received(logger: logging.Logger,
                         consumer_id: str) -> None:
     """
     Log padronizado para mensagens recebidas
+    
+    Decodifica apenas o prefixo do corpo exibido no log (até 50 caracteres).
     """
-    message = body.decode('utf-8')
-    props_info = f"delivery_mode={properties.delivery_mode}"
-    if properties.priority:
-        props_info += f" | priority={properties.priority}"
-    if properties.headers:
-        props_info += f" | headers={properties.headers}"
+    if not logger.isEnabledFor(logging.INFO):
+        return
     
-    logger.info(f"RECEBIDO [{consumer_id}] ← Exchange: {method.exchange} | "
-               f"Routing Key: {method.routing_key} | Mensagem: {message[:50]}... | {props_info}")
+    # 50 caracteres ocupam no máximo 200 bytes em UTF-8
+    message = body[:200].decode('utf-8', errors='replace')[:50]
+    logger.info("RECEBIDO [%s] ← Exchange: %s | Routing Key: %s | Mensagem: %s... | %s",
+                consumer_id, method.exchange, method.routing_key, message,
+                _format_properties(properties))
 
 def print_scenario_header(scenario_name: str, component_name: str, description: str) -> None:
     """
@@ -171,7 +1043,8 @@ def get_config_summary() -> Dict[str, str]:
         'RABBITMQ_HOST': os.getenv('RABBITMQ_HOST', 'localhost'),
         'RABBITMQ_PORT': os.getenv('RABBITMQ_PORT', '5672'),
         'RABBITMQ_USER': os.getenv('RABBITMQ_USER', 'guest'),
-        'RABBITMQ_VHOST': os.getenv('RABBITMQ_VHOST', '/')
+        'RABBITMQ_VHOST': os.getenv('RABBITMQ_VHOST', '/'),
+        'RABBITMQ_HEARTBEAT': os.getenv('RABBITMQ_HEARTBEAT', '600')
     }
 
 def print_config_info(logger: logging.Logger) -> None:
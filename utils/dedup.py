@@ -0,0 +1,280 @@
+"""
+Deduplicação de entregas por message_id (consumer idempotente)
+
+Depois de uma queda, o broker reentrega (redelivered=True) toda a janela de
+prefetch não confirmada, inclusive mensagens já processadas cujo ACK se
+perdeu. DedupFilter guarda os message_id processados e descarta essas
+reentregas:
+
+- RecentIds: conjunto em memória com limite de entradas (descarta as mais
+  antigas) e TTL; consulta O(1), usada em toda mensagem com message_id
+- BloomFilter (opcional): filtro probabilístico na frente do SQLite; uma
+  resposta negativa evita a consulta ao disco
+- SQLiteDedupStore (opcional): camada persistente, que sobrevive a reinícios
+  do consumer
+
+Só o caminho das reentregas consulta Bloom e SQLite; mensagens novas pagam
+apenas a consulta ao conjunto recente. Os ids são gravados depois do
+processamento (mark_processed), então mensagens republicadas para retry
+continuam sendo processadas.
+
+Configuração por ambiente em create_dedup_filter(): DEDUP_MAX_ENTRIES,
+DEDUP_TTL, DEDUP_BLOOM_CAPACITY, DEDUP_SQLITE_PATH e DEDUP_PERSISTENT_TTL.
+"""
+import hashlib
+import math
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterator, Optional
+
+import pika
+
+class RecentIds:
+    """
+    Conjunto de ids recentes com limite de tamanho e TTL
+
+    Os ids ficam na ordem em que foram marcados; ao exceder max_entries ou
+    vencer o TTL, os mais antigos são descartados.
+    """
+
+    def __init__(self, max_entries: int = 100_000, ttl: float = 600.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: 'OrderedDict[str, float]' = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, message_id: str) -> bool:
+        marked_at = self._entries.get(message_id)
+        if marked_at is None:
+            return False
+        if time.monotonic() - marked_at > self.ttl:
+            del self._entries[message_id]
+            return False
+        return True
+
+    def add(self, message_id: str) -> None:
+        now = time.monotonic()
+        self._entries[message_id] = now
+        self._entries.move_to_end(message_id)
+        # Remove do início os vencidos e o excesso
+        while self._entries:
+            oldest_id, marked_at = next(iter(self._entries.items()))
+            if len(self._entries) <= self.max_entries and now - marked_at <= self.ttl:
+                break
+            del self._entries[oldest_id]
+
+class BloomFilter:
+    """
+    Filtro de Bloom com k hashes derivados de um blake2b (double hashing)
+
+    Args:
+        capacity: Número de ids esperado
+        error_rate: Taxa de falsos positivos na capacidade
+    """
+
+    def __init__(self, capacity: int, error_rate: float = 0.01):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.size = max(8, int(math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2)))
+        self.hashes = max(1, int(round(self.size / capacity * math.log(2))))
+        self._bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, item: str) -> Iterator[int]:
+        digest = hashlib.blake2b(item.encode('utf-8'), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        for i in range(self.hashes):
+            yield (h1 + i * h2) % self.size
+
+    def __contains__(self, item: str) -> bool:
+        return all(self._bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(item))
+
+    def add(self, item: str) -> None:
+        for pos in self._positions(item):
+            self._bits[pos >> 3] |= 1 << (pos & 7)
+        self.count += 1
+
+class SQLiteDedupStore:
+    """
+    Ids processados persistidos em SQLite (WAL), com expiração por TTL
+
+    Args:
+        path: Arquivo do banco
+        ttl: Segundos que um id continua valendo
+        purge_every: Inserções entre duas limpezas dos ids vencidos
+    """
+
+    def __init__(self, path: str, ttl: float = 86400.0, purge_every: int = 1000):
+        self.path = path
+        self.ttl = ttl
+        self.purge_every = purge_every
+        self._inserts = 0
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS processed_messages "
+            "(message_id TEXT PRIMARY KEY, processed_at REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS processed_messages_at ON processed_messages (processed_at)"
+        )
+
+    def contains(self, message_id: str) -> bool:
+        row = self._conn.execute(
+            "SELECT 1 FROM processed_messages WHERE message_id = ? AND processed_at >= ?",
+            (message_id, time.time() - self.ttl)
+        ).fetchone()
+        return row is not None
+
+    def add(self, message_id: str) -> None:
+        self._conn.execute(
+            "INSERT OR REPLACE INTO processed_messages (message_id, processed_at) VALUES (?, ?)",
+            (message_id, time.time())
+        )
+        self._inserts += 1
+        if self._inserts % self.purge_every == 0:
+            self.purge()
+
+    def purge(self) -> int:
+        """
+        Remove os ids vencidos
+
+        Returns:
+            Número de ids removidos
+        """
+        cursor = self._conn.execute("DELETE FROM processed_messages WHERE processed_at < ?",
+                                    (time.time() - self.ttl,))
+        return cursor.rowcount
+
+    def ids(self) -> Iterator[str]:
+        """
+        Ids ainda válidos (usado para aquecer o filtro de Bloom)
+        """
+        cursor = self._conn.execute("SELECT message_id FROM processed_messages WHERE processed_at >= ?",
+                                    (time.time() - self.ttl,))
+        for (message_id,) in cursor:
+            yield message_id
+
+    def close(self) -> None:
+        self._conn.close()
+
+class DedupFilter:
+    """
+    Filtro de entregas duplicadas em camadas (recentes -> Bloom -> SQLite)
+
+    Thread-safe. O filtro de Bloom só é usado junto com o SQLite: sem a
+    camada persistente não há como confirmar um positivo.
+
+    Args:
+        max_entries: Limite do conjunto de ids recentes
+        ttl: TTL (segundos) do conjunto de ids recentes
+        bloom_capacity: Capacidade do filtro de Bloom (None desativa)
+        bloom_error_rate: Taxa de falsos positivos do filtro de Bloom
+        sqlite_path: Arquivo da camada persistente (None desativa)
+        persistent_ttl: TTL (segundos) dos ids no SQLite
+    """
+
+    def __init__(self,
+                 max_entries: int = 100_000,
+                 ttl: float = 600.0,
+                 bloom_capacity: Optional[int] = None,
+                 bloom_error_rate: float = 0.01,
+                 sqlite_path: Optional[str] = None,
+                 persistent_ttl: float = 86400.0):
+        self.recent = RecentIds(max_entries, ttl)
+        self.store = SQLiteDedupStore(sqlite_path, persistent_ttl) if sqlite_path else None
+        self.bloom = BloomFilter(bloom_capacity, bloom_error_rate) if bloom_capacity and self.store else None
+        self._lock = threading.Lock()
+        self.stats = {'checked': 0, 'redelivered': 0, 'duplicates': 0,
+                      'bloom_skips': 0, 'store_lookups': 0, 'marked': 0}
+        if self.bloom is not None:
+            self._warm_bloom()
+
+    def _warm_bloom(self) -> None:
+        # Recarrega o filtro com os ids persistidos (após reinício ou saturação),
+        # crescendo se os ids válidos já ocupam mais da metade da capacidade
+        self.store.purge()
+        ids = list(self.store.ids())
+        capacity = max(self.bloom.capacity, 2 * len(ids))
+        self.bloom = BloomFilter(capacity, self.bloom.error_rate)
+        for message_id in ids:
+            self.bloom.add(message_id)
+
+    def is_duplicate(self, method: Any, properties: Optional[pika.BasicProperties]) -> bool:
+        """
+        Verifica se a entrega já foi processada
+
+        Mensagens sem message_id nunca são consideradas duplicadas. Entregas
+        novas (redelivered=False) consultam apenas os ids recentes.
+        """
+        message_id = properties.message_id if properties else None
+        if not message_id:
+            return False
+
+        with self._lock:
+            self.stats['checked'] += 1
+            if message_id in self.recent:
+                self.stats['duplicates'] += 1
+                return True
+            if not getattr(method, 'redelivered', False) or self.store is None:
+                return False
+
+            self.stats['redelivered'] += 1
+            if self.bloom is not None and message_id not in self.bloom:
+                self.stats['bloom_skips'] += 1
+                return False
+            self.stats['store_lookups'] += 1
+            if self.store.contains(message_id):
+                self.recent.add(message_id)
+                self.stats['duplicates'] += 1
+                return True
+            return False
+
+    def mark_processed(self, properties: Optional[pika.BasicProperties]) -> None:
+        """
+        Registra o message_id como processado (chamar antes do ACK)
+        """
+        message_id = properties.message_id if properties else None
+        if not message_id:
+            return
+
+        with self._lock:
+            self.stats['marked'] += 1
+            self.recent.add(message_id)
+            if self.store is not None:
+                self.store.add(message_id)
+            if self.bloom is not None:
+                if self.bloom.count >= self.bloom.capacity:
+                    self._warm_bloom()
+                self.bloom.add(message_id)
+
+    def get_stats(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self.stats, recent=len(self.recent))
+
+    def close(self) -> None:
+        if self.store is not None:
+            self.store.close()
+
+def create_dedup_filter() -> DedupFilter:
+    """
+    Cria um DedupFilter a partir das variáveis de ambiente
+
+    DEDUP_MAX_ENTRIES (100000), DEDUP_TTL (600 s), DEDUP_BLOOM_CAPACITY
+    (desativado), DEDUP_SQLITE_PATH (desativado) e DEDUP_PERSISTENT_TTL (86400 s).
+    """
+    bloom_capacity = int(os.getenv('DEDUP_BLOOM_CAPACITY', '0'))
+    return DedupFilter(
+        max_entries=int(os.getenv('DEDUP_MAX_ENTRIES', '100000')),
+        ttl=float(os.getenv('DEDUP_TTL', '600')),
+        bloom_capacity=bloom_capacity or None,
+        sqlite_path=os.getenv('DEDUP_SQLITE_PATH') or None,
+        persistent_ttl=float(os.getenv('DEDUP_PERSISTENT_TTL', '86400'))
+    )
@@ -0,0 +1,148 @@
+"""
+Registro de handlers por tipo de mensagem com métricas automáticas
+
+Substitui cadeias if/elif sobre o tipo da mensagem: os handlers são
+registrados com um decorator e o despacho é uma consulta a dicionário,
+com custo constante independente do número de tipos. Cada tipo despachado
+acumula chamadas, erros e um histograma de latência.
+
+Uso típico:
+    HANDLERS = HandlerRegistry('interoperability')
+
+    @HANDLERS.register('ORDER_CREATED')
+    def process_order(message, logger): ...
+
+    @HANDLERS.default
+    def process_generic(message, logger): ...
+
+    HANDLERS.dispatch(message['type'], message, logger)
+"""
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from utils.histogram import LatencyHistogram
+
+class HandlerStats:
+    """
+    Contadores e histograma de latência de um tipo de mensagem
+    """
+
+    def __init__(self, handler_name: str):
+        self.handler_name = handler_name
+        self.errors = 0
+        self.latency = LatencyHistogram()
+
+    @property
+    def calls(self) -> int:
+        return self.latency.count
+
+    def record(self, seconds: float, failed: bool = False) -> None:
+        if failed:
+            self.errors += 1
+        self.latency.record(seconds)
+
+    def snapshot(self) -> Dict[str, Any]:
+        summary = self.latency.summary()
+        return {
+            'handler': self.handler_name,
+            'calls': summary['count'],
+            'errors': self.errors,
+            'avg_ms': summary['mean_ms'],
+            'p50_ms': summary['p50_ms'],
+            'p95_ms': summary['p95_ms'],
+            'p99_ms': summary['p99_ms'],
+            'max_ms': summary['max_ms']
+        }
+
+class HandlerRegistry:
+    """
+    Mapa tipo de mensagem -> handler, com fallback padrão e métricas
+
+    Thread-safe para despacho concorrente (consume_threaded).
+    """
+
+    def __init__(self, name: str = ''):
+        self.name = name
+        self._handlers: Dict[str, Callable] = {}
+        self._default: Optional[Callable] = None
+        self._stats: Dict[str, HandlerStats] = {}
+        self._lock = threading.Lock()
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._handlers
+
+    def register(self, *keys: str) -> Callable[[Callable], Callable]:
+        """
+        Decorator que associa o handler a um ou mais tipos de mensagem
+
+        Raises:
+            ValueError: Se algum tipo já tiver handler registrado
+        """
+        def decorator(func: Callable) -> Callable:
+            for key in keys:
+                if key in self._handlers:
+                    raise ValueError(f"Tipo '{key}' já registrado para {self._handlers[key].__name__}")
+                self._handlers[key] = func
+            return func
+        return decorator
+
+    def default(self, func: Callable) -> Callable:
+        """
+        Decorator que define o handler dos tipos sem registro
+        """
+        self._default = func
+        return func
+
+    def get(self, key: str) -> Callable:
+        """
+        Retorna o handler de um tipo (ou o padrão)
+
+        Raises:
+            KeyError: Se o tipo não tiver handler e não houver padrão
+        """
+        handler = self._handlers.get(key, self._default)
+        if handler is None:
+            raise KeyError(f"Nenhum handler para o tipo '{key}' em '{self.name}'")
+        return handler
+
+    def record(self, key: str, seconds: float, failed: bool = False) -> None:
+        """
+        Registra uma execução medida fora de dispatch (ex: em outro processo)
+        """
+        handler = self._handlers.get(key, self._default)
+        with self._lock:
+            stats = self._stats.get(key)
+            if stats is None:
+                stats = self._stats[key] = HandlerStats(getattr(handler, '__name__', '?'))
+            stats.record(seconds, failed)
+
+    def dispatch(self, key: str, *args, **kwargs) -> Any:
+        """
+        Executa o handler do tipo medindo latência e erros
+
+        Exceções do handler são contabilizadas e propagadas.
+        """
+        handler = self.get(key)
+        started = time.perf_counter()
+        try:
+            result = handler(*args, **kwargs)
+        except Exception:
+            self.record(key, time.perf_counter() - started, failed=True)
+            raise
+        self.record(key, time.perf_counter() - started)
+        return result
+
+    def get_stats(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Métricas por tipo de mensagem despachado
+        """
+        with self._lock:
+            return {key: stats.snapshot() for key, stats in self._stats.items()}
+
+    def total_calls(self) -> int:
+        with self._lock:
+            return sum(stats.calls for stats in self._stats.values())
+
+    def registered_types(self) -> List[str]:
+        return list(self._handlers)
@@ -0,0 +1,174 @@
+"""
+Histograma de latência com memória constante (estilo HdrHistogram)
+
+Os valores são gravados em microssegundos inteiros e agrupados em buckets
+log-lineares: cada potência de 2 é dividida em SUB_BUCKETS faixas iguais, o
+que limita o erro relativo de qualquer percentil a 1/SUB_BUCKETS (< 1% com
+o padrão de 128) para qualquer ordem de grandeza. record() é O(1), a memória
+é proporcional ao número de buckets ocupados (no máximo 128 por potência de
+2, independente do número de amostras) e histogramas de threads ou processos
+diferentes podem ser somados com merge().
+
+Uso típico:
+    hist = LatencyHistogram()
+    hist.record(elapsed_seconds)
+    hist.percentile(99)       # segundos
+    hist.summary()            # {'count', 'mean_ms', 'p50_ms', ..., 'max_ms'}
+"""
+from typing import Any, Dict, Iterable, Optional
+
+# Bits da parte linear do bucket: 2**7 = 128 faixas por potência de 2
+SUB_BUCKET_BITS = 7
+SUB_BUCKETS = 1 << SUB_BUCKET_BITS
+
+# Unidades (microssegundos) por segundo
+UNITS_PER_SECOND = 1_000_000
+
+def _bucket_index(value: int) -> int:
+    """
+    Índice do bucket de um valor inteiro não negativo
+    """
+    if value < 2 * SUB_BUCKETS:
+        # Valores pequenos têm bucket exato
+        return value
+    shift = value.bit_length() - SUB_BUCKET_BITS - 1
+    return SUB_BUCKETS * shift + (value >> shift)
+
+def _bucket_bounds(index: int) -> tuple:
+    """
+    Menor e maior valor inteiro representados por um bucket
+    """
+    if index < 2 * SUB_BUCKETS:
+        return index, index
+    shift = index // SUB_BUCKETS - 1
+    top = index - SUB_BUCKETS * shift
+    return top << shift, ((top + 1) << shift) - 1
+
+class LatencyHistogram:
+    """
+    Histograma log-bucketed de durações em segundos
+
+    Não é thread-safe: quem compartilha uma instância entre threads deve
+    protegê-la com um lock (como faz HandlerRegistry).
+    """
+
+    def __init__(self):
+        self._counts: Dict[int, int] = {}
+        self.count = 0
+        self.total = 0.0
+        self.min: Optional[float] = None
+        self.max: Optional[float] = None
+
+    def __len__(self) -> int:
+        return self.count
+
+    def __bool__(self) -> bool:
+        return self.count > 0
+
+    def record(self, seconds: float, count: int = 1) -> None:
+        """
+        Registra uma duração (valores negativos, como relógios fora de
+        sincronia, contam como zero)
+        """
+        seconds = max(0.0, seconds)
+        index = _bucket_index(int(seconds * UNITS_PER_SECOND))
+        self._counts[index] = self._counts.get(index, 0) + count
+        self.count += count
+        self.total += seconds * count
+        if self.min is None or seconds < self.min:
+            self.min = seconds
+        if self.max is None or seconds > self.max:
+            self.max = seconds
+
+    def merge(self, other: 'LatencyHistogram') -> 'LatencyHistogram':
+        """
+        Soma os registros de outro histograma a este
+
+        Returns:
+            O próprio histograma, para encadear chamadas
+        """
+        for index, count in other._counts.items():
+            self._counts[index] = self._counts.get(index, 0) + count
+        self.count += other.count
+        self.total += other.total
+        if other.min is not None and (self.min is None or other.min < self.min):
+            self.min = other.min
+        if other.max is not None and (self.max is None or other.max > self.max):
+            self.max = other.max
+        return self
+
+    @classmethod
+    def merged(cls, histograms: Iterable['LatencyHistogram']) -> 'LatencyHistogram':
+        """
+        Novo histograma com a soma de vários
+        """
+        result = cls()
+        for histogram in histograms:
+            result.merge(histogram)
+        return result
+
+    def copy(self) -> 'LatencyHistogram':
+        return LatencyHistogram().merge(self)
+
+    def reset(self) -> None:
+        self.__init__()
+
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+    def percentile(self, q: float) -> float:
+        """
+        Duração (segundos) no percentil q (0-100)
+
+        Retorna o maior valor do bucket que contém o percentil, limitado ao
+        mínimo e ao máximo observados.
+        """
+        if not self.count:
+            return 0.0
+        rank = max(1, int(q / 100.0 * self.count + 0.5))
+        seen = 0
+        for index in sorted(self._counts):
+            seen += self._counts[index]
+            if seen >= rank:
+                value = _bucket_bounds(index)[1] / UNITS_PER_SECOND
+                return min(max(value, self.min), self.max)
+        return self.max
+
+    def summary(self) -> Dict[str, Any]:
+        """
+        Resumo em milissegundos (contagem, média, percentis, mínimo e máximo)
+        """
+        return {
+            'count': self.count,
+            'mean_ms': self.mean() * 1000,
+            'min_ms': (self.min or 0.0) * 1000,
+            'p50_ms': self.percentile(50) * 1000,
+            'p95_ms': self.percentile(95) * 1000,
+            'p99_ms': self.percentile(99) * 1000,
+            'max_ms': (self.max or 0.0) * 1000
+        }
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        Snapshot serializável (JSON/pickle) para agregar em outro processo
+        """
+        return {
+            'counts': {str(index): count for index, count in self._counts.items()},
+            'count': self.count,
+            'total': self.total,
+            'min': self.min,
+            'max': self.max
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'LatencyHistogram':
+        """
+        Reconstrói um histograma a partir de to_dict()
+        """
+        histogram = cls()
+        histogram._counts = {int(index): count for index, count in data['counts'].items()}
+        histogram.count = data['count']
+        histogram.total = data['total']
+        histogram.min = data['min']
+        histogram.max = data['max']
+        return histogram
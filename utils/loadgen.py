@@ -0,0 +1,242 @@
+"""
+Gerador de carga em malha aberta (open loop) para os producers
+
+Os producers dos cenários se auto-regulam com time.sleep entre envios: se
+um envio demora, todos os seguintes atrasam e a carga oferecida cai junto
+com a capacidade do sistema (coordinated omission). LoadGenerator fixa de
+antemão o instante pretendido de cada mensagem, segundo a taxa alvo e o
+perfil de chegadas, e nunca o recalcula: quando o envio atrasa, as
+mensagens seguintes saem imediatamente até alcançar o cronograma, e as
+latências são medidas a partir do instante pretendido, não do real.
+
+Perfis de chegada (taxa média = rate):
+- constant: intervalos iguais de 1/rate
+- poisson: intervalos exponenciais (chegadas independentes)
+- burst: rajadas de burst_size mensagens no mesmo instante
+- ramp: taxa cresce linearmente de ramp_from_rate até rate
+
+O que cada mensagem contém fica com o producer: send(n, intended_ns)
+recebe o número sequencial e o instante pretendido (time.time_ns) e usa o
+builder do cenário (ex: create_message_from_template) para publicar.
+
+Configuração por ambiente em create_load_generator(): LOAD_RATE,
+LOAD_PROFILE, LOAD_DURATION, LOAD_MESSAGES, LOAD_BURST_SIZE e LOAD_RAMP_FROM.
+"""
+import math
+import os
+import random
+import threading
+import time
+from typing import Any, Callable, Dict, Iterator, Optional
+
+from utils.histogram import LatencyHistogram
+
+# Header com o instante pretendido do envio (ns), para medir latência sem coordinated omission
+INTENDED_HEADER = 'x-intended-ns'
+
+PROFILES = ('constant', 'poisson', 'burst', 'ramp')
+
+def arrival_offsets(profile: str,
+                    rate: float,
+                    duration: Optional[float] = None,
+                    messages: Optional[int] = None,
+                    burst_size: int = 10,
+                    ramp_from_rate: float = 0.0,
+                    rng: Optional[random.Random] = None) -> Iterator[float]:
+    """
+    Instantes pretendidos dos envios, em segundos desde o início
+
+    Termina quando passar de duration ou ao completar messages (o que vier
+    primeiro); sem nenhum dos dois, é infinito.
+
+    Raises:
+        ValueError: Se o perfil for desconhecido ou os parâmetros inválidos
+    """
+    if profile not in PROFILES:
+        raise ValueError(f"Perfil de chegada desconhecido: {profile} (disponíveis: {', '.join(PROFILES)})")
+    if rate <= 0 or burst_size < 1 or ramp_from_rate < 0:
+        raise ValueError("rate deve ser > 0, burst_size >= 1 e ramp_from_rate >= 0")
+    rng = rng or random.Random()
+
+    ramp_seconds = None
+    if profile == 'ramp':
+        # Sem duração, a rampa dura o suficiente para enviar as mensagens pedidas
+        if duration:
+            ramp_seconds = duration
+        elif messages:
+            ramp_seconds = 2.0 * messages / (ramp_from_rate + rate)
+        else:
+            raise ValueError("O perfil ramp precisa de duration ou messages")
+
+    n = 0
+    offset = 0.0
+    while messages is None or n < messages:
+        if profile == 'constant':
+            offset = n / rate
+        elif profile == 'poisson':
+            offset += rng.expovariate(rate) if n else 0.0
+        elif profile == 'burst':
+            offset = (n // burst_size) * burst_size / rate
+        else:
+            offset = _ramp_offset(n, ramp_from_rate, rate, ramp_seconds)
+        if duration is not None and offset >= duration:
+            return
+        yield offset
+        n += 1
+
+def _ramp_offset(n: int, start_rate: float, end_rate: float, ramp_seconds: float) -> float:
+    # Instante da n-ésima chegada com taxa r(t) = r0 + (r1 - r0) t / D: resolve
+    # n = r0 t + (r1 - r0) t² / 2D; depois da rampa a taxa fica em r1
+    slope = (end_rate - start_rate) / ramp_seconds
+    ramp_total = start_rate * ramp_seconds + slope * ramp_seconds ** 2 / 2
+    if n >= ramp_total:
+        return ramp_seconds + (n - ramp_total) / end_rate
+    if abs(slope) < 1e-12:
+        return n / start_rate
+    return (-start_rate + math.sqrt(start_rate ** 2 + 2 * slope * n)) / slope
+
+class LoadGenerator:
+    """
+    Envia mensagens em um cronograma fixo (malha aberta) e mede o atraso
+
+    Métricas (histogramas em segundos):
+    - lag: atraso do início do envio em relação ao instante pretendido
+    - latency: fim do envio menos o instante pretendido (inclui o tempo
+      esperando envios anteriores, que um gerador em malha fechada omitiria)
+    - service: duração do próprio send
+
+    Args:
+        send: Função (n, intended_ns) que monta e publica a mensagem n
+        rate: Taxa alvo (mensagens/s)
+        profile: Perfil de chegada (constant, poisson, burst, ramp)
+        duration: Segundos de carga (opcional)
+        messages: Número de mensagens (opcional)
+        burst_size: Mensagens por rajada no perfil burst
+        ramp_from_rate: Taxa inicial do perfil ramp
+        sleep: Função de espera (ex: connection.sleep, que mantém heartbeats)
+        seed: Semente do perfil poisson
+    """
+
+    def __init__(self,
+                 send: Callable[[int, int], Any],
+                 rate: float,
+                 profile: str = 'constant',
+                 duration: Optional[float] = None,
+                 messages: Optional[int] = None,
+                 burst_size: int = 10,
+                 ramp_from_rate: float = 0.0,
+                 sleep: Optional[Callable[[float], None]] = None,
+                 seed: Optional[int] = None):
+        # Valida os parâmetros já na construção
+        next(arrival_offsets(profile, rate, duration, messages, burst_size, ramp_from_rate), None)
+        self.send = send
+        self.rate = rate
+        self.profile = profile
+        self.duration = duration
+        self.messages = messages
+        self.burst_size = burst_size
+        self.ramp_from_rate = ramp_from_rate
+        self.sleep = sleep or time.sleep
+        self.seed = seed
+        self.lag = LatencyHistogram()
+        self.latency = LatencyHistogram()
+        self.service = LatencyHistogram()
+        self.sent = 0
+        self.errors = 0
+        self.last_error: Optional[Exception] = None
+        # Atraso do último envio: se cresce até o fim, o producer não acompanha a taxa
+        self.last_lag = 0.0
+        self.elapsed = 0.0
+
+    def run(self, stop_event: Optional[threading.Event] = None) -> Dict[str, Any]:
+        """
+        Executa a carga até o fim do cronograma ou stop_event
+
+        Exceções de send são contadas (a última fica em last_error) e o
+        cronograma segue.
+
+        Returns:
+            get_stats() ao final
+        """
+        stop_event = stop_event or threading.Event()
+        offsets = arrival_offsets(self.profile, self.rate, self.duration, self.messages,
+                                  self.burst_size, self.ramp_from_rate, random.Random(self.seed))
+        # Relógio monotônico para o cronograma e relógio de parede para o header
+        start = time.perf_counter()
+        start_ns = time.time_ns()
+        try:
+            for n, offset in enumerate(offsets, start=1):
+                if stop_event.is_set():
+                    break
+                intended = start + offset
+                delay = intended - time.perf_counter()
+                if delay > 0:
+                    self.sleep(delay)
+                began = time.perf_counter()
+                try:
+                    self.send(n, start_ns + int(offset * 1e9))
+                    self.sent += 1
+                except Exception as e:
+                    self.errors += 1
+                    self.last_error = e
+                finished = time.perf_counter()
+                self.lag.record(began - intended)
+                self.last_lag = began - intended
+                self.latency.record(finished - intended)
+                self.service.record(finished - began)
+        finally:
+            self.elapsed = time.perf_counter() - start
+        return self.get_stats()
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            'profile': self.profile,
+            'target_rate': self.rate,
+            'sent': self.sent,
+            'errors': self.errors,
+            'elapsed': self.elapsed,
+            'achieved_rate': self.sent / self.elapsed if self.elapsed else 0.0,
+            'max_lag_ms': (self.lag.max or 0.0) * 1000,
+            'final_lag_ms': self.last_lag * 1000,
+            'lag': self.lag.summary(),
+            'latency': self.latency.summary(),
+            'service': self.service.summary()
+        }
+
+def create_load_generator(send: Callable[[int, int], Any],
+                          sleep: Optional[Callable[[float], None]] = None) -> Optional[LoadGenerator]:
+    """
+    Cria um LoadGenerator a partir das variáveis de ambiente
+
+    LOAD_RATE (mensagens/s), LOAD_PROFILE (constant), LOAD_DURATION (s),
+    LOAD_MESSAGES, LOAD_BURST_SIZE (10) e LOAD_RAMP_FROM (0).
+
+    Returns:
+        LoadGenerator ou None sem LOAD_RATE (o producer mantém o ritmo de demonstração)
+    """
+    rate = float(os.getenv('LOAD_RATE', '0'))
+    if rate <= 0:
+        return None
+    duration = os.getenv('LOAD_DURATION')
+    messages = os.getenv('LOAD_MESSAGES')
+    return LoadGenerator(
+        send,
+        rate=rate,
+        profile=os.getenv('LOAD_PROFILE', 'constant'),
+        duration=float(duration) if duration else None,
+        messages=int(messages) if messages else None,
+        burst_size=int(os.getenv('LOAD_BURST_SIZE', '10')),
+        ramp_from_rate=float(os.getenv('LOAD_RAMP_FROM', '0')),
+        sleep=sleep
+    )
+
+def format_load_stats(stats: Dict[str, Any]) -> str:
+    """
+    Resumo de uma linha das estatísticas de LoadGenerator.get_stats()
+    """
+    latency = stats['latency']
+    return (f"{stats['sent']} enviadas ({stats['errors']} erros) em {stats['elapsed']:.1f}s | "
+            f"{stats['achieved_rate']:.0f}/{stats['target_rate']:.0f} msg/s ({stats['profile']}) | "
+            f"latência desde o instante pretendido p50 {latency['p50_ms']:.2f}ms "
+            f"p99 {latency['p99_ms']:.2f}ms max {latency['max_ms']:.2f}ms | "
+            f"atraso máximo {stats['max_lag_ms']:.1f}ms")
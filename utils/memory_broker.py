@@ -0,0 +1,949 @@
+"""
+Broker AMQP em memória para benchmarks e execuções offline
+
+Implementa, dentro do próprio processo, o subconjunto da API do pika
+BlockingConnection/BlockingChannel usado pelo projeto: exchanges direct,
+fanout, topic e headers (mais o exchange padrão), filas com x-max-priority,
+TTL (x-message-ttl e a propriedade expiration) e dead-lettering
+(x-dead-letter-exchange/x-dead-letter-routing-key com o header x-death),
+basic_qos, ack/nack/reject com requeue, publisher confirms e a diferença
+entre filas/mensagens duráveis e transitórias (simulada por restart()).
+
+O broker vive no processo: producers e consumers precisam rodar no mesmo
+processo (threads ou um único loop) para trocar mensagens. Ativado em
+get_rabbitmq_connection com RABBITMQ_BACKEND=memory.
+
+Como no BlockingConnection, os callbacks de consumo só rodam dentro de
+process_data_events/start_consuming da conexão dona do canal, o que torna
+a ordem de entrega determinística.
+"""
+import copy
+import functools
+import heapq
+import itertools
+import threading
+import time
+from collections import OrderedDict, deque
+from datetime import datetime
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+import pika
+import pika.exceptions
+import pika.frame
+import pika.spec
+
+EXCHANGE_TYPES = ('direct', 'fanout', 'topic', 'headers')
+
+class _Message:
+    __slots__ = ('exchange', 'routing_key', 'body', 'properties', 'redelivered', 'expires_at')
+
+    def __init__(self, exchange: str, routing_key: str, body: bytes, properties: pika.BasicProperties):
+        self.exchange = exchange
+        self.routing_key = routing_key
+        self.body = body
+        self.properties = properties
+        self.redelivered = False
+        # Instante (time.monotonic) em que a mensagem expira na fila atual
+        self.expires_at: Optional[float] = None
+
+    @property
+    def persistent(self) -> bool:
+        return self.properties.delivery_mode == 2
+
+class _Exchange:
+    def __init__(self, name: str, exchange_type: str, durable: bool, arguments: Dict[str, Any]):
+        self.name = name
+        self.type = exchange_type
+        self.durable = durable
+        self.arguments = arguments
+        # (fila, routing_key, argumentos)
+        self.bindings: List[Tuple[str, str, Dict[str, Any]]] = []
+
+class _Consumer:
+    def __init__(self, tag: str, channel: 'MemoryChannel', queue: str,
+                 callback: Callable, auto_ack: bool, prefetch_count: int):
+        self.tag = tag
+        self.channel = channel
+        self.queue = queue
+        self.callback = callback
+        self.auto_ack = auto_ack
+        self.prefetch_count = prefetch_count
+        self.unacked = 0
+
+    def has_capacity(self) -> bool:
+        if self.auto_ack:
+            return True
+        if self.prefetch_count and self.unacked >= self.prefetch_count:
+            return False
+        channel_limit = self.channel._global_prefetch
+        return not channel_limit or len(self.channel._unacked) < channel_limit
+
+class _Queue:
+    def __init__(self, name: str, durable: bool, arguments: Dict[str, Any]):
+        self.name = name
+        self.durable = durable
+        self.arguments = arguments
+        self.max_priority = int(arguments.get('x-max-priority') or 0)
+        # Um deque por nível de prioridade (apenas um em filas comuns)
+        self.buckets: List[Deque[_Message]] = [deque() for _ in range(self.max_priority + 1)]
+        self.consumers: List[_Consumer] = []
+        self._next_consumer = 0
+
+    def __len__(self) -> int:
+        return sum(len(bucket) for bucket in self.buckets)
+
+    def bucket_for(self, message: _Message) -> Deque[_Message]:
+        return self.buckets[min(message.properties.priority or 0, self.max_priority)]
+
+    def push(self, message: _Message, front: bool = False) -> None:
+        if front:
+            self.bucket_for(message).appendleft(message)
+        else:
+            self.bucket_for(message).append(message)
+
+    def message_ttl(self, message: _Message) -> Optional[int]:
+        """
+        TTL efetivo em ms: o menor entre x-message-ttl e a propriedade expiration
+        """
+        ttls = []
+        if self.arguments.get('x-message-ttl') is not None:
+            ttls.append(int(self.arguments['x-message-ttl']))
+        if message.properties.expiration is not None:
+            ttls.append(int(message.properties.expiration))
+        return min(ttls) if ttls else None
+
+    def pop(self) -> Optional[_Message]:
+        for bucket in reversed(self.buckets):
+            if bucket:
+                return bucket.popleft()
+        return None
+
+    def next_consumer(self) -> Optional[_Consumer]:
+        # Round-robin entre os consumers com janela de prefetch livre
+        count = len(self.consumers)
+        for offset in range(count):
+            consumer = self.consumers[(self._next_consumer + offset) % count]
+            if consumer.has_capacity():
+                self._next_consumer = (self._next_consumer + offset + 1) % count
+                return consumer
+        return None
+
+def topic_matches(pattern: str, routing_key: str) -> bool:
+    """
+    Verifica se uma routing key casa com um padrão de binding topic
+
+    '*' substitui exatamente uma palavra e '#' zero ou mais palavras.
+    """
+    def match(p: List[str], k: List[str]) -> bool:
+        if not p:
+            return not k
+        if p[0] == '#':
+            return any(match(p[1:], k[i:]) for i in range(len(k) + 1))
+        if not k:
+            return False
+        return (p[0] == '*' or p[0] == k[0]) and match(p[1:], k[1:])
+
+    return match(pattern.split('.'), routing_key.split('.'))
+
+def headers_match(binding_arguments: Dict[str, Any], headers: Optional[Dict[str, Any]]) -> bool:
+    """
+    Verifica se os headers de uma mensagem casam com um binding headers
+
+    Segue x-match all (padrão) / any; chaves iniciadas por 'x-' só entram
+    como critério nos modos all-with-x / any-with-x (x-match nunca entra).
+    """
+    headers = headers or {}
+    x_match = str(binding_arguments.get('x-match', 'all'))
+    with_x = x_match.endswith('-with-x')
+    criteria = [(k, v) for k, v in binding_arguments.items()
+                if k != 'x-match' and (with_x or not k.startswith('x-'))]
+    if not criteria:
+        return x_match.startswith('all')
+    results = (k in headers and (v is None or headers[k] == v) for k, v in criteria)
+    return any(results) if x_match.startswith('any') else all(results)
+
+def _dead_letter_properties(queue: _Queue, message: _Message, reason: str) -> pika.BasicProperties:
+    """
+    Propriedades de uma mensagem morta: registra a morte em x-death
+
+    Como no RabbitMQ, x-death tem uma entrada por (fila, motivo) com um
+    contador, a mais recente primeiro, e a propriedade expiration é removida.
+    """
+    properties = copy.copy(message.properties)
+    headers = dict(properties.headers or {})
+    deaths = [dict(death) for death in headers.get('x-death') or []]
+    for index, death in enumerate(deaths):
+        if death.get('queue') == queue.name and death.get('reason') == reason:
+            death['count'] = death.get('count', 1) + 1
+            death['time'] = datetime.now()
+            deaths.insert(0, deaths.pop(index))
+            break
+    else:
+        death = {'count': 1, 'reason': reason, 'queue': queue.name, 'time': datetime.now(),
+                 'exchange': message.exchange, 'routing-keys': [message.routing_key]}
+        if properties.expiration is not None:
+            death['original-expiration'] = properties.expiration
+        deaths.insert(0, death)
+    headers['x-death'] = deaths
+    headers.setdefault('x-first-death-reason', reason)
+    headers.setdefault('x-first-death-queue', queue.name)
+    headers.setdefault('x-first-death-exchange', message.exchange)
+    properties.headers = headers
+    properties.expiration = None
+    return properties
+
+class MemoryBroker:
+    """
+    Estado do broker: exchanges, filas, bindings e mensagens
+
+    Thread-safe; várias conexões (de threads diferentes) podem compartilhar
+    o mesmo broker.
+    """
+
+    def __init__(self):
+        self.exchanges: Dict[str, _Exchange] = {}
+        self.queues: Dict[str, _Queue] = {}
+        self.connections: List['MemoryConnection'] = []
+        self.stats = {'published': 0, 'routed': 0, 'unroutable': 0, 'delivered': 0,
+                      'acked': 0, 'nacked': 0, 'requeued': 0, 'dropped': 0,
+                      'expired': 0, 'dead_lettered': 0}
+        self._condition = threading.Condition(threading.RLock())
+        # Heap (expira em, sequência, fila, mensagem) e a thread que expira mensagens
+        self._expirations: List[Tuple[float, int, str, _Message]] = []
+        self._expiry_seq = itertools.count()
+        self._expiry_thread: Optional[threading.Thread] = None
+        self._next_queue = 1
+        self._next_consumer = 1
+
+    # --- Declarações ---
+
+    def declare_exchange(self, channel: 'MemoryChannel', name: str, exchange_type: str,
+                         passive: bool, durable: bool, arguments: Optional[Dict[str, Any]]) -> None:
+        with self._condition:
+            existing = self.exchanges.get(name)
+            if passive or existing is not None:
+                if existing is None:
+                    channel._fail(404, f"NOT_FOUND - no exchange '{name}'")
+                if not passive and (existing.type != exchange_type or existing.durable != durable):
+                    channel._fail(406, f"PRECONDITION_FAILED - inequivalent arg for exchange '{name}'")
+                return
+            if exchange_type not in EXCHANGE_TYPES:
+                channel._fail(503, f"COMMAND_INVALID - unknown exchange type '{exchange_type}'")
+            self.exchanges[name] = _Exchange(name, exchange_type, durable, dict(arguments or {}))
+
+    def declare_queue(self, channel: 'MemoryChannel', name: str, passive: bool, durable: bool,
+                      arguments: Optional[Dict[str, Any]]) -> _Queue:
+        with self._condition:
+            if not name:
+                name = f"amq.gen-{self._next_queue}"
+                self._next_queue += 1
+            existing = self.queues.get(name)
+            if passive or existing is not None:
+                if existing is None:
+                    channel._fail(404, f"NOT_FOUND - no queue '{name}'")
+                if not passive and (existing.durable != durable or existing.arguments != dict(arguments or {})):
+                    channel._fail(406, f"PRECONDITION_FAILED - inequivalent arg for queue '{name}'")
+                return existing
+            queue = _Queue(name, durable, dict(arguments or {}))
+            self.queues[name] = queue
+            return queue
+
+    def bind(self, channel: 'MemoryChannel', queue: str, exchange: str, routing_key: str,
+             arguments: Optional[Dict[str, Any]]) -> None:
+        with self._condition:
+            if queue not in self.queues:
+                channel._fail(404, f"NOT_FOUND - no queue '{queue}'")
+            if exchange not in self.exchanges:
+                channel._fail(404, f"NOT_FOUND - no exchange '{exchange}'")
+            binding = (queue, routing_key, dict(arguments or {}))
+            if binding not in self.exchanges[exchange].bindings:
+                self.exchanges[exchange].bindings.append(binding)
+
+    def unbind(self, queue: str, exchange: str, routing_key: str, arguments: Optional[Dict[str, Any]]) -> None:
+        with self._condition:
+            bindings = self.exchanges[exchange].bindings if exchange in self.exchanges else []
+            binding = (queue, routing_key, dict(arguments or {}))
+            if binding in bindings:
+                bindings.remove(binding)
+
+    def delete_queue(self, name: str) -> int:
+        with self._condition:
+            queue = self.queues.pop(name, None)
+            if queue is None:
+                return 0
+            for exchange in self.exchanges.values():
+                exchange.bindings = [b for b in exchange.bindings if b[0] != name]
+            return len(queue)
+
+    # --- Roteamento e entrega ---
+
+    def route(self, exchange_name: str, routing_key: str, headers: Optional[Dict[str, Any]]) -> List[str]:
+        """
+        Retorna as filas de destino de uma publicação
+        """
+        if exchange_name == '':
+            return [routing_key] if routing_key in self.queues else []
+
+        exchange = self.exchanges[exchange_name]
+        if exchange.type == 'fanout':
+            targets = [queue for queue, _, _ in exchange.bindings]
+        elif exchange.type == 'direct':
+            targets = [queue for queue, key, _ in exchange.bindings if key == routing_key]
+        elif exchange.type == 'topic':
+            targets = [queue for queue, key, _ in exchange.bindings if topic_matches(key, routing_key)]
+        else:
+            targets = [queue for queue, _, args in exchange.bindings if headers_match(args, headers)]
+        # Uma cópia por fila, mesmo com vários bindings casando
+        return list(dict.fromkeys(targets))
+
+    def publish(self, channel: 'MemoryChannel', exchange: str, routing_key: str, body: Any,
+                properties: Optional[pika.BasicProperties]) -> bool:
+        if isinstance(body, str):
+            body = body.encode('utf-8')
+        properties = properties or pika.BasicProperties()
+
+        with self._condition:
+            if exchange and exchange not in self.exchanges:
+                channel._fail(404, f"NOT_FOUND - no exchange '{exchange}'")
+            self.stats['published'] += 1
+            targets = self.route(exchange, routing_key, properties.headers)
+            if not targets:
+                self.stats['unroutable'] += 1
+                return False
+            for name in targets:
+                self.stats['routed'] += 1
+                self._push(self.queues[name], _Message(exchange, routing_key, bytes(body), properties))
+                self._dispatch(self.queues[name])
+            return True
+
+    def _push(self, queue: _Queue, message: _Message, front: bool = False) -> None:
+        # Chamado com o lock: enfileira e agenda a expiração, se houver TTL
+        if message.expires_at is None:
+            ttl = queue.message_ttl(message)
+            if ttl is not None:
+                message.expires_at = time.monotonic() + ttl / 1000.0
+        queue.push(message, front)
+        if message.expires_at is not None:
+            heapq.heappush(self._expirations,
+                           (message.expires_at, next(self._expiry_seq), queue.name, message))
+            if self._expiry_thread is None:
+                self._expiry_thread = threading.Thread(target=self._expiry_loop,
+                                                       name='memory-broker-ttl', daemon=True)
+                self._expiry_thread.start()
+            self._condition.notify_all()
+
+    def _expiry_loop(self) -> None:
+        # Expira as mensagens vencidas e dorme até o próximo vencimento
+        with self._condition:
+            while True:
+                now = time.monotonic()
+                while self._expirations and self._expirations[0][0] <= now:
+                    _, _, queue_name, message = heapq.heappop(self._expirations)
+                    queue = self.queues.get(queue_name)
+                    if queue is None:
+                        continue
+                    try:
+                        queue.bucket_for(message).remove(message)
+                    except ValueError:
+                        # Já foi entregue (ou a fila foi recriada)
+                        continue
+                    self.stats['expired'] += 1
+                    self._dead_letter(queue, message, 'expired')
+                timeout = self._expirations[0][0] - now if self._expirations else None
+                self._condition.wait(timeout)
+
+    def _dead_letter(self, queue: _Queue, message: _Message, reason: str) -> None:
+        # Chamado com o lock: republica no x-dead-letter-exchange da fila ou descarta
+        exchange = queue.arguments.get('x-dead-letter-exchange')
+        if exchange is None or (exchange and exchange not in self.exchanges):
+            self.stats['dropped'] += 1
+            return
+        routing_key = queue.arguments.get('x-dead-letter-routing-key', message.routing_key)
+        properties = _dead_letter_properties(queue, message, reason)
+        targets = self.route(exchange, routing_key, properties.headers)
+        if not targets:
+            self.stats['dropped'] += 1
+            return
+        self.stats['dead_lettered'] += 1
+        for name in targets:
+            self._push(self.queues[name], _Message(exchange, routing_key, message.body, properties))
+            self._dispatch(self.queues[name])
+
+    def _dispatch(self, queue: _Queue) -> None:
+        # Chamado com o lock: move mensagens para os canais com janela livre
+        delivered = False
+        while len(queue) and queue.consumers:
+            consumer = queue.next_consumer()
+            if consumer is None:
+                break
+            message = queue.pop()
+            consumer.channel._enqueue_delivery(consumer, message)
+            self.stats['delivered'] += 1
+            delivered = True
+        if delivered:
+            self._condition.notify_all()
+
+    def redispatch(self, queue_names) -> None:
+        with self._condition:
+            for name in queue_names:
+                if name in self.queues:
+                    self._dispatch(self.queues[name])
+
+    def register_consumer(self, channel: 'MemoryChannel', queue: str, callback: Callable,
+                          auto_ack: bool, consumer_tag: Optional[str]) -> _Consumer:
+        with self._condition:
+            if queue not in self.queues:
+                channel._fail(404, f"NOT_FOUND - no queue '{queue}'")
+            if not consumer_tag:
+                consumer_tag = f"ctag-memory-{self._next_consumer}"
+                self._next_consumer += 1
+            consumer = _Consumer(consumer_tag, channel, queue, callback, auto_ack, channel._prefetch_count)
+            self.queues[queue].consumers.append(consumer)
+            self._dispatch(self.queues[queue])
+            return consumer
+
+    def unregister_consumer(self, consumer: _Consumer) -> None:
+        with self._condition:
+            queue = self.queues.get(consumer.queue)
+            if queue is not None and consumer in queue.consumers:
+                queue.consumers.remove(consumer)
+                queue._next_consumer = 0
+
+    def settle(self, entries: List[Tuple[_Consumer, str, _Message]], ack: bool, requeue: bool) -> None:
+        """
+        Finaliza entregas: ACK descarta, NACK devolve à fila ou descarta
+        """
+        with self._condition:
+            touched = set()
+            for consumer, queue_name, message in entries:
+                consumer.unacked -= 1
+                touched.add(queue_name)
+                if ack:
+                    self.stats['acked'] += 1
+                    continue
+                self.stats['nacked'] += 1
+                queue = self.queues.get(queue_name)
+                if queue is None:
+                    self.stats['dropped'] += 1
+                elif requeue:
+                    message.redelivered = True
+                    self._push(queue, message, front=True)
+                    self.stats['requeued'] += 1
+                else:
+                    self._dead_letter(queue, message, 'rejected')
+            for queue_name in touched:
+                if queue_name in self.queues:
+                    self._dispatch(self.queues[queue_name])
+
+    def wait(self, timeout: Optional[float]) -> None:
+        with self._condition:
+            self._condition.wait(timeout)
+
+    def notify(self) -> None:
+        with self._condition:
+            self._condition.notify_all()
+
+    # --- Administração ---
+
+    def message_count(self, queue: str) -> int:
+        """
+        Mensagens prontas (não entregues) em uma fila
+        """
+        with self._condition:
+            return len(self.queues[queue])
+
+    def set_resource_alarm(self, active: bool) -> None:
+        """
+        Simula um alarme de memória/disco: envia Connection.Blocked (ou
+        Unblocked) a todas as conexões; as publicações continuam sendo aceitas
+        """
+        for connection in list(self.connections):
+            connection._notify_blocked(active)
+
+    def restart(self) -> None:
+        """
+        Simula a reinicialização do broker
+
+        Fecha todas as conexões (mensagens não confirmadas voltam às filas),
+        remove exchanges e filas não duráveis e, nas filas duráveis, mantém
+        apenas mensagens persistentes (delivery_mode=2).
+        """
+        for connection in list(self.connections):
+            connection._force_close(320, "CONNECTION_FORCED - broker forced connection closure with reason 'shutdown'")
+
+        with self._condition:
+            self.exchanges = {name: ex for name, ex in self.exchanges.items() if ex.durable}
+            self.queues = {name: q for name, q in self.queues.items() if q.durable}
+            for exchange in self.exchanges.values():
+                exchange.bindings = [b for b in exchange.bindings if b[0] in self.queues]
+            for queue in self.queues.values():
+                queue.consumers = []
+                for index, bucket in enumerate(queue.buckets):
+                    queue.buckets[index] = deque(m for m in bucket if m.persistent)
+
+class _ImplAdapter:
+    """
+    Imita o canal assíncrono interno (_impl) usado por ConfirmingPublisher
+    e pela declaração em pipeline de utils.topology
+    """
+
+    def __init__(self, channel: 'MemoryChannel'):
+        self._channel = channel
+
+    def confirm_delivery(self, ack_nack_callback: Callable, callback: Optional[Callable] = None) -> None:
+        self._channel._confirm_callback = ack_nack_callback
+        self._channel._confirming = True
+        if callback:
+            callback(pika.frame.Method(self._channel.channel_number, pika.spec.Confirm.SelectOk()))
+
+    def basic_publish(self, exchange: str, routing_key: str, body: Any,
+                      properties: Optional[pika.BasicProperties] = None, mandatory: bool = False) -> None:
+        self._channel.basic_publish(exchange, routing_key, body, properties, mandatory)
+
+    def _send_method(self, method: Any) -> None:
+        channel = self._channel
+        try:
+            if isinstance(method, pika.spec.Exchange.Declare):
+                channel.exchange_declare(method.exchange, method.type, passive=method.passive,
+                                         durable=method.durable, arguments=method.arguments)
+            elif isinstance(method, pika.spec.Queue.Declare):
+                channel.queue_declare(method.queue, passive=method.passive, durable=method.durable,
+                                      arguments=method.arguments)
+            elif isinstance(method, pika.spec.Queue.Bind):
+                channel.queue_bind(method.queue, method.exchange, method.routing_key, method.arguments)
+            else:
+                raise NotImplementedError(f"Método não suportado pelo broker em memória: {method.NAME}")
+        except pika.exceptions.ChannelClosedByBroker as error:
+            if not getattr(method, 'nowait', False):
+                raise
+            # Com nowait o erro só chega na próxima chamada síncrona do canal
+            channel._pending_error = error
+
+class MemoryChannel:
+    """
+    Canal com a mesma interface do pika BlockingChannel
+    """
+
+    def __init__(self, connection: 'MemoryConnection', channel_number: int):
+        self.connection = connection
+        self.channel_number = channel_number
+        self._broker = connection.broker
+        self._closed_reason: Optional[Exception] = None
+        self._prefetch_count = 0
+        self._global_prefetch = 0
+        self._consumers: Dict[str, _Consumer] = {}
+        self._deliveries: Deque[Tuple[_Consumer, _Message, int]] = deque()
+        # delivery_tag -> (consumer, fila, mensagem)
+        self._unacked: 'OrderedDict[int, Tuple[_Consumer, str, _Message]]' = OrderedDict()
+        self._next_tag = 1
+        self._confirming = False
+        self._confirm_callback: Optional[Callable] = None
+        self._publish_seq = 0
+        self._pending_confirms: Deque[int] = deque()
+        self._impl = _ImplAdapter(self)
+        # Erro de um método nowait ainda não entregue ao chamador
+        self._pending_error: Optional[Exception] = None
+
+    def __repr__(self) -> str:
+        return f"<MemoryChannel number={self.channel_number} open={self.is_open}>"
+
+    @property
+    def is_open(self) -> bool:
+        return self._closed_reason is None and self.connection.is_open
+
+    @property
+    def is_closed(self) -> bool:
+        return not self.is_open
+
+    @property
+    def consumer_tags(self) -> List[str]:
+        return list(self._consumers)
+
+    def _check_open(self) -> None:
+        self.connection._check_open()
+        if self._pending_error is not None:
+            error, self._pending_error = self._pending_error, None
+            raise error
+        if self._closed_reason is not None:
+            raise pika.exceptions.ChannelWrongStateError('Channel is closed.')
+
+    def _fail(self, reply_code: int, reply_text: str) -> None:
+        # Erros de protocolo fecham o canal, como no RabbitMQ
+        error = pika.exceptions.ChannelClosedByBroker(reply_code, reply_text)
+        self._shutdown(error)
+        raise error
+
+    def _shutdown(self, reason: Exception) -> None:
+        if self._closed_reason is not None:
+            return
+        self._closed_reason = reason
+        for consumer in list(self._consumers.values()):
+            self._broker.unregister_consumer(consumer)
+        self._consumers.clear()
+        # Entregas pendentes e não confirmadas voltam às filas
+        with self._broker._condition:
+            entries = list(self._unacked.values())
+            self._unacked.clear()
+            self._deliveries.clear()
+        if entries:
+            self._broker.settle(entries, ack=False, requeue=True)
+        self.connection._channels.pop(self.channel_number, None)
+
+    def _enqueue_delivery(self, consumer: _Consumer, message: _Message) -> None:
+        # Chamado pelo broker com o lock: reserva a delivery_tag na janela
+        tag = self._next_tag
+        self._next_tag += 1
+        if not consumer.auto_ack:
+            consumer.unacked += 1
+            self._unacked[tag] = (consumer, consumer.queue, message)
+        self._deliveries.append((consumer, message, tag))
+
+    def _process_deliveries(self) -> int:
+        processed = 0
+        while self._confirm_callback and self._pending_confirms:
+            tag = self._pending_confirms.popleft()
+            self._confirm_callback(pika.frame.Method(self.channel_number, pika.spec.Basic.Ack(delivery_tag=tag)))
+            processed += 1
+
+        while self._deliveries and self._closed_reason is None:
+            consumer, message, tag = self._deliveries.popleft()
+            if consumer.tag not in self._consumers:
+                continue
+            method = pika.spec.Basic.Deliver(
+                consumer_tag=consumer.tag,
+                delivery_tag=tag,
+                redelivered=message.redelivered,
+                exchange=message.exchange,
+                routing_key=message.routing_key
+            )
+            consumer.callback(self, method, message.properties, message.body)
+            processed += 1
+        return processed
+
+    # --- API do BlockingChannel ---
+
+    def close(self, reply_code: int = 0, reply_text: str = 'Normal shutdown') -> None:
+        self._shutdown(pika.exceptions.ChannelClosedByClient(reply_code, reply_text))
+
+    def confirm_delivery(self) -> None:
+        self._check_open()
+        self._confirming = True
+
+    def exchange_declare(self, exchange: str, exchange_type: str = 'direct', passive: bool = False,
+                         durable: bool = False, auto_delete: bool = False, internal: bool = False,
+                         arguments: Optional[Dict[str, Any]] = None) -> pika.frame.Method:
+        self._check_open()
+        self._broker.declare_exchange(self, exchange, exchange_type, passive, durable, arguments)
+        return pika.frame.Method(self.channel_number, pika.spec.Exchange.DeclareOk())
+
+    def queue_declare(self, queue: str, passive: bool = False, durable: bool = False,
+                      exclusive: bool = False, auto_delete: bool = False,
+                      arguments: Optional[Dict[str, Any]] = None) -> pika.frame.Method:
+        self._check_open()
+        declared = self._broker.declare_queue(self, queue, passive, durable, arguments)
+        return pika.frame.Method(self.channel_number, pika.spec.Queue.DeclareOk(
+            queue=declared.name, message_count=len(declared), consumer_count=len(declared.consumers)))
+
+    def queue_bind(self, queue: str, exchange: str, routing_key: Optional[str] = None,
+                   arguments: Optional[Dict[str, Any]] = None) -> pika.frame.Method:
+        self._check_open()
+        self._broker.bind(self, queue, exchange, routing_key if routing_key is not None else queue, arguments)
+        return pika.frame.Method(self.channel_number, pika.spec.Queue.BindOk())
+
+    def queue_unbind(self, queue: str, exchange: Optional[str] = None, routing_key: Optional[str] = None,
+                     arguments: Optional[Dict[str, Any]] = None) -> pika.frame.Method:
+        self._check_open()
+        self._broker.unbind(queue, exchange, routing_key if routing_key is not None else queue, arguments)
+        return pika.frame.Method(self.channel_number, pika.spec.Queue.UnbindOk())
+
+    def queue_purge(self, queue: str) -> pika.frame.Method:
+        self._check_open()
+        with self._broker._condition:
+            target = self._broker.queues.get(queue)
+            if target is None:
+                self._fail(404, f"NOT_FOUND - no queue '{queue}'")
+            count = len(target)
+            target.buckets = [deque() for _ in target.buckets]
+        return pika.frame.Method(self.channel_number, pika.spec.Queue.PurgeOk(message_count=count))
+
+    def queue_delete(self, queue: str, if_unused: bool = False, if_empty: bool = False) -> pika.frame.Method:
+        self._check_open()
+        count = self._broker.delete_queue(queue)
+        return pika.frame.Method(self.channel_number, pika.spec.Queue.DeleteOk(message_count=count))
+
+    def basic_qos(self, prefetch_size: int = 0, prefetch_count: int = 0, global_qos: bool = False) -> None:
+        self._check_open()
+        if global_qos:
+            self._global_prefetch = prefetch_count
+            # O limite do canal vale na hora: uma janela maior libera entregas
+            self._broker.redispatch({consumer.queue for consumer in self._consumers.values()})
+        else:
+            self._prefetch_count = prefetch_count
+
+    def basic_publish(self, exchange: str, routing_key: str, body: Any,
+                      properties: Optional[pika.BasicProperties] = None, mandatory: bool = False) -> None:
+        self._check_open()
+        routed = self._broker.publish(self, exchange, routing_key, body, properties)
+        if self._confirm_callback is not None:
+            # Modo confirm do canal interno: o ACK chega no próximo process_data_events
+            self._publish_seq += 1
+            self._pending_confirms.append(self._publish_seq)
+        elif self._confirming and mandatory and not routed:
+            raise pika.exceptions.UnroutableError([])
+
+    def basic_consume(self, queue: str, on_message_callback: Callable, auto_ack: bool = False,
+                      exclusive: bool = False, consumer_tag: Optional[str] = None,
+                      arguments: Optional[Dict[str, Any]] = None) -> str:
+        self._check_open()
+        consumer = self._broker.register_consumer(self, queue, on_message_callback, auto_ack, consumer_tag)
+        self._consumers[consumer.tag] = consumer
+        return consumer.tag
+
+    def basic_cancel(self, consumer_tag: str) -> List[Any]:
+        consumer = self._consumers.pop(consumer_tag, None)
+        if consumer is None:
+            return []
+        self._broker.unregister_consumer(consumer)
+
+        # Entregas ainda não processadas do consumer voltam para a fila
+        with self._broker._condition:
+            pending = [entry for entry in self._deliveries if entry[0] is consumer]
+            for entry in pending:
+                self._deliveries.remove(entry)
+            entries = [self._unacked.pop(tag) for _, _, tag in pending if tag in self._unacked]
+        if entries:
+            self._broker.settle(entries, ack=False, requeue=True)
+        return []
+
+    def basic_get(self, queue: str, auto_ack: bool = False) -> Tuple[Any, Any, Any]:
+        self._check_open()
+        with self._broker._condition:
+            target = self._broker.queues.get(queue)
+            if target is None:
+                self._fail(404, f"NOT_FOUND - no queue '{queue}'")
+            message = target.pop()
+            if message is None:
+                return None, None, None
+            consumer = _Consumer('', self, queue, None, auto_ack, 0)
+            tag = self._next_tag
+            self._next_tag += 1
+            if not auto_ack:
+                consumer.unacked += 1
+                self._unacked[tag] = (consumer, queue, message)
+            self._broker.stats['delivered'] += 1
+        method = pika.spec.Basic.GetOk(delivery_tag=tag, redelivered=message.redelivered,
+                                       exchange=message.exchange, routing_key=message.routing_key,
+                                       message_count=len(target))
+        return method, message.properties, message.body
+
+    def _settle(self, delivery_tag: int, multiple: bool, ack: bool, requeue: bool) -> None:
+        self._check_open()
+        # _unacked também recebe entregas de outras threads (_enqueue_delivery, com o lock)
+        with self._broker._condition:
+            # Como no RabbitMQ, o tag precisa estar pendente mesmo com multiple (exceto 0)
+            if multiple and delivery_tag == 0:
+                tags = list(self._unacked)
+            elif delivery_tag in self._unacked:
+                tags = [tag for tag in self._unacked if tag <= delivery_tag] if multiple else [delivery_tag]
+            else:
+                self._fail(406, f"PRECONDITION_FAILED - unknown delivery tag {delivery_tag}")
+            entries = [self._unacked.pop(tag) for tag in tags]
+        self._broker.settle(entries, ack, requeue)
+
+    def basic_ack(self, delivery_tag: int = 0, multiple: bool = False) -> None:
+        self._settle(delivery_tag, multiple, ack=True, requeue=False)
+
+    def basic_nack(self, delivery_tag: int = 0, multiple: bool = False, requeue: bool = True) -> None:
+        self._settle(delivery_tag, multiple, ack=False, requeue=requeue)
+
+    def basic_reject(self, delivery_tag: int = 0, requeue: bool = True) -> None:
+        self._settle(delivery_tag, False, ack=False, requeue=requeue)
+
+    def start_consuming(self) -> None:
+        """
+        Processa entregas até stop_consuming ou até não restarem consumers
+        """
+        while self._consumers and self.is_open:
+            self.connection.process_data_events(time_limit=None)
+
+    def stop_consuming(self, consumer_tag: Optional[str] = None) -> None:
+        tags = [consumer_tag] if consumer_tag else list(self._consumers)
+        for tag in tags:
+            self.basic_cancel(tag)
+        self._broker.notify()
+
+class MemoryConnection:
+    """
+    Conexão com a mesma interface do pika BlockingConnection
+    """
+
+    def __init__(self, broker: MemoryBroker):
+        self.broker = broker
+        self._channels: Dict[int, MemoryChannel] = {}
+        self._next_channel = 1
+        self._closed_reason: Optional[Exception] = None
+        self._callbacks: Deque[Callable[[], None]] = deque()
+        self._timers: List[Tuple[float, Callable[[], None]]] = []
+        self._blocked_callbacks: List[Callable] = []
+        self._unblocked_callbacks: List[Callable] = []
+        with broker._condition:
+            broker.connections.append(self)
+
+    @property
+    def is_open(self) -> bool:
+        return self._closed_reason is None
+
+    @property
+    def is_closed(self) -> bool:
+        return self._closed_reason is not None
+
+    @property
+    def is_closing(self) -> bool:
+        return False
+
+    def _check_open(self) -> None:
+        if isinstance(self._closed_reason, pika.exceptions.ConnectionClosedByBroker):
+            raise self._closed_reason
+        if self._closed_reason is not None:
+            raise pika.exceptions.ConnectionWrongStateError('Connection is closed.')
+
+    def _force_close(self, reply_code: int, reply_text: str) -> None:
+        self._shutdown(pika.exceptions.ConnectionClosedByBroker(reply_code, reply_text))
+
+    def _shutdown(self, reason: Exception) -> None:
+        if self._closed_reason is not None:
+            return
+        for channel in list(self._channels.values()):
+            channel._shutdown(reason)
+        self._closed_reason = reason
+        with self.broker._condition:
+            if self in self.broker.connections:
+                self.broker.connections.remove(self)
+            self.broker._condition.notify_all()
+
+    def channel(self, channel_number: Optional[int] = None) -> MemoryChannel:
+        self._check_open()
+        if channel_number is None:
+            channel_number = self._next_channel
+            self._next_channel += 1
+        channel = MemoryChannel(self, channel_number)
+        self._channels[channel_number] = channel
+        return channel
+
+    def close(self, reply_code: int = 200, reply_text: str = 'Normal shutdown') -> None:
+        if self.is_closed:
+            raise pika.exceptions.ConnectionWrongStateError('Connection is closed.')
+        self._shutdown(pika.exceptions.ConnectionClosedByClient(reply_code, reply_text))
+
+    def add_callback_threadsafe(self, callback: Callable[[], None]) -> None:
+        self._check_open()
+        self._callbacks.append(callback)
+        self.broker.notify()
+
+    def call_later(self, delay: float, callback: Callable[[], None]) -> None:
+        self._timers.append((time.monotonic() + delay, callback))
+
+    def add_on_connection_blocked_callback(self, callback: Callable) -> None:
+        self._blocked_callbacks.append(callback)
+
+    def add_on_connection_unblocked_callback(self, callback: Callable) -> None:
+        self._unblocked_callbacks.append(callback)
+
+    def _notify_blocked(self, blocked: bool) -> None:
+        # Como no pika, o callback recebe (conexão, frame) no próximo process_data_events
+        if blocked:
+            frame = pika.frame.Method(0, pika.spec.Connection.Blocked(reason='low on memory'))
+            callbacks = self._blocked_callbacks
+        else:
+            frame = pika.frame.Method(0, pika.spec.Connection.Unblocked())
+            callbacks = self._unblocked_callbacks
+        for callback in callbacks:
+            self.add_callback_threadsafe(functools.partial(callback, self, frame))
+
+    def _run_pending(self) -> int:
+        processed = 0
+        while self._callbacks:
+            self._callbacks.popleft()()
+            processed += 1
+
+        if self._timers:
+            now = time.monotonic()
+            due = [timer for timer in self._timers if timer[0] <= now]
+            self._timers = [timer for timer in self._timers if timer[0] > now]
+            for _, callback in sorted(due, key=lambda timer: timer[0]):
+                callback()
+                processed += 1
+
+        for channel in list(self._channels.values()):
+            processed += channel._process_deliveries()
+        return processed
+
+    def process_data_events(self, time_limit: Optional[float] = 0) -> None:
+        """
+        Executa callbacks pendentes; com time_limit > 0 espera por eventos
+
+        time_limit=None bloqueia até que ao menos um evento seja processado.
+        """
+        self._check_open()
+        deadline = None if time_limit is None else time.monotonic() + time_limit
+        while True:
+            if self._run_pending() or self.is_closed:
+                return
+            if deadline is None:
+                timeout = None
+            else:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    return
+            if self._timers:
+                next_timer = min(timer[0] for timer in self._timers) - time.monotonic()
+                timeout = max(0.0, next_timer if timeout is None else min(timeout, next_timer))
+            with self.broker._condition:
+                if not self._has_pending():
+                    self.broker._condition.wait(timeout)
+            self._check_open()
+            if deadline is None and not self._timers:
+                # Acordado por notify (ex: stop_consuming de outra thread)
+                self._run_pending()
+                return
+
+    def _has_pending(self) -> bool:
+        return bool(self._callbacks) or any(
+            channel._deliveries or channel._pending_confirms for channel in self._channels.values()
+        )
+
+    def sleep(self, duration: float) -> None:
+        deadline = time.monotonic() + duration
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return
+            self.process_data_events(time_limit=remaining)
+
+_default_broker: Optional[MemoryBroker] = None
+_default_broker_lock = threading.Lock()
+
+def get_memory_broker() -> MemoryBroker:
+    """
+    Retorna o broker em memória compartilhado pelo processo
+    """
+    global _default_broker
+    with _default_broker_lock:
+        if _default_broker is None:
+            _default_broker = MemoryBroker()
+        return _default_broker
+
+def reset_memory_broker() -> MemoryBroker:
+    """
+    Descarta o broker compartilhado e cria um novo (estado limpo entre execuções)
+    """
+    global _default_broker
+    with _default_broker_lock:
+        _default_broker = MemoryBroker()
+        return _default_broker
+
+def connect(broker: Optional[MemoryBroker] = None) -> MemoryConnection:
+    """
+    Abre uma conexão no broker informado (padrão: broker do processo)
+    """
+    return MemoryConnection(broker or get_memory_broker())
@@ -0,0 +1,263 @@
+"""
+Consumo de várias filas em um canal com prefetch por fila e fair queuing
+
+Com vários basic_consume compartilhando um prefetch, uma rajada em uma fila
+ocupa a janela inteira e as outras esperam. QueueMultiplexer dá a cada fila
+o seu próprio prefetch (basic_qos por consumer, antes de cada basic_consume)
+e guarda as entregas em um buffer por fila. A próxima mensagem processada é
+escolhida por weighted fair queuing (start-time fair queuing): cada fila
+acumula tempo virtual igual ao tempo de serviço dividido pelo peso, e a fila
+com o menor tempo virtual vai primeiro. Com pesos 2 e 1, a primeira fila
+recebe dois terços do tempo de processamento enquanto as duas têm
+mensagens; uma fila ociosa não acumula crédito para depois.
+
+O lag de cada fila é reportado periodicamente: mensagens prontas no broker
+(queue_declare passivo), entregas no buffer e idade da mais antiga.
+
+Uso típico:
+    mux = QueueMultiplexer(channel, logger=logger)
+    mux.add_queue('persistent_messages_queue', handle_persistent, prefetch_count=2, weight=2)
+    mux.add_queue('transient_messages_queue', handle_transient, prefetch_count=4)
+    mux.run(stop_event)
+"""
+import functools
+import logging
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+import pika
+
+from utils.histogram import LatencyHistogram
+from utils.workers import Handler
+
+class _QueueState:
+    """
+    Buffer, peso e métricas de uma fila multiplexada
+    """
+
+    def __init__(self, queue: str, handler: Handler, prefetch_count: int, weight: float,
+                 requeue_on_error: bool):
+        self.queue = queue
+        self.handler = handler
+        self.prefetch_count = prefetch_count
+        self.weight = weight
+        self.requeue_on_error = requeue_on_error
+        self.consumer_tag: Optional[str] = None
+        # (method, properties, body, instante de chegada)
+        self.buffer: Deque[Tuple[Any, pika.BasicProperties, bytes, float]] = deque()
+        # Tempo virtual em que termina o último serviço desta fila
+        self.finish = 0.0
+        self.processed = 0
+        self.failed = 0
+        self.busy_seconds = 0.0
+        self.service = LatencyHistogram()
+        self.wait = LatencyHistogram()
+        self.ready: Optional[int] = None
+
+    def oldest_age(self, now: float) -> float:
+        if not self.buffer:
+            return 0.0
+        _, properties, _, arrived_at = self.buffer[0]
+        # timestamp do producer dá a idade desde o envio; sem ele, desde a chegada
+        sent_at = properties.timestamp if properties and properties.timestamp else None
+        return max(0.0, now - sent_at) if sent_at else now - arrived_at
+
+class QueueMultiplexer:
+    """
+    Consome várias filas em um canal com prefetch por fila e pesos
+
+    Os handlers rodam na thread de I/O, um de cada vez, e não fazem ack
+    (como em consume_threaded): a entrega é confirmada se o handler
+    terminar e recebe NACK se lançar exceção.
+
+    Args:
+        channel: Canal do RabbitMQ (BlockingChannel) dedicado ao multiplexador
+        logger: Logger para erros e relatórios de lag
+        lag_interval: Segundos entre consultas do backlog das filas (0 desativa)
+    """
+
+    def __init__(self, channel, logger: Optional[logging.Logger] = None, lag_interval: float = 10.0):
+        self.channel = channel
+        self.logger = logger or logging.getLogger(__name__)
+        self.lag_interval = lag_interval
+        self._queues: Dict[str, _QueueState] = {}
+        self._virtual_time = 0.0
+        self._last_lag_check = 0.0
+
+    def add_queue(self,
+                  queue: str,
+                  handler: Handler,
+                  prefetch_count: int = 1,
+                  weight: float = 1.0,
+                  requeue_on_error: bool = True) -> None:
+        """
+        Registra uma fila e inicia o consumo com o prefetch dela
+
+        Args:
+            queue: Nome da fila (já declarada)
+            handler: Função que recebe (method, properties, body) e não faz ack
+            prefetch_count: Entregas não confirmadas desta fila
+            weight: Fração relativa do tempo de processamento
+            requeue_on_error: Se mensagens com erro no handler voltam para a fila
+
+        Raises:
+            ValueError: Se a fila já estiver registrada ou os parâmetros forem inválidos
+        """
+        if queue in self._queues:
+            raise ValueError(f"Fila '{queue}' já registrada no multiplexador")
+        if prefetch_count < 1 or weight <= 0:
+            raise ValueError("prefetch_count deve ser >= 1 e weight > 0")
+
+        state = _QueueState(queue, handler, prefetch_count, weight, requeue_on_error)
+        # Começa no tempo virtual atual: filas novas não recebem crédito acumulado
+        state.finish = self._virtual_time
+        self._queues[queue] = state
+        # Sem global_qos o limite vale por consumer, então cada fila tem a sua janela
+        self.channel.basic_qos(prefetch_count=prefetch_count)
+        state.consumer_tag = self.channel.basic_consume(
+            queue=queue, on_message_callback=functools.partial(self._on_message, state)
+        )
+
+    def _on_message(self, state: _QueueState, ch, method, properties, body) -> None:
+        state.buffer.append((method, properties, body, time.time()))
+
+    def _next_queue(self) -> Optional[_QueueState]:
+        # Menor tempo virtual de início entre as filas com entregas no buffer
+        best = None
+        best_start = 0.0
+        for state in self._queues.values():
+            if not state.buffer:
+                continue
+            start = max(self._virtual_time, state.finish)
+            if best is None or start < best_start:
+                best, best_start = state, start
+        return best
+
+    def _serve(self, state: _QueueState) -> None:
+        method, properties, body, arrived_at = state.buffer.popleft()
+        start = max(self._virtual_time, state.finish)
+        self._virtual_time = start
+        state.wait.record(time.time() - arrived_at)
+
+        started = time.perf_counter()
+        try:
+            state.handler(method, properties, body)
+            success = True
+        except Exception as e:
+            self.logger.error(f"Erro no handler de '{state.queue}' (tag {method.delivery_tag}): {str(e)}")
+            success = False
+        elapsed = time.perf_counter() - started
+
+        state.finish = start + elapsed / state.weight
+        state.busy_seconds += elapsed
+        state.service.record(elapsed)
+        if not self.channel.is_open:
+            return
+        if success:
+            state.processed += 1
+            self.channel.basic_ack(delivery_tag=method.delivery_tag)
+        else:
+            state.failed += 1
+            self.channel.basic_nack(delivery_tag=method.delivery_tag, requeue=state.requeue_on_error)
+
+    def refresh_lag(self) -> None:
+        """
+        Atualiza o número de mensagens prontas de cada fila (queue_declare passivo)
+        """
+        for state in self._queues.values():
+            frame = self.channel.queue_declare(queue=state.queue, passive=True)
+            state.ready = frame.method.message_count
+        self._last_lag_check = time.monotonic()
+
+    def get_lag(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Lag por fila: prontas no broker (última consulta), no buffer e idade
+        da entrega mais antiga do buffer (segundos)
+        """
+        now = time.time()
+        return {
+            queue: {
+                'ready': state.ready,
+                'buffered': len(state.buffer),
+                'oldest_age': state.oldest_age(now)
+            }
+            for queue, state in self._queues.items()
+        }
+
+    def get_stats(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Métricas por fila, incluindo a fração do tempo de serviço recebida
+        """
+        total_busy = sum(state.busy_seconds for state in self._queues.values())
+        lag = self.get_lag()
+        return {
+            queue: {
+                'weight': state.weight,
+                'prefetch_count': state.prefetch_count,
+                'processed': state.processed,
+                'failed': state.failed,
+                'share': state.busy_seconds / total_busy if total_busy else 0.0,
+                'service': state.service.summary(),
+                'wait_p99_ms': state.wait.percentile(99) * 1000,
+                **lag[queue]
+            }
+            for queue, state in self._queues.items()
+        }
+
+    def log_lag(self) -> None:
+        for queue, lag in self.get_lag().items():
+            ready = '?' if lag['ready'] is None else lag['ready']
+            self.logger.info(f"📈 Lag '{queue}': {ready} prontas no broker, {lag['buffered']} no buffer, "
+                             f"mais antiga há {lag['oldest_age']:.1f}s")
+
+    def _maybe_report_lag(self) -> None:
+        if self.lag_interval and time.monotonic() - self._last_lag_check >= self.lag_interval:
+            self.refresh_lag()
+            self.log_lag()
+
+    def run(self, stop_event: Optional[threading.Event] = None, poll_interval: float = 0.5) -> Dict[str, Dict[str, Any]]:
+        """
+        Processa as filas até stop_event ser sinalizado (ou KeyboardInterrupt)
+
+        Ao sair, os consumers são cancelados e as entregas ainda no buffer
+        voltam para as filas.
+
+        Returns:
+            get_stats() ao final do consumo
+        """
+        stop_event = stop_event or threading.Event()
+        connection = self.channel.connection
+        self._last_lag_check = time.monotonic()
+        try:
+            while not stop_event.is_set() and self.channel.is_open:
+                state = self._next_queue()
+                if state is None:
+                    connection.process_data_events(time_limit=poll_interval)
+                else:
+                    self._serve(state)
+                    # Recebe as entregas liberadas pelo ACK antes de escolher a próxima
+                    connection.process_data_events(time_limit=0)
+                self._maybe_report_lag()
+        finally:
+            self.close()
+        return self.get_stats()
+
+    def close(self) -> None:
+        """
+        Cancela os consumers e devolve às filas as entregas não iniciadas
+        """
+        if not self.channel.is_open:
+            return
+        for state in self._queues.values():
+            if state.consumer_tag is not None:
+                self.channel.basic_cancel(state.consumer_tag)
+                state.consumer_tag = None
+        for state in self._queues.values():
+            while state.buffer:
+                method = state.buffer.popleft()[0]
+                self.channel.basic_nack(delivery_tag=method.delivery_tag, requeue=True)
+
+    def queues(self) -> List[str]:
+        return list(self._queues)
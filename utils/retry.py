@@ -0,0 +1,156 @@
+"""
+Retry atrasado em tiers com TTL e dead-lettering
+
+Substitui basic_nack(requeue=True), que devolve a mensagem na hora e cria
+laços quentes de reprocessamento: a mensagem com falha é republicada em uma
+fila de atraso (x-message-ttl) do tier correspondente à tentativa e
+confirmada. Quando o TTL vence, o broker a devolve à fila de trabalho via
+dead-lettering, sem ocupar o consumer enquanto espera. Esgotados os tiers, a
+mensagem vai para a fila de mensagens mortas ({fila}.dead).
+
+A contagem de tentativas viaja com a mensagem (header x-retry-attempt, com
+fallback para as entradas de x-death das filas de atraso), então sobrevive
+a reinícios do consumer e não depende de estado em memória.
+
+Uso típico:
+    retry = RetryPolicy('manual_ack_queue')
+    retry.declare(channel)
+    ...
+    except TemporaryError as e:
+        retry.retry(ch, method, properties, body, reason=str(e))
+"""
+import copy
+import logging
+from typing import Any, Dict, Iterable, List, Optional
+
+import pika
+
+from utils.topology import (
+    RETRY_TIERS_MS, dead_letter_queue_name, declare, retry_queue_name, retry_topology
+)
+
+ATTEMPT_HEADER = 'x-retry-attempt'
+REASON_HEADER = 'x-retry-reason'
+DEAD_REASON_HEADER = 'x-dead-reason'
+
+# Tamanho máximo do motivo gravado nos headers
+MAX_REASON_LENGTH = 200
+
+def exponential_delays(base_ms: int = 1000, factor: int = 5, tiers: int = 3) -> List[int]:
+    """
+    Atrasos dos tiers em progressão geométrica (ex: 1000, 5000, 25000)
+    """
+    return [base_ms * factor ** tier for tier in range(tiers)]
+
+class RetryPolicy:
+    """
+    Política de retry atrasado de uma fila de trabalho
+
+    Args:
+        queue: Fila de trabalho consumida
+        delays_ms: Atraso de cada tier (padrão: RETRY_TIERS_MS do manifesto)
+        max_retries: Retentativas antes de mandar para a fila de mortas
+            (padrão: uma por tier; tentativas além dos tiers usam o último)
+        durable: Se as filas de atraso e de mortas são duráveis
+        logger: Logger para registrar retentativas
+    """
+
+    def __init__(self,
+                 queue: str,
+                 delays_ms: Optional[Iterable[int]] = None,
+                 max_retries: Optional[int] = None,
+                 durable: bool = True,
+                 logger: Optional[logging.Logger] = None):
+        self.queue = queue
+        self.delays_ms = list(delays_ms if delays_ms is not None else RETRY_TIERS_MS.get(queue, exponential_delays()))
+        if not self.delays_ms:
+            raise ValueError("RetryPolicy precisa de pelo menos um tier de atraso")
+        self.max_retries = max_retries if max_retries is not None else len(self.delays_ms)
+        self.durable = durable
+        self.dead_letter_queue = dead_letter_queue_name(queue)
+        self.logger = logger or logging.getLogger(__name__)
+        self.stats: Dict[str, Any] = {
+            'retried': 0,
+            'dead_lettered': 0,
+            'by_tier': {delay_ms: 0 for delay_ms in self.delays_ms}
+        }
+
+    def topology(self) -> Dict[str, List[Dict[str, Any]]]:
+        return retry_topology(self.queue, self.delays_ms, durable=self.durable)
+
+    def declare(self, channel) -> int:
+        """
+        Declara as filas de atraso e de mortas (idempotente, em pipeline)
+        """
+        return declare(channel, **self.topology())
+
+    def attempts(self, properties: Optional[pika.BasicProperties]) -> int:
+        """
+        Retentativas já feitas para a mensagem
+
+        Usa o header x-retry-attempt; sem ele, soma as expirações registradas
+        em x-death nas filas de atraso desta fila de trabalho.
+        """
+        headers = (properties.headers if properties else None) or {}
+        if ATTEMPT_HEADER in headers:
+            return int(headers[ATTEMPT_HEADER])
+        prefix = f"{self.queue}.retry."
+        return sum(int(death.get('count', 1)) for death in headers.get('x-death') or []
+                   if death.get('reason') == 'expired' and str(death.get('queue', '')).startswith(prefix))
+
+    def delay_for(self, attempt: int) -> int:
+        """
+        Atraso (ms) da retentativa de número attempt (0 = primeira)
+        """
+        return self.delays_ms[min(attempt, len(self.delays_ms) - 1)]
+
+    def _republish(self, channel, routing_key: str, properties: Optional[pika.BasicProperties],
+                   body: bytes, headers: Dict[str, Any]) -> None:
+        new_properties = copy.copy(properties) if properties else pika.BasicProperties()
+        new_properties.headers = {**(new_properties.headers or {}), **headers}
+        # Um expiration por mensagem competiria com o TTL do tier
+        new_properties.expiration = None
+        channel.basic_publish(exchange='', routing_key=routing_key, body=body, properties=new_properties)
+
+    def retry(self, channel, method, properties: Optional[pika.BasicProperties], body: bytes,
+              reason: str = '') -> str:
+        """
+        Agenda uma nova tentativa da mensagem e confirma a entrega atual
+
+        A mensagem é republicada antes do ACK: uma queda entre os dois
+        gera, no máximo, uma entrega duplicada.
+
+        Returns:
+            'retry' se foi para uma fila de atraso ou 'dead' se esgotou as tentativas
+        """
+        attempt = self.attempts(properties)
+        if attempt >= self.max_retries:
+            self.dead_letter(channel, method, properties, body,
+                             reason=f"tentativas esgotadas ({attempt}): {reason}")
+            return 'dead'
+
+        delay_ms = self.delay_for(attempt)
+        self._republish(channel, retry_queue_name(self.queue, delay_ms), properties, body, {
+            ATTEMPT_HEADER: attempt + 1,
+            REASON_HEADER: reason[:MAX_REASON_LENGTH]
+        })
+        channel.basic_ack(delivery_tag=method.delivery_tag)
+        self.stats['retried'] += 1
+        self.stats['by_tier'][delay_ms] = self.stats['by_tier'].get(delay_ms, 0) + 1
+        self.logger.info(f"Retentativa {attempt + 1}/{self.max_retries} agendada em {delay_ms}ms "
+                         f"(tag {method.delivery_tag}): {reason}")
+        return 'retry'
+
+    def dead_letter(self, channel, method, properties: Optional[pika.BasicProperties], body: bytes,
+                    reason: str = '') -> None:
+        """
+        Move a mensagem para a fila de mortas e confirma a entrega atual
+        """
+        self._republish(channel, self.dead_letter_queue, properties, body, {
+            ATTEMPT_HEADER: self.attempts(properties),
+            DEAD_REASON_HEADER: reason[:MAX_REASON_LENGTH]
+        })
+        channel.basic_ack(delivery_tag=method.delivery_tag)
+        self.stats['dead_lettered'] += 1
+        self.logger.warning(f"Mensagem enviada para '{self.dead_letter_queue}' "
+                            f"(tag {method.delivery_tag}): {reason}")
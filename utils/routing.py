@@ -0,0 +1,374 @@
+"""
+Roteamento do lado do cliente: previsão das filas de destino
+
+O producer não sabe para quais filas uma routing key vai sem perguntar ao
+broker. TopicTrie compila os bindings topic conhecidos (manifesto de
+topologia ou bindings avulsos) em uma trie por palavra, com nós especiais
+para '*' (exatamente uma palavra) e '#' (zero ou mais palavras), e responde
+match(routing_key) -> filas. O custo depende do tamanho da key e não do
+número de bindings, e os resultados ficam memoizados (LRU), então as keys
+repetidas de um producer custam uma consulta a dicionário.
+
+HeadersIndex faz o mesmo para exchanges headers: os bindings são indexados
+por (header, valor), e uma mensagem só consulta as listas dos headers que
+carrega. Cada binding candidato conta quantos critérios a mensagem
+satisfez, o que basta para avaliar x-match any (ao menos um) e all (todos)
+sem percorrer os bindings que não compartilham nenhum header.
+
+Uso típico:
+    router = TopicTrie.from_topology('topic_exchange')
+    router.match('system.error.auth')    # ('topic_queue_errors',)
+    router.is_routable('app.order.created')  # False: nenhuma fila recebe
+
+    index = HeadersIndex.from_topology('headers_exchange')
+    index.match({'format': 'csv', 'source': 'api'})  # (): nenhuma fila recebe
+"""
+import functools
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from utils.topology import get_scenario_topology
+
+class _TopicNode:
+    """
+    Nó da trie: filhos por palavra, filhos curinga e filas dos bindings que terminam aqui
+    """
+    __slots__ = ('children', 'star', 'hash', 'queues', 'is_hash')
+
+    def __init__(self, is_hash: bool = False):
+        self.children: Dict[str, '_TopicNode'] = {}
+        self.star: Optional['_TopicNode'] = None
+        self.hash: Optional['_TopicNode'] = None
+        self.queues: Set[str] = set()
+        # Nó alcançado por '#': pode consumir mais palavras sem sair do lugar
+        self.is_hash = is_hash
+
+class TopicTrie:
+    """
+    Trie de padrões topic ('*' e '#') com match memoizado
+
+    A semântica é a mesma de memory_broker.topic_matches (palavras separadas
+    por '.'), e cada fila aparece uma vez no resultado mesmo com vários
+    bindings casando.
+
+    Args:
+        bindings: Pares (padrão, fila) iniciais
+        cache_size: Routing keys distintas memoizadas (0 desativa)
+    """
+
+    def __init__(self, bindings: Iterable[Tuple[str, str]] = (), cache_size: int = 4096):
+        self._root = _TopicNode()
+        self._bindings: Set[Tuple[str, str]] = set()
+        self.cache_size = cache_size
+        self._cached_match = functools.lru_cache(maxsize=cache_size)(self._match)
+        for pattern, queue in bindings:
+            self.add(pattern, queue)
+
+    @classmethod
+    def from_bindings(cls, bindings: Iterable[Dict[str, Any]], exchange: Optional[str] = None,
+                      cache_size: int = 4096) -> 'TopicTrie':
+        """
+        Cria a trie a partir de bindings no formato do manifesto
+
+        Args:
+            bindings: Dicionários {'exchange', 'queue', 'routing_key'}
+            exchange: Considera só os bindings deste exchange (padrão: todos)
+        """
+        return cls(((binding.get('routing_key', ''), binding['queue']) for binding in bindings
+                    if exchange is None or binding['exchange'] == exchange), cache_size=cache_size)
+
+    @classmethod
+    def from_topology(cls, scenario: str, exchange: Optional[str] = None,
+                      cache_size: int = 4096) -> 'TopicTrie':
+        """
+        Cria a trie com os bindings de um cenário do manifesto de topologia
+
+        Raises:
+            KeyError: Se o cenário não existir no manifesto
+        """
+        return cls.from_bindings(get_scenario_topology(scenario)['bindings'], exchange, cache_size)
+
+    def add(self, pattern: str, queue: str) -> None:
+        """
+        Adiciona um binding (padrão -> fila); invalida o cache
+        """
+        node = self._root
+        for word in pattern.split('.'):
+            if word == '#':
+                node.hash = node.hash or _TopicNode(is_hash=True)
+                node = node.hash
+            elif word == '*':
+                node.star = node.star or _TopicNode()
+                node = node.star
+            else:
+                node = node.children.setdefault(word, _TopicNode())
+        node.queues.add(queue)
+        self._bindings.add((pattern, queue))
+        self._cached_match.cache_clear()
+
+    def remove(self, pattern: str, queue: str) -> bool:
+        """
+        Remove um binding; os nós vazios ficam na trie (não mudam o resultado)
+
+        Returns:
+            True se o binding existia
+        """
+        if (pattern, queue) not in self._bindings:
+            return False
+        node = self._root
+        for word in pattern.split('.'):
+            node = node.hash if word == '#' else node.star if word == '*' else node.children[word]
+        node.queues.discard(queue)
+        self._bindings.discard((pattern, queue))
+        self._cached_match.cache_clear()
+        return True
+
+    def _match(self, routing_key: str) -> Tuple[str, ...]:
+        words = routing_key.split('.')
+        size = len(words)
+        queues: Dict[str, None] = {}
+        # Percorre os estados (nó, palavras consumidas); visited evita a
+        # explosão combinatória com vários '#' no mesmo padrão
+        stack: List[Tuple[_TopicNode, int]] = [(self._root, 0)]
+        visited: Set[Tuple[int, int]] = set()
+        while stack:
+            node, index = stack.pop()
+            state = (id(node), index)
+            if state in visited:
+                continue
+            visited.add(state)
+            if node.hash is not None:
+                # '#' casando zero palavras
+                stack.append((node.hash, index))
+            if index == size:
+                for queue in node.queues:
+                    queues[queue] = None
+                continue
+            if node.is_hash:
+                # '#' casando mais uma palavra
+                stack.append((node, index + 1))
+            child = node.children.get(words[index])
+            if child is not None:
+                stack.append((child, index + 1))
+            if node.star is not None:
+                stack.append((node.star, index + 1))
+        return tuple(sorted(queues))
+
+    def match(self, routing_key: str) -> Tuple[str, ...]:
+        """
+        Filas que recebem uma routing key (ordenadas, sem repetição)
+        """
+        return self._cached_match(routing_key)
+
+    def is_routable(self, routing_key: str) -> bool:
+        return bool(self._cached_match(routing_key))
+
+    def fanout(self, routing_keys: Iterable[str]) -> Dict[str, int]:
+        """
+        Número de filas de destino de cada routing key
+        """
+        return {key: len(self._cached_match(key)) for key in routing_keys}
+
+    def unroutable(self, routing_keys: Iterable[str]) -> List[str]:
+        """
+        Routing keys que não chegam a nenhuma fila (o broker as descartaria)
+        """
+        return [key for key in dict.fromkeys(routing_keys) if not self._cached_match(key)]
+
+    def bindings(self) -> List[Tuple[str, str]]:
+        return sorted(self._bindings)
+
+    def cache_info(self):
+        return self._cached_match.cache_info()
+
+    def __len__(self) -> int:
+        return len(self._bindings)
+
+def _hashable(value: Any) -> bool:
+    try:
+        hash(value)
+    except TypeError:
+        return False
+    return True
+
+def _frozen_headers(headers: Optional[Dict[str, Any]]) -> Optional[Tuple[Tuple[str, Any], ...]]:
+    # Chave do cache; None se algum valor não for hashable (tabelas, listas)
+    items = tuple(sorted((headers or {}).items()))
+    return items if all(_hashable(value) for _, value in items) else None
+
+class _HeadersBinding:
+    """
+    Binding headers compilado: modo (any/all) e critérios
+
+    As chaves 'x-' só viram critério nos modos any-with-x / all-with-x.
+    """
+    __slots__ = ('queue', 'arguments', 'any', 'criteria')
+
+    def __init__(self, queue: str, arguments: Dict[str, Any]):
+        self.queue = queue
+        self.arguments = arguments
+        x_match = str(arguments.get('x-match', 'all'))
+        with_x = x_match.endswith('-with-x')
+        self.any = x_match.startswith('any')
+        self.criteria = {k: v for k, v in arguments.items()
+                         if k != 'x-match' and (with_x or not k.startswith('x-'))}
+
+    def matches(self, headers: Dict[str, Any]) -> bool:
+        results = (k in headers and (v is None or headers[k] == v) for k, v in self.criteria.items())
+        return any(results) if self.any else all(results)
+
+class HeadersIndex:
+    """
+    Índice de bindings headers por (header, valor) com x-match any/all (e -with-x)
+
+    A semântica é a mesma de memory_broker.headers_match: x-match 'all' é o
+    padrão, critérios com valor None só exigem a presença do header e um
+    binding 'all' sem critérios recebe tudo. Bindings com valores que não são
+    hashable ficam fora do índice e são avaliados um a um.
+
+    Args:
+        bindings: Pares (fila, argumentos do binding) iniciais
+        cache_size: Combinações de headers distintas memoizadas (0 desativa)
+    """
+
+    def __init__(self, bindings: Iterable[Tuple[str, Dict[str, Any]]] = (), cache_size: int = 4096):
+        self._bindings: List[_HeadersBinding] = []
+        # (header, valor) -> bindings; header -> bindings que só exigem presença
+        self._by_pair: Dict[Tuple[str, Any], List[_HeadersBinding]] = {}
+        self._by_key: Dict[str, List[_HeadersBinding]] = {}
+        # Avaliados sempre: 'all' sem critérios e critérios não indexáveis
+        self._scan: List[_HeadersBinding] = []
+        self.cache_size = cache_size
+        self._cached_match = functools.lru_cache(maxsize=cache_size)(self._match_frozen)
+        for queue, arguments in bindings:
+            self.add(queue, arguments)
+
+    @classmethod
+    def from_bindings(cls, bindings: Iterable[Dict[str, Any]], exchange: Optional[str] = None,
+                      cache_size: int = 4096) -> 'HeadersIndex':
+        """
+        Cria o índice a partir de bindings no formato do manifesto
+
+        Args:
+            bindings: Dicionários {'exchange', 'queue', 'arguments'}
+            exchange: Considera só os bindings deste exchange (padrão: todos)
+        """
+        return cls(((binding['queue'], binding.get('arguments') or {}) for binding in bindings
+                    if exchange is None or binding['exchange'] == exchange), cache_size=cache_size)
+
+    @classmethod
+    def from_topology(cls, scenario: str, exchange: Optional[str] = None,
+                      cache_size: int = 4096) -> 'HeadersIndex':
+        """
+        Cria o índice com os bindings de um cenário do manifesto de topologia
+
+        Raises:
+            KeyError: Se o cenário não existir no manifesto
+        """
+        return cls.from_bindings(get_scenario_topology(scenario)['bindings'], exchange, cache_size)
+
+    def add(self, queue: str, arguments: Dict[str, Any]) -> None:
+        """
+        Adiciona um binding (fila, argumentos com x-match); invalida o cache
+        """
+        binding = _HeadersBinding(queue, dict(arguments))
+        self._bindings.append(binding)
+        if not binding.criteria or not all(_hashable(v) for v in binding.criteria.values()):
+            self._scan.append(binding)
+        else:
+            for key, value in binding.criteria.items():
+                if value is None:
+                    self._by_key.setdefault(key, []).append(binding)
+                else:
+                    self._by_pair.setdefault((key, value), []).append(binding)
+        self._cached_match.cache_clear()
+
+    def remove(self, queue: str, arguments: Dict[str, Any]) -> bool:
+        """
+        Remove um binding
+
+        Returns:
+            True se o binding existia
+        """
+        arguments = dict(arguments)
+        binding = next((b for b in self._bindings if b.queue == queue and b.arguments == arguments), None)
+        if binding is None:
+            return False
+        self._bindings.remove(binding)
+        for postings in [self._scan, *self._by_pair.values(), *self._by_key.values()]:
+            if binding in postings:
+                postings.remove(binding)
+        self._cached_match.cache_clear()
+        return True
+
+    def _match(self, headers: Dict[str, Any]) -> Tuple[str, ...]:
+        # Critérios satisfeitos por binding candidato: cada header da mensagem
+        # satisfaz no máximo um critério de cada binding
+        hits: Dict[int, int] = {}
+        candidates: Dict[int, _HeadersBinding] = {}
+        for key, value in headers.items():
+            postings = self._by_key.get(key, [])
+            if _hashable(value):
+                postings = postings + self._by_pair.get((key, value), [])
+            for binding in postings:
+                hits[id(binding)] = hits.get(id(binding), 0) + 1
+                candidates[id(binding)] = binding
+
+        queues: Dict[str, None] = {}
+        for ident, binding in candidates.items():
+            if binding.any or hits[ident] == len(binding.criteria):
+                queues[binding.queue] = None
+        for binding in self._scan:
+            if binding.matches(headers):
+                queues[binding.queue] = None
+        return tuple(sorted(queues))
+
+    def _match_frozen(self, frozen: Tuple[Tuple[str, Any], ...]) -> Tuple[str, ...]:
+        return self._match(dict(frozen))
+
+    def match(self, headers: Optional[Dict[str, Any]]) -> Tuple[str, ...]:
+        """
+        Filas que recebem uma mensagem com estes headers (ordenadas, sem repetição)
+        """
+        frozen = _frozen_headers(headers)
+        if frozen is None:
+            return self._match(headers or {})
+        return self._cached_match(frozen)
+
+    def is_routable(self, headers: Optional[Dict[str, Any]]) -> bool:
+        return bool(self.match(headers))
+
+    def unmatched(self, combinations: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Combinações de headers que não chegam a nenhuma fila
+        """
+        return [headers for headers in combinations if not self.match(headers)]
+
+    def unmatched_report(self, combinations: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Combinações sem destino com o número de ocorrências, da mais frequente
+
+        Args:
+            combinations: Headers publicados (um dicionário por mensagem)
+
+        Returns:
+            Lista de {'headers', 'count'}
+        """
+        counts: Counter = Counter()
+        examples: Dict[Any, Dict[str, Any]] = {}
+        for headers in combinations:
+            if self.match(headers):
+                continue
+            key = _frozen_headers(headers) or repr(sorted((headers or {}).items()))
+            counts[key] += 1
+            examples.setdefault(key, dict(headers or {}))
+        return [{'headers': examples[key], 'count': count} for key, count in counts.most_common()]
+
+    def bindings(self) -> List[Tuple[str, Dict[str, Any]]]:
+        return [(binding.queue, dict(binding.arguments)) for binding in self._bindings]
+
+    def cache_info(self):
+        return self._cached_match.cache_info()
+
+    def __len__(self) -> int:
+        return len(self._bindings)
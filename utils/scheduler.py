@@ -0,0 +1,207 @@
+"""
+Escalonador local das entregas já recebidas (buffer do prefetch)
+
+Com prefetch > 1 o consumer recebe várias mensagens antes de processá-las e,
+sem escalonamento, as processa na ordem de chegada: um alerta de prioridade
+10 espera atrás de um BATCH_PROCESS de duas horas. DeliveryScheduler mantém
+as entregas pendentes em um heap e entrega a próxima segundo uma política:
+
+- fifo: ordem de chegada
+- priority: maior properties.priority primeiro
+- sjf: menor tempo estimado primeiro (header estimated_time ou
+  processing_time; sem header, o mesmo campo da mensagem)
+- edf: prazo mais cedo primeiro (timestamp/chegada + properties.expiration)
+
+Empates (e mensagens sem o atributo da política) seguem a ordem de chegada.
+O prefetch não muda; só a ordem de processamento dentro da janela.
+
+A estimativa em header evita decodificar o corpo na thread de I/O; quem já
+decodificou a mensagem (consume_in_processes) a passa para push(message=...).
+"""
+import heapq
+import inspect
+import itertools
+import math
+import os
+import re
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+import pika
+
+from utils.serialization import decode_message
+
+# Chave de ordenação: recebe (properties, body, instante de chegada)
+SchedulingKey = Callable[[Optional[pika.BasicProperties], bytes, float], float]
+
+# Campos (header ou mensagem) com o tempo estimado de processamento
+ESTIMATE_FIELDS = ('estimated_time', 'processing_time')
+
+# Marca de "mensagem não decodificada" (None é uma mensagem válida)
+_UNDECODED = object()
+
+_DURATION = re.compile(r'^\s*(\d+(?:\.\d+)?)\s*([a-zç]*)', re.IGNORECASE)
+
+_UNIT_SECONDS = {
+    '': 1, 's': 1, 'sec': 1, 'second': 1, 'seconds': 1, 'segundo': 1, 'segundos': 1,
+    'm': 60, 'min': 60, 'minute': 60, 'minutes': 60, 'minuto': 60, 'minutos': 60,
+    'h': 3600, 'hour': 3600, 'hours': 3600, 'hora': 3600, 'horas': 3600
+}
+
+def parse_duration(value: Any) -> Optional[float]:
+    """
+    Converte uma duração (número em segundos ou texto como '45 minutes') em segundos
+
+    Returns:
+        Segundos ou None se o valor não for reconhecido
+    """
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return float(value)
+    if isinstance(value, str):
+        match = _DURATION.match(value)
+        if match and match.group(2).lower() in _UNIT_SECONDS:
+            return float(match.group(1)) * _UNIT_SECONDS[match.group(2).lower()]
+    return None
+
+def priority_key(properties: Optional[pika.BasicProperties], body: bytes, arrived_at: float) -> float:
+    return -float((properties.priority if properties else None) or 0)
+
+def _estimate(fields: Any) -> Optional[float]:
+    if not isinstance(fields, dict):
+        return None
+    for field in ESTIMATE_FIELDS:
+        seconds = parse_duration(fields.get(field))
+        if seconds is not None:
+            return seconds
+    return None
+
+def shortest_job_key(properties: Optional[pika.BasicProperties], body: bytes, arrived_at: float,
+                     message: Any = _UNDECODED) -> float:
+    # Header primeiro; o corpo só é decodificado se ninguém o decodificou ainda
+    seconds = _estimate(properties.headers if properties else None)
+    if seconds is None:
+        if message is _UNDECODED:
+            try:
+                message = decode_message(body, properties)
+            except Exception:
+                return math.inf
+        seconds = _estimate(message)
+    # Sem estimativa vai para o fim
+    return math.inf if seconds is None else seconds
+
+def deadline_key(properties: Optional[pika.BasicProperties], body: bytes, arrived_at: float) -> float:
+    expiration = properties.expiration if properties else None
+    if expiration is None:
+        return math.inf
+    # timestamp é o envio (segundos) quando o producer preenche; senão, a chegada
+    start = properties.timestamp if properties.timestamp else arrived_at
+    return start + int(expiration) / 1000.0
+
+def fifo_key(properties: Optional[pika.BasicProperties], body: bytes, arrived_at: float) -> float:
+    return 0.0
+
+POLICIES: Dict[str, SchedulingKey] = {
+    'fifo': fifo_key,
+    'priority': priority_key,
+    'sjf': shortest_job_key,
+    'edf': deadline_key
+}
+
+class DeliveryScheduler:
+    """
+    Fila de entregas pendentes ordenada por uma política
+
+    Thread-safe: push na thread de I/O e pop nas threads de trabalho.
+
+    Args:
+        policy: Nome em POLICIES ou função (properties, body, chegada) -> chave;
+            se a função aceitar o parâmetro message, recebe a mensagem já
+            decodificada quando push() a tiver
+    """
+
+    def __init__(self, policy: Any = 'priority'):
+        if callable(policy):
+            self.policy_name = getattr(policy, '__name__', 'custom')
+            self._key = policy
+        elif policy in POLICIES:
+            self.policy_name = policy
+            self._key = POLICIES[policy]
+        else:
+            raise ValueError(f"Política de escalonamento desconhecida: {policy} "
+                             f"(disponíveis: {', '.join(POLICIES)})")
+        try:
+            self._takes_message = 'message' in inspect.signature(self._key).parameters
+        except (TypeError, ValueError):
+            self._takes_message = False
+        self._heap: List[Tuple[float, int, Any]] = []
+        # Ordens de chegada ainda pendentes (min-heap com remoção preguiçosa)
+        self._arrivals: List[int] = []
+        self._removed: Set[int] = set()
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+        self.stats = {'scheduled': 0, 'reordered': 0}
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+    def push(self, item: Any, properties: Optional[pika.BasicProperties], body: bytes,
+             message: Any = _UNDECODED) -> None:
+        """
+        Adiciona uma entrega; item é devolvido por pop() quando for a vez dela
+
+        Args:
+            message: Corpo já decodificado, se houver (evita decodificar de novo)
+        """
+        if self._takes_message and message is not _UNDECODED:
+            key = self._key(properties, body, time.time(), message=message)
+        else:
+            key = self._key(properties, body, time.time())
+        with self._lock:
+            seq = next(self._seq)
+            heapq.heappush(self._heap, (key, seq, item))
+            heapq.heappush(self._arrivals, seq)
+            self.stats['scheduled'] += 1
+
+    def pop(self) -> Any:
+        """
+        Remove a próxima entrega segundo a política
+
+        Raises:
+            IndexError: Se não houver entregas pendentes
+        """
+        with self._lock:
+            _, seq, item = heapq.heappop(self._heap)
+            # Passou na frente de alguma entrega que chegou antes: a mais
+            # antiga pendente não é ela
+            if self._arrivals[0] != seq:
+                self.stats['reordered'] += 1
+                self._removed.add(seq)
+            else:
+                heapq.heappop(self._arrivals)
+                while self._arrivals and self._arrivals[0] in self._removed:
+                    self._removed.discard(heapq.heappop(self._arrivals))
+            return item
+
+    def order(self, deliveries: Iterable[Tuple[Any, pika.BasicProperties, bytes]]) -> List[Tuple[Any, pika.BasicProperties, bytes]]:
+        """
+        Ordena um lote de (method, properties, body) segundo a política (estável)
+        """
+        now = time.time()
+        deliveries = list(deliveries)
+        ordered = sorted(deliveries, key=lambda d: self._key(d[1], d[2], now))
+        if ordered != deliveries:
+            self.stats['reordered'] += 1
+        self.stats['scheduled'] += len(deliveries)
+        return ordered
+
+def create_scheduler(default_policy: str = 'priority') -> Optional[DeliveryScheduler]:
+    """
+    Cria o escalonador da política em SCHEDULER_POLICY (padrão: default_policy)
+
+    Returns:
+        DeliveryScheduler ou None com SCHEDULER_POLICY=fifo (ordem de chegada
+        sem custo de heap)
+    """
+    policy = os.getenv('SCHEDULER_POLICY', default_policy)
+    return None if policy == 'fifo' else DeliveryScheduler(policy)
@@ -0,0 +1,397 @@
+"""
+Registro de codecs de mensagem selecionados pelo content_type
+
+Codecs disponíveis:
+- application/json: JSON compacto (sem indentação nem espaços)
+- application/x-compact-binary: formato binário compacto só com stdlib
+- application/msgpack: MessagePack, se o pacote msgpack estiver instalado
+
+Todos decodificam direto de bytes, sem body.decode('utf-8') intermediário.
+
+Também trata compressão zlib anunciada em content_encoding ('deflate' ou
+'deflate+zdict:<nome>' quando usa um dicionário pré-treinado), aplicada
+apenas acima de um limite de tamanho e revertida automaticamente por
+decode_message.
+"""
+import copy
+import json
+import os
+import struct
+import zlib
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import pika
+
+try:
+    import msgpack
+except ImportError:  # Dependência opcional
+    msgpack = None
+
+DEFAULT_CONTENT_TYPE = 'application/json'
+
+class Codec:
+    """
+    Par encode/decode associado a um content_type
+    """
+
+    def __init__(self, content_type: str, encode: Callable[[Any], bytes], decode: Callable[[bytes], Any]):
+        self.content_type = content_type
+        self.encode = encode
+        self.decode = decode
+
+    def __repr__(self) -> str:
+        return f"Codec({self.content_type!r})"
+
+_REGISTRY: Dict[str, Codec] = {}
+
+def register_codec(codec: Codec) -> None:
+    """
+    Registra (ou substitui) um codec pelo seu content_type
+    """
+    _REGISTRY[codec.content_type] = codec
+
+def get_codec(content_type: Optional[str] = None) -> Codec:
+    """
+    Retorna o codec de um content_type (padrão: application/json)
+
+    Raises:
+        ValueError: Se o content_type não tiver codec registrado
+    """
+    content_type = content_type or DEFAULT_CONTENT_TYPE
+    try:
+        return _REGISTRY[content_type]
+    except KeyError:
+        raise ValueError(f"Nenhum codec registrado para content_type '{content_type}'")
+
+def available_codecs() -> List[str]:
+    """
+    Lista os content_types com codec registrado
+    """
+    return list(_REGISTRY)
+
+def encode_message(message: Any, content_type: str = DEFAULT_CONTENT_TYPE) -> Tuple[bytes, str]:
+    """
+    Serializa uma mensagem com o codec do content_type
+
+    Args:
+        message: Objeto a serializar (dict, list, str, números...)
+        content_type: Codec desejado
+
+    Returns:
+        Tupla (body, content_type) para usar no basic_publish/BasicProperties
+    """
+    codec = get_codec(content_type)
+    return codec.encode(message), codec.content_type
+
+def decode_message(body: bytes, properties: Optional[pika.BasicProperties] = None) -> Any:
+    """
+    Desserializa o corpo usando o content_type das propriedades
+
+    Mensagens sem content_type são tratadas como JSON, como no restante do
+    projeto. Corpos comprimidos (content_encoding deflate) são
+    descomprimidos antes.
+
+    Args:
+        body: Corpo recebido no callback
+        properties: Propriedades da mensagem
+
+    Returns:
+        Objeto desserializado
+    """
+    content_type = getattr(properties, 'content_type', None)
+    content_encoding = getattr(properties, 'content_encoding', None)
+    if content_encoding and content_encoding.startswith(DEFLATE):
+        body = decompress_body(body, content_encoding)
+    return get_codec(content_type).decode(body)
+
+# Exceções que decode_message pode lançar para um corpo inválido: JSON
+# malformado e UTF-8 inválido (ValueError), content_type ou content_encoding
+# desconhecidos (ValueError), zlib corrompido e binário truncado
+DECODE_ERRORS: Tuple[type, ...] = (ValueError, zlib.error, IndexError, struct.error)
+if msgpack is not None:
+    DECODE_ERRORS += (msgpack.UnpackException,)
+
+# --- JSON compacto ---
+
+_json_encoder = json.JSONEncoder(ensure_ascii=False, separators=(',', ':'))
+
+def _encode_json(message: Any) -> bytes:
+    return _json_encoder.encode(message).encode('utf-8')
+
+register_codec(Codec('application/json', _encode_json, json.loads))
+
+# --- Binário compacto (somente stdlib) ---
+#
+# Cada valor é um byte de tipo seguido do conteúdo. Inteiros e tamanhos usam
+# varint (inteiros com zigzag), floats usam 8 bytes IEEE 754.
+
+_NONE, _FALSE, _TRUE, _INT, _FLOAT, _STR, _BYTES, _LIST, _DICT = range(9)
+_pack_double = struct.Struct('>d').pack
+_unpack_double = struct.Struct('>d').unpack_from
+
+def _write_varint(out: bytearray, value: int) -> None:
+    while value > 0x7F:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+def _write_value(out: bytearray, value: Any) -> None:
+    if value is None:
+        out.append(_NONE)
+    elif value is True:
+        out.append(_TRUE)
+    elif value is False:
+        out.append(_FALSE)
+    elif isinstance(value, int):
+        out.append(_INT)
+        _write_varint(out, (value << 1) if value >= 0 else ((-value) << 1) - 1)
+    elif isinstance(value, float):
+        out.append(_FLOAT)
+        out += _pack_double(value)
+    elif isinstance(value, str):
+        data = value.encode('utf-8')
+        out.append(_STR)
+        _write_varint(out, len(data))
+        out += data
+    elif isinstance(value, (bytes, bytearray)):
+        out.append(_BYTES)
+        _write_varint(out, len(value))
+        out += value
+    elif isinstance(value, (list, tuple)):
+        out.append(_LIST)
+        _write_varint(out, len(value))
+        for item in value:
+            _write_value(out, item)
+    elif isinstance(value, dict):
+        out.append(_DICT)
+        _write_varint(out, len(value))
+        for key, item in value.items():
+            _write_value(out, key)
+            _write_value(out, item)
+    else:
+        raise TypeError(f"Tipo não suportado pelo codec binário: {type(value).__name__}")
+
+def _read_varint(data: bytes, pos: int) -> Tuple[int, int]:
+    result = 0
+    shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        result |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return result, pos
+        shift += 7
+
+def _read_value(data: bytes, pos: int) -> Tuple[Any, int]:
+    tag = data[pos]
+    pos += 1
+    if tag == _STR:
+        length, pos = _read_varint(data, pos)
+        return data[pos:pos + length].decode('utf-8'), pos + length
+    if tag == _INT:
+        raw, pos = _read_varint(data, pos)
+        return (raw >> 1) if not raw & 1 else -((raw + 1) >> 1), pos
+    if tag == _DICT:
+        count, pos = _read_varint(data, pos)
+        result = {}
+        for _ in range(count):
+            key, pos = _read_value(data, pos)
+            result[key], pos = _read_value(data, pos)
+        return result, pos
+    if tag == _LIST:
+        count, pos = _read_varint(data, pos)
+        items = []
+        for _ in range(count):
+            item, pos = _read_value(data, pos)
+            items.append(item)
+        return items, pos
+    if tag == _FLOAT:
+        return _unpack_double(data, pos)[0], pos + 8
+    if tag == _NONE:
+        return None, pos
+    if tag == _TRUE:
+        return True, pos
+    if tag == _FALSE:
+        return False, pos
+    if tag == _BYTES:
+        length, pos = _read_varint(data, pos)
+        return bytes(data[pos:pos + length]), pos + length
+    raise ValueError(f"Tipo desconhecido no codec binário: {tag}")
+
+def _encode_binary(message: Any) -> bytes:
+    out = bytearray()
+    _write_value(out, message)
+    return bytes(out)
+
+def _decode_binary(body: bytes) -> Any:
+    value, pos = _read_value(body, 0)
+    if pos != len(body):
+        raise ValueError(f"Bytes extras após a mensagem binária ({len(body) - pos})")
+    return value
+
+register_codec(Codec('application/x-compact-binary', _encode_binary, _decode_binary))
+
+# --- MessagePack (opcional) ---
+
+if msgpack is not None:
+    register_codec(Codec(
+        'application/msgpack',
+        lambda message: msgpack.packb(message, use_bin_type=True),
+        lambda body: msgpack.unpackb(body, raw=False)
+    ))
+
+# --- Compressão (content_encoding) ---
+
+DEFLATE = 'deflate'
+ZDICT_PREFIX = 'deflate+zdict:'
+MAX_DECOMPRESSED_SIZE = 64 * 1024 * 1024
+
+# Dicionário curado com os trechos mais repetidos nos payloads JSON dos
+# cenários. O zlib usa o dicionário como histórico prévio, então os trechos
+# mais frequentes ficam no final (mais perto dos dados).
+SCENARIO_JSON_ZDICT = (
+    '"records_count":"estimated_time":" minutes"'
+    '"alert_code":"CRIT-"affected_systems":["database","api","frontend"]'
+    '"source_ip":"192.168."attack_type":"SQL_INJECTION"BRUTE_FORCE"XSS"'
+    '"server":"server-"severity":"CRITICAL"ERROR"WARNING"INFO"DEBUG"'
+    '"headers_info":{"format":"json"xml"csv"priority":"high"medium"low"'
+    '"region":"us"eu"br"source":"api"batch"encrypted":"true"}'
+    '"complexity":"high"medium"low"processing_time":"estimated_time":'
+    '"ack_type":"MANUAL"AUTO"risk_level":"BAIXO"ALTO"failure_simulation":false,'
+    '"durability":"PERSISTENTE"TRANSIENTE"important_data":"Dados críticos do sistema - ID '
+    '"category":"system"app"subcategory":"info"warning"error"detail":"auth"database"api"'
+    '"task_id":"task_type":"description":"payload":"Dados da tarefa #'
+    '"created_at":"2025-"type":"broadcast"announcement":"content":"Mensagem '
+    '{"id":,"type":"priority":,"content":"Mensagem ","timestamp":"2025-'
+    'T00:00:00.000000","scenario":"'
+).encode('utf-8')
+
+_ZDICTS: Dict[str, bytes] = {'scenarios-v1': SCENARIO_JSON_ZDICT}
+
+def register_zdict(name: str, zdict: bytes) -> None:
+    """
+    Registra um dicionário zlib pré-treinado
+
+    Producer e consumer precisam ter o mesmo dicionário registrado com o
+    mesmo nome (o nome viaja em content_encoding).
+    """
+    if ':' in name or not zdict:
+        raise ValueError("Nome de dicionário inválido ou dicionário vazio")
+    _ZDICTS[name] = bytes(zdict)
+
+def train_zdict(samples: List[bytes], max_size: int = 32 * 1024) -> bytes:
+    """
+    Monta um dicionário zlib a partir de corpos de exemplo
+
+    O zlib só enxerga os últimos 32KB do dicionário, então as amostras são
+    concatenadas e truncadas a partir do início.
+
+    Args:
+        samples: Corpos de mensagens representativos
+        max_size: Tamanho máximo do dicionário em bytes
+
+    Returns:
+        Dicionário para register_zdict
+    """
+    return b''.join(samples)[-max_size:]
+
+def compress_body(body: bytes,
+                  threshold: int = 0,
+                  zdict_name: Optional[str] = None,
+                  level: int = 6) -> Tuple[bytes, Optional[str]]:
+    """
+    Comprime o corpo com zlib se ele atingir o limite de tamanho
+
+    Args:
+        body: Corpo serializado
+        threshold: Tamanho mínimo em bytes para comprimir
+        zdict_name: Dicionário registrado a usar (opcional)
+        level: Nível de compressão do zlib (1-9)
+
+    Returns:
+        Tupla (body, content_encoding); content_encoding é None quando o
+        corpo foi mantido sem compressão
+    """
+    if len(body) < threshold:
+        return body, None
+
+    if zdict_name:
+        compressor = zlib.compressobj(level, zdict=_ZDICTS[zdict_name])
+        content_encoding = ZDICT_PREFIX + zdict_name
+    else:
+        compressor = zlib.compressobj(level)
+        content_encoding = DEFLATE
+    compressed = compressor.compress(body) + compressor.flush()
+
+    # Mensagens pequenas podem crescer com o cabeçalho do zlib
+    if len(compressed) >= len(body):
+        return body, None
+    return compressed, content_encoding
+
+def decompress_body(body: bytes, content_encoding: str) -> bytes:
+    """
+    Reverte compress_body a partir do content_encoding
+
+    Raises:
+        ValueError: Se o dicionário não estiver registrado ou o corpo
+            descomprimido exceder MAX_DECOMPRESSED_SIZE
+    """
+    if content_encoding.startswith(ZDICT_PREFIX):
+        name = content_encoding[len(ZDICT_PREFIX):]
+        if name not in _ZDICTS:
+            raise ValueError(f"Dicionário zlib '{name}' não registrado")
+        decompressor = zlib.decompressobj(zdict=_ZDICTS[name])
+    elif content_encoding == DEFLATE:
+        decompressor = zlib.decompressobj()
+    else:
+        raise ValueError(f"content_encoding não suportado: '{content_encoding}'")
+
+    data = decompressor.decompress(body, MAX_DECOMPRESSED_SIZE)
+    if decompressor.unconsumed_tail:
+        raise ValueError(f"Mensagem descomprimida excede {MAX_DECOMPRESSED_SIZE} bytes")
+    return data
+
+def compress_for_publish(body: Any,
+                         properties: Optional[pika.BasicProperties] = None,
+                         threshold: Optional[int] = None,
+                         zdict_name: Optional[str] = None) -> Tuple[Any, pika.BasicProperties]:
+    """
+    Prepara corpo e propriedades para o basic_publish com compressão
+
+    Sem parâmetros, segue o ambiente: MESSAGE_COMPRESS_THRESHOLD (bytes;
+    ausente ou 0 desativa) e MESSAGE_ZDICT (nome do dicionário). Com a
+    compressão desativada o corpo e as propriedades voltam inalterados.
+
+    Só corpos acima do limite são comprimidos, e a compressão vai sinalizada
+    em content_encoding: decode_message descomprime sem configuração no
+    consumer, então os producers podem chamar esta função antes de todo
+    basic_publish.
+
+    Args:
+        body: Corpo serializado (str ou bytes)
+        properties: Propriedades da mensagem
+        threshold: Tamanho mínimo para comprimir
+        zdict_name: Dicionário registrado a usar
+
+    Returns:
+        Tupla (body, properties); quando comprimido, properties é uma cópia
+        com content_encoding preenchido (a original não é alterada)
+    """
+    if threshold is None:
+        threshold = int(os.getenv('MESSAGE_COMPRESS_THRESHOLD', '0'))
+    if zdict_name is None:
+        zdict_name = os.getenv('MESSAGE_ZDICT') or None
+
+    properties = properties or pika.BasicProperties()
+    if threshold <= 0:
+        return body, properties
+
+    raw = body.encode('utf-8') if isinstance(body, str) else body
+    compressed, content_encoding = compress_body(raw, threshold, zdict_name)
+    if content_encoding is None:
+        return body, properties
+
+    # Cópia: as propriedades do chamador podem ser reaproveitadas em outras publicações
+    properties = copy.copy(properties)
+    properties.content_encoding = content_encoding
+    return compressed, properties
@@ -0,0 +1,333 @@
+"""
+Manifesto declarativo da topologia RabbitMQ de todos os cenários
+
+Descreve exchanges, filas (com argumentos) e bindings de cada cenário em um
+único lugar. As declarações são enviadas em pipeline (nowait) e apenas a
+última aguarda resposta do broker, funcionando como barreira: um cenário
+inteiro custa um round trip em vez de um por declaração. Um cache por
+conexão evita redeclarar o que já foi confirmado pelo broker dela.
+"""
+import threading
+import weakref
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+import pika
+
+# Tiers de retry atrasado por fila de trabalho (ms, exponenciais x5)
+RETRY_TIERS_MS: Dict[str, List[int]] = {
+    'manual_ack_queue': [1000, 5000, 25000]
+}
+
+def retry_queue_name(queue: str, delay_ms: int) -> str:
+    return f"{queue}.retry.{delay_ms}ms"
+
+def dead_letter_queue_name(queue: str) -> str:
+    return f"{queue}.dead"
+
+def retry_topology(queue: str, delays_ms: Iterable[int], durable: bool = True) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    Filas de atraso e de mensagens mortas de uma fila de trabalho
+
+    Cada tier é uma fila sem consumers com x-message-ttl; ao expirar, a
+    mensagem volta à fila de trabalho pelo exchange padrão (dead-lettering
+    com x-dead-letter-routing-key), e o broker registra a passagem em x-death.
+    A fila de trabalho não muda de argumentos, então a topologia pode ser
+    adicionada a filas que já existem.
+
+    Returns:
+        Dicionário {'exchanges', 'queues', 'bindings'} no formato do manifesto
+    """
+    queues = [
+        {'name': retry_queue_name(queue, delay_ms), 'durable': durable,
+         'arguments': {'x-message-ttl': delay_ms,
+                       'x-dead-letter-exchange': '',
+                       'x-dead-letter-routing-key': queue}}
+        for delay_ms in delays_ms
+    ]
+    queues.append({'name': dead_letter_queue_name(queue), 'durable': durable})
+    return {'exchanges': [], 'queues': queues, 'bindings': []}
+
+# Cenário -> exchanges, filas e bindings (espelha o que cada script declara)
+TOPOLOGY: Dict[str, Dict[str, List[Dict[str, Any]]]] = {
+    'direct_exchange': {
+        'exchanges': [
+            {'name': 'direct_exchange_demo', 'type': 'direct', 'durable': True}
+        ],
+        'queues': [
+            {'name': 'direct_queue_info', 'durable': True},
+            {'name': 'direct_queue_warning', 'durable': True},
+            {'name': 'direct_queue_error', 'durable': True}
+        ],
+        'bindings': [
+            {'exchange': 'direct_exchange_demo', 'queue': 'direct_queue_info', 'routing_key': 'info'},
+            {'exchange': 'direct_exchange_demo', 'queue': 'direct_queue_warning', 'routing_key': 'warning'},
+            {'exchange': 'direct_exchange_demo', 'queue': 'direct_queue_error', 'routing_key': 'error'}
+        ]
+    },
+    'fanout_exchange': {
+        'exchanges': [
+            {'name': 'fanout_exchange_demo', 'type': 'fanout', 'durable': True}
+        ],
+        'queues': [
+            {'name': 'fanout_queue_notifications', 'durable': True},
+            {'name': 'fanout_queue_audit', 'durable': True},
+            {'name': 'fanout_queue_metrics', 'durable': True}
+        ],
+        'bindings': [
+            {'exchange': 'fanout_exchange_demo', 'queue': 'fanout_queue_notifications', 'routing_key': ''},
+            {'exchange': 'fanout_exchange_demo', 'queue': 'fanout_queue_audit', 'routing_key': ''},
+            {'exchange': 'fanout_exchange_demo', 'queue': 'fanout_queue_metrics', 'routing_key': ''}
+        ]
+    },
+    'topic_exchange': {
+        'exchanges': [
+            {'name': 'topic_exchange_demo', 'type': 'topic', 'durable': True}
+        ],
+        'queues': [
+            {'name': 'topic_queue_errors', 'durable': True},
+            {'name': 'topic_queue_warnings', 'durable': True},
+            {'name': 'topic_queue_user_activity', 'durable': True}
+        ],
+        'bindings': [
+            {'exchange': 'topic_exchange_demo', 'queue': 'topic_queue_errors', 'routing_key': '*.error.*'},
+            {'exchange': 'topic_exchange_demo', 'queue': 'topic_queue_warnings', 'routing_key': 'system.warning.*'},
+            {'exchange': 'topic_exchange_demo', 'queue': 'topic_queue_user_activity', 'routing_key': 'app.user.*'}
+        ]
+    },
+    'headers_exchange': {
+        'exchanges': [
+            {'name': 'headers_exchange_demo', 'type': 'headers', 'durable': True}
+        ],
+        'queues': [
+            {'name': 'headers_queue_json_high', 'durable': True},
+            {'name': 'headers_queue_us_or_xml', 'durable': True},
+            {'name': 'headers_queue_encrypted', 'durable': True}
+        ],
+        'bindings': [
+            {'exchange': 'headers_exchange_demo', 'queue': 'headers_queue_json_high', 'routing_key': '',
+             'arguments': {'x-match': 'all', 'format': 'json', 'priority': 'high'}},
+            {'exchange': 'headers_exchange_demo', 'queue': 'headers_queue_us_or_xml', 'routing_key': '',
+             'arguments': {'x-match': 'any', 'region': 'us', 'format': 'xml'}},
+            {'exchange': 'headers_exchange_demo', 'queue': 'headers_queue_encrypted', 'routing_key': '',
+             'arguments': {'x-match': 'any', 'encrypted': 'true'}}
+        ]
+    },
+    'round_robin': {
+        'exchanges': [],
+        'queues': [{'name': 'round_robin_work_queue', 'durable': True}],
+        'bindings': []
+    },
+    'round_robin_weighted': {
+        'exchanges': [],
+        'queues': [{'name': 'weighted_round_robin_queue', 'durable': True}],
+        'bindings': []
+    },
+    'persistence': {
+        'exchanges': [],
+        'queues': [
+            {'name': 'persistent_messages_queue', 'durable': True},
+            {'name': 'transient_messages_queue', 'durable': False}
+        ],
+        'bindings': []
+    },
+    'acknowledgments': {
+        'exchanges': [],
+        'queues': [
+            {'name': 'auto_ack_queue', 'durable': True},
+            {'name': 'manual_ack_queue', 'durable': True}
+        ] + retry_topology('manual_ack_queue', RETRY_TIERS_MS['manual_ack_queue'])['queues'],
+        'bindings': []
+    },
+    'priority': {
+        'exchanges': [],
+        'queues': [
+            {'name': 'priority_queue', 'durable': True, 'arguments': {'x-max-priority': 10}}
+        ],
+        'bindings': []
+    },
+    'interoperability': {
+        'exchanges': [
+            {'name': 'interop_exchange', 'type': 'direct', 'durable': True}
+        ],
+        'queues': [
+            {'name': 'python_queue', 'durable': True},
+            {'name': 'nodejs_queue', 'durable': True},
+            {'name': 'javascript_queue', 'durable': True}
+        ],
+        'bindings': [
+            {'exchange': 'interop_exchange', 'queue': 'python_queue', 'routing_key': 'python'},
+            {'exchange': 'interop_exchange', 'queue': 'nodejs_queue', 'routing_key': 'nodejs'},
+            {'exchange': 'interop_exchange', 'queue': 'javascript_queue', 'routing_key': 'javascript'}
+        ]
+    }
+}
+
+# Declarações já confirmadas, por conexão: outra conexão (ou um broker
+# reiniciado) pode não ter a topologia, e a entrada some com a conexão
+_declared: 'weakref.WeakKeyDictionary[Any, Set[tuple]]' = weakref.WeakKeyDictionary()
+_declared_lock = threading.Lock()
+
+def _freeze(arguments: Optional[Dict[str, Any]]) -> tuple:
+    return tuple(sorted((arguments or {}).items()))
+
+def _exchange_op(exchange: Dict[str, Any]) -> tuple:
+    key = ('exchange', exchange['name'], exchange['type'], exchange.get('durable', True),
+           _freeze(exchange.get('arguments')))
+    method = pika.spec.Exchange.Declare(
+        exchange=exchange['name'],
+        type=exchange['type'],
+        durable=exchange.get('durable', True),
+        nowait=True,
+        arguments=exchange.get('arguments') or {}
+    )
+
+    def declare(channel):
+        channel.exchange_declare(
+            exchange=exchange['name'],
+            exchange_type=exchange['type'],
+            durable=exchange.get('durable', True),
+            arguments=exchange.get('arguments') or {}
+        )
+
+    return key, method, declare
+
+def _queue_op(queue: Dict[str, Any]) -> tuple:
+    key = ('queue', queue['name'], queue.get('durable', True), _freeze(queue.get('arguments')))
+    method = pika.spec.Queue.Declare(
+        queue=queue['name'],
+        durable=queue.get('durable', True),
+        nowait=True,
+        arguments=queue.get('arguments') or {}
+    )
+
+    def declare(channel):
+        channel.queue_declare(
+            queue=queue['name'],
+            durable=queue.get('durable', True),
+            arguments=queue.get('arguments') or {}
+        )
+
+    return key, method, declare
+
+def _binding_op(binding: Dict[str, Any]) -> tuple:
+    key = ('binding', binding['exchange'], binding['queue'], binding.get('routing_key', ''),
+           _freeze(binding.get('arguments')))
+    method = pika.spec.Queue.Bind(
+        queue=binding['queue'],
+        exchange=binding['exchange'],
+        routing_key=binding.get('routing_key', ''),
+        nowait=True,
+        arguments=binding.get('arguments') or {}
+    )
+
+    def declare(channel):
+        channel.queue_bind(
+            queue=binding['queue'],
+            exchange=binding['exchange'],
+            routing_key=binding.get('routing_key', ''),
+            arguments=binding.get('arguments') or {}
+        )
+
+    return key, method, declare
+
+def declare(channel,
+            exchanges: Iterable[Dict[str, Any]] = (),
+            queues: Iterable[Dict[str, Any]] = (),
+            bindings: Iterable[Dict[str, Any]] = (),
+            pipelined: bool = True) -> int:
+    """
+    Declara exchanges, filas e bindings pulando o que já está em cache
+
+    Com pipelined=True todas as declarações, exceto a última, são enviadas
+    com nowait; a última é síncrona e só retorna depois que o broker
+    processou as anteriores (o canal processa na ordem). Se alguma falhar,
+    o broker fecha o canal e a exceção é propagada pela barreira.
+
+    Args:
+        channel: Canal do RabbitMQ (BlockingChannel)
+        exchanges: Dicionários {'name', 'type', 'durable', 'arguments'}
+        queues: Dicionários {'name', 'durable', 'arguments'}
+        bindings: Dicionários {'exchange', 'queue', 'routing_key', 'arguments'}
+        pipelined: Se deve usar declarações nowait
+
+    Returns:
+        Número de declarações enviadas ao broker
+    """
+    ops = ([_exchange_op(e) for e in exchanges] +
+           [_queue_op(q) for q in queues] +
+           [_binding_op(b) for b in bindings])
+
+    connection = getattr(channel, 'connection', channel)
+    with _declared_lock:
+        declared = _declared.get(connection, set())
+        pending = []
+        seen = set()
+        for op in ops:
+            if op[0] not in declared and op[0] not in seen:
+                seen.add(op[0])
+                pending.append(op)
+
+    if not pending:
+        return 0
+
+    # nowait exige acesso ao canal assíncrono interno do BlockingChannel
+    impl = getattr(channel, '_impl', None)
+    if not pipelined or impl is None:
+        for _, _, declare_sync in pending:
+            declare_sync(channel)
+    else:
+        for _, method, _ in pending[:-1]:
+            impl._send_method(method)
+        pending[-1][2](channel)
+
+    with _declared_lock:
+        _declared.setdefault(connection, set()).update(op[0] for op in pending)
+
+    return len(pending)
+
+def get_scenario_topology(scenario_name: str) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    Retorna a topologia declarada para um cenário
+
+    Raises:
+        KeyError: Se o cenário não existir no manifesto
+    """
+    if scenario_name not in TOPOLOGY:
+        raise KeyError(f"Cenário '{scenario_name}' não existe no manifesto de topologia")
+    return TOPOLOGY[scenario_name]
+
+def apply_topology(channel,
+                   scenarios: Optional[Iterable[str]] = None,
+                   pipelined: bool = True) -> int:
+    """
+    Aplica o manifesto de topologia de um ou mais cenários
+
+    Args:
+        channel: Canal do RabbitMQ
+        scenarios: Nomes dos cenários (padrão: todos)
+        pipelined: Se deve usar declarações nowait com uma única barreira
+
+    Returns:
+        Número de declarações enviadas ao broker (0 se tudo estava em cache)
+    """
+    exchanges, queues, bindings = [], [], []
+    for scenario_name in (scenarios if scenarios is not None else TOPOLOGY):
+        topology = get_scenario_topology(scenario_name)
+        exchanges.extend(topology['exchanges'])
+        queues.extend(topology['queues'])
+        bindings.extend(topology['bindings'])
+
+    return declare(channel, exchanges, queues, bindings, pipelined=pipelined)
+
+def reset_declaration_cache(connection: Any = None) -> None:
+    """
+    Esquece as declarações em cache (ex: após reconectar a um broker reiniciado)
+
+    Args:
+        connection: Conexão cujo cache será descartado (padrão: todas)
+    """
+    with _declared_lock:
+        if connection is None:
+            _declared.clear()
+        else:
+            _declared.pop(connection, None)
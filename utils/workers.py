@@ -0,0 +1,645 @@
+"""
+Runtime de consumo concorrente para handlers bloqueantes
+
+O callback do pika roda na thread de I/O da conexão: um handler com
+time.sleep ou trabalho pesado trava heartbeats e faz um prefetch de N
+processar uma mensagem por vez. Aqui as entregas são repassadas a um
+ThreadPoolExecutor do tamanho da janela do basic_qos, e os ACK/NACK voltam
+para a thread de I/O por connection.add_callback_threadsafe (o pika não é
+thread-safe).
+
+Para handlers CPU-bound (limitados pelo GIL) consume_in_processes envia a
+mensagem já decodificada a um ProcessPoolExecutor e confirma as entregas na
+ordem em que chegaram.
+
+PrefetchController ajusta o prefetch em tempo de execução pela lei de
+Little, a partir do tempo de serviço e da taxa de ACKs medidos.
+
+consume_batches entrega ao handler lotes de até N mensagens (ou o que chegar
+em T ms) e confirma cada lote com um único basic_ack(multiple=True).
+
+Com um DeliveryScheduler (utils.scheduler), consume_threaded e
+consume_in_processes escolhem a próxima entrega do buffer pela política
+(prioridade, menor job, prazo) em vez da ordem de chegada.
+"""
+import functools
+import logging
+import logging.handlers
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+import pika
+
+from utils.dedup import DedupFilter
+from utils.scheduler import DeliveryScheduler
+from utils.serialization import decode_message
+
+# Handler síncrono: recebe (method, properties, body) e não faz ack
+Handler = Callable[[Any, pika.BasicProperties, bytes], None]
+
+# Entrega como recebida no callback do pika
+Delivery = Tuple[Any, pika.BasicProperties, bytes]
+
+class PrefetchController:
+    """
+    Ajusta o prefetch de um canal em tempo de execução (lei de Little)
+
+    Para manter `concurrency` handlers ocupados, cada um precisa ter a
+    próxima mensagem disponível quando termina a atual. Com tempo de
+    serviço S e round trip R até o broker, a vazão máxima é concurrency/S
+    e as mensagens em trânsito necessárias são L = X * (S + R), com X a
+    vazão. O controlador mede S (duração dos handlers), R (duração do
+    próprio basic_qos, que é síncrono) e a taxa de ACKs; X é a taxa de
+    ACKs limitada a concurrency/S (sem ACKs no intervalo, concurrency/S),
+    e o basic_qos é reemitido com L * headroom, nunca abaixo de concurrency.
+    Workers mais rápidos ganham janelas maiores e a divisão da carga passa
+    a seguir a velocidade real, sem acumular mensagens em workers lentos ou
+    ociosos; com a fila cheia a taxa de ACKs sobe e o headroom faz a janela
+    crescer a cada intervalo até a capacidade.
+
+    Usa global_qos=True: o RabbitMQ só aplica um novo prefetch por consumer
+    a consumers criados depois, mas o limite do canal vale imediatamente.
+
+    Os métodos record_* podem ser chamados de qualquer thread; start e
+    maybe_adjust devem rodar na thread de I/O da conexão.
+    """
+
+    def __init__(self,
+                 channel,
+                 concurrency: int = 1,
+                 initial_prefetch: Optional[int] = None,
+                 min_prefetch: int = 1,
+                 max_prefetch: int = 200,
+                 interval: float = 5.0,
+                 headroom: float = 1.25,
+                 smoothing: float = 0.2,
+                 logger: Optional[logging.Logger] = None):
+        """
+        Args:
+            channel: Canal do RabbitMQ (BlockingChannel)
+            concurrency: Mensagens processadas ao mesmo tempo pelo worker
+            initial_prefetch: Prefetch até a primeira medição (padrão: concurrency)
+            min_prefetch: Limite inferior do prefetch
+            max_prefetch: Limite superior do prefetch
+            interval: Segundos entre reavaliações
+            headroom: Margem sobre o valor calculado (absorve variação de S)
+            smoothing: Peso das novas amostras na média móvel exponencial
+            logger: Logger para os ajustes
+        """
+        if concurrency < 1 or min_prefetch < 1 or max_prefetch < min_prefetch:
+            raise ValueError("Parâmetros de prefetch inválidos")
+
+        self.channel = channel
+        self.concurrency = concurrency
+        self.min_prefetch = min_prefetch
+        self.max_prefetch = max_prefetch
+        self.interval = interval
+        self.headroom = headroom
+        self.smoothing = smoothing
+        self.logger = logger
+        self.prefetch_count = max(min_prefetch, min(max_prefetch, initial_prefetch or concurrency))
+
+        self.service_time: Optional[float] = None
+        self.rtt: Optional[float] = None
+        self.ack_rate = 0.0
+        self.adjustments = 0
+        self._acks = 0
+        self._window_start = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _smooth(self, current: Optional[float], sample: float) -> float:
+        if current is None:
+            return sample
+        return current + self.smoothing * (sample - current)
+
+    def _apply(self, prefetch_count: int) -> None:
+        started = time.perf_counter()
+        self.channel.basic_qos(prefetch_count=prefetch_count, global_qos=True)
+        self.rtt = self._smooth(self.rtt, time.perf_counter() - started)
+        self.prefetch_count = prefetch_count
+
+    def start(self) -> None:
+        """
+        Aplica o prefetch inicial (e faz a primeira medição de round trip)
+        """
+        self._apply(self.prefetch_count)
+        self._window_start = time.monotonic()
+
+    def record_service_time(self, seconds: float) -> None:
+        with self._lock:
+            self.service_time = self._smooth(self.service_time, seconds)
+
+    def record_ack(self) -> None:
+        with self._lock:
+            self._acks += 1
+
+    def target_prefetch(self) -> int:
+        """
+        Prefetch recomendado para as medições atuais
+        """
+        if not self.service_time:
+            return self.prefetch_count
+        capacity = self.concurrency / self.service_time
+        # Vazão real (ACKs/s) quando o worker não está saturado
+        throughput = min(capacity, self.ack_rate) if self.ack_rate else capacity
+        in_flight = max(self.concurrency, throughput * (self.service_time + (self.rtt or 0.0)))
+        target = math.ceil(in_flight * self.headroom)
+        return max(self.min_prefetch, min(self.max_prefetch, target))
+
+    def maybe_adjust(self) -> bool:
+        """
+        Reavalia o prefetch se o intervalo tiver passado
+
+        Returns:
+            True se um novo basic_qos foi emitido
+        """
+        now = time.monotonic()
+        elapsed = now - self._window_start
+        if elapsed < self.interval:
+            return False
+
+        with self._lock:
+            self.ack_rate = self._acks / elapsed
+            self._acks = 0
+        self._window_start = now
+
+        target = self.target_prefetch()
+        if target == self.prefetch_count:
+            return False
+
+        previous = self.prefetch_count
+        self._apply(target)
+        self.adjustments += 1
+        if self.logger:
+            self.logger.info(f"Prefetch ajustado: {previous} → {target} "
+                             f"(serviço {self.service_time * 1000:.0f}ms, "
+                             f"RTT {self.rtt * 1000:.1f}ms, {self.ack_rate:.2f} ACKs/s)")
+        return True
+
+    def get_metrics(self) -> Dict[str, float]:
+        """
+        Retorna as medições atuais do controlador
+        """
+        return {
+            'prefetch_count': self.prefetch_count,
+            'service_time_ms': (self.service_time or 0.0) * 1000,
+            'rtt_ms': (self.rtt or 0.0) * 1000,
+            'ack_rate': self.ack_rate,
+            'adjustments': self.adjustments
+        }
+
+def consume_threaded(channel,
+                     queue: str,
+                     handler: Handler,
+                     prefetch_count: int = 1,
+                     max_workers: Optional[int] = None,
+                     stop_event: Optional[threading.Event] = None,
+                     requeue_on_error: bool = True,
+                     logger: Optional[logging.Logger] = None,
+                     poll_interval: float = 0.5,
+                     prefetch_controller: Optional[PrefetchController] = None,
+                     scheduler: Optional[DeliveryScheduler] = None) -> Dict[str, int]:
+    """
+    Consome uma fila executando o handler em um pool de threads
+
+    A thread que chama esta função fica no loop de I/O do pika (entregas,
+    heartbeats e ACKs); o handler roda nas threads do pool. O ACK é feito
+    após o handler terminar com sucesso; exceções geram NACK. Ao encerrar
+    (stop_event ou Ctrl+C) o consumer é cancelado e as tarefas em andamento
+    são concluídas e confirmadas antes do retorno.
+
+    Com prefetch_controller o pool tem controller.concurrency threads e o
+    prefetch passa a ser ajustado pelo controlador (prefetch_count é ignorado).
+
+    Com scheduler, cada thread livre processa a entrega que a política
+    escolher entre as que aguardam (útil quando o prefetch excede o pool).
+
+    Args:
+        channel: Canal do RabbitMQ (BlockingChannel)
+        queue: Nome da fila
+        handler: Função (method, properties, body) executada no pool
+        prefetch_count: Janela de mensagens não confirmadas (>= 1)
+        max_workers: Threads do pool (padrão: prefetch_count)
+        stop_event: Evento que encerra o consumo quando sinalizado
+        requeue_on_error: Se mensagens com erro voltam para a fila
+        logger: Logger para erros dos handlers
+        poll_interval: Intervalo máximo de espera do loop de I/O (segundos)
+        prefetch_controller: Controlador de prefetch adaptativo (opcional)
+        scheduler: Escalonador das entregas pendentes (padrão: ordem de chegada)
+
+    Returns:
+        Contadores {'processed', 'failed'} ao final do consumo
+    """
+    if prefetch_count < 1:
+        raise ValueError("prefetch_count deve ser >= 1 para limitar a concorrência")
+
+    logger = logger or logging.getLogger(__name__)
+    connection = channel.connection
+    stop_event = stop_event or threading.Event()
+    counters = {'processed': 0, 'failed': 0}
+    in_flight: Set[Future] = set()
+
+    def settle(delivery_tag: int, success: bool) -> None:
+        # Executado na thread de I/O
+        if not channel.is_open:
+            return
+        if prefetch_controller:
+            prefetch_controller.record_ack()
+        if success:
+            counters['processed'] += 1
+            channel.basic_ack(delivery_tag=delivery_tag)
+        else:
+            counters['failed'] += 1
+            channel.basic_nack(delivery_tag=delivery_tag, requeue=requeue_on_error)
+
+    def run_handler(method, properties, body) -> None:
+        started = time.perf_counter()
+        try:
+            handler(method, properties, body)
+            success = True
+        except Exception as e:
+            logger.error(f"Erro no handler (tag {method.delivery_tag}): {str(e)}")
+            success = False
+        if prefetch_controller:
+            prefetch_controller.record_service_time(time.perf_counter() - started)
+        connection.add_callback_threadsafe(functools.partial(settle, method.delivery_tag, success))
+
+    if prefetch_controller:
+        max_workers = max_workers or prefetch_controller.concurrency
+    executor = ThreadPoolExecutor(max_workers=max_workers or prefetch_count,
+                                  thread_name_prefix=f"consumer-{queue}")
+
+    def run_next() -> None:
+        # Uma chamada por entrega: a escolhida é a melhor no momento em que a thread fica livre
+        run_handler(*scheduler.pop())
+
+    def on_message(ch, method, properties, body):
+        if scheduler is not None:
+            scheduler.push((method, properties, body), properties, body)
+            future = executor.submit(run_next)
+        else:
+            future = executor.submit(run_handler, method, properties, body)
+        in_flight.add(future)
+        future.add_done_callback(in_flight.discard)
+
+    if prefetch_controller:
+        prefetch_controller.start()
+    else:
+        channel.basic_qos(prefetch_count=prefetch_count)
+    consumer_tag = channel.basic_consume(queue=queue, on_message_callback=on_message)
+
+    try:
+        while not stop_event.is_set() and channel.is_open:
+            connection.process_data_events(time_limit=poll_interval)
+            if prefetch_controller:
+                prefetch_controller.maybe_adjust()
+    finally:
+        if channel.is_open:
+            channel.basic_cancel(consumer_tag)
+        # Drena as tarefas em andamento mantendo o loop de I/O ativo para os ACKs
+        while in_flight and connection.is_open:
+            connection.process_data_events(time_limit=0.1)
+        executor.shutdown(wait=True)
+        if connection.is_open:
+            connection.process_data_events(time_limit=0)
+
+    return counters
+
+# Corpos maiores que isso não são serializados (pickle) para os processos
+DEFAULT_MAX_PICKLE_BYTES = 256 * 1024
+
+# Marcador de entregas descartadas pelo filtro de duplicatas
+_DUPLICATE = object()
+
+def _init_worker_logging() -> None:
+    """
+    Inicializador dos processos do pool
+
+    Com fork, o filho herda o QueueHandler de setup_logging(async_logging=True),
+    mas não a thread do QueueListener: os registros ficariam parados na fila.
+    Aqui os loggers voltam a escrever direto nos handlers do listener.
+    """
+    loggers = [logging.getLogger()] + [logger for logger in logging.Logger.manager.loggerDict.values()
+                                       if isinstance(logger, logging.Logger)]
+    for logger in loggers:
+        listener = getattr(logger, '_queue_listener', None)
+        if listener is None:
+            continue
+        for handler in logger.handlers[:]:
+            if isinstance(handler, logging.handlers.QueueHandler):
+                logger.removeHandler(handler)
+        for handler in listener.handlers:
+            logger.addHandler(handler)
+        logger._queue_listener = None
+
+class _PendingDelivery:
+    __slots__ = ('method', 'properties', 'message', 'done', 'result', 'error', 'requeue', 'inline')
+
+    def __init__(self, method, properties, message):
+        self.method = method
+        self.properties = properties
+        self.message = message
+        self.done = False
+        self.result = None
+        self.error: Optional[BaseException] = None
+        self.requeue = True
+        # Executada na thread local (corpo grande) em vez do pool de processos
+        self.inline = False
+
+def consume_in_processes(channel,
+                         queue: str,
+                         task: Callable[[Any], Any],
+                         prefetch_count: Optional[int] = None,
+                         max_workers: Optional[int] = None,
+                         max_pickle_bytes: int = DEFAULT_MAX_PICKLE_BYTES,
+                         on_result: Optional[Callable[[Any, Any, Any, pika.BasicProperties, bool], None]] = None,
+                         stop_event: Optional[threading.Event] = None,
+                         requeue_on_error: bool = True,
+                         logger: Optional[logging.Logger] = None,
+                         poll_interval: float = 0.5,
+                         dedup: Optional[DedupFilter] = None,
+                         scheduler: Optional[DeliveryScheduler] = None) -> Dict[str, int]:
+    """
+    Consome uma fila executando o processamento em um pool de processos
+
+    A mensagem é decodificada na thread de I/O (decode_message) e task(message)
+    roda em um processo do pool; o resultado volta para a thread de I/O, onde
+    on_result é chamado e a entrega é confirmada. As confirmações seguem a
+    ordem de entrega: sequências concluídas com sucesso viram um único
+    basic_ack(multiple=True), por isso o canal deve ser dedicado a este
+    consumer.
+
+    Mensagens com corpo acima de max_pickle_bytes não são copiadas para os
+    processos: rodam em uma thread local, limitando o custo de pickle.
+
+    Args:
+        channel: Canal do RabbitMQ (BlockingChannel) dedicado
+        queue: Nome da fila
+        task: Função de nível de módulo (serializável) que recebe a mensagem
+            decodificada e retorna um resultado serializável
+        prefetch_count: Janela de mensagens não confirmadas (padrão: 2x workers)
+        max_workers: Processos do pool (padrão: número de CPUs)
+        max_pickle_bytes: Tamanho máximo do corpo enviado aos processos
+        on_result: Chamado na thread de I/O com (message, result, method,
+            properties, inline); inline indica que o task rodou neste
+            processo, e não no pool (efeitos colaterais já aplicados aqui)
+        stop_event: Evento que encerra o consumo quando sinalizado
+        requeue_on_error: Se mensagens com erro no task voltam para a fila
+        logger: Logger para erros
+        poll_interval: Intervalo máximo de espera do loop de I/O (segundos)
+        dedup: Filtro de duplicatas; entregas já processadas são confirmadas
+            sem executar o task e as concluídas são marcadas antes do ACK
+        scheduler: Escalonador das entregas; com ele, no máximo max_workers
+            tasks ficam no pool e as demais aguardam a vez pela política
+
+    Returns:
+        Contadores {'processed', 'failed', 'inline', 'duplicates'} ao final do consumo
+    """
+    logger = logger or logging.getLogger(__name__)
+    connection = channel.connection
+    stop_event = stop_event or threading.Event()
+    counters = {'processed': 0, 'failed': 0, 'inline': 0, 'duplicates': 0}
+
+    workers = max_workers or os.cpu_count() or 1
+    processes = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker_logging)
+    prefetch_count = prefetch_count or 2 * workers
+    local = ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"inline-{queue}")
+
+    # delivery_tag -> entrega, na ordem de chegada
+    pending: 'OrderedDict[int, _PendingDelivery]' = OrderedDict()
+
+    def flush() -> None:
+        # Confirma o prefixo concluído das entregas, em ordem
+        last_success = None
+        while pending:
+            tag, entry = next(iter(pending.items()))
+            if not entry.done:
+                break
+            pending.popitem(last=False)
+
+            if entry.error is None:
+                last_success = tag
+                if entry.message is _DUPLICATE:
+                    continue
+                counters['processed'] += 1
+                if dedup is not None:
+                    dedup.mark_processed(entry.properties)
+                if on_result:
+                    try:
+                        on_result(entry.message, entry.result, entry.method, entry.properties, entry.inline)
+                    except Exception as e:
+                        logger.error(f"Erro em on_result (tag {tag}): {str(e)}")
+                continue
+
+            if last_success is not None and channel.is_open:
+                channel.basic_ack(delivery_tag=last_success, multiple=True)
+            last_success = None
+            counters['failed'] += 1
+            logger.error(f"Erro no processamento (tag {tag}): {str(entry.error)}")
+            if channel.is_open:
+                channel.basic_nack(delivery_tag=tag, requeue=entry.requeue)
+
+        if last_success is not None and channel.is_open:
+            channel.basic_ack(delivery_tag=last_success, multiple=True)
+
+    # Tasks submetidos e ainda não concluídos
+    running = [0]
+
+    def submit(tag: int, message: Any, inline: bool) -> None:
+        if inline:
+            counters['inline'] += 1
+            future = local.submit(task, message)
+        else:
+            future = processes.submit(task, message)
+        running[0] += 1
+        future.add_done_callback(
+            lambda f: connection.add_callback_threadsafe(functools.partial(complete, tag, f))
+        )
+
+    def submit_scheduled() -> None:
+        # Mantém o pool ocupado com as entregas escolhidas pela política
+        while scheduler is not None and len(scheduler) and running[0] < workers:
+            submit(*scheduler.pop())
+
+    def complete(tag: int, future: Future) -> None:
+        # Executado na thread de I/O
+        running[0] -= 1
+        entry = pending.get(tag)
+        if entry is not None:
+            entry.done = True
+            entry.error = future.exception()
+            if entry.error is None:
+                entry.result = future.result()
+            flush()
+        submit_scheduled()
+
+    def on_message(ch, method, properties, body):
+        tag = method.delivery_tag
+        if dedup is not None and dedup.is_duplicate(method, properties):
+            # Confirmada na ordem, junto com as vizinhas, sem reprocessar
+            counters['duplicates'] += 1
+            entry = _PendingDelivery(method, properties, _DUPLICATE)
+            entry.done = True
+            pending[tag] = entry
+            flush()
+            return
+        try:
+            message = decode_message(body, properties)
+        except Exception as e:
+            entry = _PendingDelivery(method, properties, None)
+            entry.done, entry.error, entry.requeue = True, e, False
+            pending[tag] = entry
+            flush()
+            return
+
+        entry = _PendingDelivery(method, properties, message)
+        entry.requeue = requeue_on_error
+        entry.inline = len(body) > max_pickle_bytes
+        pending[tag] = entry
+        if scheduler is not None:
+            scheduler.push((tag, message, entry.inline), properties, body, message=message)
+            submit_scheduled()
+        else:
+            submit(tag, message, entry.inline)
+
+    channel.basic_qos(prefetch_count=prefetch_count)
+    consumer_tag = channel.basic_consume(queue=queue, on_message_callback=on_message)
+
+    try:
+        while not stop_event.is_set() and channel.is_open:
+            connection.process_data_events(time_limit=poll_interval)
+    finally:
+        if channel.is_open:
+            channel.basic_cancel(consumer_tag)
+        # Aguarda os resultados pendentes para confirmá-los antes de sair
+        while pending and connection.is_open and channel.is_open:
+            connection.process_data_events(time_limit=0.1)
+        processes.shutdown(wait=True)
+        local.shutdown(wait=True)
+
+    return counters
+
+def consume_batches(channel,
+                    queue: str,
+                    handler: Callable[[List[Delivery]], Optional[Iterable[int]]],
+                    batch_size: int = 10,
+                    max_wait_ms: float = 200,
+                    prefetch_count: Optional[int] = None,
+                    stop_event: Optional[threading.Event] = None,
+                    requeue_on_error: bool = True,
+                    logger: Optional[logging.Logger] = None) -> Dict[str, int]:
+    """
+    Consome uma fila em lotes confirmados com um único ACK
+
+    O handler recebe até batch_size entregas, ou as que chegaram em
+    max_wait_ms desde a primeira do lote. Se terminar sem exceção, o lote
+    inteiro é confirmado com basic_ack(multiple=True). Se falhar, o lote é
+    dividido ao meio e cada metade reprocessada, até isolar as mensagens com
+    erro (que recebem NACK); o handler deve tolerar reprocessar mensagens de
+    uma metade que falhou.
+
+    O handler pode devolver os delivery tags das entregas que nunca serão
+    processadas (ex: corpo que não decodifica): elas recebem NACK sem
+    requeue (dead-lettering) antes do ACK múltiplo das demais.
+
+    Os lotes são liquidados em ordem, então o ACK múltiplo nunca cobre
+    entregas pendentes; por isso o canal deve ser dedicado a este consumer.
+    O handler roda na thread de I/O (como um callback do pika).
+
+    Args:
+        channel: Canal do RabbitMQ (BlockingChannel) dedicado
+        queue: Nome da fila
+        handler: Função que recebe a lista de (method, properties, body) e
+            opcionalmente devolve os delivery tags a rejeitar
+        batch_size: Tamanho máximo do lote
+        max_wait_ms: Espera máxima para completar um lote (milissegundos)
+        prefetch_count: Janela do basic_qos (padrão: batch_size)
+        stop_event: Evento que encerra o consumo quando sinalizado
+        requeue_on_error: Se mensagens com erro voltam para a fila
+        logger: Logger para erros do handler
+
+    Returns:
+        Contadores {'processed', 'failed', 'rejected', 'batches', 'acks'} ao final do consumo
+    """
+    if batch_size < 1:
+        raise ValueError("batch_size deve ser >= 1")
+    prefetch_count = prefetch_count or batch_size
+    if prefetch_count < batch_size:
+        raise ValueError("prefetch_count menor que batch_size impede lotes completos")
+
+    logger = logger or logging.getLogger(__name__)
+    connection = channel.connection
+    stop_event = stop_event or threading.Event()
+    counters = {'processed': 0, 'failed': 0, 'rejected': 0, 'batches': 0, 'acks': 0}
+    buffer: List[Delivery] = []
+    max_wait = max_wait_ms / 1000.0
+    batch_started = [0.0]
+
+    def run(batch: List[Delivery]) -> None:
+        try:
+            rejected = set(handler(batch) or ())
+        except Exception as e:
+            if len(batch) > 1:
+                middle = len(batch) // 2
+                run(batch[:middle])
+                run(batch[middle:])
+                return
+            method = batch[0][0]
+            counters['failed'] += 1
+            logger.error(f"Erro no handler de lote (tag {method.delivery_tag}): {str(e)}")
+            if channel.is_open:
+                channel.basic_nack(delivery_tag=method.delivery_tag, requeue=requeue_on_error)
+            return
+
+        if not channel.is_open:
+            return
+        # O ACK múltiplo precisa de um tag ainda pendente: rejeitadas saem antes
+        for delivery_tag in sorted(rejected):
+            counters['rejected'] += 1
+            channel.basic_nack(delivery_tag=delivery_tag, requeue=False)
+        accepted = [method.delivery_tag for method, _, _ in batch if method.delivery_tag not in rejected]
+        if accepted:
+            counters['processed'] += len(accepted)
+            counters['acks'] += 1
+            channel.basic_ack(delivery_tag=max(accepted), multiple=True)
+
+    def flush() -> None:
+        if not buffer:
+            return
+        batch = buffer[:]
+        buffer.clear()
+        counters['batches'] += 1
+        run(batch)
+
+    def on_message(ch, method, properties, body):
+        if not buffer:
+            batch_started[0] = time.monotonic()
+        buffer.append((method, properties, body))
+        if len(buffer) >= batch_size:
+            flush()
+
+    channel.basic_qos(prefetch_count=prefetch_count)
+    consumer_tag = channel.basic_consume(queue=queue, on_message_callback=on_message)
+
+    try:
+        while not stop_event.is_set() and channel.is_open:
+            if buffer:
+                remaining = batch_started[0] + max_wait - time.monotonic()
+                if remaining <= 0:
+                    flush()
+                    continue
+                connection.process_data_events(time_limit=remaining)
+            else:
+                connection.process_data_events(time_limit=0.5)
+    finally:
+        if channel.is_open:
+            channel.basic_cancel(consumer_tag)
+            # Processa o lote parcial para não deixar entregas sem resposta
+            flush()
+
+    return counters